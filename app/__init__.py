@@ -16,6 +16,7 @@ from .utils.common import format_datetime_filter, format_number_es
 # Importar Flask-Login
 from flask_login import LoginManager
 from pathlib import Path
+from startup_profiler import startup_profiler
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -100,7 +101,7 @@ class SimpleUser:
 @login_manager.user_loader
 def load_user(user_id):
     """Cargar usuario para Flask-Login usando SQL directo"""
-    logger.info(f"🔍 DEBUG: Flask-Login cargando usuario ID: {user_id}")
+    logger.debug("🔍 Flask-Login cargando usuario ID: %s", user_id)
     try:
         from sqlalchemy import text
         from app.models import db
@@ -111,13 +112,13 @@ def load_user(user_id):
         ).fetchone()
         
         if result:
-            logger.info(f"🔍 DEBUG: Usuario recargado exitosamente: {result[1]} (admin: {bool(result[5])}, role: {result[6]})")
+            logger.debug("🔍 Usuario recargado exitosamente: %s (admin: %s, role: %s)", result[1], bool(result[5]), result[6])
             return SimpleUser(result[0], result[1], result[2], result[3], result[4], result[5], result[6])
         else:
-            logger.info(f"🔍 DEBUG: Usuario ID {user_id} no encontrado para recarga")
+            logger.debug("🔍 Usuario ID %s no encontrado para recarga", user_id)
         return None
     except Exception as e:
-        logger.error(f"❌ ERROR recargando usuario: {e}")
+        logger.error("❌ ERROR recargando usuario: %s", e)
         return None
 
 def create_app(config_class=None):
@@ -134,15 +135,28 @@ def create_app(config_class=None):
     # Asegurar que el límite de tamaño de archivos se aplique correctamente
     app.config['MAX_CONTENT_LENGTH'] = config_class.MAX_CONTENT_LENGTH
     
+    # Medir registro por blueprint si el perfilado de arranque está activo
+    startup_profiler.instrument_app(app)
+    
     # Inicializar extensiones
-    init_extensions(app)
+    with startup_profiler.fase('init_extensions'):
+        init_extensions(app)
     
     # Registrar blueprints
-    register_blueprints(app)
+    with startup_profiler.fase('register_blueprints'):
+        register_blueprints(app)
     
     # Configurar logging
     configure_logging(app)
     
+    # Métricas Prometheus (/metrics)
+    from app.utils.metrics import init_metrics
+    init_metrics(app)
+    
+    # Perfilado por muestreo de peticiones (opt-in, PROFILER_ENABLED)
+    from app.utils.request_profiler import init_request_profiler
+    init_request_profiler(app)
+    
     # Configurar manejo de errores
     configure_error_handlers(app)
     
@@ -155,14 +169,16 @@ def init_extensions(app):
     """Inicializar extensiones de Flask."""
     
     # SQLAlchemy
-    from app.models import db
-    db.init_app(app)
+    with startup_profiler.fase('sqlalchemy', grupo='extensiones'):
+        from app.models import db
+        db.init_app(app)
     
     # Flask-Login
-    login_manager.init_app(app)
+    with startup_profiler.fase('login_manager', grupo='extensiones'):
+        login_manager.init_app(app)
     
     # Crear tablas si no existen
-    with app.app_context():
+    with startup_profiler.fase('create_all', grupo='extensiones'), app.app_context():
         try:
             db.create_all()
             logger.info("Database tables created successfully")
@@ -193,6 +209,8 @@ def register_blueprints(app):
     from app.blueprints.facturas import facturas_bp
     from app.blueprints.visitantes import visitantes_bp
     from app.blueprints.test_access import test_bp
+    from app.blueprints.monitoreo import monitoreo_bp
+    from app.blueprints.ocr_jobs import ocr_jobs_bp
     # from app.blueprints.presupuesto import bp as presupuesto_bp  # Comentado temporalmente - requiere pandas
     
     # Registrar blueprints con sus prefijos
@@ -213,32 +231,17 @@ def register_blueprints(app):
     app.register_blueprint(codigos_despacho_bp, url_prefix='/codigos-despacho')
     app.register_blueprint(facturas_bp, url_prefix='/facturas')
     app.register_blueprint(visitantes_bp, url_prefix='/visitantes')
+    app.register_blueprint(monitoreo_bp, url_prefix='/admin/monitoreo')
+    app.register_blueprint(ocr_jobs_bp, url_prefix='/ocr/jobs')
     app.register_blueprint(test_bp)  # Blueprint de prueba
     # app.register_blueprint(presupuesto_bp)  # Comentado temporalmente - requiere pandas
 
 def configure_logging(app):
-    """Configurar logging para la aplicación."""
+    """Configurar logging para la aplicación (cola no bloqueante, un solo escritor)."""
+    from app.utils.logging_config import setup_queue_logging
+    
+    setup_queue_logging(app)
     if not app.debug and not app.testing:
-        import logging
-        from logging.handlers import RotatingFileHandler
-        
-        # Crear directorio de logs
-        log_dir = Path(app.config['BASE_DIR']) / 'logs'
-        log_dir.mkdir(exist_ok=True)
-        
-        # Configurar handler de archivos
-        file_handler = RotatingFileHandler(
-            log_dir / 'oleoflores.log',
-            maxBytes=10240000,  # 10MB
-            backupCount=10
-        )
-        file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-        ))
-        file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
-        
-        app.logger.setLevel(logging.INFO)
         app.logger.info('Oleoflores Smart Flow startup')
 
 def configure_error_handlers(app):
@@ -0,0 +1,9 @@
+"""
+Blueprint de monitoreo: vistas administrativas de rendimiento y salud.
+"""
+
+from flask import Blueprint
+
+monitoreo_bp = Blueprint('monitoreo', __name__)
+
+from . import routes  # noqa: E402,F401
@@ -0,0 +1,97 @@
+"""
+Rutas de monitoreo (solo administradores).
+
+Devuelven JSON para consumirlas desde el panel de administración o con curl.
+"""
+
+import logging
+import os
+
+from flask import abort, current_app, jsonify, request, send_from_directory
+from flask_login import current_user, login_required
+
+from app.utils.request_profiler import list_profiles
+from fotos_duplicadas import get_indice_huellas
+from ocr_breakers import breakers_snapshot, reset_breaker
+from ocr_telemetria import get_telemetria
+
+from . import monitoreo_bp
+
+logger = logging.getLogger(__name__)
+
+
+@monitoreo_bp.before_request
+@login_required
+def require_admin():
+    """Todas las vistas de monitoreo requieren un usuario administrador."""
+    if not getattr(current_user, 'is_admin', False):
+        abort(403)
+
+
+@monitoreo_bp.route('/perfiles')
+def perfiles():
+    """Peticiones perfiladas más lentas de las últimas ``horas`` (default 24)."""
+    limite = request.args.get('limite', 20, type=int)
+    horas = request.args.get('horas', 24, type=float)
+    perfiles = list_profiles(current_app.config.get('PROFILER_DIR', ''), limit=limite, since_hours=horas)
+    return jsonify({
+        'habilitado': current_app.config.get('PROFILER_ENABLED', False),
+        'perfiles': perfiles,
+    })
+
+
+@monitoreo_bp.route('/perfiles/<path:archivo>')
+def descargar_perfil(archivo):
+    """Descarga un perfil (speedscope o pilas colapsadas)."""
+    profile_dir = current_app.config.get('PROFILER_DIR', '')
+    if not profile_dir:
+        abort(404)
+    return send_from_directory(profile_dir, archivo, as_attachment=True)
+
+
+@monitoreo_bp.route('/ocr/backends')
+def ocr_backends():
+    """Estado de los circuit breakers de los backends OCR externos (de este worker)."""
+    return jsonify({'worker_pid': os.getpid(), 'backends': breakers_snapshot()})
+
+
+@monitoreo_bp.route('/ocr/backends/<nombre>/reset', methods=['POST'])
+def reset_ocr_backend(nombre):
+    """Cierra a mano el circuito de ``nombre`` (p. ej. tras confirmar que el webhook volvió)."""
+    snapshot = reset_breaker(nombre)
+    if snapshot is None:
+        abort(404)
+    logger.info(f"Circuito OCR {nombre} reiniciado por el usuario {current_user.get_id()}")
+    return jsonify(snapshot)
+
+
+@monitoreo_bp.route('/ocr/telemetria')
+def ocr_telemetria():
+    """
+    Agregados de las llamadas OCR de las últimas ``horas`` (default 24): por
+    método, tasa de aciertos de caché, duración por tamaño de imagen y costo
+    por día. Con ``llamadas=N`` incluye las N llamadas más recientes.
+    """
+    horas = request.args.get('horas', 24, type=float)
+    telemetria = get_telemetria()
+    datos = telemetria.resumen(horas=horas)
+    datos['habilitado'] = telemetria.enabled
+    limite = request.args.get('llamadas', 0, type=int)
+    if limite > 0:
+        datos['llamadas'] = telemetria.llamadas(horas=horas, limite=min(limite, 1000))
+    return jsonify(datos)
+
+
+@monitoreo_bp.route('/fotos/duplicadas')
+def fotos_duplicadas():
+    """
+    Fotos cargadas en las últimas ``horas`` (default 24) por ámbito, cuántas
+    eran iguales o casi iguales a una anterior y cuántos análisis se
+    reutilizaron, con las ``limite`` duplicadas más recientes (default 50).
+    """
+    horas = request.args.get('horas', 24, type=float)
+    limite = request.args.get('limite', 50, type=int)
+    indice = get_indice_huellas()
+    datos = indice.resumen(horas=horas, limite=max(0, min(limite, 1000)))
+    datos['habilitado'] = indice.enabled
+    return jsonify(datos)
@@ -0,0 +1,9 @@
+"""
+Blueprint de trabajos OCR: encola imágenes y consulta el estado del proceso.
+"""
+
+from flask import Blueprint
+
+ocr_jobs_bp = Blueprint('ocr_jobs', __name__)
+
+from . import routes  # noqa: E402,F401
@@ -0,0 +1,136 @@
+"""
+Rutas de la cola OCR.
+
+``POST /ocr/jobs`` guarda la imagen y responde 202 con el id del trabajo;
+``GET /ocr/jobs/<id>`` devuelve el estado y, al terminar, el resultado del
+servicio OCR. No hay SSE: con workers síncronos de gunicorn un stream abierto
+ocupa un worker igual que el OCR que se quiere sacar de la petición.
+"""
+
+import logging
+import os
+import uuid
+
+from flask import abort, current_app, jsonify, request, url_for
+from flask_login import current_user, login_required
+from werkzeug.utils import secure_filename
+
+import ocr_jobs
+
+from . import ocr_jobs_bp
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONES = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.pdf'}
+
+
+@ocr_jobs_bp.before_request
+@login_required
+def require_login():
+    """Encolar y consultar trabajos requiere sesión."""
+
+
+@ocr_jobs_bp.before_request
+def iniciar_hilos():
+    """
+    Arranca los hilos de la cola en este proceso si aún no corren (gunicorn los
+    arranca en post_fork; esto cubre el servidor de desarrollo).
+    """
+    ocr_jobs.iniciar_pool(current_app._get_current_object())
+
+
+def _prioridad(valor):
+    """Solo los niveles con nombre: un número arbitrario permitiría adelantarse a portería."""
+    if valor is None or valor == '':
+        return ocr_jobs.PRIORIDADES['normal']
+    if valor in ocr_jobs.PRIORIDADES:
+        return ocr_jobs.PRIORIDADES[valor]
+    abort(400, description=f'Prioridad no válida: {valor}')
+
+
+def _extension(archivo):
+    return os.path.splitext(secure_filename(archivo.filename))[1].lower()
+
+
+def _guardar(archivo):
+    """Guarda la imagen subida en el directorio de la cola y devuelve la ruta."""
+    # El mismo directorio del que ``purgar`` borra las imágenes
+    directorio = ocr_jobs.get_cola().directorio_archivos
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f'{uuid.uuid4().hex}{_extension(archivo)}')
+    archivo.save(ruta)
+    return ruta
+
+
+@ocr_jobs_bp.route('', methods=['POST'])
+def encolar():
+    """
+    Encola un trabajo OCR.
+
+    Form: ``tipo`` (placa, arl, soat, tecnomecanica, licencia, documentos u
+    otro tipo registrado), ``prioridad`` (porteria, normal u oficina) y
+    ``placa_registrada`` (opcional, placas). La imagen va en ``imagen``; con
+    ``tipo=documentos`` va un archivo por documento (``arl``, ``soat``,
+    ``tecnomecanica``, ``licencia``) y se procesan en paralelo.
+    """
+    tipo = (request.form.get('tipo') or '').strip().lower()
+    usuario = current_user.get_id()
+    if tipo == 'documentos':
+        archivos = {t: request.files[t] for t in ocr_jobs.TIPOS_DOCUMENTO
+                    if t in request.files and request.files[t].filename}
+    else:
+        archivo = request.files.get('imagen')
+        archivos = {tipo: archivo} if archivo is not None and archivo.filename else {}
+    if not archivos:
+        return jsonify({'success': False, 'error': 'Falta la imagen'}), 400
+
+    # Todo lo que puede rechazar la petición va antes de escribir archivos
+    tipo_job = 'documento' if tipo in ocr_jobs.TIPOS_DOCUMENTO else tipo
+    if not ocr_jobs.tipo_soportado(tipo_job):
+        return jsonify({'success': False, 'error': f'Tipo de trabajo OCR no soportado: {tipo}'}), 400
+    prioridad = _prioridad(request.form.get('prioridad'))
+    for archivo in archivos.values():
+        if _extension(archivo) not in EXTENSIONES:
+            return jsonify({'success': False, 'error': f'Extensión no soportada: {archivo.filename}'}), 400
+
+    rutas = {}
+    try:
+        for clave, archivo in archivos.items():
+            rutas[clave] = _guardar(archivo)
+        if tipo == 'documentos':
+            payload = {'documentos': rutas}
+        elif tipo_job == 'documento':
+            payload = {'tipo_documento': tipo, 'image_path': rutas[tipo]}
+        else:
+            payload = {'image_path': rutas[tipo]}
+            if tipo == 'placa':
+                payload['placa_registrada'] = request.form.get('placa_registrada') or None
+        payload['usuario'] = usuario
+        job_id = ocr_jobs.get_cola().encolar(tipo_job, payload, prioridad=prioridad, usuario=usuario)
+    except Exception:
+        # Sin trabajo que las referencie, ``purgar`` nunca las borraría
+        for ruta in rutas.values():
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        raise
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'estado': ocr_jobs.PENDIENTE,
+        'status_url': url_for('ocr_jobs.estado', job_id=job_id),
+    }), 202
+
+
+@ocr_jobs_bp.route('/<job_id>')
+def estado(job_id):
+    """Estado del trabajo; incluye ``resultado`` cuando está completado."""
+    datos = ocr_jobs.get_cola().estado(job_id)
+    if datos is None:
+        abort(404)
+    return jsonify(datos)
+
+
+@ocr_jobs_bp.route('/resumen')
+def resumen():
+    """Trabajos por estado (para monitoreo)."""
+    return jsonify(ocr_jobs.get_cola().resumen())
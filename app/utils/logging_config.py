@@ -0,0 +1,158 @@
+"""
+Oleoflores Smart Flow - Logging no bloqueante
+
+Todos los registros pasan por un ``QueueHandler`` (``put`` nunca bloquea) y un
+único ``QueueListener`` en un hilo de fondo hace la escritura real: archivo
+rotativo y consola. Así los hilos de las peticiones no esperan por E/S de disco
+ni por la rotación del archivo.
+
+Modos (``LOG_QUEUE_MODE``):
+
+- ``thread``: cola en memoria; cada proceso tiene su propio hilo escritor.
+- ``process``: cola ``multiprocessing`` creada en el proceso maestro de
+  gunicorn (``preload_app``). Los workers heredan la cola con el fork y el
+  hilo escritor solo existe en el maestro, de modo que hay un único escritor
+  para ``oleoflores.log`` y la rotación no compite entre procesos.
+
+Niveles por módulo con ``LOG_LEVELS``, p. ej.
+``LOG_LEVELS="db_operations=WARNING,app.blueprints.entrada=DEBUG"``.
+"""
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+LOG_FORMAT = '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+
+_listener = None
+_listener_pid = None
+_queue_handler = None
+
+
+def parse_module_levels(spec):
+    """
+    Convierte "modulo=NIVEL,otro=NIVEL" en un diccionario {modulo: nivel}.
+
+    Entradas mal formadas o con niveles desconocidos se ignoran.
+    """
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        name, level = (part.strip() for part in item.split('=', 1))
+        level_value = logging.getLevelName(level.upper())
+        if name and isinstance(level_value, int):
+            levels[name] = level_value
+    return levels
+
+
+def apply_module_levels(levels):
+    """Aplica niveles por logger (el logger raíz se indica como 'root')."""
+    for name, level in levels.items():
+        logging.getLogger(None if name == 'root' else name).setLevel(level)
+
+
+def _create_queue(mode):
+    if mode == 'process':
+        import multiprocessing
+        return multiprocessing.Queue(-1)
+    return queue.SimpleQueue()
+
+
+def setup_queue_logging(app):
+    """
+    Configura el logging de la aplicación a través de una cola.
+
+    Es idempotente: ``configure_logging`` y ``ProductionConfig.init_app`` pueden
+    llamarla sin duplicar handlers. Los handlers que ya tuviera el logger raíz
+    (p. ej. el StreamHandler de ``logging.basicConfig``) se mueven detrás de la
+    cola para que la consola tampoco bloquee.
+
+    Returns:
+        QueueListener: El listener activo de este proceso.
+    """
+    global _listener, _listener_pid, _queue_handler
+
+    root = logging.getLogger()
+    base_level = logging.getLevelName(str(app.config.get('LOG_LEVEL', 'INFO')).upper())
+    if not isinstance(base_level, int):
+        base_level = logging.INFO
+
+    if _listener is None:
+        handlers = [h for h in root.handlers if not isinstance(h, QueueHandler)]
+
+        if not app.debug and not app.testing:
+            log_dir = Path(app.config['BASE_DIR']) / 'logs'
+            log_dir.mkdir(exist_ok=True)
+            file_handler = RotatingFileHandler(
+                log_dir / 'oleoflores.log',
+                maxBytes=10240000,  # 10MB
+                backupCount=10,
+                delay=True
+            )
+            file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            file_handler.setLevel(base_level)
+            handlers.append(file_handler)
+
+        log_queue = _create_queue(app.config.get('LOG_QUEUE_MODE', 'thread'))
+        _queue_handler = QueueHandler(log_queue)
+        for handler in handlers:
+            root.removeHandler(handler)
+        root.addHandler(_queue_handler)
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        _listener_pid = os.getpid()
+        atexit.register(stop_queue_logging)
+
+    root.setLevel(base_level)
+    app.logger.setLevel(base_level)
+    apply_module_levels(parse_module_levels(app.config.get('LOG_LEVELS', '')))
+    return _listener
+
+
+def _restart_listener_in_child():
+    """
+    En modo ``thread`` el hilo escritor no sobrevive al fork: cada hijo arranca
+    el suyo sobre su copia de la cola. En modo ``process`` el maestro sigue
+    siendo el único escritor y el hijo no hace nada.
+    """
+    global _listener_pid
+    if _listener is None:
+        return
+    if isinstance(_listener.queue, queue.SimpleQueue):
+        # Cola nueva: la heredada puede traer registros pendientes del padre
+        # y un estado interno inconsistente tras el fork
+        fresh_queue = queue.SimpleQueue()
+        _queue_handler.queue = fresh_queue
+        _listener.queue = fresh_queue
+        _listener._thread = None
+        _listener.start()
+        _listener_pid = os.getpid()
+    else:
+        # multiprocessing solo reinicia el hilo alimentador de la cola en sus
+        # propios Process; gunicorn hace fork() directo, así que se reinicia aquí.
+        _listener.queue._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+
+def stop_queue_logging():
+    """
+    Vacía la cola y detiene el hilo escritor (al terminar el proceso).
+
+    En un worker creado por fork no hace nada: el listener pertenece al maestro
+    y enviarle el centinela por la cola compartida lo detendría.
+    """
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        try:
+            _listener.stop()
+        except Exception:
+            pass
+        _listener = None
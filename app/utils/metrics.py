@@ -0,0 +1,417 @@
+"""
+Oleoflores Smart Flow - Métricas en formato de texto Prometheus
+
+Expone ``/metrics`` con:
+
+- Latencia de peticiones por blueprint/endpoint/método (histograma) y conteo
+  por código de estado.
+- Consultas SQLite y tiempo de base de datos por petición (histogramas), más
+  totales por origen (``sqlite3`` de ``db_operations``/``db_utils`` y
+  ``sqlalchemy``).
+- Latencia de llamadas OCR por backend y resultado (histograma).
+- Aciertos/fallos de caché por caché (contadores; la tasa de aciertos se
+  calcula en Prometheus con ``rate(hit) / rate(hit + miss)``).
+- Eventos de los circuit breakers de backends OCR externos (``ocr_breakers``).
+
+Agregación entre workers de gunicorn: cada proceso acumula en memoria y cada
+``METRICS_FLUSH_SECONDS`` vuelca su estado completo a
+``<METRICS_MULTIPROC_DIR>/worker_<pid>.json``. Al responder ``/metrics`` se
+suman los archivos de todos los workers (también los de workers ya
+reciclados, para que los contadores no retrocedan). ``gunicorn.conf.py`` fija
+el directorio y lo vacía al arrancar el maestro. Sin directorio configurado
+(``run.py``, un solo proceso) se exporta solo la memoria del proceso.
+
+Solo se exportan contadores e histogramas: ambos se suman sin ambigüedad.
+
+Acceso: con ``METRICS_TOKEN`` definido, ``/metrics`` exige ``Bearer <token>``
+(o ``?token=``); sin token solo responde a un administrador con sesión o a
+una petición local directa (127.0.0.1/::1 sin ``X-Forwarded-For``).
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+from flask import Response, abort, g, has_request_context, request
+from flask_login import current_user
+
+import db_connection
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+OCR_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+# nombre: (tipo, ayuda, etiquetas, buckets)
+METRICS = {
+    'oleoflores_http_request_duration_seconds': (
+        'histogram', 'Latencia de peticiones HTTP', ('blueprint', 'endpoint', 'method'), LATENCY_BUCKETS),
+    'oleoflores_http_requests_total': (
+        'counter', 'Peticiones HTTP atendidas', ('blueprint', 'endpoint', 'method', 'status'), None),
+    'oleoflores_db_queries_per_request': (
+        'histogram', 'Consultas SQL ejecutadas por petición', ('blueprint', 'endpoint'), QUERY_COUNT_BUCKETS),
+    'oleoflores_db_seconds_per_request': (
+        'histogram', 'Tiempo de base de datos por petición', ('blueprint', 'endpoint'), DB_TIME_BUCKETS),
+    'oleoflores_db_queries_total': (
+        'counter', 'Consultas SQL ejecutadas', ('source',), None),
+    'oleoflores_db_query_seconds_total': (
+        'counter', 'Tiempo total en consultas SQL', ('source',), None),
+    'oleoflores_db_lock_errors_total': (
+        'counter', 'Sentencias SQLite fallidas por bloqueo (database is locked/busy)', ('source',), None),
+    'oleoflores_ocr_duration_seconds': (
+        'histogram', 'Latencia de llamadas OCR por backend', ('backend', 'outcome'), OCR_BUCKETS),
+    'oleoflores_cache_requests_total': (
+        'counter', 'Consultas a cachés por resultado (hit/miss)', ('cache', 'result'), None),
+    'oleoflores_ocr_breaker_events_total': (
+        'counter', 'Eventos de circuit breakers OCR (apertura, cierre, rechazo)', ('backend', 'event'), None),
+}
+
+
+class MetricsRegistry:
+    """
+    Contadores e histogramas de un proceso.
+
+    Los histogramas guardan conteos por bucket (no acumulados) más el bucket
+    +Inf, la suma y el total, para poder sumarlos entre workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels, value=1.0):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][3]
+        key = (name, labels)
+        with self._lock:
+            serie = self.histograms.get(key)
+            if serie is None:
+                # [bucket_0 .. bucket_n, +Inf, suma, total]
+                serie = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+            for i, limite in enumerate(buckets):
+                if value <= limite:
+                    serie[i] += 1
+                    break
+            else:
+                serie[len(buckets)] += 1
+            serie[-2] += value
+            serie[-1] += 1
+
+    def snapshot(self):
+        """Estado serializable a JSON."""
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(serie)] for (name, labels), serie in self.histograms.items()],
+            }
+
+
+registry = MetricsRegistry()
+
+_multiproc_dir = None
+_flush_interval = 5.0
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+def _reset_in_child():
+    """Un worker recién creado no hereda los contadores del maestro."""
+    global _last_flush, _flush_lock
+    registry.reset()
+    _flush_lock = threading.Lock()
+    _last_flush = 0.0
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_in_child)
+
+
+# ---------------------------------------------------------------------------
+# API para el resto de la aplicación
+# ---------------------------------------------------------------------------
+
+def observe_ocr(backend, seconds, outcome='success'):
+    """Registra una llamada OCR (outcome: success, failure o error)."""
+    registry.observe('oleoflores_ocr_duration_seconds', (backend, outcome), seconds)
+
+
+def ocr_timer(backend):
+    """
+    Decorador para métodos de backend OCR que devuelven un dict con 'success'.
+
+    Una excepción cuenta como ``error`` y se propaga.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            inicio = time.perf_counter()
+            outcome = 'error'
+            try:
+                result = func(*args, **kwargs)
+                outcome = 'success' if isinstance(result, dict) and result.get('success') else 'failure'
+                return result
+            finally:
+                observe_ocr(backend, time.perf_counter() - inicio, outcome)
+        return wrapper
+    return decorator
+
+
+def record_cache(cache, hit):
+    """Registra un acierto o fallo de la caché ``cache``."""
+    registry.inc('oleoflores_cache_requests_total', (cache, 'hit' if hit else 'miss'))
+
+
+def record_breaker(backend, event):
+    """Registra un evento (``abierto``, ``cerrado``, ``rechazo``...) del circuit breaker de ``backend``."""
+    registry.inc('oleoflores_ocr_breaker_events_total', (backend, event))
+
+
+@contextmanager
+def db_timer(source):
+    """Mide una consulta hecha fuera de ``db_connection`` (p. ej. SQLAlchemy)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _observe_query(time.perf_counter() - inicio, source, None, source)
+
+
+def _observe_query(seconds, sql, error, source='sqlite3'):
+    """Observador de ``db_connection``: ``sql`` es None al leer filas."""
+    is_statement = sql is not None
+    if is_statement:
+        registry.inc('oleoflores_db_queries_total', (source,))
+    if error is not None and db_connection.is_lock_error(error):
+        registry.inc('oleoflores_db_lock_errors_total', (source,))
+    registry.inc('oleoflores_db_query_seconds_total', (source,), seconds)
+    if has_request_context():
+        stats = g.get('_metrics_db')
+        if stats is not None:
+            if is_statement:
+                stats[0] += 1
+            stats[1] += seconds
+
+
+# ---------------------------------------------------------------------------
+# Agregación entre procesos
+# ---------------------------------------------------------------------------
+
+def _worker_file():
+    return Path(_multiproc_dir) / f'worker_{os.getpid()}.json'
+
+
+def flush(force=False):
+    """Vuelca el estado de este proceso a su archivo (escritura atómica)."""
+    global _last_flush
+    if not _multiproc_dir:
+        return
+    ahora = time.monotonic()
+    if not force and ahora - _last_flush < _flush_interval:
+        return
+    if not _flush_lock.acquire(blocking=force):
+        return  # Otro hilo ya está volcando
+    try:
+        _last_flush = ahora
+        destino = _worker_file()
+        temporal = destino.with_suffix('.tmp')
+        temporal.write_text(json.dumps(registry.snapshot()))
+        os.replace(temporal, destino)
+    except OSError as e:
+        logger.warning("No se pudieron volcar las métricas a %s: %s", _multiproc_dir, e)
+    finally:
+        _flush_lock.release()
+
+
+def clear_multiproc_dir(directory):
+    """Elimina los volcados previos (el maestro de gunicorn lo hace al arrancar)."""
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    for archivo in path.glob('worker_*.json'):
+        try:
+            archivo.unlink()
+        except OSError:
+            pass
+
+
+def collect():
+    """Suma el estado de todos los workers (o solo de este proceso)."""
+    if not _multiproc_dir:
+        snapshots = [registry.snapshot()]
+    else:
+        flush(force=True)
+        snapshots = []
+        for archivo in Path(_multiproc_dir).glob('worker_*.json'):
+            try:
+                snapshots.append(json.loads(archivo.read_text()))
+            except (OSError, ValueError):
+                continue  # Worker escribiendo o archivo corrupto: se omite en este scrape
+
+    counters, histograms = {}, {}
+    for snap in snapshots:
+        for name, labels, value in snap.get('counters', []):
+            key = (name, tuple(labels))
+            counters[key] = counters.get(key, 0.0) + value
+        for name, labels, serie in snap.get('histograms', []):
+            if name not in METRICS or len(serie) != len(METRICS[name][3]) + 3:
+                continue  # Volcado de una versión con otros buckets
+            key = (name, tuple(labels))
+            actual = histograms.get(key)
+            histograms[key] = list(serie) if actual is None else [a + b for a, b in zip(actual, serie)]
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pares = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """Texto de exposición Prometheus (versión 0.0.4)."""
+    counters, histograms = collect()
+    lineas = []
+    for name, (tipo, ayuda, label_names, buckets) in METRICS.items():
+        lineas.append(f'# HELP {name} {ayuda}')
+        lineas.append(f'# TYPE {name} {tipo}')
+        if tipo == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lineas.append(f'{name}{_format_labels(label_names, labels)} {_format_value(value)}')
+            continue
+        for (metric, labels), serie in sorted(histograms.items()):
+            if metric != name:
+                continue
+            acumulado = 0
+            for limite, conteo in zip(buckets, serie):
+                acumulado += conteo
+                le = _format_labels(label_names, labels, f'le="{_format_value(float(limite))}"')
+                lineas.append(f'{name}_bucket{le} {acumulado}')
+            le_inf = _format_labels(label_names, labels, 'le="+Inf"')
+            lineas.append(f'{name}_bucket{le_inf} {serie[-1]}')
+            lineas.append(f'{name}_sum{_format_labels(label_names, labels)} {_format_value(serie[-2])}')
+            lineas.append(f'{name}_count{_format_labels(label_names, labels)} {serie[-1]}')
+    return '\n'.join(lineas) + '\n'
+
+
+# ---------------------------------------------------------------------------
+# Integración con Flask
+# ---------------------------------------------------------------------------
+
+def _request_labels():
+    rule = request.url_rule
+    endpoint = rule.endpoint if rule is not None else 'unmatched'
+    return request.blueprint or 'app', endpoint
+
+
+def _record_request(status):
+    inicio = g.pop('_metrics_start', None)
+    if inicio is None:
+        return  # Ya registrada (after_request) o petición excluida
+    duracion = time.perf_counter() - inicio
+    blueprint, endpoint = _request_labels()
+    registry.observe('oleoflores_http_request_duration_seconds', (blueprint, endpoint, request.method), duracion)
+    registry.inc('oleoflores_http_requests_total', (blueprint, endpoint, request.method, str(status)))
+    consultas, segundos_db = g.pop('_metrics_db', (0, 0.0))
+    registry.observe('oleoflores_db_queries_per_request', (blueprint, endpoint), consultas)
+    registry.observe('oleoflores_db_seconds_per_request', (blueprint, endpoint), segundos_db)
+    flush()
+
+
+def _install_sqlalchemy_listeners():
+    try:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+    except ImportError:
+        return
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metrics_start', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        pila = conn.info.get('_metrics_start')
+        if pila:
+            _observe_query(time.perf_counter() - pila.pop(), statement, None, 'sqlalchemy')
+
+
+def init_metrics(app):
+    """Registra los hooks de medición y la ruta ``/metrics``."""
+    global _multiproc_dir, _flush_interval
+
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    _multiproc_dir = app.config.get('METRICS_MULTIPROC_DIR') or None
+    _flush_interval = float(app.config.get('METRICS_FLUSH_SECONDS', 5))
+    if _multiproc_dir:
+        Path(_multiproc_dir).mkdir(parents=True, exist_ok=True)
+        atexit.register(flush, force=True)
+
+    db_connection.add_query_observer(_observe_query)
+    _install_sqlalchemy_listeners()
+
+    @app.before_request
+    def _metrics_before_request():
+        if request.path == '/metrics':
+            return
+        g._metrics_start = time.perf_counter()
+        g._metrics_db = [0, 0.0]
+
+    @app.after_request
+    def _metrics_after_request(response):
+        _record_request(response.status_code)
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown_request(exc):
+        # Solo llega aquí con la petición sin registrar si hubo una excepción no manejada
+        _record_request(500)
+
+    token = app.config.get('METRICS_TOKEN')
+
+    def _autorizado():
+        if getattr(current_user, 'is_admin', False):
+            return True
+        if token:
+            auth = request.headers.get('Authorization', '')
+            return auth == f'Bearer {token}' or request.args.get('token') == token
+        # Sin token se niega por defecto, salvo un scraper en la misma máquina sin proxy de por medio
+        return request.remote_addr in ('127.0.0.1', '::1') and 'X-Forwarded-For' not in request.headers
+
+    def metrics_view():
+        if not _autorizado():
+            abort(403)
+        return Response(render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    logger.info("Métricas habilitadas en /metrics (multiproceso: %s)", _multiproc_dir or 'no')
@@ -0,0 +1,113 @@
+"""
+Oleoflores Smart Flow - Precarga para el modelo preload-and-fork
+
+Con ``preload_app`` en gunicorn la aplicación se construye una sola vez en el
+proceso maestro y los workers se crean con ``fork()``. Para que la memoria se
+comparta de verdad (copy-on-write) hay que:
+
+1. Calentar en el maestro todo lo que los workers usarían igual (mapa de URLs,
+   plantillas Jinja compiladas, módulos pesados como OCR/LangChain).
+2. Desactivar el GC durante la carga y congelar los objetos (``gc.freeze``)
+   justo antes del fork, para que las colecciones en los workers no toquen las
+   páginas heredadas.
+3. Descartar en cada worker las conexiones de base de datos abiertas por el
+   maestro.
+
+Los ganchos de ``gunicorn.conf.py`` llaman a estas funciones.
+"""
+
+import gc
+import importlib
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def warm_shared_state(app):
+    """
+    Calienta en el proceso maestro los recursos que se comparten con los workers.
+
+    Args:
+        app: Instancia Flask ya creada por ``create_app``.
+
+    Returns:
+        dict: Resumen de lo precargado (para logs y para el benchmark de memoria).
+    """
+    inicio = time.perf_counter()
+    resumen = {'templates': 0, 'modules': [], 'module_errors': {}}
+
+    # Compilar el matcher del mapa de URLs (normalmente ocurre en la primera petición)
+    app.url_map.update()
+
+    # Compilar todas las plantillas Jinja
+    jinja_env = app.jinja_env
+    for template_name in jinja_env.list_templates():
+        try:
+            jinja_env.get_template(template_name)
+            resumen['templates'] += 1
+        except Exception as e:
+            logger.warning("Precarga: no se pudo compilar la plantilla %s: %s", template_name, e)
+
+    # Importar módulos pesados (servicios OCR, LangChain, etc.)
+    for module_name in app.config.get('PRELOAD_MODULES', []):
+        try:
+            importlib.import_module(module_name)
+            resumen['modules'].append(module_name)
+        except Exception as e:
+            resumen['module_errors'][module_name] = str(e)
+            logger.warning("Precarga: no se pudo importar %s: %s", module_name, e)
+
+    # Índice de placas conocidas para corregir lecturas OCR (los workers lo heredan construido)
+    try:
+        from ocr_placa_correccion import get_indice_placas
+        indice = get_indice_placas(app.config.get('TIQUETES_DB_PATH'))
+        if indice:
+            indice.refrescar(forzar=True)
+            resumen['placas_indexadas'] = indice.indice.tamano
+    except Exception as e:
+        logger.warning("Precarga: no se pudo construir el índice de placas: %s", e)
+
+    # Modelos de OCR local (OCR_ENGINE_PRELOAD): se cargan una vez y los workers los heredan
+    if os.getenv('OCR_ENGINE_PRELOAD', 'false').lower() == 'true':
+        try:
+            import ocr_engines
+            resumen['motores_ocr'] = ocr_engines.calentar()
+        except Exception as e:
+            logger.warning("Precarga: no se pudieron cargar los motores OCR: %s", e)
+
+    resumen['seconds'] = round(time.perf_counter() - inicio, 3)
+    logger.info(
+        "Precarga completada: %d plantillas, %d módulos en %.3fs",
+        resumen['templates'], len(resumen['modules']), resumen['seconds']
+    )
+    return resumen
+
+
+def freeze_before_fork():
+    """
+    Mueve todos los objetos vivos a la generación permanente del GC.
+
+    Se llama en el maestro justo antes de cada fork. Un ``gc.collect`` previo
+    evita congelar basura.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def reset_after_fork(app):
+    """
+    Prepara un worker recién creado.
+
+    Reactiva el GC (desactivado en el maestro durante la carga) y descarta el
+    pool de conexiones SQLAlchemy heredado sin cerrar los sockets/archivos del
+    maestro.
+    """
+    gc.enable()
+    try:
+        from app.models import db
+        with app.app_context():
+            db.engine.dispose(close=False)
+    except Exception as e:
+        logger.warning("No se pudo reiniciar el pool de conexiones tras el fork: %s", e)
@@ -0,0 +1,255 @@
+"""
+Oleoflores Smart Flow - Perfilado por muestreo de peticiones
+
+Middleware opcional (``PROFILER_ENABLED``) que perfila una fracción de las
+peticiones (``PROFILER_SAMPLE_RATE``) y, siempre, los endpoints listados en
+``PROFILER_ENDPOINTS`` (p. ej. ``"pesaje.pesaje,graneles.registro_entrada"``).
+
+Un único hilo muestreador por proceso toma cada ``PROFILER_INTERVAL_MS`` la
+pila de los hilos que están atendiendo peticiones perfiladas
+(``sys._current_frames``). No hay trazado de cada llamada, así que el costo
+es constante por muestra y no depende de cuántas funciones ejecute la vista.
+
+Cada petición perfilada se escribe en ``logs/profiles/`` como:
+
+- ``*.speedscope.json``: se abre en https://www.speedscope.app
+- ``*.collapsed.txt``: pilas colapsadas para ``flamegraph.pl``/inferno
+
+El nombre del archivo incluye la duración y el endpoint, de modo que el
+listado de perfiles más lentos no necesita índice y funciona con varios
+workers de gunicorn escribiendo en el mismo directorio.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+_FILENAME_RE = re.compile(
+    r'^(?P<ts>\d{8}_\d{6}_\d{6})_(?P<ms>\d+)ms_(?P<endpoint>[\w.\-]+)_(?P<pid>\d+)'
+    r'\.(?P<fmt>speedscope\.json|collapsed\.txt)$'
+)
+
+
+class _Session:
+    """Muestras de una petición perfilada."""
+
+    __slots__ = ('thread_id', 'start', 'last', 'samples')
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.start = self.last = time.perf_counter()
+        self.samples = []  # [(pila, peso_ms)]
+
+
+class SamplingProfiler:
+    """Muestreador de pilas compartido por todas las peticiones de un proceso."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_thread(self):
+        # Tras un fork el hilo del padre no existe en el hijo
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+
+    def start(self, thread_id=None):
+        session = _Session(thread_id or threading.get_ident())
+        self._ensure_thread()
+        with self._lock:
+            self._sessions[session.thread_id] = session
+        self._wakeup.set()
+        return session
+
+    def stop(self, session):
+        with self._lock:
+            self._sessions.pop(session.thread_id, None)
+        return time.perf_counter() - session.start
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            if not self._sessions:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            ahora = time.perf_counter()
+            with self._lock:
+                sessions = list(self._sessions.values())
+            for session in sessions:
+                frame = frames.get(session.thread_id)
+                if frame is None or session.thread_id == own_id:
+                    continue
+                pila = []
+                while frame is not None:
+                    code = frame.f_code
+                    pila.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                pila.reverse()
+                session.samples.append((tuple(pila), (ahora - session.last) * 1000.0))
+                session.last = ahora
+
+
+def _frame_label(frame):
+    nombre, archivo, linea = frame
+    return f'{nombre} ({os.path.basename(archivo)}:{linea})'
+
+
+def to_collapsed(samples):
+    """Pilas colapsadas: 'raiz;...;hoja <peso en µs>' por línea."""
+    acumulado = {}
+    for pila, peso in samples:
+        clave = ';'.join(_frame_label(f).replace(';', ':') for f in pila)
+        acumulado[clave] = acumulado.get(clave, 0.0) + peso
+    return '\n'.join(f'{pila} {int(round(peso * 1000))}' for pila, peso in sorted(acumulado.items())) + '\n'
+
+
+def to_speedscope(samples, name, duration_ms):
+    """Perfil 'sampled' en el formato de archivo de speedscope."""
+    frames, indices = [], {}
+    muestras, pesos = [], []
+    for pila, peso in samples:
+        ids = []
+        for frame in pila:
+            idx = indices.get(frame)
+            if idx is None:
+                idx = indices[frame] = len(frames)
+                frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+            ids.append(idx)
+        muestras.append(ids)
+        pesos.append(round(peso, 3))
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'exporter': 'oleoflores-request-profiler',
+        'name': name,
+        'activeProfileIndex': 0,
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': round(duration_ms, 3),
+            'samples': muestras,
+            'weights': pesos,
+        }],
+    }
+
+
+def list_profiles(profile_dir, limit=20, since_hours=24):
+    """
+    Perfiles recientes ordenados de más lento a más rápido.
+
+    Returns:
+        list: dicts con archivo, endpoint, duración, fecha, pid y formato.
+    """
+    path = Path(profile_dir)
+    if not path.is_dir():
+        return []
+    limite_fecha = time.time() - since_hours * 3600 if since_hours else None
+    perfiles = []
+    for archivo in path.iterdir():
+        match = _FILENAME_RE.match(archivo.name)
+        if not match:
+            continue
+        fecha = datetime.strptime(match['ts'], '%Y%m%d_%H%M%S_%f')
+        if limite_fecha and fecha.timestamp() < limite_fecha:
+            continue
+        perfiles.append({
+            'archivo': archivo.name,
+            'endpoint': match['endpoint'],
+            'duracion_ms': int(match['ms']),
+            'fecha': fecha.isoformat(timespec='seconds'),
+            'pid': int(match['pid']),
+            'formato': 'speedscope' if match['fmt'].startswith('speedscope') else 'collapsed',
+        })
+    perfiles.sort(key=lambda p: p['duracion_ms'], reverse=True)
+    return perfiles[:limit]
+
+
+def _prune(profile_dir, max_files):
+    archivos = [a for a in Path(profile_dir).iterdir() if _FILENAME_RE.match(a.name)]
+    if len(archivos) <= max_files:
+        return
+    archivos.sort(key=lambda a: a.stat().st_mtime)
+    for archivo in archivos[:len(archivos) - max_files]:
+        try:
+            archivo.unlink()
+        except OSError:
+            pass
+
+
+profiler = SamplingProfiler()
+
+
+def init_request_profiler(app):
+    """Registra los hooks del perfilador si ``PROFILER_ENABLED`` está activo."""
+    if not app.config.get('PROFILER_ENABLED', False):
+        return
+
+    sample_rate = float(app.config.get('PROFILER_SAMPLE_RATE', 0.01))
+    endpoints = set(app.config.get('PROFILER_ENDPOINTS', []))
+    output_format = app.config.get('PROFILER_FORMAT', 'speedscope')
+    profile_dir = Path(app.config.get('PROFILER_DIR') or Path(app.config['BASE_DIR']) / 'logs' / 'profiles')
+    max_files = int(app.config.get('PROFILER_MAX_FILES', 500))
+    min_ms = float(app.config.get('PROFILER_MIN_DURATION_MS', 0))
+    profiler.interval = float(app.config.get('PROFILER_INTERVAL_MS', 5)) / 1000.0
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    app.config['PROFILER_DIR'] = str(profile_dir)
+
+    @app.before_request
+    def _profiler_before_request():
+        endpoint = request.endpoint
+        if endpoint == 'static':
+            return
+        if endpoint in endpoints or random.random() < sample_rate:
+            g._profiler_session = profiler.start()
+
+    @app.teardown_request
+    def _profiler_teardown_request(exc):
+        session = g.pop('_profiler_session', None)
+        if session is None:
+            return
+        duracion_ms = profiler.stop(session) * 1000.0
+        if duracion_ms < min_ms or not session.samples:
+            return
+        endpoint = re.sub(r'[^\w.\-]', '_', request.endpoint or 'unmatched')
+        nombre = f"{datetime.now():%Y%m%d_%H%M%S_%f}_{int(duracion_ms)}ms_{endpoint}_{os.getpid()}"
+        titulo = f"{request.method} {request.path} ({duracion_ms:.0f} ms)"
+        try:
+            if output_format == 'collapsed':
+                (profile_dir / f'{nombre}.collapsed.txt').write_text(to_collapsed(session.samples))
+            else:
+                (profile_dir / f'{nombre}.speedscope.json').write_text(
+                    json.dumps(to_speedscope(session.samples, titulo, duracion_ms))
+                )
+            _prune(profile_dir, max_files)
+        except OSError as e:
+            logger.warning("No se pudo escribir el perfil %s: %s", nombre, e)
+
+    logger.info(
+        "Perfilador de peticiones activo (muestreo %.3f, endpoints %s, formato %s)",
+        sample_rate, sorted(endpoints), output_format
+    )
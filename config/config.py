@@ -43,6 +43,8 @@ class BaseConfig:
 
     # Base de datos legacy (SQLite directo) - Migrado a oleoflores_dev.db
     TIQUETES_DB_PATH = os.path.join(INSTANCE_DIR, 'oleoflores_dev.db')
+    # Archivos por año de guías cerradas (scripts/archivar_guias.py). Default: <dir de TIQUETES_DB_PATH>/archivo
+    TIQUETES_ARCHIVE_DIR = os.environ.get('TIQUETES_ARCHIVE_DIR', '')
     
     # Session Configuration - Mejorada para persistencia
     SESSION_TYPE = 'filesystem'
@@ -94,6 +96,28 @@ class BaseConfig:
     LANGCHAIN_MODEL = os.environ.get('LANGCHAIN_MODEL', 'gpt-3.5-turbo')
     LANGCHAIN_MAX_TOKENS = int(os.environ.get('LANGCHAIN_MAX_TOKENS', '1000'))
     
+    # Logging (ver app/utils/logging_config.py)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_LEVELS = os.environ.get('LOG_LEVELS', '')  # "modulo=NIVEL,otro=NIVEL"
+    LOG_QUEUE_MODE = os.environ.get('LOG_QUEUE_MODE', 'thread')  # 'thread' o 'process'
+    
+    # Métricas Prometheus en /metrics (ver app/utils/metrics.py)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR', '')  # gunicorn.conf.py lo fija
+    METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', '5'))
+    # Con token, /metrics exige "Bearer <token>"; sin token solo admite administradores o localhost
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    
+    # Perfilado por muestreo de peticiones (ver app/utils/request_profiler.py)
+    PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'false').lower() == 'true'
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', '0.01'))  # Fracción de peticiones
+    PROFILER_ENDPOINTS = [e.strip() for e in os.environ.get('PROFILER_ENDPOINTS', '').split(',') if e.strip()]
+    PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', '5'))
+    PROFILER_FORMAT = os.environ.get('PROFILER_FORMAT', 'speedscope')  # 'speedscope' o 'collapsed'
+    PROFILER_MIN_DURATION_MS = float(os.environ.get('PROFILER_MIN_DURATION_MS', '0'))
+    PROFILER_MAX_FILES = int(os.environ.get('PROFILER_MAX_FILES', '500'))
+    PROFILER_DIR = os.environ.get('PROFILER_DIR', '')  # Default: <BASE_DIR>/logs/profiles
+    
     # Pagination
     RECORDS_PER_PAGE = int(os.environ.get('RECORDS_PER_PAGE', '25'))
     
@@ -101,6 +125,11 @@ class BaseConfig:
     CACHE_TYPE = os.environ.get('CACHE_TYPE', 'simple')
     CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', '300'))
     
+    # Precarga (gunicorn preload_app): módulos pesados a importar en el maestro antes del fork
+    PRELOAD_MODULES = [m.strip() for m in os.environ.get(
+        'PRELOAD_MODULES', 'app.utils.ocr_service,app.utils.tiquete_ocr_service'
+    ).split(',') if m.strip()]
+    
     # Feature Flags
     USAR_NUEVOS_TEMPLATES_ENTRADA = os.environ.get('USAR_NUEVOS_TEMPLATES_ENTRADA', 'true').lower() == 'true'
     
@@ -195,27 +224,10 @@ class ProductionConfig(BaseConfig):
         """Configuración específica para producción."""
         BaseConfig.init_app(app)
         
-        # Configurar logging para producción
-        import logging
-        from logging.handlers import RotatingFileHandler
-        
-        # File handler
+        # Logging a través de la cola compartida (idempotente con configure_logging)
+        from app.utils.logging_config import setup_queue_logging
+        setup_queue_logging(app)
         if not app.debug:
-            log_dir = Path(cls.BASE_DIR) / 'logs'
-            log_dir.mkdir(exist_ok=True)
-            
-            file_handler = RotatingFileHandler(
-                log_dir / 'oleoflores.log',
-                maxBytes=10240000,  # 10MB
-                backupCount=10
-            )
-            file_handler.setFormatter(logging.Formatter(
-                '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-            ))
-            file_handler.setLevel(logging.INFO)
-            app.logger.addHandler(file_handler)
-            
-            app.logger.setLevel(logging.INFO)
             app.logger.info('Oleoflores Smart Flow startup')
 
 class TestingConfig(BaseConfig):
@@ -0,0 +1,342 @@
+"""
+Archivo por año de las guías cerradas.
+
+``TIQUETES_DB_PATH`` (la base "caliente") solo debe guardar la operación
+reciente. ``archivar_guias`` mueve las guías cerradas (con salida) registradas
+antes de una fecha de corte a un archivo SQLite por año
+(``<dir>/<base>_<año>.db``), con las mismas tablas del flujo de fruta.
+
+Las consultas del día a día no cambian. Las consultas históricas piden a
+``tabla_historica`` el nombre de la tabla a usar: si el rango de fechas o las
+guías pedidas pueden estar archivadas, se hace ``ATTACH`` de los años
+necesarios sobre la misma conexión y se devuelve una vista temporal
+``historico_<tabla>`` (``UNION ALL`` de la base caliente y los archivos); si
+no, se devuelve la tabla de siempre y la consulta solo toca la base caliente.
+
+Cada archivo guarda en ``archivo_info`` la fecha máxima de registro
+archivada, que es lo que permite decidir sin abrirlo si hace falta.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from db_connection import TiquetesConnection
+
+logger = logging.getLogger(__name__)
+
+# Tablas del flujo de fruta que se archivan (todas se relacionan por codigo_guia)
+TABLAS_ARCHIVO = (
+    'entry_records', 'pesajes_bruto', 'clasificaciones', 'fotos_clasificacion', 'pesajes_neto', 'salidas',
+)
+
+# Una etapa (p. ej. la salida) puede quedar algunas horas después del registro
+HOLGURA_ETAPAS = timedelta(days=1)
+
+_GUIA_TIMESTAMP = re.compile(r'_(\d{14})$')
+_ARCHIVO_NOMBRE = re.compile(r'_(\d{4})\.db$')
+
+_cache_lock = threading.Lock()
+_cache_archivos = {}  # directorio -> (mtime, [(año, ruta, max_registro_utc)])
+
+
+def archive_dir(db_path):
+    """
+    Directorio de archivos de ``db_path``: ``TIQUETES_ARCHIVE_DIR`` de la
+    aplicación si está configurado, si no ``<dir de la base>/archivo``.
+    """
+    try:
+        from flask import current_app, has_app_context
+        if has_app_context() and current_app.config.get('TIQUETES_ARCHIVE_DIR'):
+            return current_app.config['TIQUETES_ARCHIVE_DIR']
+    except ImportError:
+        pass
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'archivo')
+
+
+def archive_path(db_path, anio, directorio=None):
+    base = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(directorio or archive_dir(db_path), f'{base}_{anio}.db')
+
+
+def listar_archivos(db_path, directorio=None):
+    """
+    Archivos existentes de ``db_path`` como ``[(año, ruta, max_registro_utc)]``.
+
+    Se cachea por directorio hasta que cambie su mtime (archivar crea o
+    reemplaza archivos, lo que lo actualiza).
+    """
+    directorio = directorio or archive_dir(db_path)
+    try:
+        mtime = os.stat(directorio).st_mtime
+    except OSError:
+        return []
+    with _cache_lock:
+        cacheado = _cache_archivos.get(directorio)
+        if cacheado and cacheado[0] == mtime:
+            return cacheado[1]
+
+    base = os.path.splitext(os.path.basename(db_path))[0]
+    archivos = []
+    for nombre in sorted(os.listdir(directorio)):
+        match = _ARCHIVO_NOMBRE.search(nombre)
+        if not match or not nombre.startswith(base + '_'):
+            continue
+        ruta = os.path.join(directorio, nombre)
+        try:
+            conn = sqlite3.connect(f'file:{ruta}?mode=ro', uri=True)
+            try:
+                fila = conn.execute("SELECT valor FROM archivo_info WHERE clave = 'max_registro_utc'").fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning("Archivo histórico ilegible %s: %s", ruta, e)
+            continue
+        archivos.append((int(match.group(1)), ruta, fila[0] if fila else None))
+
+    with _cache_lock:
+        _cache_archivos[directorio] = (mtime, archivos)
+    return archivos
+
+
+def _anios_necesarios(archivos, desde_utc=None, codigos_guia=None):
+    """Años archivados que pueden contener filas del rango o de las guías."""
+    necesarios = set()
+    if desde_utc:
+        try:
+            desde = datetime.strptime(desde_utc[:19], '%Y-%m-%d %H:%M:%S') - HOLGURA_ETAPAS
+            desde_str = desde.strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            desde_str = desde_utc
+        necesarios.update(anio for anio, _, maximo in archivos if not maximo or maximo >= desde_str)
+    for codigo in codigos_guia or ():
+        match = _GUIA_TIMESTAMP.search(codigo or '')
+        if not match:
+            # Código sin fecha: puede estar en cualquier año
+            return {anio for anio, _, _ in archivos}
+        stamp = match.group(1)
+        fecha_guia = f'{stamp[:4]}-{stamp[4:6]}-{stamp[6:8]} {stamp[8:10]}:{stamp[10:12]}:{stamp[12:14]}'
+        for anio, _, maximo in archivos:
+            # El código usa hora local; el año de registro UTC puede ser el siguiente
+            if anio in (int(stamp[:4]), int(stamp[:4]) + 1) and (not maximo or fecha_guia <= maximo):
+                necesarios.add(anio)
+    return necesarios
+
+
+def _columnas(conn, esquema, tabla):
+    return [fila[1] for fila in conn.execute(f'PRAGMA "{esquema}".table_info("{tabla}")')]
+
+
+def tabla_historica(conn, tabla, desde_utc=None, codigos_guia=None, db_path=None):
+    """
+    Nombre de la tabla (o vista) a consultar para ``tabla`` en ``conn``.
+
+    Args:
+        conn: Conexión abierta sobre la base caliente.
+        tabla: Una de ``TABLAS_ARCHIVO``.
+        desde_utc: Límite inferior del rango consultado ('YYYY-MM-DD HH:MM:SS').
+            Sin rango de fechas ni guías se consulta solo la base caliente.
+        codigos_guia: Guías consultadas (el año sale del código).
+        db_path: Ruta de la base caliente (default: la de ``conn``).
+
+    Returns:
+        str: ``tabla`` si no hace falta el archivo, o ``historico_<tabla>``.
+    """
+    if tabla not in TABLAS_ARCHIVO or (not desde_utc and not codigos_guia):
+        return tabla
+    if db_path is None:
+        db_path = next((fila[2] for fila in conn.execute('PRAGMA database_list') if fila[1] == 'main'), None)
+        if not db_path:  # Base en memoria
+            return tabla
+    archivos = listar_archivos(db_path)
+    if not archivos:
+        return tabla
+    anios = _anios_necesarios(archivos, desde_utc, codigos_guia)
+    if not anios:
+        return tabla
+
+    adjuntas = {fila[1] for fila in conn.execute('PRAGMA database_list')}
+    limite = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if hasattr(conn, 'getlimit') else 10
+    esquemas = []
+    for anio, ruta, _ in sorted(archivos, reverse=True):
+        if anio not in anios:
+            continue
+        esquema = f'archivo_{anio}'
+        if esquema not in adjuntas:
+            if len(adjuntas - {'main', 'temp'}) >= limite:
+                logger.warning("Límite de ATTACH alcanzado; se omite el archivo %s", ruta)
+                continue
+            conn.execute(f'ATTACH DATABASE ? AS {esquema}', (ruta,))
+            adjuntas.add(esquema)
+        esquemas.append(esquema)
+    if not esquemas:
+        return tabla
+
+    # Columnas de la base caliente; las que falten en un archivo viejo van NULL
+    columnas = _columnas(conn, 'main', tabla)
+    partes = [f'SELECT {", ".join(columnas)} FROM main."{tabla}"']
+    for esquema in esquemas:
+        existentes = set(_columnas(conn, esquema, tabla))
+        seleccion = ', '.join(c if c in existentes else f'NULL AS {c}' for c in columnas)
+        partes.append(f'SELECT {seleccion} FROM {esquema}."{tabla}"')
+    vista = f'historico_{tabla}'
+    conn.execute(f'DROP VIEW IF EXISTS temp.{vista}')
+    conn.execute(f'CREATE TEMP VIEW {vista} AS ' + ' UNION ALL '.join(partes))
+    return vista
+
+
+# ---------------------------------------------------------------------------
+# Archivado
+# ---------------------------------------------------------------------------
+
+def _crear_archivo(conn_main, ruta):
+    """Crea (o completa) el archivo con las tablas de la base caliente."""
+    conn = sqlite3.connect(ruta)
+    try:
+        for tabla in TABLAS_ARCHIVO:
+            sql = conn_main.execute(
+                "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (tabla,)
+            ).fetchone()
+            if not sql:
+                continue
+            existentes = _columnas(conn, 'main', tabla)
+            if not existentes:
+                conn.execute(sql[0])
+            else:
+                # Migraciones posteriores de la base caliente
+                tipos = {fila[1]: fila[2] for fila in conn_main.execute(f'PRAGMA main.table_info("{tabla}")')}
+                for columna, tipo in tipos.items():
+                    if columna not in existentes:
+                        conn.execute(f'ALTER TABLE "{tabla}" ADD COLUMN {columna} {tipo}')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{tabla}_codigo_guia" ON "{tabla}" (codigo_guia)')
+        conn.execute('CREATE TABLE IF NOT EXISTS archivo_info (clave TEXT PRIMARY KEY, valor TEXT)')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def guias_cerradas(conn, antes_de_utc):
+    """
+    ``{año: [codigo_guia]}`` de las guías con salida registradas antes del corte.
+
+    El año es el del registro de entrada (o el de la salida si falta la entrada).
+    """
+    filas = conn.execute(
+        """
+        SELECT s.codigo_guia, COALESCE(e.timestamp_registro_utc, s.timestamp_salida_utc) AS ts
+        FROM salidas s LEFT JOIN entry_records e ON e.codigo_guia = s.codigo_guia
+        WHERE COALESCE(e.timestamp_registro_utc, s.timestamp_salida_utc) < ?
+        """,
+        (antes_de_utc,),
+    ).fetchall()
+    por_anio = {}
+    for codigo_guia, ts in filas:
+        if ts:
+            por_anio.setdefault(int(ts[:4]), []).append((codigo_guia, ts))
+    return por_anio
+
+
+def archivar_guias(db_path, antes_de_utc, directorio=None, lote=20000, dry_run=False, progreso=None):
+    """
+    Mueve las guías cerradas anteriores a ``antes_de_utc`` a los archivos por año.
+
+    Cada lote de guías se copia y luego se borra de la base caliente en la
+    misma transacción. Si el archivo ya tiene filas de una guía del lote
+    (re-ejecución después de editar la fila caliente, guía restaurada), gana la
+    copia caliente. Los id se conservan salvo que el archivo ya use ese id para
+    otra guía (SQLite reutiliza el id más alto borrado de la base caliente): la
+    fila entra con un id nuevo y la archivada no se toca. Las tablas se
+    relacionan por ``codigo_guia``, no por id. Si las filas copiadas no
+    coinciden con las borradas, el lote se revierte. Si el proceso se
+    interrumpe, volver a ejecutarlo es seguro.
+
+    Args:
+        db_path: Base caliente.
+        antes_de_utc: Corte 'YYYY-MM-DD HH:MM:SS' (UTC) sobre el registro.
+        directorio: Directorio de archivos (default ``archive_dir(db_path)``).
+        lote: Guías por transacción (acota el tiempo de bloqueo de escritura).
+        dry_run: Solo contar.
+        progreso: callable(año, guias_movidas, total_año) opcional.
+
+    Returns:
+        dict: ``{año: {'guias': n, 'ruta': ..., <tabla>: filas}}``.
+    """
+    directorio = directorio or archive_dir(db_path)
+    conn = sqlite3.connect(db_path, factory=TiquetesConnection, timeout=30)
+    resumen = {}
+    try:
+        por_anio = guias_cerradas(conn, antes_de_utc)
+        if dry_run:
+            return {anio: {'guias': len(guias), 'ruta': archive_path(db_path, anio, directorio)}
+                    for anio, guias in sorted(por_anio.items())}
+        os.makedirs(directorio, exist_ok=True)
+
+        tablas = [t for t in TABLAS_ARCHIVO if _columnas(conn, 'main', t)]
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS archivo_lote (codigo_guia TEXT PRIMARY KEY)')
+        for anio, guias in sorted(por_anio.items()):
+            ruta = archive_path(db_path, anio, directorio)
+            _crear_archivo(conn, ruta)
+            conn.execute('ATTACH DATABASE ? AS archivo', (ruta,))
+            info = resumen[anio] = {'guias': 0, 'ruta': ruta, **{t: 0 for t in tablas}}
+            try:
+                for inicio in range(0, len(guias), lote):
+                    bloque = guias[inicio:inicio + lote]
+                    conn.execute('BEGIN IMMEDIATE')
+                    try:
+                        conn.execute('DELETE FROM temp.archivo_lote')
+                        conn.executemany('INSERT OR IGNORE INTO temp.archivo_lote VALUES (?)',
+                                         [(codigo,) for codigo, _ in bloque])
+                        for tabla in tablas:
+                            en_lote = 'codigo_guia IN (SELECT codigo_guia FROM temp.archivo_lote)'
+                            conn.execute(f'DELETE FROM archivo."{tabla}" WHERE {en_lote}')
+                            nombres = _columnas(conn, 'main', tabla)
+                            columnas = ', '.join(nombres)
+                            if 'id' not in nombres:
+                                copiadas = conn.execute(
+                                    f'INSERT INTO archivo."{tabla}" ({columnas}) '
+                                    f'SELECT {columnas} FROM main."{tabla}" WHERE {en_lote}'
+                                ).rowcount
+                            else:
+                                # Con su id las que lo tienen libre; el resto (id ya usado por otra guía) con uno nuevo
+                                copiadas = conn.execute(
+                                    f'INSERT INTO archivo."{tabla}" ({columnas}) '
+                                    f'SELECT {columnas} FROM main."{tabla}" '
+                                    f'WHERE {en_lote} AND id NOT IN (SELECT id FROM archivo."{tabla}")'
+                                ).rowcount
+                                sin_id = ', '.join(c for c in nombres if c != 'id')
+                                copiadas += conn.execute(
+                                    f'INSERT INTO archivo."{tabla}" ({sin_id}) '
+                                    f'SELECT {sin_id} FROM main."{tabla}" c WHERE {en_lote} AND NOT EXISTS ('
+                                    f'SELECT 1 FROM archivo."{tabla}" a WHERE a.id = c.id AND a.codigo_guia = c.codigo_guia)'
+                                ).rowcount
+                            borradas = conn.execute(f'DELETE FROM main."{tabla}" WHERE {en_lote}').rowcount
+                            if copiadas != borradas:
+                                # Nunca borrar de la base caliente algo que no llegó al archivo
+                                raise sqlite3.IntegrityError(
+                                    f'{tabla}: {copiadas} filas copiadas a {ruta} y {borradas} por borrar'
+                                )
+                            info[tabla] += borradas
+                        maximo = max(ts for _, ts in bloque)
+                        conn.execute(
+                            "INSERT INTO archivo.archivo_info (clave, valor) VALUES ('max_registro_utc', ?) "
+                            "ON CONFLICT(clave) DO UPDATE SET valor = MAX(valor, excluded.valor)",
+                            (maximo,),
+                        )
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    info['guias'] += len(bloque)
+                    if progreso:
+                        progreso(anio, info['guias'], len(guias))
+            finally:
+                conn.execute('DETACH DATABASE archivo')
+            logger.info("Archivadas %d guías de %d en %s", info['guias'], anio, ruta)
+    finally:
+        conn.close()
+        with _cache_lock:
+            _cache_archivos.pop(directorio, None)
+    return resumen
@@ -0,0 +1,140 @@
+"""
+Conexiones SQLite instrumentadas para la capa de datos.
+
+``db_operations`` y ``db_utils`` abren sus conexiones con
+``sqlite3.connect(db_path, factory=TiquetesConnection)``. La conexión se
+comporta igual que una ``sqlite3.Connection`` normal, pero cada sentencia
+ejecutada (y la lectura de sus filas y los COMMIT) se reporta a los
+observadores registrados: el módulo de métricas cuenta consultas y tiempo de
+base de datos por petición y la prueba de carga cuenta esperas por bloqueo.
+
+Este módulo no depende de Flask: sin observadores el costo es una llamada a
+``perf_counter`` por sentencia.
+"""
+
+import sqlite3
+import time
+
+_query_observers = []
+
+
+def add_query_observer(observer):
+    """
+    Registra el callable ``observer(seconds, sql, error)``.
+
+    ``sql`` es la sentencia ejecutada, o None al leer filas (``fetch*``), de
+    modo que el tiempo total incluye ambas fases pero solo se cuenta una
+    consulta por sentencia. ``error`` es la excepción lanzada, si la hubo
+    (p. ej. ``database is locked``).
+    """
+    if observer not in _query_observers:
+        _query_observers.append(observer)
+
+
+def remove_query_observer(observer):
+    if observer in _query_observers:
+        _query_observers.remove(observer)
+
+
+def is_lock_error(error):
+    """True si la excepción es un bloqueo de SQLite (locked/busy)."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    mensaje = str(error).lower()
+    return 'locked' in mensaje or 'busy' in mensaje
+
+
+def _notify(inicio, sql, error=None):
+    if not _query_observers:
+        return
+    segundos = time.perf_counter() - inicio
+    for observer in _query_observers:
+        try:
+            observer(segundos, sql, error)
+        except Exception:
+            # Las métricas nunca deben romper una consulta
+            pass
+
+
+class TiquetesCursor(sqlite3.Cursor):
+    """Cursor que mide ``execute*`` y ``fetch*``."""
+
+    def execute(self, sql, parameters=()):
+        inicio = time.perf_counter()
+        try:
+            result = super().execute(sql, parameters)
+        except sqlite3.Error as e:
+            _notify(inicio, sql, e)
+            raise
+        _notify(inicio, sql)
+        return result
+
+    def executemany(self, sql, seq_of_parameters):
+        inicio = time.perf_counter()
+        try:
+            result = super().executemany(sql, seq_of_parameters)
+        except sqlite3.Error as e:
+            _notify(inicio, sql, e)
+            raise
+        _notify(inicio, sql)
+        return result
+
+    def executescript(self, sql_script):
+        inicio = time.perf_counter()
+        try:
+            result = super().executescript(sql_script)
+        except sqlite3.Error as e:
+            _notify(inicio, sql_script, e)
+            raise
+        _notify(inicio, sql_script)
+        return result
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            _notify(inicio, None)
+
+    def fetchmany(self, size=None):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            _notify(inicio, None)
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            _notify(inicio, None)
+
+
+class TiquetesConnection(sqlite3.Connection):
+    """
+    Conexión cuyos cursores (incluidos los de ``conn.execute``) son
+    ``TiquetesCursor``.
+    """
+
+    def cursor(self, factory=TiquetesCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        # El COMMIT es donde una escritura espera el bloqueo de la base
+        inicio = time.perf_counter()
+        try:
+            super().commit()
+        except sqlite3.Error as e:
+            _notify(inicio, 'COMMIT', e)
+            raise
+        _notify(inicio, 'COMMIT')
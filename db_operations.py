@@ -10,6 +10,9 @@ import json
 from datetime import datetime, time, timedelta
 from flask import current_app
 import pytz
+from db_connection import TiquetesConnection
+from db_archive import tabla_historica
+from fotos_duplicadas import get_indice_huellas
 import traceback
 # Importación removida para evitar dependencias circulares
 
@@ -35,11 +38,11 @@ def store_pesaje_bruto(pesaje_data):
     Returns:
         bool: True si se almacenó correctamente, False en caso contrario
     """
-    logger.info(f"🔍 STORE_PESAJE_BRUTO - Datos recibidos: {pesaje_data}")
+    logger.debug("🔍 STORE_PESAJE_BRUTO - Datos recibidos: %s", pesaje_data)
     conn = None
     try:
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         cursor = conn.cursor()
         
         # Definir columnas válidas para la tabla pesajes_bruto
@@ -55,7 +58,7 @@ def store_pesaje_bruto(pesaje_data):
         # Log de campos filtrados para debug
         filtered_out = set(pesaje_data.keys()) - valid_columns
         if filtered_out:
-            logger.info(f"🔍 Campos filtrados de pesajes_bruto (no existen): {filtered_out}")
+            logger.info("🔍 Campos filtrados de pesajes_bruto (no existen): %s", filtered_out)
         
         # Verificar si ya existe un registro con este código_guia
         cursor.execute("SELECT id FROM pesajes_bruto WHERE codigo_guia = ?", 
@@ -76,10 +79,10 @@ def store_pesaje_bruto(pesaje_data):
             params.append(filtered_data.get('codigo_guia'))
             
             update_query = f"UPDATE pesajes_bruto SET {', '.join(update_cols)} WHERE codigo_guia = ?"
-            logger.info(f"🔍 UPDATE Query: {update_query}")
-            logger.info(f"🔍 UPDATE Params: {params}")
+            logger.debug("🔍 UPDATE Query: %s", update_query)
+            logger.debug("🔍 UPDATE Params: %s", params)
             cursor.execute(update_query, params)
-            logger.info(f"Actualizado registro de pesaje bruto para guía: {filtered_data.get('codigo_guia')}")
+            logger.info("Actualizado registro de pesaje bruto para guía: %s", filtered_data.get('codigo_guia'))
         else:
             # Insertar nuevo registro
             columns = ', '.join(filtered_data.keys())
@@ -88,7 +91,7 @@ def store_pesaje_bruto(pesaje_data):
             
             insert_query = f"INSERT INTO pesajes_bruto ({columns}) VALUES ({placeholders})"
             cursor.execute(insert_query, values)
-            logger.info(f"Insertado nuevo registro de pesaje bruto para guía: {filtered_data.get('codigo_guia')}")
+            logger.info("Insertado nuevo registro de pesaje bruto para guía: %s", filtered_data.get('codigo_guia'))
         
         conn.commit()
         return True
@@ -96,7 +99,7 @@ def store_pesaje_bruto(pesaje_data):
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return False
     except sqlite3.Error as e:
-        logger.error(f"Error almacenando registro de pesaje bruto: {e}")
+        logger.error("Error almacenando registro de pesaje bruto: %s", e)
         return False
     finally:
         if conn:
@@ -124,7 +127,7 @@ def get_pesajes_bruto(filtros=None):
         # Process the single configured DB (tiquetes.db)
         if os.path.exists(db_path_secondary):
             try:
-                conn_tq = sqlite3.connect(db_path_secondary)
+                conn_tq = sqlite3.connect(db_path_secondary, factory=TiquetesConnection)
                 conn_tq.row_factory = sqlite3.Row
                 cursor = conn_tq.cursor()
                 
@@ -137,9 +140,13 @@ def get_pesajes_bruto(filtros=None):
                 pesajes_neto_exists = cursor.fetchone() is not None
                 
                 if pesajes_exists:
+                    codigos_filtro = (filtros or {}).get('codigos_guia')
+                    tabla_bruto = tabla_historica(conn_tq, 'pesajes_bruto', codigos_guia=codigos_filtro)
+                    tabla_neto = tabla_historica(conn_tq, 'pesajes_neto', codigos_guia=codigos_filtro)
+
                     # Build query con LEFT JOIN para incluir peso_neto
                     if pesajes_neto_exists:
-                        query = """
+                        query = f"""
                         SELECT 
                             pb.*, 
                             pb.timestamp_pesaje_utc,
@@ -147,12 +154,12 @@ def get_pesajes_bruto(filtros=None):
                             pn.peso_tara,
                             pn.peso_producto,
                             pn.timestamp_pesaje_neto_utc
-                        FROM pesajes_bruto pb
-                        LEFT JOIN pesajes_neto pn ON pb.codigo_guia = pn.codigo_guia
+                        FROM {tabla_bruto} pb
+                        LEFT JOIN {tabla_neto} pn ON pb.codigo_guia = pn.codigo_guia
                         """
                     else:
                         # Fallback si no existe pesajes_neto
-                        query = "SELECT *, timestamp_pesaje_utc FROM pesajes_bruto"
+                        query = f"SELECT *, timestamp_pesaje_utc FROM {tabla_bruto} pb"
                     
                     params = []
                     conditions = []
@@ -180,16 +187,16 @@ def get_pesajes_bruto(filtros=None):
                             pesajes.append(pesaje)
 
             except sqlite3.Error as e:
-                 logger.error(f"Error consultando {db_path_secondary}: {e}")
+                 logger.error("Error consultando %s: %s", db_path_secondary, e)
             finally:
                 if conn_tq:
                     conn_tq.close()
         else:
-            logger.warning(f"Base de datos {db_path_secondary} no encontrada.")
+            logger.warning("Base de datos %s no encontrada.", db_path_secondary)
             
         return pesajes
     except Exception as e:
-        logger.error(f"Error general recuperando registros de pesajes brutos: {e}")
+        logger.error("Error general recuperando registros de pesajes brutos: %s", e)
         return []
 
 def get_pesaje_bruto_by_codigo_guia(codigo_guia):
@@ -211,7 +218,7 @@ def get_pesaje_bruto_by_codigo_guia(codigo_guia):
         # Process the single configured DB (tiquetes.db)
         if os.path.exists(db_path_secondary):
             try:
-                conn = sqlite3.connect(db_path_secondary)
+                conn = sqlite3.connect(db_path_secondary, factory=TiquetesConnection)
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
                 
@@ -222,6 +229,9 @@ def get_pesaje_bruto_by_codigo_guia(codigo_guia):
                 cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='entry_records'")
                 entry_exists = cursor.fetchone() is not None
                 
+                tabla_bruto = tabla_historica(conn, 'pesajes_bruto', codigos_guia=[codigo_guia])
+                tabla_entry = tabla_historica(conn, 'entry_records', codigos_guia=[codigo_guia])
+
                 # Query pesajes_bruto first
                 if pesajes_exists:
                     query = "SELECT p.*, p.timestamp_pesaje_utc "
@@ -235,16 +245,16 @@ def get_pesaje_bruto_by_codigo_guia(codigo_guia):
                              query += ", e.image_filename "
                          else: 
                              query += ", NULL as image_filename " # Add placeholder if column missing
-                         query += "FROM pesajes_bruto p LEFT JOIN entry_records e ON p.codigo_guia = e.codigo_guia WHERE p.codigo_guia = ?"
+                         query += f"FROM {tabla_bruto} p LEFT JOIN {tabla_entry} e ON p.codigo_guia = e.codigo_guia WHERE p.codigo_guia = ?"
                     else:
-                         query += ", NULL as image_filename FROM pesajes_bruto p WHERE p.codigo_guia = ?" 
+                         query += f", NULL as image_filename FROM {tabla_bruto} p WHERE p.codigo_guia = ?" 
                          
                     cursor.execute(query, (codigo_guia,))
                     row = cursor.fetchone()
                     
                     if row:
                         pesaje = dict(row)
-                        logger.info(f"Encontrado pesaje bruto para {codigo_guia} en {db_path_secondary}")
+                        logger.info("Encontrado pesaje bruto para %s en %s", codigo_guia, db_path_secondary)
                         # Normalize SAP code
                         if 'codigo_guia_transporte_sap' not in pesaje or not pesaje['codigo_guia_transporte_sap']:
                              pesaje['codigo_guia_transporte_sap'] = 'No registrada'
@@ -253,12 +263,12 @@ def get_pesaje_bruto_by_codigo_guia(codigo_guia):
                 
                 # If not found in pesajes_bruto, check entry_records if it exists
                 if entry_exists:
-                    cursor.execute("SELECT * FROM entry_records WHERE codigo_guia = ?", (codigo_guia,))
+                    cursor.execute(f"SELECT * FROM {tabla_entry} WHERE codigo_guia = ?", (codigo_guia,))
                     row = cursor.fetchone()
                     
                     if row:
                         entry = dict(row)
-                        logger.info(f"Encontrado registro de entrada para {codigo_guia} en {db_path_secondary}")
+                        logger.info("Encontrado registro de entrada para %s en %s", codigo_guia, db_path_secondary)
                         peso_basico = {
                            # ... (mapping logic remains the same) ...
                             'codigo_guia': codigo_guia,
@@ -279,20 +289,20 @@ def get_pesaje_bruto_by_codigo_guia(codigo_guia):
                 conn = None # Reset conn for the next iteration or finally block
                 
             except sqlite3.Error as e:
-                logger.error(f"Error consultando {db_path_secondary}: {e}")
+                logger.error("Error consultando %s: %s", db_path_secondary, e)
                 if conn:
                     conn.close()
                     conn = None # Reset conn
         
         # If not found in any database
-        logger.warning(f"No se encontró pesaje bruto para {codigo_guia}")
+        logger.warning("No se encontró pesaje bruto para %s", codigo_guia)
         return None
 
     except KeyError:
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return None
     except Exception as e:
-        logger.error(f"Error general en get_pesaje_bruto_by_codigo_guia: {e}")
+        logger.error("Error general en get_pesaje_bruto_by_codigo_guia: %s", e)
         if conn: # Close connection if open due to general error
              conn.close()
         return None
@@ -312,7 +322,7 @@ def update_pesaje_bruto(codigo_guia, datos_pesaje):
     conn = None
     try:
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         cursor = conn.cursor()
         
         # Verificar si existe el registro
@@ -336,16 +346,16 @@ def update_pesaje_bruto(codigo_guia, datos_pesaje):
             cursor.execute(update_query, params)
             
             conn.commit()
-            logger.info(f"Actualizado registro de pesaje bruto para guía: {codigo_guia}")
+            logger.info("Actualizado registro de pesaje bruto para guía: %s", codigo_guia)
             return True
         else:
-            logger.warning(f"No se encontró registro de pesaje bruto para actualizar: {codigo_guia}")
+            logger.warning("No se encontró registro de pesaje bruto para actualizar: %s", codigo_guia)
             return False
     except KeyError:
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return False
     except sqlite3.Error as e:
-        logger.error(f"Error actualizando registro de pesaje bruto: {e}")
+        logger.error("Error actualizando registro de pesaje bruto: %s", e)
         return False
     finally:
         if conn:
@@ -356,6 +366,26 @@ def update_pesaje_bruto(codigo_guia, datos_pesaje):
 #-----------------------
 # db_operations.py
 
+def _registrar_huella_foto(ruta_foto, ambito, referencia):
+    """
+    Registra la huella perceptual de una foto cargada (ver fotos_duplicadas) y
+    avisa si es igual o casi igual a una foto de otra guía/fecha.
+    Las rutas relativas se resuelven contra la carpeta static de la app.
+    """
+    try:
+        archivo = ruta_foto
+        if not os.path.isabs(archivo):
+            archivo = os.path.join(current_app.static_folder, archivo)
+        coincidencia = get_indice_huellas().registrar(ruta_foto, ambito, referencia, archivo=archivo)
+    except RuntimeError:
+        # Fuera del contexto de la app no hay carpeta static para resolver la ruta
+        return None
+    if coincidencia and coincidencia.referencia != referencia:
+        logger.warning("Foto de %s %s (%s) %s a %s de %s.", ambito, ruta_foto, referencia,
+                       'idéntica' if coincidencia.exacta else f'casi igual (distancia {coincidencia.distancia})',
+                       coincidencia.ruta, coincidencia.referencia)
+    return coincidencia
+
 
 
 def store_clasificacion(clasificacion_data, fotos=None):
@@ -366,12 +396,12 @@ def store_clasificacion(clasificacion_data, fotos=None):
     conn = None
     codigo_guia_logging = clasificacion_data.get('codigo_guia', 'UNKNOWN') # Para logs
     try:
-        logger.info(f"--- store_clasificacion v2 INICIO para {codigo_guia_logging} ---")
-        logger.debug(f"Datos recibidos: {clasificacion_data}")
-        logger.debug(f"Fotos recibidas: {fotos}")
+        logger.info("--- store_clasificacion v2 INICIO para %s ---", codigo_guia_logging)
+        logger.debug("Datos recibidos: %s", clasificacion_data)
+        logger.debug("Fotos recibidas: %s", fotos)
 
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         # Asegurar que las claves foráneas estén habilitadas si usas relaciones
         # conn.execute("PRAGMA foreign_keys = ON")
         cursor = conn.cursor()
@@ -402,40 +432,42 @@ def store_clasificacion(clasificacion_data, fotos=None):
         # Log de campos filtrados para debug
         filtered_out = set(datos_sin_none.keys()) - valid_columns
         if filtered_out:
-            logger.info(f"🔍 Campos filtrados de clasificaciones (no existen): {filtered_out}")
+            logger.info("🔍 Campos filtrados de clasificaciones (no existen): %s", filtered_out)
         
-        logger.debug(f"STORE_CLASIF: Datos finales para SQL (sin None y filtrados): {datos_finales}")
-        logger.info(f"[DEBUG-ESTADO] Valor de 'estado' a guardar: {datos_finales.get('estado')}")
+        logger.debug("STORE_CLASIF: Datos finales para SQL (sin None y filtrados): %s", datos_finales)
+        logger.debug("[DEBUG-ESTADO] Valor de 'estado' a guardar: %s", datos_finales.get('estado'))
 
         # Check if record exists
         cursor.execute("SELECT id FROM clasificaciones WHERE codigo_guia = ?", (codigo_guia,))
         existing = cursor.fetchone()
-        logger.debug(f"STORE_CLASIF: Registro existente para {codigo_guia}? {'Sí' if existing else 'No'}")
+        logger.debug("STORE_CLASIF: Registro existente para %s? %s", codigo_guia, 'Sí' if existing else 'No')
 
         if existing:
             # UPDATE logic
             update_fields = {k: v for k, v in datos_finales.items() if k != 'codigo_guia'}
             if not update_fields:
-                logger.warning(f"STORE_CLASIF: No hay campos para actualizar en clasificación existente {codigo_guia}.")
+                logger.warning("STORE_CLASIF: No hay campos para actualizar en clasificación existente %s.", codigo_guia)
             else:
                 set_clause = ', '.join([f"{k} = ?" for k in update_fields.keys()])
                 valores = list(update_fields.values()) + [codigo_guia]
                 update_query = f"UPDATE clasificaciones SET {set_clause} WHERE codigo_guia = ?"
-                logger.info(f"STORE_CLASIF: Preparando UPDATE para {codigo_guia}.")
-                logger.info(f"[DEBUG-ESTADO] Valor de 'estado' en UPDATE: {update_fields.get('estado')}")
+                logger.info("STORE_CLASIF: Preparando UPDATE para %s.", codigo_guia)
+                logger.debug("[DEBUG-ESTADO] Valor de 'estado' en UPDATE: %s", update_fields.get('estado'))
                 # --- INICIO: Logs detallados de UPDATE ---
-                logger.info(f"STORE_CLASIF [UPDATE SQL]: {update_query}")
-                # Loguear parámetros con cuidado, especialmente si pueden ser muy largos
-                try:
-                    # Intentar loguear como JSON para valores largos
-                    params_log = json.dumps(valores, indent=2, ensure_ascii=False, default=str)
-                    logger.info(f"STORE_CLASIF [UPDATE PARAMS]:\n{params_log}")
-                except Exception as log_err:
-                    logger.error(f"STORE_CLASIF [UPDATE PARAMS] Error al dumpear params para log: {log_err}")
-                    logger.info(f"STORE_CLASIF [UPDATE PARAMS] (raw - puede estar truncado): {valores}")
+                logger.debug("STORE_CLASIF [UPDATE SQL]: %s", update_query)
+                # Loguear parámetros con cuidado, especialmente si pueden ser muy largos.
+                # El json.dumps es costoso: solo se hace si DEBUG está habilitado.
+                if logger.isEnabledFor(logging.DEBUG):
+                    try:
+                        # Intentar loguear como JSON para valores largos
+                        params_log = json.dumps(valores, indent=2, ensure_ascii=False, default=str)
+                        logger.debug("STORE_CLASIF [UPDATE PARAMS]:\n%s", params_log)
+                    except Exception as log_err:
+                        logger.error("STORE_CLASIF [UPDATE PARAMS] Error al dumpear params para log: %s", log_err)
+                        logger.debug("STORE_CLASIF [UPDATE PARAMS] (raw - puede estar truncado): %s", valores)
                 # --- FIN: Logs detallados de UPDATE ---
                 cursor.execute(update_query, valores)
-                logger.info(f"STORE_CLASIF: UPDATE ejecutado para {codigo_guia}.")
+                logger.info("STORE_CLASIF: UPDATE ejecutado para %s.", codigo_guia)
         else:
             # INSERT logic
             if not datos_finales:
@@ -446,76 +478,81 @@ def store_clasificacion(clasificacion_data, fotos=None):
             placeholders = ', '.join(['?' for _ in datos_finales])
             valores = list(datos_finales.values())
             insert_query = f"INSERT INTO clasificaciones ({campos}) VALUES ({placeholders})"
-            logger.info(f"STORE_CLASIF: Ejecutando INSERT: {insert_query}")
-            logger.info(f"[DEBUG-ESTADO] Valor de 'estado' en INSERT: {datos_finales.get('estado')}")
-            logger.debug(f"STORE_CLASIF: Valores para INSERT: {valores}")
+            logger.info("STORE_CLASIF: Ejecutando INSERT: %s", insert_query)
+            logger.debug("[DEBUG-ESTADO] Valor de 'estado' en INSERT: %s", datos_finales.get('estado'))
+            logger.debug("STORE_CLASIF: Valores para INSERT: %s", valores)
             cursor.execute(insert_query, valores)
-            logger.info(f"STORE_CLASIF: INSERT ejecutado para {codigo_guia}.")
+            logger.info("STORE_CLASIF: INSERT ejecutado para %s.", codigo_guia)
 
         # Commit después de INSERT/UPDATE de clasificación
         conn.commit()
-        logger.info(f"[DEBUG-ESTADO] Commit realizado para {codigo_guia}. Valor de 'estado' guardado: {datos_finales.get('estado')}")
-        logger.info(f"STORE_CLASIF: Commit realizado para tabla clasificaciones ({codigo_guia}).")
+        logger.debug("[DEBUG-ESTADO] Commit realizado para %s. Valor de 'estado' guardado: %s", codigo_guia, datos_finales.get('estado'))
+        logger.info("STORE_CLASIF: Commit realizado para tabla clasificaciones (%s).", codigo_guia)
 
 
         # --- Guardar fotos si existen ---
         if fotos:
-            logger.info(f"STORE_CLASIF: Procesando {len(fotos)} fotos para {codigo_guia}.")
+            logger.info("STORE_CLASIF: Procesando %s fotos para %s.", len(fotos), codigo_guia)
             # Borrar fotos existentes
-            logger.info(f"STORE_CLASIF: Borrando fotos existentes para {codigo_guia}...")
+            logger.info("STORE_CLASIF: Borrando fotos existentes para %s...", codigo_guia)
             try:
                 cursor.execute("DELETE FROM fotos_clasificacion WHERE codigo_guia = ?", (codigo_guia,))
-                logger.info(f"STORE_CLASIF: Fotos antiguas borradas ok para {codigo_guia}.")
+                logger.info("STORE_CLASIF: Fotos antiguas borradas ok para %s.", codigo_guia)
             except sqlite3.Error as del_err:
                  # Loguear pero continuar, podría ser que la tabla no exista o esté vacía
-                 logger.warning(f"STORE_CLASIF: Error (o tabla vacía?) borrando fotos antiguas para {codigo_guia}: {del_err}")
+                 logger.warning("STORE_CLASIF: Error (o tabla vacía?) borrando fotos antiguas para %s: %s", codigo_guia, del_err)
 
             # Insertar fotos nuevas
             fotos_insertadas_count = 0
+            fotos_insertadas = []
             for i, foto_path in enumerate(fotos):
                 if foto_path:
-                    logger.debug(f"STORE_CLASIF: Insertando foto {i+1}: {foto_path}")
+                    logger.debug("STORE_CLASIF: Insertando foto %s: %s", i+1, foto_path)
                     try:
                         cursor.execute("""
                             INSERT INTO fotos_clasificacion (codigo_guia, ruta_foto, numero_foto)
                             VALUES (?, ?, ?)
                         """, (codigo_guia, foto_path, i + 1))
                         fotos_insertadas_count += 1
+                        fotos_insertadas.append(foto_path)
                     except sqlite3.Error as insert_err:
                          # Loguear el error específico de la foto
-                         logger.error(f"STORE_CLASIF: Error insertando foto {i+1} ({foto_path}) para {codigo_guia}: {insert_err}")
+                         logger.error("STORE_CLASIF: Error insertando foto %s (%s) para %s: %s", i+1, foto_path, codigo_guia, insert_err)
                          # Considerar si se debe devolver False aquí si una foto falla
                          # return False # Descomentar si el fallo al guardar UNA foto debe detener todo
                 else:
-                    logger.warning(f"STORE_CLASIF: Se omitió la foto {i+1} para {codigo_guia} (ruta vacía).")
+                    logger.warning("STORE_CLASIF: Se omitió la foto %s para %s (ruta vacía).", i+1, codigo_guia)
 
             # Commit después de insertar todas las fotos
             conn.commit()
-            logger.info(f"STORE_CLASIF: Commit realizado para tabla fotos_clasificacion ({codigo_guia}). {fotos_insertadas_count} fotos insertadas.")
+            logger.info("STORE_CLASIF: Commit realizado para tabla fotos_clasificacion (%s). %s fotos insertadas.", codigo_guia, fotos_insertadas_count)
+            # Después del commit: decodificar y hashear cada foto no debe retener el bloqueo de escritura
+            for foto_path in fotos_insertadas:
+                _registrar_huella_foto(foto_path, 'clasificacion', codigo_guia)
         else:
-             logger.info(f"STORE_CLASIF: No se proporcionaron fotos para guardar ({codigo_guia}).")
+             logger.info("STORE_CLASIF: No se proporcionaron fotos para guardar (%s).", codigo_guia)
 
-        logger.info(f"--- store_clasificacion v2 FIN ÉXITO para {codigo_guia_logging} ---")
+        logger.info("--- store_clasificacion v2 FIN ÉXITO para %s ---", codigo_guia_logging)
         return True
 
     except KeyError as ke:
-        logger.error(f"STORE_CLASIF: Error de configuración (KeyError) para {codigo_guia_logging}: {ke}", exc_info=True)
+        logger.error("STORE_CLASIF: Error de configuración (KeyError) para %s: %s", codigo_guia_logging, ke, exc_info=True)
         return False
     except sqlite3.Error as db_err:
         # *** LOG DETALLADO DEL ERROR SQL ***
-        logger.error(f"STORE_CLASIF: Error de Base de Datos (sqlite3.Error) para {codigo_guia_logging}: {db_err}", exc_info=True)
+        logger.error("STORE_CLASIF: Error de Base de Datos (sqlite3.Error) para %s: %s", codigo_guia_logging, db_err, exc_info=True)
         # Loguear los datos que se intentaban guardar puede ser útil
-        logger.error(f"STORE_CLASIF: Datos que se intentaban guardar: {datos_finales if 'datos_finales' in locals() else 'No disponibles'}")
+        logger.error("STORE_CLASIF: Datos que se intentaban guardar: %s", datos_finales if 'datos_finales' in locals() else 'No disponibles')
         return False
     except Exception as e:
-        logger.error(f"STORE_CLASIF: Error General (Exception) para {codigo_guia_logging}: {e}", exc_info=True)
+        logger.error("STORE_CLASIF: Error General (Exception) para %s: %s", codigo_guia_logging, e, exc_info=True)
         return False
     finally:
         if conn:
             conn.close()
-            logger.debug(f"STORE_CLASIF: Conexión a BD cerrada para {codigo_guia_logging}.")
+            logger.debug("STORE_CLASIF: Conexión a BD cerrada para %s.", codigo_guia_logging)
         else:
-            logger.debug(f"STORE_CLASIF: Conexión a BD no estaba abierta al finalizar ({codigo_guia_logging}).")
+            logger.debug("STORE_CLASIF: Conexión a BD no estaba abierta al finalizar (%s).", codigo_guia_logging)
 
 # ... (resto de funciones en db_operations.py) ...
 
@@ -533,17 +570,16 @@ def get_clasificaciones(filtros=None):
     conn = None
     try:
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        query = "SELECT * FROM clasificaciones"
+        conditions = []
         params = []
+        desde_utc = None
         
         # Aplicar filtros si se proporcionan
         if filtros:
-            conditions = []
-            
             # Filtro por códigos de guía (OPTIMIZACIÓN PRINCIPAL)
             if 'codigos_guia' in filtros and filtros['codigos_guia']:
                 codigos_guia = filtros['codigos_guia']
@@ -564,9 +600,10 @@ def get_clasificaciones(filtros=None):
                     
                     conditions.append("timestamp_clasificacion_utc >= ?")
                     params.append(utc_timestamp_desde)
-                    logger.info(f"[Clasificaciones] Filtro fecha_desde (Bogotá: {fecha_desde_str} 00:00:00) -> UTC: {utc_timestamp_desde}")
+                    desde_utc = utc_timestamp_desde
+                    logger.info("[Clasificaciones] Filtro fecha_desde (Bogotá: %s 00:00:00) -> UTC: %s", fecha_desde_str, utc_timestamp_desde)
                 except (ValueError, TypeError) as e:
-                     logger.warning(f"[Clasificaciones] Error procesando fecha_desde '{filtros.get('fecha_desde', 'N/A')}': {e}. Saltando filtro.")
+                     logger.warning("[Clasificaciones] Error procesando fecha_desde '%s': %s. Saltando filtro.", filtros.get('fecha_desde', 'N/A'), e)
                 
             if filtros.get('fecha_hasta'):
                 try:
@@ -580,9 +617,9 @@ def get_clasificaciones(filtros=None):
                     
                     conditions.append("timestamp_clasificacion_utc <= ?")
                     params.append(utc_timestamp_hasta)
-                    logger.info(f"[Clasificaciones] Filtro fecha_hasta (Bogotá: {fecha_hasta_str} 23:59:59) -> UTC: {utc_timestamp_hasta}")
+                    logger.info("[Clasificaciones] Filtro fecha_hasta (Bogotá: %s 23:59:59) -> UTC: %s", fecha_hasta_str, utc_timestamp_hasta)
                 except (ValueError, TypeError) as e:
-                     logger.warning(f"[Clasificaciones] Error procesando fecha_hasta '{filtros.get('fecha_hasta', 'N/A')}': {e}. Saltando filtro.")
+                     logger.warning("[Clasificaciones] Error procesando fecha_hasta '%s': %s. Saltando filtro.", filtros.get('fecha_hasta', 'N/A'), e)
             
             # Mantener los otros filtros como estaban
             if filtros.get('codigo_proveedor'):
@@ -592,9 +629,12 @@ def get_clasificaciones(filtros=None):
             if filtros.get('nombre_proveedor'):
                 conditions.append("nombre_proveedor LIKE ?")
                 params.append(f"%{filtros['nombre_proveedor']}%")
-            
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
+        
+        # Los rangos históricos y las guías archivadas se leen también del archivo por año
+        tabla = tabla_historica(conn, 'clasificaciones', desde_utc, (filtros or {}).get('codigos_guia'))
+        query = f"SELECT * FROM {tabla}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
         
         # Ordenar por timestamp UTC más reciente
         query += " ORDER BY timestamp_clasificacion_utc DESC"
@@ -602,27 +642,34 @@ def get_clasificaciones(filtros=None):
         cursor.execute(query, params)
         
         # Convertir filas a diccionarios
-        clasificaciones = []
-        for row in cursor.fetchall():
-            clasificacion = {key: row[key] for key in row.keys()}
-            
-            # Obtener fotos asociadas
-            # Use a separate cursor or fetch all data first to avoid issues
-            with sqlite3.connect(db_path) as foto_conn:
-                foto_cursor = foto_conn.cursor()
-                foto_cursor.execute("SELECT ruta_foto FROM fotos_clasificacion WHERE codigo_guia = ? ORDER BY numero_foto", 
-                             (clasificacion['codigo_guia'],))
-                fotos = [foto_row[0] for foto_row in foto_cursor.fetchall()]
-                clasificacion['fotos'] = fotos
-            
-            clasificaciones.append(clasificacion)
-        
+        clasificaciones = [{key: row[key] for key in row.keys()} for row in cursor.fetchall()]
+
+        # Obtener fotos asociadas: la tabla (o vista histórica) se resuelve una sola
+        # vez para todas las guías del listado, no una vez por clasificación
+        codigos = list(dict.fromkeys(c['codigo_guia'] for c in clasificaciones if c.get('codigo_guia')))
+        fotos_por_guia = {}
+        if codigos:
+            tabla_fotos = 'fotos_clasificacion'
+            if tabla != 'clasificaciones':
+                tabla_fotos = tabla_historica(conn, tabla_fotos, codigos_guia=codigos)
+            for inicio in range(0, len(codigos), 500):
+                bloque = codigos[inicio:inicio + 500]
+                cursor.execute(
+                    f"SELECT codigo_guia, ruta_foto FROM {tabla_fotos} "
+                    f"WHERE codigo_guia IN ({', '.join('?' * len(bloque))}) ORDER BY numero_foto",
+                    bloque,
+                )
+                for codigo_guia, ruta_foto in cursor.fetchall():
+                    fotos_por_guia.setdefault(codigo_guia, []).append(ruta_foto)
+        for clasificacion in clasificaciones:
+            clasificacion['fotos'] = fotos_por_guia.get(clasificacion.get('codigo_guia'), [])
+
         return clasificaciones
     except KeyError:
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return []
     except sqlite3.Error as e:
-        logger.error(f"Error recuperando registros de clasificaciones: {e}")
+        logger.error("Error recuperando registros de clasificaciones: %s", e)
         return []
     finally:
         if conn:
@@ -642,22 +689,23 @@ def get_fotos_clasificacion(codigo_guia):
     conn = None
     try:
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         cursor = conn.cursor()
         
-        cursor.execute("SELECT ruta_foto FROM fotos_clasificacion WHERE codigo_guia = ? ORDER BY numero_foto", 
+        tabla = tabla_historica(conn, 'fotos_clasificacion', codigos_guia=[codigo_guia])
+        cursor.execute(f"SELECT ruta_foto FROM {tabla} WHERE codigo_guia = ? ORDER BY numero_foto", 
                      (codigo_guia,))
         fotos_raw = cursor.fetchall()
         fotos = [foto_row[0] for foto_row in fotos_raw]
         
-        logger.info(f"Fotos de clasificación encontradas para {codigo_guia}: {len(fotos)} fotos")
+        logger.info("Fotos de clasificación encontradas para %s: %s fotos", codigo_guia, len(fotos))
         return fotos
         
     except KeyError:
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return []
     except sqlite3.Error as e:
-        logger.error(f"Error obteniendo fotos de clasificación para {codigo_guia}: {e}")
+        logger.error("Error obteniendo fotos de clasificación para %s: %s", codigo_guia, e)
         return []
     finally:
         if conn:
@@ -678,28 +726,30 @@ def get_clasificacion_by_codigo_guia(codigo_guia):
     conn = None
     try:
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM clasificaciones WHERE codigo_guia = ?", (codigo_guia,))
+        tabla = tabla_historica(conn, 'clasificaciones', codigos_guia=[codigo_guia])
+        cursor.execute(f"SELECT * FROM {tabla} WHERE codigo_guia = ?", (codigo_guia,))
         row = cursor.fetchone()
         
         if row:
             clasificacion = {key: row[key] for key in row.keys()}
             
             # Obtener fotos asociadas (using main connection cursor is fine here)
-            logger.info(f"[DIAG][get_clasificacion] Buscando fotos para guía: {codigo_guia}")
+            logger.debug("[DIAG][get_clasificacion] Buscando fotos para guía: %s", codigo_guia)
             try:
-                cursor.execute("SELECT ruta_foto FROM fotos_clasificacion WHERE codigo_guia = ? ORDER BY numero_foto", 
+                tabla_fotos = tabla_historica(conn, 'fotos_clasificacion', codigos_guia=[codigo_guia])
+                cursor.execute(f"SELECT ruta_foto FROM {tabla_fotos} WHERE codigo_guia = ? ORDER BY numero_foto", 
                              (codigo_guia,))
                 fotos_raw = cursor.fetchall() # Obtener todas las filas crudas
-                logger.info(f"[DIAG][get_clasificacion] Consulta de fotos ejecutada para {codigo_guia}. Resultado crudo: {fotos_raw}")
+                logger.debug("[DIAG][get_clasificacion] Consulta de fotos ejecutada para %s. Resultado crudo: %s", codigo_guia, fotos_raw)
                 fotos = [foto_row[0] for foto_row in fotos_raw] # Extraer la ruta
                 clasificacion['fotos'] = fotos
-                logger.info(f"[DIAG][get_clasificacion] Rutas de fotos encontradas y asignadas para {codigo_guia}: {fotos}")
+                logger.debug("[DIAG][get_clasificacion] Rutas de fotos encontradas y asignadas para %s: %s", codigo_guia, fotos)
             except sqlite3.Error as фото_err:
-                 logger.error(f"[DIAG][get_clasificacion] Error al consultar fotos para {codigo_guia}: {фото_err}")
+                 logger.error("[DIAG][get_clasificacion] Error al consultar fotos para %s: %s", codigo_guia, фото_err)
                  clasificacion['fotos'] = [] # Asignar lista vacía en caso de error
             
             # Si clasificaciones es una cadena JSON, convertirla a lista
@@ -722,7 +772,7 @@ def get_clasificacion_by_codigo_guia(codigo_guia):
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return None
     except sqlite3.Error as e:
-        logger.error(f"Error recuperando registro de clasificación por código de guía: {e}")
+        logger.error("Error recuperando registro de clasificación por código de guía: %s", e)
         return None
     finally:
         if conn:
@@ -746,7 +796,7 @@ def store_pesaje_neto(pesaje_data):
     conn = None
     try:
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         cursor = conn.cursor()
         
         # Verificar si ya existe un registro con este código_guia
@@ -779,7 +829,7 @@ def store_pesaje_neto(pesaje_data):
             
             update_query = f"UPDATE pesajes_neto SET {', '.join(update_cols)} WHERE codigo_guia = ?"
             cursor.execute(update_query, params)
-            logger.info(f"Actualizado registro de pesaje neto para guía: {datos_finales.get('codigo_guia')}")
+            logger.info("Actualizado registro de pesaje neto para guía: %s", datos_finales.get('codigo_guia'))
         else:
             # Insertar nuevo registro
             columns = ', '.join(datos_finales.keys())
@@ -788,7 +838,7 @@ def store_pesaje_neto(pesaje_data):
             
             insert_query = f"INSERT INTO pesajes_neto ({columns}) VALUES ({placeholders})"
             cursor.execute(insert_query, values)
-            logger.info(f"Insertado nuevo registro de pesaje neto para guía: {datos_finales.get('codigo_guia')}")
+            logger.info("Insertado nuevo registro de pesaje neto para guía: %s", datos_finales.get('codigo_guia'))
         
         conn.commit()
         return True
@@ -796,7 +846,7 @@ def store_pesaje_neto(pesaje_data):
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return False
     except sqlite3.Error as e:
-        logger.error(f"Error almacenando registro de pesaje neto: {e}")
+        logger.error("Error almacenando registro de pesaje neto: %s", e)
         return False
     finally:
         if conn:
@@ -836,17 +886,16 @@ def get_pesajes_neto(fecha_desde_str=None, fecha_hasta_str=None, proveedor_term=
     try:
         # Usar db_path proporcionado o el de configuración
         db_path_to_use = db_path or current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path_to_use)
+        conn = sqlite3.connect(db_path_to_use, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        query = "SELECT * FROM pesajes_neto"
+        conditions = []
         params = []
+        desde_utc = None
         
         # Aplicar filtros si se proporcionan
         if filtros:
-            conditions = []
-            
             # Filtro por códigos de guía (OPTIMIZACIÓN PRINCIPAL)
             if 'codigos_guia' in filtros and filtros['codigos_guia']:
                 codigos_guia = filtros['codigos_guia']
@@ -867,9 +916,10 @@ def get_pesajes_neto(fecha_desde_str=None, fecha_hasta_str=None, proveedor_term=
                     
                     conditions.append("timestamp_pesaje_neto_utc >= ?")
                     params.append(utc_timestamp_desde)
-                    logger.info(f"[Pesajes Neto] Filtro fecha_desde (Bogotá: {fecha_desde_filter} 00:00:00) -> UTC: {utc_timestamp_desde}")
+                    desde_utc = utc_timestamp_desde
+                    logger.info("[Pesajes Neto] Filtro fecha_desde (Bogotá: %s 00:00:00) -> UTC: %s", fecha_desde_filter, utc_timestamp_desde)
                 except (ValueError, TypeError) as e:
-                    logger.warning(f"[Pesajes Neto] Error procesando fecha_desde '{filtros.get('fecha_desde', 'N/A')}': {e}. Saltando filtro.")
+                    logger.warning("[Pesajes Neto] Error procesando fecha_desde '%s': %s. Saltando filtro.", filtros.get('fecha_desde', 'N/A'), e)
 
             if filtros.get('fecha_hasta'):
                 try:
@@ -882,9 +932,9 @@ def get_pesajes_neto(fecha_desde_str=None, fecha_hasta_str=None, proveedor_term=
                     
                     conditions.append("timestamp_pesaje_neto_utc <= ?")
                     params.append(utc_timestamp_hasta)
-                    logger.info(f"[Pesajes Neto] Filtro fecha_hasta (Bogotá: {fecha_hasta_str} 23:59:59) -> UTC: {utc_timestamp_hasta}")
+                    logger.info("[Pesajes Neto] Filtro fecha_hasta (Bogotá: %s 23:59:59) -> UTC: %s", fecha_hasta_str, utc_timestamp_hasta)
                 except (ValueError, TypeError) as e:
-                    logger.warning(f"[Pesajes Neto] Error procesando fecha_hasta '{filtros.get('fecha_hasta', 'N/A')}': {e}. Saltando filtro.")
+                    logger.warning("[Pesajes Neto] Error procesando fecha_hasta '%s': %s. Saltando filtro.", filtros.get('fecha_hasta', 'N/A'), e)
 
             # Otros filtros
             proveedor_term_filter = filtros.get('proveedor_term')
@@ -901,10 +951,12 @@ def get_pesajes_neto(fecha_desde_str=None, fecha_hasta_str=None, proveedor_term=
                 # Ejemplo simplificado asumiendo que existen en la tabla:
                 conditions.append("(codigo_proveedor LIKE ? OR nombre_proveedor LIKE ?)")
                 params.extend([f"%{proveedor_term_filter}%", f"%{proveedor_term_filter}%"])
-                logger.info(f"[Pesajes Neto] Filtro por proveedor_term: '{proveedor_term_filter}'")
-            
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
+                logger.info("[Pesajes Neto] Filtro por proveedor_term: '%s'", proveedor_term_filter)
+        
+        tabla = tabla_historica(conn, 'pesajes_neto', desde_utc, (filtros or {}).get('codigos_guia'))
+        query = f"SELECT * FROM {tabla}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
                 
         # Ordenar por timestamp UTC más reciente en SQL
         query += " ORDER BY timestamp_pesaje_neto_utc DESC"
@@ -923,7 +975,7 @@ def get_pesajes_neto(fecha_desde_str=None, fecha_hasta_str=None, proveedor_term=
         for p_neto in pesajes_raw:
             codigo_guia = p_neto.get('codigo_guia')
             if not codigo_guia:
-                logger.warning(f"Registro de pesaje neto sin código de guía: {p_neto}")
+                logger.warning("Registro de pesaje neto sin código de guía: %s", p_neto)
                 continue
             
             # Obtener datos adicionales de entry_records
@@ -947,7 +999,7 @@ def get_pesajes_neto(fecha_desde_str=None, fecha_hasta_str=None, proveedor_term=
                     fecha_pesaje_neto_local = dt_bogota.strftime('%d/%m/%Y')
                     hora_pesaje_neto_local = dt_bogota.strftime('%H:%M:%S')
                 except ValueError as e:
-                    logger.error(f"Error convirtiendo timestamp '{timestamp_utc_str}' para guía {codigo_guia}: {e}")
+                    logger.error("Error convirtiendo timestamp '%s' para guía %s: %s", timestamp_utc_str, codigo_guia, e)
             
             # Crear registro enriquecido
             registro_enriquecido = {
@@ -988,7 +1040,7 @@ def get_pesajes_neto(fecha_desde_str=None, fecha_hasta_str=None, proveedor_term=
             return [], {'peso_neto_total': 0, 'peso_bruto_total': 0, 'cantidad_registros': 0}
         return []
     except sqlite3.Error as e:
-        logger.error(f"Recuperando registros de pesajes netos: {e}")
+        logger.error("Recuperando registros de pesajes netos: %s", e)
         if legacy_call:
             return [], {'peso_neto_total': 0, 'peso_bruto_total': 0, 'cantidad_registros': 0}
         return []
@@ -1002,18 +1054,19 @@ def _get_entry_record_local(codigo_guia, db_path):
     """
     conn = None
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM entry_records WHERE codigo_guia = ?", (codigo_guia,))
+        tabla = tabla_historica(conn, 'entry_records', codigos_guia=[codigo_guia])
+        cursor.execute(f"SELECT * FROM {tabla} WHERE codigo_guia = ?", (codigo_guia,))
         row = cursor.fetchone()
         
         if row:
             return {key: row[key] for key in row.keys()}
         return None
     except sqlite3.Error as e:
-        logger.error(f"Error obteniendo entry_record para {codigo_guia}: {e}")
+        logger.error("Error obteniendo entry_record para %s: %s", codigo_guia, e)
         return None
     finally:
         if conn:
@@ -1025,18 +1078,19 @@ def _get_pesaje_bruto_local(codigo_guia, db_path):
     """
     conn = None
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM pesajes_bruto WHERE codigo_guia = ?", (codigo_guia,))
+        tabla = tabla_historica(conn, 'pesajes_bruto', codigos_guia=[codigo_guia])
+        cursor.execute(f"SELECT * FROM {tabla} WHERE codigo_guia = ?", (codigo_guia,))
         row = cursor.fetchone()
         
         if row:
             return {key: row[key] for key in row.keys()}
         return None
     except sqlite3.Error as e:
-        logger.error(f"Error obteniendo pesaje_bruto para {codigo_guia}: {e}")
+        logger.error("Error obteniendo pesaje_bruto para %s: %s", codigo_guia, e)
         return None
     finally:
         if conn:
@@ -1056,11 +1110,12 @@ def get_pesaje_neto_by_codigo_guia(codigo_guia):
     conn = None
     try:
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM pesajes_neto WHERE codigo_guia = ?", (codigo_guia,))
+        tabla = tabla_historica(conn, 'pesajes_neto', codigos_guia=[codigo_guia])
+        cursor.execute(f"SELECT * FROM {tabla} WHERE codigo_guia = ?", (codigo_guia,))
         row = cursor.fetchone()
         
         if row:
@@ -1071,7 +1126,7 @@ def get_pesaje_neto_by_codigo_guia(codigo_guia):
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return None
     except sqlite3.Error as e:
-        logger.error(f"Error recuperando registro de pesaje neto por código de guía: {e}")
+        logger.error("Error recuperando registro de pesaje neto por código de guía: %s", e)
         return None
     finally:
         if conn:
@@ -1092,7 +1147,7 @@ def get_provider_by_code(codigo_proveedor, codigo_guia_actual=None):
     conn = None
     try:
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -1104,7 +1159,7 @@ def get_provider_by_code(codigo_proveedor, codigo_guia_actual=None):
             if row: 
                 proveedor = {key: row[key] for key in row.keys()}
                 proveedor['es_dato_otra_entrega'] = False
-                logger.info(f"Proveedor encontrado en tabla proveedores: {codigo_proveedor}")
+                logger.info("Proveedor encontrado en tabla proveedores: %s", codigo_proveedor)
                 return proveedor
         
         if codigo_guia_actual:
@@ -1117,7 +1172,7 @@ def get_provider_by_code(codigo_proveedor, codigo_guia_actual=None):
                     proveedor['codigo'] = proveedor.get('codigo_proveedor')
                     proveedor['nombre'] = proveedor.get('nombre_proveedor')
                     proveedor['es_dato_otra_entrega'] = False
-                    logger.info(f"Proveedor encontrado en entry_records para el mismo código de guía: {codigo_guia_actual}")
+                    logger.info("Proveedor encontrado en entry_records para el mismo código de guía: %s", codigo_guia_actual)
                     return proveedor
         
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='entry_records'")
@@ -1131,8 +1186,8 @@ def get_provider_by_code(codigo_proveedor, codigo_guia_actual=None):
                 proveedor['timestamp_registro_utc'] = proveedor.get('timestamp_registro_utc', '')
                 proveedor['es_dato_otra_entrega'] = bool(codigo_guia_actual and proveedor.get('codigo_guia') != codigo_guia_actual)
                 if proveedor['es_dato_otra_entrega']:
-                    logger.warning(f"Proveedor encontrado en otra entrada (código guía: {proveedor.get('codigo_guia')})")
-                logger.info(f"Proveedor encontrado en entry_records: {codigo_proveedor}")
+                    logger.warning("Proveedor encontrado en otra entrada (código guía: %s)", proveedor.get('codigo_guia'))
+                logger.info("Proveedor encontrado en entry_records: %s", codigo_proveedor)
                 return proveedor
             
         tables_to_check = ['pesajes_bruto', 'clasificaciones', 'pesajes_neto']
@@ -1151,7 +1206,7 @@ def get_provider_by_code(codigo_proveedor, codigo_guia_actual=None):
                             proveedor['codigo'] = proveedor.get('codigo_proveedor')
                             proveedor['nombre'] = proveedor.get('nombre_proveedor')
                             proveedor['es_dato_otra_entrega'] = False
-                            logger.info(f"Proveedor encontrado en {table} para el mismo código de guía: {codigo_guia_actual}")
+                            logger.info("Proveedor encontrado en %s para el mismo código de guía: %s", table, codigo_guia_actual)
                             return proveedor
                     query = f"SELECT * FROM {table} WHERE codigo_proveedor = ? LIMIT 1"
                     cursor.execute(query, (codigo_proveedor,))
@@ -1162,17 +1217,17 @@ def get_provider_by_code(codigo_proveedor, codigo_guia_actual=None):
                         proveedor['nombre'] = proveedor.get('nombre_proveedor')
                         proveedor['es_dato_otra_entrega'] = bool(codigo_guia_actual and 'codigo_guia' in columns and proveedor.get('codigo_guia') != codigo_guia_actual)
                         if proveedor['es_dato_otra_entrega']:
-                            logger.warning(f"Datos encontrados en {table} de otra entrada (código guía: {proveedor.get('codigo_guia')})")
-                        logger.info(f"Proveedor encontrado en {table}: {codigo_proveedor}")
+                            logger.warning("Datos encontrados en %s de otra entrada (código guía: %s)", table, proveedor.get('codigo_guia'))
+                        logger.info("Proveedor encontrado en %s: %s", table, codigo_proveedor)
                         return proveedor
         
-        logger.warning(f"No se encontró información del proveedor: {codigo_proveedor}")
+        logger.warning("No se encontró información del proveedor: %s", codigo_proveedor)
         return None
     except KeyError:
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return None
     except sqlite3.Error as e:
-        logger.error(f"Error buscando proveedor por código: {e}")
+        logger.error("Error buscando proveedor por código: %s", e)
         return None
     finally:
         if conn:
@@ -1183,14 +1238,14 @@ def get_entry_records_by_provider_code(codigo_proveedor):
     try:
         # Get DB path from app config
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row
         c = conn.cursor()
         
         # Verificar si existe la tabla
         c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='entry_records'")
         if not c.fetchone():
-            logger.warning(f"No existe la tabla entry_records para buscar registros del proveedor {codigo_proveedor}")
+            logger.warning("No existe la tabla entry_records para buscar registros del proveedor %s", codigo_proveedor)
             # Cerrar conexión si se abrió
             if conn:
                 conn.close()
@@ -1215,7 +1270,7 @@ def get_entry_records_by_provider_code(codigo_proveedor):
         # Cerrar conexión antes de retornar
         if conn:
              conn.close()
-        logger.info(f"Encontrados {len(records)} registros para el proveedor {codigo_proveedor}")
+        logger.info("Encontrados %s registros para el proveedor %s", len(records), codigo_proveedor)
         return records
     except KeyError:
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
@@ -1223,7 +1278,7 @@ def get_entry_records_by_provider_code(codigo_proveedor):
             conn.close()
         return []
     except Exception as e:
-        logger.error(f"Error al obtener registros para el proveedor {codigo_proveedor}: {str(e)}")
+        logger.error("Error al obtener registros para el proveedor %s: %s", codigo_proveedor, str(e))
         # logger.error(traceback.format_exc()) # Comentado para reducir verbosidad, descomentar si es necesario
         if conn:
              conn.close()
@@ -1251,7 +1306,7 @@ def store_salida(salida_data):
     conn = None
     try:
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         cursor = conn.cursor()
 
         # Verificar si ya existe un registro con este código_guia
@@ -1278,7 +1333,7 @@ def store_salida(salida_data):
             
             update_query = f"UPDATE salidas SET {', '.join(update_cols)} WHERE codigo_guia = ?"
             cursor.execute(update_query, params)
-            logger.info(f"Actualizado registro de salida para guía: {datos_finales.get('codigo_guia')}")
+            logger.info("Actualizado registro de salida para guía: %s", datos_finales.get('codigo_guia'))
         else:
             # Insertar nuevo registro
             columns = ', '.join(datos_finales.keys())
@@ -1287,7 +1342,7 @@ def store_salida(salida_data):
             
             insert_query = f"INSERT INTO salidas ({columns}) VALUES ({placeholders})"
             cursor.execute(insert_query, values)
-            logger.info(f"Insertado nuevo registro de salida para guía: {datos_finales.get('codigo_guia')}")
+            logger.info("Insertado nuevo registro de salida para guía: %s", datos_finales.get('codigo_guia'))
         
         conn.commit()
         return True
@@ -1295,7 +1350,7 @@ def store_salida(salida_data):
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return False
     except sqlite3.Error as e:
-        logger.error(f"Error almacenando registro de salida: {e}")
+        logger.error("Error almacenando registro de salida: %s", e)
         return False
     finally:
         if conn:
@@ -1315,7 +1370,7 @@ def get_salidas(filtros=None):
     conn = None
     try:
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -1325,13 +1380,12 @@ def get_salidas(filtros=None):
             logger.warning("La tabla 'salidas' no existe en la base de datos.")
             return []
         
-        query = "SELECT * FROM salidas"
+        conditions = []
         params = []
+        desde_utc = None
         
         # Aplicar filtros si se proporcionan
         if filtros:
-            conditions = []
-            
             # Filtro por códigos de guía (OPTIMIZACIÓN PRINCIPAL)
             if 'codigos_guia' in filtros and filtros['codigos_guia']:
                 codigos_guia = filtros['codigos_guia']
@@ -1351,8 +1405,9 @@ def get_salidas(filtros=None):
                     utc_timestamp_desde = utc_dt_desde.strftime('%Y-%m-%d %H:%M:%S')
                     conditions.append("timestamp_salida_utc >= ?")
                     params.append(utc_timestamp_desde)
+                    desde_utc = utc_timestamp_desde
                 except (ValueError, TypeError) as e:
-                    logger.warning(f"[Salidas] Error procesando fecha_desde '{filtros.get('fecha_desde', 'N/A')}': {e}.")
+                    logger.warning("[Salidas] Error procesando fecha_desde '%s': %s.", filtros.get('fecha_desde', 'N/A'), e)
 
             if filtros.get('fecha_hasta'):
                 try:
@@ -1365,7 +1420,7 @@ def get_salidas(filtros=None):
                     conditions.append("timestamp_salida_utc <= ?")
                     params.append(utc_timestamp_hasta)
                 except (ValueError, TypeError) as e:
-                    logger.warning(f"[Salidas] Error procesando fecha_hasta '{filtros.get('fecha_hasta', 'N/A')}': {e}.")
+                    logger.warning("[Salidas] Error procesando fecha_hasta '%s': %s.", filtros.get('fecha_hasta', 'N/A'), e)
 
             # Otros filtros
             if filtros.get('codigo_guia'):
@@ -1380,9 +1435,11 @@ def get_salidas(filtros=None):
             if filtros.get('estado'):
                  conditions.append("estado LIKE ?")
                  params.append(f"%{filtros['estado']}%")
-            
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
+        
+        tabla = tabla_historica(conn, 'salidas', desde_utc, (filtros or {}).get('codigos_guia'))
+        query = f"SELECT * FROM {tabla}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
                 
         # Ordenar por timestamp UTC más reciente
         query += " ORDER BY timestamp_salida_utc DESC"
@@ -1399,7 +1456,7 @@ def get_salidas(filtros=None):
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return []
     except sqlite3.Error as e:
-        logger.error(f"Recuperando registros de salidas: {e}")
+        logger.error("Recuperando registros de salidas: %s", e)
         return []
     finally:
         if conn:
@@ -1420,7 +1477,7 @@ def get_salida_by_codigo_guia(codigo_guia):
     conn = None
     try:
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -1430,7 +1487,8 @@ def get_salida_by_codigo_guia(codigo_guia):
             logger.warning("La tabla 'salidas' no existe al buscar por código de guía.")
             return None
         
-        cursor.execute("SELECT * FROM salidas WHERE codigo_guia = ?", (codigo_guia,))
+        tabla = tabla_historica(conn, 'salidas', codigos_guia=[codigo_guia])
+        cursor.execute(f"SELECT * FROM {tabla} WHERE codigo_guia = ?", (codigo_guia,))
         row = cursor.fetchone()
         
         if row:
@@ -1441,7 +1499,7 @@ def get_salida_by_codigo_guia(codigo_guia):
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return None
     except sqlite3.Error as e:
-        logger.error(f"Error recuperando registro de salida por código de guía: {e}")
+        logger.error("Error recuperando registro de salida por código de guía: %s", e)
         return None
     finally:
         if conn:
@@ -1481,7 +1539,7 @@ def guardar_actualizar_validacion_sap(fecha_aplicable_validacion, timestamp_crea
             return False
 
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         cursor = conn.cursor()
 
         # Verificar si ya existe un registro para esta fecha_aplicable_validacion
@@ -1513,7 +1571,7 @@ def guardar_actualizar_validacion_sap(fecha_aplicable_validacion, timestamp_crea
                 WHERE fecha_aplicable_validacion = :fecha_aplicable_validacion
             """
             cursor.execute(update_query, params)
-            logger.info(f"Validación SAP actualizada para fecha: {fecha_aplicable_validacion}")
+            logger.info("Validación SAP actualizada para fecha: %s", fecha_aplicable_validacion)
         else:
             # Insertar nuevo registro (incluyendo fecha_validacion)
             # SQLite asignará CURRENT_TIMESTAMP a fecha_creacion automáticamente si la columna tiene ese DEFAULT
@@ -1527,18 +1585,20 @@ def guardar_actualizar_validacion_sap(fecha_aplicable_validacion, timestamp_crea
                 )
             """
             cursor.execute(insert_query, params)
-            logger.info(f"Nueva validación SAP guardada para fecha: {fecha_aplicable_validacion}")
+            logger.info("Nueva validación SAP guardada para fecha: %s", fecha_aplicable_validacion)
         
         conn.commit()
+        if ruta_foto_validacion:
+            _registrar_huella_foto(ruta_foto_validacion, 'pesaje_neto', fecha_aplicable_validacion)
         return True
 
     except sqlite3.Error as e:
-        logger.error(f"Error de base de datos en guardar_actualizar_validacion_sap para fecha {fecha_aplicable_validacion}: {e}")
+        logger.error("Error de base de datos en guardar_actualizar_validacion_sap para fecha %s: %s", fecha_aplicable_validacion, e)
         if conn:
             conn.rollback()
         return False
     except Exception as e_general:
-        logger.error(f"Error general en guardar_actualizar_validacion_sap para fecha {fecha_aplicable_validacion}: {e_general}")
+        logger.error("Error general en guardar_actualizar_validacion_sap para fecha %s: %s", fecha_aplicable_validacion, e_general)
         if conn:
             conn.rollback() # Asegurar rollback en caso de error no SQLite
         return False
@@ -1571,7 +1631,7 @@ def get_validacion_diaria_sap(fecha_validacion, db_path=None):
             return None
     
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row # Para acceder a las columnas por nombre
         cursor = conn.cursor()
 
@@ -1590,10 +1650,10 @@ def get_validacion_diaria_sap(fecha_validacion, db_path=None):
             return None
 
     except sqlite3.Error as e:
-        logger.error(f"Error de BD en get_validacion_diaria_sap para fecha {fecha_validacion}: {e}")
+        logger.error("Error de BD en get_validacion_diaria_sap para fecha %s: %s", fecha_validacion, e)
         return None
     except Exception as e_general:
-        logger.error(f"Error general en get_validacion_diaria_sap para fecha {fecha_validacion}: {e_general}")
+        logger.error("Error general en get_validacion_diaria_sap para fecha %s: %s", fecha_validacion, e_general)
         return None
     finally:
         if conn:
@@ -1614,37 +1674,37 @@ def get_resumen_validaciones_diarias(rango_dias=60, db_path=None):
                     'mensaje_webhook': '...', 'ruta_foto_validacion': '...'}]
               Retorna lista vacía en caso de error o si no hay datos.
     """
-    logger.info(f"[GET_RESUMEN_VALIDACIONES] === Iniciando ejecución. Rango de días: {rango_dias}. DB Path inicial: {db_path} ===")
+    logger.debug("[GET_RESUMEN_VALIDACIONES] === Iniciando ejecución. Rango de días: %s. DB Path inicial: %s ===", rango_dias, db_path)
     conn = None
     if db_path is None:
         try:
             db_path = current_app.config['TIQUETES_DB_PATH']
-            logger.info(f"[GET_RESUMEN_VALIDACIONES] Usando db_path de current_app.config: {db_path}")
+            logger.debug("[GET_RESUMEN_VALIDACIONES] Usando db_path de current_app.config: %s", db_path)
         except RuntimeError: # Fuera de contexto de aplicación
             logger.error("[GET_RESUMEN_VALIDACIONES] Error: No se pudo obtener db_path del contexto de la aplicación (RuntimeError).")
-            logger.info("[GET_RESUMEN_VALIDACIONES] Retornando lista vacía por RuntimeError.")
+            logger.debug("[GET_RESUMEN_VALIDACIONES] Retornando lista vacía por RuntimeError.")
             return [] 
         except KeyError: # TIQUETES_DB_PATH no está en config
             logger.error("[GET_RESUMEN_VALIDACIONES] Error: 'TIQUETES_DB_PATH' no está configurada en current_app.config (KeyError).")
-            logger.info("[GET_RESUMEN_VALIDACIONES] Retornando lista vacía por KeyError.")
+            logger.debug("[GET_RESUMEN_VALIDACIONES] Retornando lista vacía por KeyError.")
             return []
         except Exception as e_cfg: # Otra excepción obteniendo config
-            logger.error(f"[GET_RESUMEN_VALIDACIONES] Error inesperado obteniendo db_path de current_app.config: {e_cfg}")
-            logger.info("[GET_RESUMEN_VALIDACIONES] Retornando lista vacía por error de configuración inesperado.")
+            logger.error("[GET_RESUMEN_VALIDACIONES] Error inesperado obteniendo db_path de current_app.config: %s", e_cfg)
+            logger.debug("[GET_RESUMEN_VALIDACIONES] Retornando lista vacía por error de configuración inesperado.")
             return []
     else:
-        logger.info(f"[GET_RESUMEN_VALIDACIONES] Usando db_path proporcionado directamente: {db_path}")
+        logger.debug("[GET_RESUMEN_VALIDACIONES] Usando db_path proporcionado directamente: %s", db_path)
 
     try:
-        logger.info(f"[GET_RESUMEN_VALIDACIONES] Intentando conectar a la base de datos: {db_path}")
-        conn = sqlite3.connect(db_path)
+        logger.debug("[GET_RESUMEN_VALIDACIONES] Intentando conectar a la base de datos: %s", db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        logger.info(f"[GET_RESUMEN_VALIDACIONES] Conexión a DB establecida. Preparando para calcular rango de fechas.")
+        logger.debug("[GET_RESUMEN_VALIDACIONES] Conexión a DB establecida. Preparando para calcular rango de fechas.")
 
         hoy_bogota = datetime.now(BOGOTA_TZ).date()
         fecha_inicio_rango = (hoy_bogota - timedelta(days=rango_dias)).strftime('%Y-%m-%d')
-        logger.info(f"[GET_RESUMEN_VALIDACIONES] Calculando resumen para los últimos {rango_dias} días. Fecha de inicio del rango (YYYY-MM-DD): {fecha_inicio_rango}")
+        logger.debug("[GET_RESUMEN_VALIDACIONES] Calculando resumen para los últimos %s días. Fecha de inicio del rango (YYYY-MM-DD): %s", rango_dias, fecha_inicio_rango)
 
         query = """
             SELECT fecha_aplicable_validacion, exito_webhook, mensaje_webhook, ruta_foto_validacion, timestamp_creacion_utc
@@ -1652,14 +1712,14 @@ def get_resumen_validaciones_diarias(rango_dias=60, db_path=None):
             WHERE fecha_aplicable_validacion >= ? 
             ORDER BY fecha_aplicable_validacion DESC
         """
-        logger.info(f"[GET_RESUMEN_VALIDACIONES] Ejecutando query: {query} con fecha_inicio_rango: {fecha_inicio_rango}")
+        logger.debug("[GET_RESUMEN_VALIDACIONES] Ejecutando query: %s con fecha_inicio_rango: %s", query, fecha_inicio_rango)
         cursor.execute(query, (fecha_inicio_rango,))
         rows = cursor.fetchall()
-        logger.info(f"[GET_RESUMEN_VALIDACIONES] Consulta ejecutada. Número de filas encontradas: {len(rows)}")
+        logger.debug("[GET_RESUMEN_VALIDACIONES] Consulta ejecutada. Número de filas encontradas: %s", len(rows))
 
         resumen_validaciones = []
         if not rows:
-            logger.info("[GET_RESUMEN_VALIDACIONES] No se encontraron filas, retornando lista vacía.")
+            logger.debug("[GET_RESUMEN_VALIDACIONES] No se encontraron filas, retornando lista vacía.")
             return []
 
         for i, row_data in enumerate(rows):
@@ -1678,25 +1738,25 @@ def get_resumen_validaciones_diarias(rango_dias=60, db_path=None):
 
                 resumen_validaciones.append(validacion_dict)
             except Exception as e_row:
-                logger.error(f"[GET_RESUMEN_VALIDACIONES] Error procesando fila {i}: {e_row}. Fila: {row_data}")
+                logger.error("[GET_RESUMEN_VALIDACIONES] Error procesando fila %s: %s. Fila: %s", i, e_row, row_data)
         
-        logger.info(f"[GET_RESUMEN_VALIDACIONES] Procesadas {len(resumen_validaciones)} validaciones. Retornando resumen.")
+        logger.debug("[GET_RESUMEN_VALIDACIONES] Procesadas %s validaciones. Retornando resumen.", len(resumen_validaciones))
         return resumen_validaciones
     
     except sqlite3.Error as e:
-        logger.error(f"[GET_RESUMEN_VALIDACIONES] Error SQLite: {e}")
+        logger.error("[GET_RESUMEN_VALIDACIONES] Error SQLite: %s", e)
         logger.error(traceback.format_exc())
-        logger.info("[GET_RESUMEN_VALIDACIONES] Retornando lista vacía debido a error SQLite.")
+        logger.debug("[GET_RESUMEN_VALIDACIONES] Retornando lista vacía debido a error SQLite.")
         return []
     except Exception as e:
-        logger.error(f"[GET_RESUMEN_VALIDACIONES] Error general en get_resumen_validaciones_diarias: {e}")
+        logger.error("[GET_RESUMEN_VALIDACIONES] Error general en get_resumen_validaciones_diarias: %s", e)
         logger.error(traceback.format_exc())
-        logger.info("[GET_RESUMEN_VALIDACIONES] Retornando lista vacía debido a error general.")
+        logger.debug("[GET_RESUMEN_VALIDACIONES] Retornando lista vacía debido a error general.")
         return []
     finally:
         if conn:
             conn.close()
-            logger.info("[GET_RESUMEN_VALIDACIONES] Conexión DB cerrada.")
-        logger.info("[GET_RESUMEN_VALIDACIONES] === Finalizando ejecución ===")
+            logger.debug("[GET_RESUMEN_VALIDACIONES] Conexión DB cerrada.")
+        logger.debug("[GET_RESUMEN_VALIDACIONES] === Finalizando ejecución ===")
 
 # --- Fin Nueva Función ---
\ No newline at end of file
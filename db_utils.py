@@ -5,6 +5,8 @@ from datetime import datetime, time
 import traceback
 from flask import current_app
 import pytz
+from db_connection import TiquetesConnection
+from db_archive import tabla_historica
 
 # Define timezones
 UTC = pytz.utc
@@ -29,7 +31,7 @@ def store_entry_record(record_data):
     try:
         # Get DB path from app config
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         cursor = conn.cursor()
         
         codigo_guia = record_data.get('codigo_guia')
@@ -48,16 +50,16 @@ def store_entry_record(record_data):
         existing_records = cursor.fetchall()
         
         if existing_records:
-            logger.warning(f"Se encontraron {len(existing_records)} registros recientes para el proveedor {codigo_proveedor}")
+            logger.warning("Se encontraron %s registros recientes para el proveedor %s", len(existing_records), codigo_proveedor)
             for record in existing_records:
-                logger.info(f"Registro existente: codigo_guia={record[0]}, nombre={record[1]}, fecha={record[2]}")
+                logger.info("Registro existente: codigo_guia=%s, nombre=%s, fecha=%s", record[0], record[1], record[2])
                 
             # Si el registro exacto ya existe, agregamos identificador de versión
             if any(record[0] == codigo_guia for record in existing_records):
-                logger.warning(f"Guía duplicada detectada: {codigo_guia}. Agregando versión.")
+                logger.warning("Guía duplicada detectada: %s. Agregando versión.", codigo_guia)
                 record_data['codigo_guia'] = f"{codigo_guia}_v{len(existing_records)}"
                 codigo_guia = record_data['codigo_guia']
-                logger.info(f"Nuevo código de guía generado: {codigo_guia}")
+                logger.info("Nuevo código de guía generado: %s", codigo_guia)
         
         # Check if record already exists with exactly the same codigo_guia
         cursor.execute("SELECT id FROM entry_records WHERE codigo_guia = ?", 
@@ -90,12 +92,12 @@ def store_entry_record(record_data):
             
             update_query = f"UPDATE entry_records SET {', '.join(update_cols)} WHERE codigo_guia = ?"
             cursor.execute(update_query, params)
-            logger.info(f"Updated existing record for guide: {codigo_guia}")
+            logger.info("Updated existing record for guide: %s", codigo_guia)
             
             # Log de campos filtrados para debug
             filtered_out = set(record_data.keys()) - valid_columns
             if filtered_out:
-                logger.info(f"Campos filtrados en UPDATE (no existen en entry_records): {filtered_out}")
+                logger.info("Campos filtrados en UPDATE (no existen en entry_records): %s", filtered_out)
         else:
             # Insert new record - Filtrar solo columnas válidas de entry_records
             valid_columns = {
@@ -115,12 +117,12 @@ def store_entry_record(record_data):
             
             insert_query = f"INSERT INTO entry_records ({columns}) VALUES ({placeholders})"
             cursor.execute(insert_query, values)
-            logger.info(f"Inserted new record for guide: {codigo_guia}")
+            logger.info("Inserted new record for guide: %s", codigo_guia)
             
             # Log de campos filtrados para debug
             filtered_out = set(record_data.keys()) - valid_columns
             if filtered_out:
-                logger.info(f"Campos filtrados (no existen en entry_records): {filtered_out}")
+                logger.info("Campos filtrados (no existen en entry_records): %s", filtered_out)
         
         conn.commit()
         return True
@@ -128,7 +130,7 @@ def store_entry_record(record_data):
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return False
     except sqlite3.Error as e:
-        logger.error(f"Error storing entry record: {e}")
+        logger.error("Error storing entry record: %s", e)
         return False
     finally:
         if conn:
@@ -148,17 +150,16 @@ def get_entry_records(filters=None):
     try:
         # Get DB path from app config
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row  # This enables column access by name
         cursor = conn.cursor()
         
-        query = "SELECT * FROM entry_records"
+        conditions = []
         params = []
+        desde_utc = None
         
         # Apply filters if provided
         if filters:
-            conditions = []
-            
             # Use timestamp_registro_utc for date filtering
             if filters.get('fecha_desde'):
                 try:
@@ -175,9 +176,10 @@ def get_entry_records(filters=None):
                     
                     conditions.append("timestamp_registro_utc >= ?")
                     params.append(utc_timestamp_desde)
-                    logger.info(f"Filtro fecha_desde (Bogotá: {fecha_desde_str} 00:00:00) convertido a UTC: {utc_timestamp_desde}")
+                    desde_utc = utc_timestamp_desde
+                    logger.info("Filtro fecha_desde (Bogotá: %s 00:00:00) convertido a UTC: %s", fecha_desde_str, utc_timestamp_desde)
                 except (ValueError, TypeError) as e:
-                     logger.warning(f"Error procesando fecha_desde '{filters['fecha_desde']}': {e}. Saltando filtro de fecha.")
+                     logger.warning("Error procesando fecha_desde '%s': %s. Saltando filtro de fecha.", filters['fecha_desde'], e)
                 
             if filters.get('fecha_hasta'):
                 try:
@@ -194,9 +196,9 @@ def get_entry_records(filters=None):
                     
                     conditions.append("timestamp_registro_utc <= ?")
                     params.append(utc_timestamp_hasta)
-                    logger.info(f"Filtro fecha_hasta (Bogotá: {fecha_hasta_str} 23:59:59) convertido a UTC: {utc_timestamp_hasta}")
+                    logger.info("Filtro fecha_hasta (Bogotá: %s 23:59:59) convertido a UTC: %s", fecha_hasta_str, utc_timestamp_hasta)
                 except (ValueError, TypeError) as e:
-                     logger.warning(f"Error procesando fecha_hasta '{filters['fecha_hasta']}': {e}. Saltando filtro de fecha.")
+                     logger.warning("Error procesando fecha_hasta '%s': %s. Saltando filtro de fecha.", filters['fecha_hasta'], e)
                 
             if filters.get('codigo_proveedor'):
                 conditions.append("codigo_proveedor LIKE ?")
@@ -213,9 +215,12 @@ def get_entry_records(filters=None):
             if filters.get('codigo_guia'):
                 conditions.append("codigo_guia LIKE ?")
                 params.append(f"%{filters['codigo_guia']}%")
-            
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
+        
+        # Historical date ranges also read the yearly archive files
+        tabla = tabla_historica(conn, 'entry_records', desde_utc)
+        query = f"SELECT * FROM {tabla}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
         
         # Execute the query without ordering to fetch all records
         cursor.execute(query, params)
@@ -258,7 +263,7 @@ def get_entry_records(filters=None):
                     record['fecha_registro'] = 'N/A'
                     record['hora_registro'] = 'N/A'
             except (ValueError, TypeError) as e:
-                logger.warning(f"Error convirtiendo timestamp '{record.get('timestamp_registro_utc')}' a hora local: {e}")
+                logger.warning("Error convirtiendo timestamp '%s' a hora local: %s", record.get('timestamp_registro_utc'), e)
                 record['fecha_registro'] = 'Error Fmt'
                 record['hora_registro'] = 'Error Fmt'
                 
@@ -301,7 +306,7 @@ def get_entry_records(filters=None):
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return []
     except sqlite3.Error as e:
-        logger.error(f"Error retrieving entry records: {e}")
+        logger.error("Error retrieving entry records: %s", e)
         return []
     finally:
         if conn:
@@ -315,12 +320,13 @@ def get_entry_record_by_guide_code(codigo_guia):
     try:
         # Get DB path from app config
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row  # Enable column access by name
         cursor = conn.cursor()
         
         # Select all columns for the given codigo_guia
-        cursor.execute("SELECT * FROM entry_records WHERE codigo_guia = ?", (codigo_guia,))
+        tabla = tabla_historica(conn, 'entry_records', codigos_guia=[codigo_guia])
+        cursor.execute(f"SELECT * FROM {tabla} WHERE codigo_guia = ?", (codigo_guia,))
         row = cursor.fetchone()
         
         if row:
@@ -376,13 +382,13 @@ def get_entry_record_by_guide_code(codigo_guia):
             
             return record
         else:
-            logger.warning(f"No entry record found for guide code: {codigo_guia}")
+            logger.warning("No entry record found for guide code: %s", codigo_guia)
             return None
     except KeyError:
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return None
     except sqlite3.Error as e:
-        logger.error(f"Error retrieving entry record {codigo_guia}: {e}")
+        logger.error("Error retrieving entry record %s: %s", codigo_guia, e)
         return None
     finally:
         if conn:
@@ -402,7 +408,7 @@ def get_latest_entry_by_provider_code(codigo_proveedor):
     try:
         # Get DB path from app config
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -416,16 +422,16 @@ def get_latest_entry_by_provider_code(codigo_proveedor):
         if row:
             # Convertir el objeto Row a diccionario
             registro = dict(row)
-            logger.info(f"Encontrado registro más reciente para proveedor {codigo_proveedor}: {registro.get('codigo_guia')}")
+            logger.info("Encontrado registro más reciente para proveedor %s: %s", codigo_proveedor, registro.get('codigo_guia'))
             return registro
         else:
-            logger.warning(f"No se encontraron registros para el proveedor {codigo_proveedor}")
+            logger.warning("No se encontraron registros para el proveedor %s", codigo_proveedor)
             return None
     except KeyError:
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return None
     except sqlite3.Error as e:
-        logger.error(f"Error al buscar registro por código de proveedor: {e}")
+        logger.error("Error al buscar registro por código de proveedor: %s", e)
         return None
     finally:
         if conn:
@@ -453,13 +459,13 @@ def update_pesaje_bruto(codigo_guia, datos_pesaje):
         result = db_operations.store_pesaje_bruto(datos_pesaje)
         
         if result:
-            logger.info(f"Pesaje bruto actualizado para guía: {codigo_guia}")
+            logger.info("Pesaje bruto actualizado para guía: %s", codigo_guia)
             return True
         else:
-            logger.error(f"Error al actualizar pesaje bruto para guía: {codigo_guia}")
+            logger.error("Error al actualizar pesaje bruto para guía: %s", codigo_guia)
             return False
     except Exception as e:
-        logger.error(f"Error en update_pesaje_bruto: {e}")
+        logger.error("Error en update_pesaje_bruto: %s", e)
         logger.error(traceback.format_exc())
         return False
 
@@ -481,16 +487,16 @@ def get_pesaje_bruto_by_codigo_guia(codigo_guia):
         pesaje = db_operations.get_pesaje_bruto_by_codigo_guia(codigo_guia)
         
         if pesaje:
-            logger.info(f"Pesaje bruto encontrado para guía: {codigo_guia}")
+            logger.info("Pesaje bruto encontrado para guía: %s", codigo_guia)
             return pesaje
         else:
-            logger.warning(f"No se encontró pesaje bruto para guía: {codigo_guia}")
+            logger.warning("No se encontró pesaje bruto para guía: %s", codigo_guia)
             
             # Si no se encuentra en la base de datos, buscar en registros de entrada
             # y complementar con datos básicos
             entry_record = get_entry_record_by_guide_code(codigo_guia)
             if entry_record:
-                logger.info(f"Se encontró registro de entrada para la guía: {codigo_guia}")
+                logger.info("Se encontró registro de entrada para la guía: %s", codigo_guia)
                 # Convertir a un formato compatible con pesaje bruto
                 datos_basicos = {
                     'codigo_guia': codigo_guia,
@@ -507,7 +513,7 @@ def get_pesaje_bruto_by_codigo_guia(codigo_guia):
                 return datos_basicos
             return None
     except Exception as e:
-        logger.error(f"Error en get_pesaje_bruto_by_codigo_guia: {e}")
+        logger.error("Error en get_pesaje_bruto_by_codigo_guia: %s", e)
         return None
 
 def get_entry_records_by_provider_code(codigo_proveedor):
@@ -525,14 +531,14 @@ def get_entry_records_by_provider_code(codigo_proveedor):
     try:
         # Get DB path from app config
         db_path = current_app.config['TIQUETES_DB_PATH']
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=TiquetesConnection)
         conn.row_factory = sqlite3.Row
         c = conn.cursor()
         
         # Verificar si existe la tabla
         c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='entry_records'")
         if not c.fetchone():
-            logger.warning(f"No existe la tabla entry_records para buscar registros del proveedor {codigo_proveedor}")
+            logger.warning("No existe la tabla entry_records para buscar registros del proveedor %s", codigo_proveedor)
             return []
         
         # Consultar registros - Sólo buscar por codigo_proveedor (el campo codigo no existe)
@@ -550,13 +556,13 @@ def get_entry_records_by_provider_code(codigo_proveedor):
             records.append(record)
         
         conn.close()
-        logger.info(f"Encontrados {len(records)} registros para el proveedor {codigo_proveedor}")
+        logger.info("Encontrados %s registros para el proveedor %s", len(records), codigo_proveedor)
         return records
     except KeyError:
         logger.error("Error: 'TIQUETES_DB_PATH' no está configurada en la aplicación Flask.")
         return []
     except Exception as e:
-        logger.error(f"Error al obtener registros para el proveedor {codigo_proveedor}: {str(e)}")
+        logger.error("Error al obtener registros para el proveedor %s: %s", codigo_proveedor, str(e))
         logger.error(traceback.format_exc())
         return []
     finally:
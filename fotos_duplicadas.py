@@ -0,0 +1,314 @@
+"""
+Detección de fotos repetidas o casi iguales entre cargas (hash perceptual).
+
+Los operadores a veces vuelven a subir la misma foto, o una casi igual
+(recomprimida, redimensionada, reenviada por WhatsApp), para las fotos de
+clasificación, la foto de soporte de la validación de pesaje neto y las
+placas de enturnamiento. Aquí se guarda de cada foto cargada:
+
+- el SHA-256 del archivo (copia exacta), y
+- un dHash de 64 bits (la imagen en gris a 9x8 y, por fila, si cada píxel es
+  más claro que el siguiente), que cambia pocos bits con recompresión o
+  cambio de tamaño.
+
+Dos fotos son "casi iguales" si la distancia de Hamming entre sus dHash es
+como máximo ``umbral``. Para no comparar contra toda la tabla, el hash se
+parte en 8 bandas de 8 bits con un índice cada una: por el principio del
+palomar, dos hashes a distancia 7 o menos comparten al menos una banda, así
+que basta buscar las filas con alguna banda igual y medir solo esas.
+
+Uso desde quien recibe la foto:
+
+- ``registrar(ruta, ambito, referencia)`` al guardarla; devuelve la foto
+  anterior más parecida del mismo ámbito (``Coincidencia``) o None. Sirve
+  para marcar la carga o, si es copia exacta, reutilizar el archivo anterior.
+- ``guardar_analisis(ruta, ambito, version, resultado)`` después de pagar
+  el análisis (Roboflow, visión) y ``analisis_reutilizable(ambito,
+  coincidencia, version)`` antes de pagarlo otra vez. Solo reutiliza en los
+  ámbitos de ``FOTOS_HUELLAS_REUSO`` y con distancia hasta
+  ``FOTOS_HUELLAS_UMBRAL_REUSO``: en placas, fotos de camiones distintos en
+  la misma portería pueden tener dHash muy cercanos, así que por defecto
+  solo se marcan.
+
+Se guarda en SQLite (WAL, una conexión por hilo y proceso). Cualquier error
+se registra y se trata como "sin coincidencia"; nunca interrumpe la carga.
+
+Configuración (variables de entorno):
+    FOTOS_HUELLAS_ENABLED        true/false (default true)
+    FOTOS_HUELLAS_PATH           default instance/fotos_huellas.db
+    FOTOS_HUELLAS_UMBRAL         distancia máxima para "casi igual", 0-7 (default 6)
+    FOTOS_HUELLAS_REUSO          ámbitos que reutilizan análisis (default clasificacion)
+    FOTOS_HUELLAS_UMBRAL_REUSO   distancia máxima para reutilizar (default 2)
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+from PIL import Image, ImageOps
+
+from ocr_cache import hash_file
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'fotos_huellas.db')
+
+BANDAS = 8
+# Con 8 bandas, el palomar garantiza encontrar toda foto a distancia <= 7
+UMBRAL_MAXIMO = BANDAS - 1
+
+_MASCARA_64 = (1 << 64) - 1
+_COLUMNAS_BANDAS = [f'b{i}' for i in range(BANDAS)]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fotos_huellas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ambito TEXT NOT NULL,
+    ruta TEXT NOT NULL,
+    referencia TEXT,
+    sha256 TEXT NOT NULL,
+    dhash INTEGER NOT NULL,
+    b0 INTEGER NOT NULL, b1 INTEGER NOT NULL, b2 INTEGER NOT NULL, b3 INTEGER NOT NULL,
+    b4 INTEGER NOT NULL, b5 INTEGER NOT NULL, b6 INTEGER NOT NULL, b7 INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    creado REAL NOT NULL,
+    duplicado_de INTEGER,
+    distancia INTEGER,
+    exacta INTEGER NOT NULL DEFAULT 0,
+    analisis_version TEXT,
+    analisis TEXT,
+    reusos INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (ambito, ruta)
+);
+CREATE INDEX IF NOT EXISTS ix_fotos_huellas_sha ON fotos_huellas (ambito, sha256);
+""" + ''.join(f"CREATE INDEX IF NOT EXISTS ix_fotos_huellas_{b} ON fotos_huellas (ambito, {b});\n"
+              for b in _COLUMNAS_BANDAS)
+
+
+def dhash(imagen) -> int:
+    """dHash de 64 bits de una ruta, archivo o ``PIL.Image`` (respeta la orientación EXIF)."""
+    if not isinstance(imagen, Image.Image):
+        with Image.open(imagen) as abierta:
+            # JPEG: decodificar ya reducida (escala 1/2..1/8), basta para 9x8
+            abierta.draft('L', (72, 64))
+            return dhash(ImageOps.exif_transpose(abierta))
+    gris = imagen.convert('L').resize((9, 8), Image.Resampling.LANCZOS)
+    # Modo L: un byte por píxel (getdata está obsoleto desde Pillow 12)
+    pixeles = gris.tobytes()
+    valor = 0
+    for fila in range(8):
+        for columna in range(8):
+            izquierda = pixeles[fila * 9 + columna]
+            valor = (valor << 1) | (izquierda > pixeles[fila * 9 + columna + 1])
+    return valor
+
+
+def distancia(a: int, b: int) -> int:
+    """Distancia de Hamming entre dos hashes de 64 bits."""
+    return ((a ^ b) & _MASCARA_64).bit_count()
+
+
+def _bandas(valor: int):
+    return [(valor >> (8 * i)) & 0xFF for i in range(BANDAS)]
+
+
+def _con_signo(valor: int) -> int:
+    """SQLite guarda enteros de 64 bits con signo."""
+    return valor - (1 << 64) if valor >= 1 << 63 else valor
+
+
+@dataclass(frozen=True)
+class Coincidencia:
+    """Foto anterior igual o casi igual a la consultada."""
+    id: int
+    ruta: str
+    referencia: Optional[str]
+    distancia: int
+    exacta: bool
+    creado: float
+    analisis_version: Optional[str] = None
+    analisis: Optional[Dict[str, Any]] = None
+
+    def como_dict(self) -> Dict[str, Any]:
+        """Resumen para marcar un resultado (sin el análisis)."""
+        return {'ruta': self.ruta, 'referencia': self.referencia, 'distancia': self.distancia,
+                'exacta': self.exacta, 'creado': self.creado}
+
+
+class IndiceHuellas:
+    """Índice SQLite de huellas (SHA-256 y dHash) de las fotos cargadas."""
+
+    def __init__(self, path: str, umbral: int = 6, reuso: Iterable[str] = ('clasificacion',),
+                 umbral_reuso: int = 2, enabled: bool = True):
+        if not 0 <= umbral <= UMBRAL_MAXIMO:
+            logger.warning(f"Umbral de fotos casi iguales {umbral} fuera de 0-{UMBRAL_MAXIMO}; se ajusta")
+            umbral = max(0, min(umbral, UMBRAL_MAXIMO))
+        self.path = path
+        self.umbral = umbral
+        self.reuso = frozenset(reuso)
+        self.umbral_reuso = min(umbral_reuso, umbral)
+        self.enabled = enabled
+        self._local = threading.local()
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        with self._lock:
+            if not self._schema_ready:
+                conn.executescript(_SCHEMA)
+                self._schema_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _buscar(self, conn: sqlite3.Connection, ambito: str, ruta: str, sha256: str,
+                valor: int) -> Optional[Coincidencia]:
+        """Foto más parecida del ámbito (otra ruta): primero copia exacta, luego por bandas."""
+        columnas = 'id, ruta, referencia, creado, analisis_version, analisis, dhash'
+        filas = conn.execute(
+            f'SELECT {columnas} FROM fotos_huellas WHERE ambito = ? AND sha256 = ? AND ruta != ?',
+            (ambito, sha256, ruta)
+        ).fetchall()
+        exacta = bool(filas)
+        if not exacta:
+            condicion = ' OR '.join(f'{b} = ?' for b in _COLUMNAS_BANDAS)
+            filas = conn.execute(
+                f'SELECT {columnas} FROM fotos_huellas WHERE ambito = ? AND ruta != ? AND ({condicion})',
+                (ambito, ruta, *_bandas(valor))
+            ).fetchall()
+        mejor = None
+        for id_, ruta_previa, referencia, creado, version, analisis, dhash_previo in filas:
+            d = distancia(valor, dhash_previo)
+            # Entre igual de cercanas, la que ya tiene análisis y luego la más antigua
+            orden = (d, analisis is None, id_)
+            if d <= self.umbral and (mejor is None or orden < mejor[0]):
+                mejor = (orden, Coincidencia(id_, ruta_previa, referencia, d, exacta, creado, version,
+                                             json.loads(analisis) if analisis else None))
+        return mejor[1] if mejor else None
+
+    def registrar(self, ruta: str, ambito: str, referencia: str = None,
+                  archivo: str = None) -> Optional[Coincidencia]:
+        """
+        Guarda la huella de una foto recién cargada.
+
+        Args:
+            ruta: Ruta con que se identifica la foto (la que se guarda en la base de datos)
+            ambito: clasificacion, pesaje_neto, placa, ...
+            referencia: Código de guía, fecha o usuario de la carga
+            archivo: Ruta en disco si es distinta de ``ruta`` (p. ej. relativa a static)
+
+        Returns:
+            Coincidencia: La foto anterior más parecida del mismo ámbito, o None.
+        """
+        if not self.enabled:
+            return None
+        try:
+            archivo = archivo or ruta
+            sha256 = hash_file(archivo)
+            valor = dhash(archivo)
+            conn = self._conn()
+            existente = conn.execute('SELECT sha256 FROM fotos_huellas WHERE ambito = ? AND ruta = ?',
+                                     (ambito, ruta)).fetchone()
+            coincidencia = self._buscar(conn, ambito, ruta, sha256, valor)
+            if existente is None or existente[0] != sha256:
+                # Ruta nueva, o reemplazada por otro contenido: el análisis anterior ya no aplica
+                conn.execute(
+                    'INSERT OR REPLACE INTO fotos_huellas (ambito, ruta, referencia, sha256, dhash, '
+                    f'{", ".join(_COLUMNAS_BANDAS)}, bytes, creado, duplicado_de, distancia, exacta) '
+                    f'VALUES (?, ?, ?, ?, ?, {", ".join("?" * BANDAS)}, ?, ?, ?, ?, ?)',
+                    (ambito, ruta, referencia, sha256, _con_signo(valor), *_bandas(valor),
+                     os.path.getsize(archivo), time.time(),
+                     coincidencia.id if coincidencia else None, coincidencia.distancia if coincidencia else None,
+                     int(bool(coincidencia and coincidencia.exacta))),
+                )
+        except (OSError, sqlite3.Error, ValueError) as e:
+            logger.warning(f"No se pudo registrar la huella de {ruta}: {e}")
+            return None
+        if coincidencia:
+            tipo = 'idéntica' if coincidencia.exacta else f'casi igual (distancia {coincidencia.distancia})'
+            logger.info(f"Foto de {ambito} {ruta} {tipo} a {coincidencia.ruta} ({coincidencia.referencia})")
+        return coincidencia
+
+    def guardar_analisis(self, ruta: str, ambito: str, version: str, resultado: Dict[str, Any]) -> None:
+        """Guarda el análisis de una foto registrada para reutilizarlo con sus casi iguales."""
+        if not self.enabled or not resultado:
+            return
+        try:
+            self._conn().execute(
+                'UPDATE fotos_huellas SET analisis_version = ?, analisis = ? WHERE ambito = ? AND ruta = ?',
+                (version, json.dumps(resultado, ensure_ascii=False, default=str), ambito, ruta),
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo guardar el análisis de {ruta}: {e}")
+
+    def analisis_reutilizable(self, ambito: str, coincidencia: Optional[Coincidencia],
+                              version: str) -> Optional[Dict[str, Any]]:
+        """
+        Copia del análisis de ``coincidencia`` si se puede reutilizar: ámbito en
+        ``reuso``, misma versión de análisis y distancia hasta ``umbral_reuso``.
+        """
+        if (not coincidencia or coincidencia.analisis is None or ambito not in self.reuso
+                or coincidencia.analisis_version != version or coincidencia.distancia > self.umbral_reuso):
+            return None
+        try:
+            self._conn().execute('UPDATE fotos_huellas SET reusos = reusos + 1 WHERE id = ?', (coincidencia.id,))
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo contar el reuso del análisis de {coincidencia.ruta}: {e}")
+        return json.loads(json.dumps(coincidencia.analisis))
+
+    def resumen(self, horas: float = 24, limite: int = 50) -> Dict[str, Any]:
+        """Por ámbito: fotos, duplicadas (exactas y casi iguales) y reusos; más las últimas duplicadas."""
+        desde = time.time() - horas * 3600
+        conn = self._conn()
+        ambitos = {}
+        for ambito, fotos, exactas, casi, reusos in conn.execute(
+                'SELECT ambito, COUNT(*), SUM(exacta), SUM(duplicado_de IS NOT NULL AND NOT exacta), '
+                '(SELECT COALESCE(SUM(reusos), 0) FROM fotos_huellas r WHERE r.ambito = f.ambito) '
+                'FROM fotos_huellas f WHERE creado >= ? GROUP BY ambito ORDER BY ambito', (desde,)):
+            ambitos[ambito] = {'fotos': fotos, 'duplicadas_exactas': exactas or 0,
+                               'casi_iguales': casi or 0, 'reusos_analisis': reusos,
+                               'tasa_duplicadas': round(((exactas or 0) + (casi or 0)) / fotos, 3)}
+        recientes = [
+            {'ambito': ambito, 'ruta': ruta, 'referencia': referencia, 'creado': creado, 'distancia': d,
+             'duplicado_de': previa, 'referencia_previa': referencia_previa}
+            for ambito, ruta, referencia, creado, d, previa, referencia_previa in conn.execute(
+                'SELECT f.ambito, f.ruta, f.referencia, f.creado, f.distancia, p.ruta, p.referencia '
+                'FROM fotos_huellas f LEFT JOIN fotos_huellas p ON p.id = f.duplicado_de '
+                'WHERE f.creado >= ? AND f.duplicado_de IS NOT NULL ORDER BY f.creado DESC LIMIT ?',
+                (desde, limite))
+        ]
+        return {'horas': horas, 'umbral': self.umbral, 'umbral_reuso': self.umbral_reuso,
+                'reuso': sorted(self.reuso), 'ambitos': ambitos, 'recientes': recientes}
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def get_indice_huellas() -> IndiceHuellas:
+    """Índice compartido del proceso, configurado por variables de entorno."""
+    global _indice
+    if _indice is None:
+        with _indice_lock:
+            if _indice is None:
+                _indice = IndiceHuellas(
+                    path=os.getenv('FOTOS_HUELLAS_PATH') or _DEFAULT_PATH,
+                    umbral=int(os.getenv('FOTOS_HUELLAS_UMBRAL', '6')),
+                    reuso=[a.strip() for a in os.getenv('FOTOS_HUELLAS_REUSO', 'clasificacion').split(',')
+                           if a.strip()],
+                    umbral_reuso=int(os.getenv('FOTOS_HUELLAS_UMBRAL_REUSO', '2')),
+                    enabled=os.getenv('FOTOS_HUELLAS_ENABLED', 'true').lower() == 'true',
+                )
+    return _indice
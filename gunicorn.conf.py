@@ -0,0 +1,95 @@
+"""
+Oleoflores Smart Flow - Configuración de gunicorn
+
+Usage:
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Con GUNICORN_PRELOAD=true (default) la aplicación se construye una vez en el
+maestro, se calientan los recursos compartidos y los workers se crean con
+fork() compartiendo memoria copy-on-write (ver app/utils/preload.py).
+Con GUNICORN_PRELOAD=false cada worker construye su propia aplicación.
+
+Las métricas de /metrics se agregan entre workers a través de
+METRICS_MULTIPROC_DIR (default logs/metrics, se vacía al arrancar).
+"""
+
+import gc
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', '3'))
+threads = int(os.environ.get('GUNICORN_THREADS', '2'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+if preload_app:
+    # Evitar "huecos" en las páginas del maestro mientras se carga la app;
+    # el GC se reactiva en el maestro al final de when_ready (con lo cargado
+    # ya congelado), en cada worker (post_fork) y en los motores OCR.
+    gc.disable()
+    # Un único escritor de logs en el maestro para todos los workers
+    os.environ.setdefault('LOG_QUEUE_MODE', 'process')
+
+# Cada worker vuelca sus métricas aquí y /metrics suma todos los archivos
+os.environ.setdefault(
+    'METRICS_MULTIPROC_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'metrics')
+)
+
+
+def _flask_app(server):
+    """Obtener la instancia Flask cargada por gunicorn (wsgi:application)."""
+    return server.app.wsgi()
+
+
+def on_starting(server):
+    # Descartar volcados de una ejecución anterior (pids ya inexistentes)
+    metrics_dir = os.environ['METRICS_MULTIPROC_DIR']
+    os.makedirs(metrics_dir, exist_ok=True)
+    for nombre in os.listdir(metrics_dir):
+        if nombre.startswith('worker_') and nombre.endswith('.json'):
+            os.remove(os.path.join(metrics_dir, nombre))
+
+
+def when_ready(server):
+    if preload_app:
+        from app.utils.preload import warm_shared_state
+        resumen = warm_shared_state(_flask_app(server))
+        server.log.info(
+            "Precarga lista: %s plantillas, módulos %s", resumen['templates'], resumen['modules']
+        )
+
+    # Procesos de motores OCR (OCR_ENGINE_PROCESSES > 0), compartidos por todos los workers
+    import ocr_engines
+    procesos = ocr_engines.iniciar_procesos()
+    if procesos:
+        server.log.info("Motores OCR: %s procesos en %s", procesos, ocr_engines.SOCKET_PATH)
+
+    if preload_app:
+        # El maestro sigue vivo (vigilancia de motores, cola de logs): congelar lo
+        # precargado y reactivar el GC para que su memoria no crezca sin límite
+        from app.utils.preload import freeze_before_fork
+        freeze_before_fork()
+        gc.enable()
+
+
+def on_exit(server):
+    import ocr_engines
+    ocr_engines.detener_procesos()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        from app.utils.preload import freeze_before_fork
+        freeze_before_fork()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app.utils.preload import reset_after_fork
+        reset_after_fork(_flask_app(server))
+
+    # Hilos de la cola OCR desde que arranca el worker: los trabajos pendientes o
+    # huérfanos de un worker anterior no esperan a que alguien use /ocr/jobs
+    import ocr_jobs
+    ocr_jobs.iniciar_pool(_flask_app(server))
@@ -0,0 +1,207 @@
+"""
+Cliente HTTP compartido para las integraciones salientes.
+
+Los webhooks OCR usaban ``requests.post`` suelto y cada servicio OCR creaba su
+propio cliente de OpenAI, así que cada llamada abría conexión y hacía el
+handshake TLS de nuevo. Este módulo ofrece, por proceso:
+
+- ``get_session()``: una ``requests.Session`` con pool de conexiones y
+  keep-alive (``HTTP_POOL_MAXSIZE`` conexiones por host).
+- ``request()``: petición sobre esa sesión con reintentos con backoff
+  exponencial y jitter completo (errores de conexión, timeouts y 429/502/503/
+  504, respetando ``Retry-After``), límite de peticiones simultáneas por host
+  y tiempo límite absoluto opcional (``deadline`` en ``time.monotonic()``, ver
+  ``ocr_hedging``). Los POST solo se reintentan con ``reintentar=True``.
+- ``get_openai_client()``: un cliente de OpenAI por API key sobre un pool
+  ``httpx`` compartido.
+
+Las sesiones se crean por pid: un worker de gunicorn nunca reutiliza sockets
+abiertos por el maestro antes del fork (``app/utils/preload.py``).
+
+Configuración (variables de entorno):
+    HTTP_POOL_MAXSIZE          conexiones keep-alive por host (default 10)
+    HTTP_MAX_PER_HOST          peticiones simultáneas por host (default 8)
+    HTTP_RETRIES               reintentos (default 2)
+    HTTP_BACKOFF_SECONDS       base del backoff (default 0.5)
+    HTTP_BACKOFF_MAX_SECONDS   tope de cada espera (default 8)
+    VERIFY_SSL                 true/false (default true)
+
+Con ``OCR_RECORD_DIR`` se graban las llamadas y con ``OCR_REPLAY_URL`` se
+dirigen a un servidor de reproducción local (ver ocr_replay).
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import ocr_replay
+
+logger = logging.getLogger(__name__)
+
+POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))
+MAX_PER_HOST = int(os.getenv('HTTP_MAX_PER_HOST', '8'))
+RETRIES = int(os.getenv('HTTP_RETRIES', '2'))
+BACKOFF_SECONDS = float(os.getenv('HTTP_BACKOFF_SECONDS', '0.5'))
+BACKOFF_MAX_SECONDS = float(os.getenv('HTTP_BACKOFF_MAX_SECONDS', '8'))
+VERIFY_SSL = os.getenv('VERIFY_SSL', 'true').lower() == 'true'
+
+STATUS_REINTENTABLES = frozenset((429, 502, 503, 504))
+METODOS_IDEMPOTENTES = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'))
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+_openai_clients = {}
+
+
+class HostBusyError(requests.exceptions.RequestException):
+    """No se liberó un cupo de concurrencia para el host antes del tiempo límite."""
+
+
+def get_session() -> requests.Session:
+    """Sesión HTTP del proceso con pool de conexiones y keep-alive."""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _lock:
+            if _session is None or _session_pid != os.getpid():
+                session = requests.Session()
+                # Sin reintentos en el adaptador: los hace request() con jitter y deadline
+                adapter = HTTPAdapter(pool_connections=10, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.verify = VERIFY_SSL
+                session.headers['User-Agent'] = 'OleofloresSmartFlow/1.0'
+                _session, _session_pid = session, os.getpid()
+                _host_slots.clear()
+                _openai_clients.clear()
+    return _session
+
+
+def _slot(host: str) -> threading.BoundedSemaphore:
+    slot = _host_slots.get(host)
+    if slot is None:
+        with _lock:
+            slot = _host_slots.setdefault(host, threading.BoundedSemaphore(MAX_PER_HOST))
+    return slot
+
+
+def _restante(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _espera_reintento(intento: int, response: Optional[requests.Response]) -> float:
+    """Backoff exponencial con jitter completo; ``Retry-After`` manda si viene."""
+    if response is not None:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_SECONDS * 2 ** intento))
+
+
+def request(method: str, url: str, *, timeout: float = 30, deadline: Optional[float] = None,
+            reintentar: Optional[bool] = None, reintentos: int = None, **kwargs) -> requests.Response:
+    """
+    Petición HTTP con pool, reintentos con jitter y límite de concurrencia por host.
+
+    Args:
+        timeout: Timeout por intento (conexión y lectura), acotado por ``deadline``.
+        deadline: Instante absoluto (``time.monotonic()``) tras el cual no se reintenta.
+        reintentar: Reintentar aunque el método no sea idempotente (default: solo idempotentes).
+        reintentos: Reintentos máximos (default ``HTTP_RETRIES``).
+
+    Los cuerpos ``files`` deben ser bytes (no archivos abiertos) si se reintenta.
+
+    Returns:
+        La última respuesta (también si es un 5xx tras agotar los reintentos).
+
+    Raises:
+        requests.RequestException: Error de red en el último intento, o
+        ``HostBusyError`` si el host no tiene cupo antes del tiempo límite.
+    """
+    method = method.upper()
+    if reintentar is None:
+        reintentar = method in METODOS_IDEMPOTENTES
+    max_intentos = 1 + ((RETRIES if reintentos is None else reintentos) if reintentar else 0)
+    url = ocr_replay.redirigir(url)
+    host = urlsplit(url).netloc
+    session = get_session()
+
+    for intento in range(max_intentos):
+        restante = _restante(deadline)
+        if restante is not None and restante <= 0:
+            raise requests.exceptions.Timeout(f'Tiempo límite agotado antes de llamar a {host}')
+        timeout_intento = timeout if restante is None else min(timeout, restante)
+
+        slot = _slot(host)
+        if not slot.acquire(timeout=timeout_intento):
+            raise HostBusyError(f'Sin cupo para {host} ({MAX_PER_HOST} peticiones en curso)')
+        response, error = None, None
+        try:
+            response = session.request(method, url, timeout=timeout_intento, **kwargs)
+            ocr_replay.grabar_requests(response)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            error = e
+        finally:
+            slot.release()
+
+        ultimo = intento == max_intentos - 1
+        if error is None and (response.status_code not in STATUS_REINTENTABLES or ultimo):
+            return response
+        if ultimo:
+            raise error
+
+        espera = _espera_reintento(intento, response)
+        restante = _restante(deadline)
+        if restante is not None and espera >= restante:
+            if error is not None:
+                raise error
+            return response
+        logger.info(f"Reintentando {method} {host} en {espera:.2f}s "
+                    f"({error or f'HTTP {response.status_code}'}; intento {intento + 2}/{max_intentos})")
+        if response is not None:
+            response.close()
+        time.sleep(espera)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request('GET', url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request('POST', url, **kwargs)
+
+
+def get_openai_client(api_key: str):
+    """
+    Cliente de OpenAI compartido por API key, con pool ``httpx`` y keep-alive.
+
+    El SDK de OpenAI ya reintenta con backoff y jitter; se limita a ``HTTP_RETRIES``.
+    """
+    get_session()  # reinicia los clientes tras un fork
+    client = _openai_clients.get(api_key)
+    if client is None:
+        with _lock:
+            client = _openai_clients.get(api_key)
+            if client is None:
+                import httpx
+                import openai
+                transporte = httpx.HTTPTransport(
+                    limits=httpx.Limits(max_connections=MAX_PER_HOST, max_keepalive_connections=POOL_MAXSIZE,
+                                        keepalive_expiry=60),
+                    verify=VERIFY_SSL,
+                )
+                if ocr_replay.RECORD_DIR:
+                    transporte = ocr_replay.transporte_grabador(transporte)
+                http_client = httpx.Client(transport=transporte, timeout=httpx.Timeout(60.0, connect=10.0))
+                client = openai.OpenAI(api_key=api_key, http_client=http_client, max_retries=RETRIES,
+                                       base_url=ocr_replay.openai_base_url())
+                _openai_clients[api_key] = client
+    return client
@@ -0,0 +1,293 @@
+"""
+Circuit breakers y puntaje de salud de los backends OCR externos.
+
+OpenAI (visión y LangChain), el webhook de make.com de ``OCRDocumentService``
+y el de n8n de ``OCRPlacaService`` se llamaban aunque llevaran minutos
+fallando, y cada fallo costaba el timeout completo. Cada backend tiene aquí un
+``CircuitBreaker`` con:
+
+- Ventana móvil de ``ventana_segundos`` con el resultado y la latencia de cada
+  llamada. Una llamada más lenta que ``lento_segundos`` cuenta como fallo.
+- Apertura cuando, con al menos ``min_llamadas`` en la ventana, la tasa de
+  fallo llega a ``umbral_error``. Abierto, las llamadas se rechazan sin tocar
+  la red (``CircuitOpenError``).
+- Semiapertura: vencida la apertura se deja pasar una sola llamada de prueba.
+  Si funciona el circuito se cierra; si no, se vuelve a abrir con el doble de
+  duración (hasta ``apertura_maxima``).
+
+Los servicios envuelven solo la llamada de red con ``breaker.llamada()`` y
+omiten de su cadena los backends con ``disponible() == False``. El estado es
+por proceso (cada worker de gunicorn aprende por su cuenta) y se ve en
+``/admin/monitoreo/ocr/backends``.
+
+Configuración (variables de entorno, comunes a todos los backends):
+    OCR_BREAKERS_ENABLED             true/false (default true; false solo mide)
+    OCR_BREAKER_WINDOW_SECONDS       default 120
+    OCR_BREAKER_MIN_CALLS            default 5
+    OCR_BREAKER_ERROR_RATE           default 0.5
+    OCR_BREAKER_SLOW_SECONDS         default 20
+    OCR_BREAKER_OPEN_SECONDS         default 30
+    OCR_BREAKER_MAX_OPEN_SECONDS     default 300
+"""
+
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from ocr_metricas import record_breaker
+
+logger = logging.getLogger(__name__)
+
+BACKEND_OPENAI = 'openai'
+BACKEND_WEBHOOK_MAKE = 'webhook_make'
+BACKEND_WEBHOOK_N8N = 'webhook_n8n'
+
+CERRADO = 'cerrado'
+ABIERTO = 'abierto'
+SEMIABIERTO = 'semiabierto'
+
+
+class CircuitOpenError(Exception):
+    """El circuito del backend está abierto; la llamada no se hizo."""
+
+
+class _Llamada:
+    """Permite marcar como fallo una llamada que no lanzó excepción (p. ej. HTTP 502)."""
+
+    def __init__(self):
+        self.fallida = False
+        self.motivo = None
+
+    def fallo(self, motivo: str) -> None:
+        self.fallida = True
+        self.motivo = motivo
+
+
+class CircuitBreaker:
+    """Circuit breaker con ventana móvil de errores y latencia."""
+
+    def __init__(self, nombre: str, ventana_segundos: float = 120, min_llamadas: int = 5,
+                 umbral_error: float = 0.5, lento_segundos: Optional[float] = 20,
+                 apertura_segundos: float = 30, apertura_maxima: float = 300, habilitado: bool = True):
+        self.nombre = nombre
+        self.ventana_segundos = ventana_segundos
+        self.min_llamadas = min_llamadas
+        self.umbral_error = umbral_error
+        self.lento_segundos = lento_segundos
+        self.apertura_segundos = apertura_segundos
+        self.apertura_maxima = apertura_maxima
+        self.habilitado = habilitado
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Vuelve a cerrado y olvida la ventana."""
+        with self._lock:
+            self._llamadas = deque()  # (monotonic, fallo, latencia)
+            self._estado = CERRADO
+            self._abierto_hasta = 0.0
+            self._aperturas_seguidas = 0
+            self._sonda_en_curso = False
+            self._rechazadas = 0
+            self._desde = time.time()
+            self.ultimo_error = None
+
+    def _podar(self, ahora: float) -> None:
+        limite = ahora - self.ventana_segundos
+        while self._llamadas and self._llamadas[0][0] < limite:
+            self._llamadas.popleft()
+
+    def _cambiar(self, estado: str) -> None:
+        if estado != self._estado:
+            logger.warning(f"Circuito OCR {self.nombre}: {self._estado} -> {estado}")
+            self._estado = estado
+            self._desde = time.time()
+            record_breaker(self.nombre, estado)
+
+    def _abrir(self, ahora: float) -> None:
+        self._aperturas_seguidas += 1
+        duracion = min(self.apertura_segundos * 2 ** (self._aperturas_seguidas - 1), self.apertura_maxima)
+        self._abierto_hasta = ahora + duracion
+        self._cambiar(ABIERTO)
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            if self._estado == ABIERTO and time.monotonic() >= self._abierto_hasta:
+                return SEMIABIERTO
+            return self._estado
+
+    def disponible(self) -> bool:
+        """Si una llamada ahora sería admitida (sin reservar la prueba de semiapertura)."""
+        if not self.habilitado:
+            return True
+        with self._lock:
+            if self._estado == CERRADO:
+                return True
+            if self._estado == ABIERTO:
+                return time.monotonic() >= self._abierto_hasta
+            return not self._sonda_en_curso
+
+    def permitir(self) -> bool:
+        """Admite o rechaza una llamada; en semiapertura reserva la única llamada de prueba."""
+        if not self.habilitado:
+            return True
+        with self._lock:
+            if self._estado == ABIERTO and time.monotonic() >= self._abierto_hasta:
+                self._cambiar(SEMIABIERTO)
+            if self._estado == CERRADO:
+                return True
+            if self._estado == SEMIABIERTO and not self._sonda_en_curso:
+                self._sonda_en_curso = True
+                return True
+            self._rechazadas += 1
+        record_breaker(self.nombre, 'rechazo')
+        return False
+
+    def registrar(self, ok: bool, latencia: float, error: Optional[str] = None) -> None:
+        """Registra el resultado de una llamada admitida por ``permitir``."""
+        fallo = not ok or (self.lento_segundos is not None and latencia > self.lento_segundos)
+        if fallo:
+            self.ultimo_error = error or f'lenta ({latencia:.1f} s)'
+        ahora = time.monotonic()
+        with self._lock:
+            self._llamadas.append((ahora, fallo, latencia))
+            self._podar(ahora)
+            if not self.habilitado:
+                return
+            if self._estado == SEMIABIERTO:
+                self._sonda_en_curso = False
+                if fallo:
+                    self._abrir(ahora)
+                else:
+                    self._aperturas_seguidas = 0
+                    # La ventana vieja es la que abrió el circuito
+                    self._llamadas.clear()
+                    self._cambiar(CERRADO)
+            elif self._estado == CERRADO and fallo and len(self._llamadas) >= self.min_llamadas:
+                fallos = sum(1 for _, f, _ in self._llamadas if f)
+                if fallos / len(self._llamadas) >= self.umbral_error:
+                    self._abrir(ahora)
+
+    @contextmanager
+    def llamada(self):
+        """
+        Envuelve una llamada de red al backend.
+
+        Una excepción cuenta como fallo y se propaga; ``control.fallo(motivo)``
+        marca como fallo una respuesta sin excepción.
+
+        Raises:
+            CircuitOpenError: Si el circuito no admite la llamada.
+        """
+        if not self.permitir():
+            raise CircuitOpenError(f'Backend {self.nombre} no disponible (circuito abierto)')
+        control = _Llamada()
+        inicio = time.perf_counter()
+        try:
+            yield control
+        except Exception as e:
+            self.registrar(False, time.perf_counter() - inicio, f'{type(e).__name__}: {e}')
+            raise
+        self.registrar(not control.fallida, time.perf_counter() - inicio, control.motivo)
+
+    def salud(self) -> float:
+        """Puntaje 0-1: tasa de éxito de la ventana, penalizada si la latencia p90 se acerca a ``lento_segundos``."""
+        estado = self.estado
+        if estado == ABIERTO:
+            return 0.0
+        with self._lock:
+            self._podar(time.monotonic())
+            llamadas = list(self._llamadas)
+        if not llamadas:
+            return 0.5 if estado == SEMIABIERTO else 1.0
+        exito = 1 - sum(1 for _, f, _ in llamadas if f) / len(llamadas)
+        if self.lento_segundos:
+            p90 = _percentil([lat for _, _, lat in llamadas], 0.9)
+            exito *= max(0.0, 1 - max(0.0, p90 / self.lento_segundos - 0.5))
+        return round(exito * (0.5 if estado == SEMIABIERTO else 1.0), 3)
+
+    def snapshot(self) -> Dict[str, Any]:
+        estado = self.estado
+        salud = self.salud()
+        with self._lock:
+            llamadas = list(self._llamadas)
+            abierto_restante = max(0.0, self._abierto_hasta - time.monotonic()) if estado == ABIERTO else 0.0
+            rechazadas = self._rechazadas
+            aperturas = self._aperturas_seguidas
+            desde = self._desde
+        latencias = [lat for _, _, lat in llamadas]
+        fallos = sum(1 for _, f, _ in llamadas if f)
+        return {
+            'backend': self.nombre,
+            'estado': estado,
+            'salud': salud,
+            'desde': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(desde)),
+            'llamadas_ventana': len(llamadas),
+            'fallos_ventana': fallos,
+            'tasa_error': round(fallos / len(llamadas), 3) if llamadas else 0.0,
+            'latencia_p50_ms': round(statistics.median(latencias) * 1000) if latencias else None,
+            'latencia_p90_ms': round(_percentil(latencias, 0.9) * 1000) if latencias else None,
+            'reabre_en_segundos': round(abierto_restante, 1),
+            'aperturas_seguidas': aperturas,
+            'rechazadas': rechazadas,
+            'ultimo_error': self.ultimo_error,
+            'habilitado': self.habilitado,
+            'config': {
+                'ventana_segundos': self.ventana_segundos, 'min_llamadas': self.min_llamadas,
+                'umbral_error': self.umbral_error, 'lento_segundos': self.lento_segundos,
+                'apertura_segundos': self.apertura_segundos, 'apertura_maxima': self.apertura_maxima,
+            },
+        }
+
+
+def _percentil(valores: List[float], q: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(nombre: str) -> CircuitBreaker:
+    """Breaker compartido del proceso para ``nombre``, configurado por variables de entorno."""
+    breaker = _breakers.get(nombre)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(nombre)
+            if breaker is None:
+                lento = float(os.getenv('OCR_BREAKER_SLOW_SECONDS', '20'))
+                breaker = CircuitBreaker(
+                    nombre,
+                    ventana_segundos=float(os.getenv('OCR_BREAKER_WINDOW_SECONDS', '120')),
+                    min_llamadas=int(os.getenv('OCR_BREAKER_MIN_CALLS', '5')),
+                    umbral_error=float(os.getenv('OCR_BREAKER_ERROR_RATE', '0.5')),
+                    lento_segundos=lento if lento > 0 else None,
+                    apertura_segundos=float(os.getenv('OCR_BREAKER_OPEN_SECONDS', '30')),
+                    apertura_maxima=float(os.getenv('OCR_BREAKER_MAX_OPEN_SECONDS', '300')),
+                    habilitado=os.getenv('OCR_BREAKERS_ENABLED', 'true').lower() == 'true',
+                )
+                _breakers[nombre] = breaker
+    return breaker
+
+
+def breakers_snapshot() -> List[Dict[str, Any]]:
+    """Estado de todos los breakers creados en este proceso, del menos sano al más sano."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return sorted((b.snapshot() for b in breakers), key=lambda s: (s['salud'], s['backend']))
+
+
+def reset_breaker(nombre: str) -> Optional[Dict[str, Any]]:
+    """Cierra el circuito de ``nombre``; None si ese backend no se ha usado en este proceso."""
+    breaker = _breakers.get(nombre)
+    if breaker is None:
+        return None
+    breaker.reset()
+    return breaker.snapshot()
@@ -0,0 +1,203 @@
+"""
+Caché persistente de resultados de OCR por contenido de imagen.
+
+``OCRPlacaService`` y ``OCRDocumentService`` consultan esta caché antes de
+llamar a GPT-4o / GPT-4o-mini (y a los webhooks). La clave es el SHA-256 de
+los bytes de la imagen, el tipo de documento y la versión del prompt, de modo
+que la misma foto enviada otra vez (recarga de página, reintento en
+portería) devuelve el resultado estructurado anterior sin costo, y cambiar
+el prompt o el modelo invalida las entradas viejas.
+
+Se guarda en SQLite (WAL, una conexión por hilo y proceso) con TTL y
+expulsión por tamaño: al superar ``max_bytes`` se borran primero las
+entradas vencidas y luego las de acceso más antiguo. Solo se guardan
+resultados exitosos. Cualquier error de la caché se registra y se trata como
+un fallo de caché; nunca interrumpe el OCR.
+
+Configuración (variables de entorno):
+    OCR_CACHE_ENABLED      true/false (default true)
+    OCR_CACHE_PATH         default instance/ocr_cache.db
+    OCR_CACHE_TTL_HOURS    default 168 (7 días)
+    OCR_CACHE_MAX_MB       default 50
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ocr_metricas import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Subir cuando cambie la forma del resultado o la lógica de validación
+PIPELINE_VERSION = '1'
+
+_DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'ocr_cache.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_cache (
+    clave TEXT PRIMARY KEY,
+    image_hash TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    resultado TEXT NOT NULL,
+    tamano INTEGER NOT NULL,
+    creado REAL NOT NULL,
+    expira REAL NOT NULL,
+    ultimo_acceso REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_ocr_cache_expira ON ocr_cache (expira);
+CREATE INDEX IF NOT EXISTS ix_ocr_cache_ultimo_acceso ON ocr_cache (ultimo_acceso);
+"""
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 del contenido del archivo."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def prompt_version(*partes: str) -> str:
+    """Versión corta derivada del prompt, el modelo y ``PIPELINE_VERSION``."""
+    sha = hashlib.sha1(PIPELINE_VERSION.encode())
+    for parte in partes:
+        sha.update(b'\0' + (parte or '').encode('utf-8'))
+    return sha.hexdigest()[:12]
+
+
+class OCRResultCache:
+    """Caché SQLite de resultados OCR con TTL y límite de tamaño."""
+
+    # Cada cuántas escrituras se revisa el tamaño total
+    EVICT_EVERY = 20
+
+    def __init__(self, path: str, ttl_seconds: float, max_bytes: int, enabled: bool = True):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._local = threading.local()
+        self._puts = 0
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        with self._lock:
+            if not self._schema_ready:
+                conn.executescript(_SCHEMA)
+                self._schema_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def make_key(image_hash: str, tipo: str, version: str) -> str:
+        return f'{image_hash}:{tipo}:{version}'
+
+    def get(self, clave: str, cache_name: str = 'ocr') -> Optional[Dict[str, Any]]:
+        """Resultado guardado para ``clave`` o None (vencido o ausente)."""
+        if not self.enabled:
+            return None
+        ahora = time.time()
+        try:
+            conn = self._conn()
+            fila = conn.execute(
+                'SELECT resultado FROM ocr_cache WHERE clave = ? AND expira > ?', (clave, ahora)
+            ).fetchone()
+            if fila:
+                conn.execute(
+                    'UPDATE ocr_cache SET ultimo_acceso = ?, hits = hits + 1 WHERE clave = ?', (ahora, clave)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Caché OCR no disponible ({e}); se procesa sin caché")
+            return None
+        record_cache(cache_name, fila is not None)
+        return json.loads(fila[0]) if fila else None
+
+    def put(self, clave: str, resultado: Dict[str, Any]) -> None:
+        """Guarda ``resultado`` si fue exitoso."""
+        if not self.enabled or not resultado or not resultado.get('success'):
+            return
+        image_hash, tipo, version = clave.split(':', 2)
+        datos = json.dumps(resultado, ensure_ascii=False, default=str)
+        ahora = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                'INSERT OR REPLACE INTO ocr_cache (clave, image_hash, tipo, prompt_version, resultado, tamano, '
+                'creado, expira, ultimo_acceso, hits) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)',
+                (clave, image_hash, tipo, version, datos, len(datos), ahora, ahora + self.ttl_seconds, ahora),
+            )
+            self._puts += 1
+            if self._puts % self.EVICT_EVERY == 0:
+                self.evict()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo guardar en la caché OCR: {e}")
+
+    def evict(self) -> int:
+        """Borra vencidas y, si se supera ``max_bytes``, las menos usadas. Devuelve filas borradas."""
+        conn = self._conn()
+        borradas = conn.execute('DELETE FROM ocr_cache WHERE expira <= ?', (time.time(),)).rowcount
+        total = conn.execute('SELECT COALESCE(SUM(tamano), 0) FROM ocr_cache').fetchone()[0]
+        if total > self.max_bytes:
+            # Dejar un 10% de margen para no expulsar en cada escritura
+            objetivo = total - int(self.max_bytes * 0.9)
+            claves, liberado = [], 0
+            for clave, tamano in conn.execute('SELECT clave, tamano FROM ocr_cache ORDER BY ultimo_acceso'):
+                claves.append((clave,))
+                liberado += tamano
+                if liberado >= objetivo:
+                    break
+            conn.executemany('DELETE FROM ocr_cache WHERE clave = ?', claves)
+            borradas += len(claves)
+        return borradas
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        entradas, tamano, hits = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(tamano), 0), COALESCE(SUM(hits), 0) FROM ocr_cache'
+        ).fetchone()
+        return {'entradas': entradas, 'bytes': tamano, 'hits': hits, 'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds, 'path': self.path}
+
+    def clear(self) -> None:
+        self._conn().execute('DELETE FROM ocr_cache')
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> OCRResultCache:
+    """Caché compartida del proceso, configurada por variables de entorno."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OCRResultCache(
+                    path=os.getenv('OCR_CACHE_PATH') or _DEFAULT_PATH,
+                    ttl_seconds=float(os.getenv('OCR_CACHE_TTL_HOURS', '168')) * 3600,
+                    max_bytes=int(float(os.getenv('OCR_CACHE_MAX_MB', '50')) * 1024 * 1024),
+                    enabled=os.getenv('OCR_CACHE_ENABLED', 'true').lower() == 'true',
+                )
+    return _cache
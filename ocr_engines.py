@@ -0,0 +1,357 @@
+"""
+Motores de OCR local (EasyOCR y Tesseract) compartidos por todo el proceso.
+
+``OCRPlacaService`` creaba su propio ``easyocr.Reader`` (segundos de carga y
+cientos de MB por instancia) y ``OCRDocumentService`` verificaba Tesseract
+en cada instancia. Aquí cada motor se carga una sola vez y los servicios
+piden texto con ``extraer_texto``.
+
+Dos modos:
+
+- En proceso (default): el ``Reader`` de EasyOCR se carga al primer uso (o
+  en el maestro de gunicorn con ``OCR_ENGINE_PRELOAD=true``, y los workers lo
+  heredan copy-on-write). EasyOCR no es seguro entre hilos, así que su
+  inferencia se serializa; Tesseract corre en un subproceso y no bloquea.
+- Procesos de motores (``OCR_ENGINE_PROCESSES`` > 0): ``iniciar_procesos``
+  (desde ``when_ready`` de gunicorn) arranca N procesos que cargan los
+  motores una vez y aceptan peticiones en un socket Unix compartido. Los
+  workers decodifican la imagen, la copian a memoria compartida
+  (``multiprocessing.shared_memory``) y solo envían el nombre del bloque; el
+  OCR usa otros núcleos y el hilo de la petición solo espera la respuesta.
+  La conexión y el saludo de autenticación se acotan a
+  ``OCR_ENGINE_CONNECT_TIMEOUT_SECONDS``: si los procesos murieron o están
+  todos ocupados se usa el modo en proceso. Un hilo del maestro revisa los
+  procesos y vuelve a lanzar los que mueran.
+
+Configuración (variables de entorno):
+    OCR_ENGINE                  motor preferido: easyocr o tesseract (default easyocr)
+    OCR_LANGUAGES               default es,en
+    OCR_GPU                     default false
+    OCR_ENGINE_PRELOAD          cargar EasyOCR en la precarga de gunicorn (default false)
+    OCR_ENGINE_PROCESSES        procesos de motores (default 0 = en proceso)
+    OCR_ENGINE_SOCKET           default instance/ocr_engines.sock
+    OCR_ENGINE_TIMEOUT_SECONDS  espera máxima por imagen (default 30)
+    OCR_ENGINE_CONNECT_TIMEOUT_SECONDS  espera máxima para conectar con un proceso (default 2)
+"""
+
+import gc
+import importlib.util
+import logging
+import os
+import secrets
+import signal
+import socket
+import threading
+import time
+from multiprocessing import connection, get_context, resource_tracker, shared_memory
+from typing import List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    from PIL import Image
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+MOTORES = ('easyocr', 'tesseract')
+MOTOR_DEFAULT = os.getenv('OCR_ENGINE', 'easyocr')
+IDIOMAS = [i.strip() for i in os.getenv('OCR_LANGUAGES', 'es,en').split(',') if i.strip()]
+GPU = os.getenv('OCR_GPU', 'false').lower() == 'true'
+TIMEOUT_SECONDS = float(os.getenv('OCR_ENGINE_TIMEOUT_SECONDS', '30'))
+CONNECT_TIMEOUT_SECONDS = float(os.getenv('OCR_ENGINE_CONNECT_TIMEOUT_SECONDS', '2'))
+# Cada cuánto el maestro revisa que los procesos de motores sigan vivos
+VIGILANCIA_SECONDS = 5.0
+SOCKET_PATH = os.getenv('OCR_ENGINE_SOCKET') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'instance', 'ocr_engines.sock')
+
+# Códigos de idioma de Tesseract
+_TESSERACT_LANG = {'es': 'spa', 'en': 'eng'}
+
+_lock = threading.Lock()
+_easyocr_lock = threading.Lock()
+_readers = {}
+_tesseract_ok = None
+_procesos = []
+_procesos_lock = threading.Lock()
+_listener = None
+_detener = threading.Event()
+
+
+def _tesseract_disponible() -> bool:
+    global _tesseract_ok
+    if _tesseract_ok is None:
+        try:
+            import pytesseract
+            pytesseract.get_tesseract_version()
+            _tesseract_ok = True
+        except Exception as e:
+            logger.info(f"Tesseract no disponible: {e}")
+            _tesseract_ok = False
+    return _tesseract_ok
+
+
+def disponible(motor: str) -> bool:
+    """Si ``motor`` se puede usar (sin cargar modelos)."""
+    if motor == 'easyocr':
+        return importlib.util.find_spec('easyocr') is not None
+    if motor == 'tesseract':
+        return _tesseract_disponible()
+    return False
+
+
+def _get_reader(idiomas: List[str]):
+    """``easyocr.Reader`` compartido para ``idiomas``; se carga una vez por proceso."""
+    clave = tuple(idiomas)
+    reader = _readers.get(clave)
+    if reader is None:
+        with _lock:
+            reader = _readers.get(clave)
+            if reader is None:
+                import easyocr
+                inicio = time.perf_counter()
+                reader = _readers[clave] = easyocr.Reader(list(idiomas), gpu=GPU)
+                logger.info(f"EasyOCR {'/'.join(idiomas)} cargado en {time.perf_counter() - inicio:.1f}s (pid {os.getpid()})")
+    return reader
+
+
+def calentar(motores=None) -> List[str]:
+    """Carga los motores de ``motores`` (default: el preferido); devuelve los listos."""
+    listos = []
+    for motor in motores or (MOTOR_DEFAULT,):
+        try:
+            if motor == 'easyocr' and disponible('easyocr'):
+                _get_reader(IDIOMAS)
+                listos.append(motor)
+            elif motor == 'tesseract' and disponible('tesseract'):
+                listos.append(motor)
+        except Exception as e:
+            logger.error(f"No se pudo cargar {motor}: {e}")
+    return listos
+
+
+def _ocr_local(imagen, motor: str, idiomas: List[str], timeout: float = None) -> str:
+    """
+    OCR en este proceso; ``imagen`` es ruta o arreglo RGB.
+
+    ``timeout`` acota la espera del turno de EasyOCR y la ejecución de
+    Tesseract (la inferencia de EasyOCR ya empezada no se puede interrumpir).
+
+    Raises:
+        TimeoutError: Si no se obtuvo el turno o Tesseract no terminó a tiempo.
+    """
+    if motor == 'easyocr':
+        reader = _get_reader(idiomas)
+        if not _easyocr_lock.acquire(timeout=-1 if timeout is None else max(0.0, timeout)):
+            raise TimeoutError(f'EasyOCR ocupado por más de {timeout:.0f} s')
+        try:
+            resultados = reader.readtext(imagen)
+        finally:
+            _easyocr_lock.release()
+        return ' '.join(item[1] for item in resultados)
+    import pytesseract
+    if isinstance(imagen, str):
+        imagen = Image.open(imagen)
+    lang = '+'.join(_TESSERACT_LANG.get(i, i) for i in idiomas)
+    try:
+        return pytesseract.image_to_string(imagen, lang=lang, timeout=timeout or 0)
+    except RuntimeError as e:
+        # pytesseract señala el timeout con RuntimeError('Tesseract process timeout')
+        if 'timeout' in str(e).lower():
+            raise TimeoutError(f'Tesseract no terminó en {timeout:.0f} s') from e
+        raise
+
+
+def _resolver_motor(motor: Optional[str]) -> Optional[str]:
+    preferido = motor or MOTOR_DEFAULT
+    for candidato in (preferido,) + tuple(m for m in MOTORES if m != preferido):
+        if disponible(candidato):
+            return candidato
+    return None
+
+
+# --- Procesos de motores ---------------------------------------------------
+
+def _servir(listener, motores):
+    """Ciclo de un proceso de motores: una petición por conexión."""
+    # Heredados del maestro de gunicorn; este proceso no debe actuar como árbitro
+    for nombre in ('SIGTERM', 'SIGINT', 'SIGQUIT', 'SIGHUP', 'SIGCHLD', 'SIGUSR1', 'SIGUSR2',
+                   'SIGTTIN', 'SIGTTOU', 'SIGWINCH'):
+        if hasattr(signal, nombre):
+            signal.signal(getattr(signal, nombre), signal.SIG_DFL)
+    # El maestro los crea con el GC apagado (precarga de gunicorn)
+    gc.enable()
+    calentar(motores)
+    while True:
+        try:
+            conn = listener.accept()
+        except (OSError, EOFError, connection.AuthenticationError):
+            # Clientes que abandonaron el saludo por timeout
+            continue
+        with conn:
+            try:
+                nombre, forma, dtype, motor, idiomas = conn.recv()
+                bloque = shared_memory.SharedMemory(name=nombre)
+                # El bloque lo libera el cliente; que el tracker de este proceso no lo borre
+                resource_tracker.unregister(bloque._name, 'shared_memory')
+                imagen = np.ndarray(forma, dtype=dtype, buffer=bloque.buf)
+                try:
+                    texto = _ocr_local(imagen, motor, idiomas)
+                finally:
+                    del imagen  # sin vistas vivas el bloque se puede cerrar
+                    bloque.close()
+                conn.send(('ok', texto))
+            except Exception as e:
+                try:
+                    conn.send(('error', f'{type(e).__name__}: {e}'))
+                except OSError:
+                    pass
+
+
+def iniciar_procesos(procesos: int = None, motores=None) -> int:
+    """
+    Arranca los procesos de motores (una vez, en el maestro, antes de crear workers).
+
+    Returns:
+        int: Procesos en marcha (0 si el modo por procesos está apagado).
+    """
+    global _listener
+    procesos = int(os.getenv('OCR_ENGINE_PROCESSES', '0')) if procesos is None else procesos
+    if procesos <= 0 or _procesos or not NUMPY_AVAILABLE:
+        return len(_procesos)
+    os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+    if os.path.exists(SOCKET_PATH):
+        os.remove(SOCKET_PATH)
+    # La clave viaja a los workers por el entorno heredado en el fork
+    clave = os.environ.setdefault('OCR_ENGINE_AUTHKEY', secrets.token_hex(16))
+    # Referencia global: si el Listener se recolecta, su finalizador borra el socket
+    listener = _listener = connection.Listener(SOCKET_PATH, family='AF_UNIX', backlog=64, authkey=clave.encode())
+    _detener.clear()
+    with _procesos_lock:
+        for i in range(procesos):
+            _procesos.append(_lanzar(listener, motores, i))
+    threading.Thread(target=_vigilar, args=(listener, motores), name='ocr-engine-vigilante', daemon=True).start()
+    logger.info(f"{procesos} procesos de motores OCR en {SOCKET_PATH}")
+    return procesos
+
+
+def _lanzar(listener, motores, indice: int):
+    proceso = get_context('fork').Process(target=_servir, args=(listener, motores),
+                                          name=f'ocr-engine-{indice}', daemon=True)
+    proceso.start()
+    return proceso
+
+
+def _vigilar(listener, motores) -> None:
+    """Hilo del maestro: vuelve a lanzar los procesos de motores que murieron."""
+    while not _detener.wait(VIGILANCIA_SECONDS):
+        with _procesos_lock:
+            if _detener.is_set():
+                return
+            for i, proceso in enumerate(_procesos):
+                if not proceso.is_alive():
+                    logger.warning(f"Proceso de motores OCR {proceso.name} terminó (código {proceso.exitcode}); "
+                                   f"se relanza")
+                    proceso.join(0)
+                    _procesos[i] = _lanzar(listener, motores, i)
+
+
+def detener_procesos() -> None:
+    global _listener
+    _detener.set()
+    with _procesos_lock:
+        for proceso in _procesos:
+            proceso.terminate()
+        for proceso in _procesos:
+            proceso.join(5)
+        _procesos.clear()
+    if _listener is not None:
+        _listener.close()
+        _listener = None
+
+
+def _conectar(clave: bytes, timeout: float) -> connection.Connection:
+    """
+    Conexión autenticada con un proceso de motores, sin esperar más de ``timeout``.
+
+    ``connection.Client`` no tiene timeout: si ningún proceso acepta (muertos u
+    ocupados) el saludo de autenticación se bloquea para siempre.
+
+    Raises:
+        TimeoutError: Si no hubo conexión o saludo a tiempo.
+        OSError, connection.AuthenticationError: Si falló la conexión.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(SOCKET_PATH)
+        sock.settimeout(None)
+        conn = connection.Connection(sock.detach())
+    except BaseException:
+        sock.close()
+        raise
+    try:
+        # El proceso que acepta envía primero su desafío; esperarlo con límite
+        if not conn.poll(timeout):
+            raise TimeoutError(f'Ningún proceso de motores OCR aceptó la conexión en {timeout:.1f} s')
+        connection.answer_challenge(conn, clave)
+        connection.deliver_challenge(conn, clave)
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+def _ocr_en_procesos(imagen, motor: str, idiomas: List[str], timeout: float) -> Optional[str]:
+    """OCR en los procesos de motores; None si no están disponibles."""
+    clave = os.environ.get('OCR_ENGINE_AUTHKEY')
+    if not clave or not NUMPY_AVAILABLE or not os.path.exists(SOCKET_PATH):
+        return None
+    if isinstance(imagen, str):
+        with Image.open(imagen) as archivo:
+            imagen = np.asarray(archivo.convert('RGB'))
+    imagen = np.ascontiguousarray(imagen)
+    bloque = shared_memory.SharedMemory(create=True, size=max(1, imagen.nbytes))
+    try:
+        np.ndarray(imagen.shape, dtype=imagen.dtype, buffer=bloque.buf)[...] = imagen
+        try:
+            conn = _conectar(clave.encode(), min(timeout, CONNECT_TIMEOUT_SECONDS))
+        except (OSError, EOFError, connection.AuthenticationError) as e:
+            # TimeoutError es OSError: procesos muertos u ocupados, se usa el modo en proceso
+            logger.warning(f"Procesos de motores OCR no disponibles: {e}")
+            return None
+        with conn:
+            conn.send((bloque.name, imagen.shape, imagen.dtype.str, motor, idiomas))
+            if not conn.poll(timeout):
+                raise TimeoutError(f'El motor {motor} no respondió en {timeout:.0f} s')
+            estado, valor = conn.recv()
+    finally:
+        bloque.close()
+        bloque.unlink()
+    if estado != 'ok':
+        raise RuntimeError(valor)
+    return valor
+
+
+def extraer_texto(imagen: Union[str, 'np.ndarray'], motor: str = None, idiomas: List[str] = None,
+                  timeout: float = None) -> str:
+    """
+    Texto de ``imagen`` (ruta o arreglo RGB) con el motor pedido o el disponible.
+
+    ``timeout`` (default ``OCR_ENGINE_TIMEOUT_SECONDS``) acota la espera en
+    ambos modos.
+
+    Raises:
+        RuntimeError: Si no hay ningún motor de OCR local.
+        TimeoutError: Si el motor no respondió a tiempo.
+    """
+    motor = _resolver_motor(motor)
+    if motor is None:
+        raise RuntimeError('No hay motor de OCR local disponible (EasyOCR o Tesseract)')
+    idiomas = list(idiomas or IDIOMAS)
+    timeout = TIMEOUT_SECONDS if timeout is None else timeout
+    texto = _ocr_en_procesos(imagen, motor, idiomas, timeout)
+    if texto is None:
+        texto = _ocr_local(imagen, motor, idiomas, timeout)
+    return texto
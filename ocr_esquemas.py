@@ -0,0 +1,321 @@
+"""
+Salida estructurada (JSON Schema) para las extracciones con LLM.
+
+Las respuestas de los modelos se recuperaban del texto libre: el primer
+``{`` y el último ``}`` de la respuesta de visión de documentos, la placa
+con una regex sobre el texto, y el tiquete desde una tabla markdown
+(``tiquete_parser.parse_markdown_response``). Un texto extra, un JSON
+cortado o una tabla mal formada terminaba en fallo y en la siguiente
+llamada paga de la cadena.
+
+Aquí cada extracción tiene un esquema que se envía a la API como
+``response_format`` (``parametros_salida``; ``json_schema`` estricto: el
+modelo solo puede devolver JSON que lo cumple) y un validador que devuelve
+el resultado tipado o lanza ``ErrorEsquema``:
+
+    ESQUEMA_DOCUMENTO -> validar_documento -> ExtraccionDocumento
+    ESQUEMA_PLACA     -> validar_placa     -> ExtraccionPlaca
+    ESQUEMA_TIQUETE   -> validar_tiquete   -> ExtraccionTiquete
+
+Los validadores también aceptan las respuestas de los caminos sin esquema
+(LangChain, webhooks): si el texto no es JSON puro se busca el objeto JSON
+dentro de él, como antes.
+
+Configuración (variables de entorno):
+    OCR_STRUCTURED_OUTPUT   usar response_format json_schema (default true)
+"""
+
+import json
+import logging
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+SALIDA_ESTRUCTURADA = os.getenv('OCR_STRUCTURED_OUTPUT', 'true').lower() == 'true'
+
+PATRON_FECHA = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+PATRON_PLACA = re.compile(r'^[A-Z]{3}[0-9]{3}$')
+
+
+class ErrorEsquema(ValueError):
+    """La respuesta del modelo no cumple el esquema de la extracción."""
+
+
+# --- Esquemas ----------------------------------------------------------------
+# Modo estricto de OpenAI: todas las propiedades requeridas (los opcionales se
+# expresan como nulos) y additionalProperties false en cada objeto. Formatos y
+# rangos (fecha, placa, confianza) se revisan en los validadores.
+
+ESQUEMA_DOCUMENTO = {
+    'type': 'object',
+    'properties': {
+        'fecha_encontrada': {'type': ['string', 'null'],
+                             'description': 'Fecha de vencimiento en formato YYYY-MM-DD, o null si no aparece'},
+        'confianza': {'type': 'integer', 'description': 'Confianza de 0 a 100'},
+        'contexto': {'type': 'string', 'description': 'Texto exacto donde aparece la fecha'},
+        'texto_visible': {'type': 'string', 'description': 'Contenido principal del documento'},
+    },
+    'required': ['fecha_encontrada', 'confianza', 'contexto', 'texto_visible'],
+    'additionalProperties': False,
+}
+
+ESQUEMA_PLACA = {
+    'type': 'object',
+    'properties': {
+        'placa': {'type': ['string', 'null'],
+                  'description': 'Placa en formato ABC123 (3 letras y 3 números), o null si no se identifica'},
+    },
+    'required': ['placa'],
+    'additionalProperties': False,
+}
+
+ESQUEMA_TIQUETE = {
+    'type': 'object',
+    'properties': {
+        'es_tiquete': {'type': 'boolean', 'description': 'Si la imagen es un tiquete de báscula'},
+        'campos': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'campo': {'type': 'string'},
+                    'original': {'type': 'string', 'description': 'Valor leído del tiquete'},
+                    'sugerido': {'type': 'string', 'description': 'Valor corregido o validado'},
+                },
+                'required': ['campo', 'original', 'sugerido'],
+                'additionalProperties': False,
+            },
+        },
+        'acarreo': {'type': 'string', 'description': 'Valor de "Se Acarreó", vacío si no aplica'},
+        'cargo': {'type': 'string', 'description': 'Valor de "Se Cargó", vacío si no aplica'},
+        'nota': {'type': 'string', 'description': 'Nota de validación'},
+        'descripcion': {'type': 'string', 'description': 'Descripción de la imagen si no es un tiquete'},
+    },
+    'required': ['es_tiquete', 'campos', 'acarreo', 'cargo', 'nota', 'descripcion'],
+    'additionalProperties': False,
+}
+
+ESQUEMAS = {'documento': ESQUEMA_DOCUMENTO, 'placa': ESQUEMA_PLACA, 'tiquete': ESQUEMA_TIQUETE}
+
+
+def parametros_salida(nombre: str) -> Dict[str, Any]:
+    """Argumentos extra de ``chat.completions.create`` para ``nombre`` (vacío sin salida estructurada)."""
+    if not SALIDA_ESTRUCTURADA:
+        return {}
+    return {'response_format': {'type': 'json_schema',
+                                'json_schema': {'name': f'extraccion_{nombre}', 'strict': True,
+                                                'schema': ESQUEMAS[nombre]}}}
+
+
+# --- Resultados tipados --------------------------------------------------------
+
+@dataclass(frozen=True)
+class ExtraccionDocumento:
+    fecha_encontrada: Optional[str]
+    confianza: int
+    contexto: str
+    texto_visible: str
+
+
+@dataclass(frozen=True)
+class ExtraccionPlaca:
+    placa: Optional[str]
+    # La placa salió de buscarla dentro de un texto libre más largo
+    extraida: bool = False
+
+
+@dataclass(frozen=True)
+class CampoTiquete:
+    campo: str
+    original: str
+    sugerido: str
+
+
+@dataclass(frozen=True)
+class ExtraccionTiquete:
+    es_tiquete: bool
+    campos: List[CampoTiquete] = field(default_factory=list)
+    acarreo: str = ''
+    cargo: str = ''
+    nota: str = ''
+    descripcion: str = ''
+
+    def como_parsed_data(self) -> Dict[str, Any]:
+        """Mismo dict que ``tiquete_parser.parse_markdown_response`` (lo que esperan las vistas)."""
+        nota = self.nota
+        if not self.es_tiquete and not nota:
+            nota = 'La imagen no contiene un tiquete válido. Se muestra una descripción general.'
+        return {
+            'table_data': [asdict(c) for c in self.campos] if self.es_tiquete else [],
+            'nota': nota,
+            'acarreo': self.acarreo,
+            'cargo': self.cargo,
+            'descripcion': self.descripcion,
+        }
+
+
+# --- Validación ----------------------------------------------------------------
+
+_TIPOS = {'object': dict, 'array': list, 'string': str, 'integer': int, 'number': (int, float),
+          'boolean': bool, 'null': type(None)}
+
+
+def _validar(valor: Any, esquema: Dict[str, Any], ruta: str = '$') -> None:
+    """Valida ``valor`` contra el subconjunto de JSON Schema que usan los esquemas de este módulo."""
+    tipos = esquema.get('type')
+    if tipos is not None:
+        tipos = tipos if isinstance(tipos, list) else [tipos]
+        # bool es subclase de int: no se acepta como entero ni como número
+        if isinstance(valor, bool) and 'boolean' not in tipos:
+            raise ErrorEsquema(f'{ruta}: se esperaba {"/".join(tipos)}, llegó booleano')
+        if not any(isinstance(valor, _TIPOS[t]) for t in tipos):
+            raise ErrorEsquema(f'{ruta}: se esperaba {"/".join(tipos)}, llegó {type(valor).__name__}')
+    if isinstance(valor, dict):
+        faltantes = [clave for clave in esquema.get('required', ()) if clave not in valor]
+        if faltantes:
+            raise ErrorEsquema(f'{ruta}: faltan {", ".join(faltantes)}')
+        propiedades = esquema.get('properties', {})
+        if esquema.get('additionalProperties') is False:
+            sobrantes = [clave for clave in valor if clave not in propiedades]
+            if sobrantes:
+                raise ErrorEsquema(f'{ruta}: propiedades no permitidas {", ".join(sobrantes)}')
+        for clave, subesquema in propiedades.items():
+            if clave in valor:
+                _validar(valor[clave], subesquema, f'{ruta}.{clave}')
+    elif isinstance(valor, list) and 'items' in esquema:
+        for i, item in enumerate(valor):
+            _validar(item, esquema['items'], f'{ruta}[{i}]')
+
+
+def cargar_json(contenido: Union[str, bytes, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Objeto JSON de la respuesta.
+
+    Con salida estructurada el contenido es JSON puro; para las respuestas
+    de texto libre (LangChain, webhooks) se busca el primer objeto JSON.
+    """
+    if isinstance(contenido, dict):
+        return contenido
+    if isinstance(contenido, bytes):
+        contenido = contenido.decode('utf-8', errors='replace')
+    if not contenido or not contenido.strip():
+        raise ErrorEsquema('Respuesta vacía')
+    texto = contenido.strip()
+    try:
+        datos = json.loads(texto)
+    except ValueError:
+        inicio = texto.find('{')
+        if inicio == -1:
+            raise ErrorEsquema('La respuesta no contiene JSON')
+        try:
+            datos, _ = json.JSONDecoder().raw_decode(texto, inicio)
+        except ValueError as e:
+            raise ErrorEsquema(f'JSON inválido en la respuesta: {e}')
+    if not isinstance(datos, dict):
+        raise ErrorEsquema(f'Se esperaba un objeto JSON, llegó {type(datos).__name__}')
+    return datos
+
+
+def contenido_mensaje(response) -> str:
+    """
+    Contenido de la primera opción de ``chat.completions``.
+
+    Raises:
+        ErrorEsquema: Si el modelo rechazó la solicitud o cortó la salida por tokens.
+    """
+    opcion = response.choices[0]
+    rechazo = getattr(opcion.message, 'refusal', None)
+    if rechazo:
+        raise ErrorEsquema(f'El modelo rechazó la solicitud: {rechazo}')
+    if getattr(opcion, 'finish_reason', None) == 'length':
+        raise ErrorEsquema('Respuesta cortada por max_tokens')
+    return opcion.message.content or ''
+
+
+def validar_documento(contenido, confianza_defecto: int = 0) -> ExtraccionDocumento:
+    """
+    Extracción de fecha de vencimiento.
+
+    ``fecha_encontrada`` queda None si el modelo no la encontró. Las
+    respuestas sin esquema pueden omitir ``confianza`` (se usa
+    ``confianza_defecto``) y traer ``texto_relevante`` en vez de ``contexto``.
+    """
+    datos = cargar_json(contenido)
+    confianza = datos.get('confianza')
+    if isinstance(confianza, str) and confianza.strip().isdigit():
+        datos['confianza'] = int(confianza)
+    elif isinstance(confianza, float) and not isinstance(confianza, bool):
+        datos['confianza'] = round(confianza)
+    # Las respuestas sin esquema no siempre traen todos los campos
+    datos.setdefault('contexto', datos.pop('texto_relevante', ''))
+    datos.setdefault('texto_visible', '')
+    datos.setdefault('confianza', confianza_defecto)
+    _validar(datos, {**ESQUEMA_DOCUMENTO, 'additionalProperties': True})
+    fecha = datos['fecha_encontrada']
+    if fecha is not None:
+        fecha = fecha.strip()
+        if fecha.lower() in ('', 'null', 'none'):
+            fecha = None
+        elif not PATRON_FECHA.match(fecha):
+            # Otros formatos los normaliza el servicio (_validate_gpt4_date)
+            logger.info(f"Fecha fuera del formato YYYY-MM-DD: {fecha}")
+    return ExtraccionDocumento(fecha_encontrada=fecha, confianza=max(0, min(100, datos['confianza'])),
+                               contexto=datos['contexto'] or '', texto_visible=datos['texto_visible'] or '')
+
+
+def normalizar_placa(texto: Optional[str]) -> Optional[str]:
+    """Placa en mayúsculas sin espacios ni guiones; None si no tiene el formato ABC123."""
+    if not texto:
+        return None
+    placa = re.sub(r'[\s\-.·]', '', texto).upper()
+    return placa if PATRON_PLACA.match(placa) else None
+
+
+def validar_placa(contenido) -> ExtraccionPlaca:
+    """
+    Extracción de placa.
+
+    Sin salida estructurada el modelo responde texto (``ABC123`` o
+    ``NO_DETECTADA``); en ese caso se busca la placa dentro del texto.
+
+    Raises:
+        ErrorEsquema: Si no cumple el esquema o la placa no tiene el formato ABC123.
+    """
+    try:
+        datos = cargar_json(contenido)
+    except ErrorEsquema:
+        texto = (contenido or '').strip().upper()
+        if texto == 'NO_DETECTADA':
+            return ExtraccionPlaca(placa=None)
+        placa = normalizar_placa(texto)
+        if placa:
+            return ExtraccionPlaca(placa=placa)
+        encontradas = re.findall(r'[A-Z]{3}[0-9]{3}', texto)
+        if encontradas:
+            return ExtraccionPlaca(placa=encontradas[0], extraida=True)
+        raise ErrorEsquema(f'Formato de placa inválido: {texto}')
+    _validar(datos, ESQUEMA_PLACA)
+    if datos['placa'] is None or datos['placa'].strip().upper() in ('', 'NO_DETECTADA'):
+        return ExtraccionPlaca(placa=None)
+    placa = normalizar_placa(datos['placa'])
+    if placa is None:
+        raise ErrorEsquema(f'Formato de placa inválido: {datos["placa"]}')
+    return ExtraccionPlaca(placa=placa)
+
+
+def validar_tiquete(contenido) -> ExtraccionTiquete:
+    """Extracción de tiquete de báscula (tabla campo/original/sugerido, acarreo, cargue y nota)."""
+    datos = cargar_json(contenido)
+    _validar(datos, ESQUEMA_TIQUETE)
+    return ExtraccionTiquete(
+        es_tiquete=datos['es_tiquete'],
+        campos=[CampoTiquete(c['campo'].strip(), c['original'].strip(), c['sugerido'].strip())
+                for c in datos['campos']],
+        acarreo=datos['acarreo'].strip(),
+        cargo=datos['cargo'].strip(),
+        nota=datos['nota'].strip(),
+        descripcion=datos['descripcion'].strip(),
+    )
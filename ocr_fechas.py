@@ -0,0 +1,293 @@
+"""
+Escáner de fechas de vencimiento en texto OCR de documentos (ARL, SOAT,
+tecnomecánica, licencia).
+
+``OCRDocumentService`` recorría el texto varias veces: un ``re.search`` por
+cada patrón contextual (sin compilar), tres ``finditer`` para listar fechas,
+búsquedas de subcadenas por cada fecha y un último ``findall`` genérico, y
+validaba cada fecha dos o tres veces. ``escanear_fechas`` hace un solo
+``finditer`` con una expresión compilada que reconoce a la vez fechas y
+palabras clave, y sobre esa lista de tokens aplica las mismas reglas:
+
+1. Reglas contextuales por tipo (p. ej. "soat ... vence 12/05/2027" o
+   "vence 12/05/2027 ... soat"), en el mismo orden que antes; gana la primera
+   regla cuya fecha sea válida.
+2. Si ninguna aplica, la fecha válida de mayor puntaje: +50 por cada palabra
+   de vencimiento y +30 por cada palabra del tipo en la ventana (30
+   caracteres antes, 50 desde la fecha), +20 si vence en los próximos 3 años,
+   -100 si ya venció, -50 si es a más de 5 años. A igual puntaje, la primera
+   del texto.
+
+El paso genérico anterior (primera fecha futura) nunca se alcanzaba: toda
+fecha válida ya entraba al paso 2.
+
+Diferencias deliberadas: una fecha ``aaaa-mm-dd`` se reconoce entera (antes
+los patrones ``dd/mm/aa`` leían "25-05-12" dentro de "2025-05-12") y también
+cuenta en las reglas contextuales.
+"""
+
+import re
+from bisect import bisect_left
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+_SEP = r'[/\-.]'
+_FECHA = (rf'(?P<anio_iso>\d{{4}}){_SEP}(?P<mes_iso>\d{{1,2}}){_SEP}(?P<dia_iso>\d{{1,2}})'
+          rf'|(?P<dia>\d{{1,2}}){_SEP}(?P<mes>\d{{1,2}}){_SEP}(?P<anio>\d{{2,4}})')
+
+# Palabras que usan las reglas y el puntaje; una más larga antes que su prefijo
+PALABRAS = (
+    'tecnomecánica', 'tecnomecanica', 'obligatorio', 'caducidad', 'categoría', 'categoria',
+    'siguiente', 'vigencia', 'licencia', 'conducir', 'vehiculo', 'revisión', 'mecánica',
+    'laboral', 'próxima', 'riesgo', 'seguro', 'expira', 'válido', 'poliza', 'póliza',
+    'soat', 'venc', 'arl',
+)
+# Subcadenas que una palabra contiene (las búsquedas anteriores eran por subcadena)
+_CONTIENE = {'tecnomecánica': ('mecánica',)}
+
+
+
+def _por_inicial(palabras) -> str:
+    """Alternativa agrupada por primera letra: el motor descarta cada posición con un solo carácter."""
+    grupos = {}
+    for palabra in palabras:
+        grupos.setdefault(palabra[0], []).append(re.escape(palabra[1:]))
+    return '|'.join(f'{re.escape(inicial)}(?:{"|".join(restos)})' for inicial, restos in grupos.items())
+
+
+_TOKENS = re.compile(rf'(?=\d)(?P<fecha>{_FECHA})|(?=[{"".join(sorted({p[0] for p in PALABRAS}))}])'
+                     rf'(?P<palabra>{_por_inicial(PALABRAS)})')
+_VENC_SUFIJO = re.compile(r'e?\s*:?\s*')
+_ESPACIOS = re.compile(r'\s+')
+_ESPECIALES = re.compile(r'[^\w\s/\-.:]')
+# "fecha vencimiento" se volvía "fecha vence" y luego "vence": se resuelve en un paso
+_SINONIMOS = re.compile(
+    r'fecha (?:vencimiento|vigencia|valido hasta|válido hasta|expira|caducidad|vence)'
+    r'|vencimiento|vigencia|valido hasta|válido hasta|expira|caducidad'
+)
+
+PALABRAS_VENCIMIENTO = ('venc', 'vigencia', 'válido', 'expira', 'caducidad')
+PALABRAS_TIPO = {
+    'arl': ('arl', 'riesgo', 'laboral', 'poliza'),
+    'soat': ('soat', 'seguro', 'obligatorio', 'vehiculo'),
+    'tecnomecanica': ('tecnomecanica', 'revisión', 'mecánica'),
+    'licencia': ('licencia', 'conducir', 'categoria'),
+}
+VENTANA_ANTES = 30
+VENTANA_DESPUES = 50
+
+# Una regla es una secuencia de elementos, en orden y con cualquier texto entre
+# ellos, o una lista de secuencias alternativas (gana la que empieza primero):
+#   frozenset        una de esas palabras
+#   ('par', a, sep, b)  palabra de ``a``, separador ``sep`` y palabra de ``b`` pegadas
+#   VENCE            "venc"/"vence" seguido de una fecha (la fecha de la regla)
+#   FECHA            cualquier fecha (la fecha de la regla)
+VENCE = 'vence'
+FECHA = 'fecha'
+
+
+def _par(a, sep, b):
+    return ('par', frozenset(a), re.compile(sep), frozenset(b))
+
+
+REGLAS = {
+    'arl': (
+        (frozenset({'arl'}) | {_par({'riesgo'}, r's?\s+', {'laboral'})}, VENCE),
+        (VENCE, frozenset({'arl', 'riesgo'})),
+        (frozenset({'poliza', 'póliza'}), VENCE),
+    ),
+    'soat': (
+        [(frozenset({'soat'}), VENCE), (frozenset({'seguro'}), frozenset({'obligatorio'}), VENCE)],
+        (VENCE, frozenset({'soat', 'seguro'})),
+        (frozenset({'poliza', 'póliza'}), frozenset({'soat', 'obligatorio'}), VENCE),
+    ),
+    'tecnomecanica': (
+        (frozenset({'tecnomecanica', 'tecnomecánica', 'revisión'}), VENCE),
+        (VENCE, frozenset({'tecnomecanica', 'revisión'})),
+        (frozenset({_par({'próxima', 'siguiente'}, r'\s+', {'revisión', 'tecnomecanica'})}), FECHA),
+    ),
+    'licencia': (
+        (frozenset({'licencia', 'conducir'}), VENCE),
+        (VENCE, frozenset({'licencia', 'conducir'})),
+        (frozenset({'categoria', 'categoría'}), VENCE),
+    ),
+}
+
+
+class Fecha:
+    """Fecha candidata: posición en el texto normalizado y valor (None si no es válida)."""
+
+    __slots__ = ('inicio', 'fin', 'texto', 'valor')
+
+    def __init__(self, inicio, fin, texto, valor):
+        self.inicio, self.fin, self.texto, self.valor = inicio, fin, texto, valor
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, espacios simples, sin símbolos y sinónimos de vencimiento como "vence"."""
+    texto = _ESPACIOS.sub(' ', texto.lower())
+    texto = _ESPECIALES.sub(' ', texto)
+    return _SINONIMOS.sub('vence', texto)
+
+
+def _valor(match, hoy: datetime) -> Optional[datetime]:
+    """Fecha del token si es real y está entre hace 5 y dentro de 10 años."""
+    if match.group('anio_iso'):
+        anio, mes, dia = match.group('anio_iso', 'mes_iso', 'dia_iso')
+    else:
+        dia, mes, anio = match.group('dia', 'mes', 'anio')
+        if len(anio) < 4:
+            anio = anio[:2]
+            anio = ('20' if int(anio) <= 30 else '19') + anio
+    try:
+        fecha = datetime(int(anio), int(mes), int(dia))
+    except ValueError:
+        return None
+    if fecha.year < hoy.year - 5 or fecha.year > hoy.year + 10:
+        return None
+    return fecha
+
+
+def tokenizar(texto: str, hoy: datetime = None) -> Tuple[List[Fecha], List[Tuple[int, int, str]]]:
+    """Un solo recorrido: fechas y palabras clave (``(inicio, fin, palabra)``) en orden."""
+    hoy = hoy or datetime.now()
+    fechas, palabras = [], []
+    for match in _TOKENS.finditer(texto):
+        if match.lastgroup != 'palabra':
+            fechas.append(Fecha(match.start(), match.end(), match.group(), _valor(match, hoy)))
+        else:
+            palabras.append((match.start(), match.end(), match.group('palabra')))
+    return fechas, palabras
+
+
+@lru_cache(maxsize=None)
+def _partes(elemento: frozenset):
+    """Palabras sueltas y pares de un elemento de regla (se calcula una vez por elemento)."""
+    return (frozenset(e for e in elemento if isinstance(e, str)),
+            tuple(e for e in elemento if isinstance(e, tuple)))
+
+
+class _Tokens:
+    def __init__(self, texto, fechas, palabras):
+        self.texto = texto
+        self.fechas = fechas
+        self.palabras = palabras
+        self.inicios_fecha = [f.inicio for f in fechas]
+        self.inicios_palabra = [p[0] for p in palabras]
+        self._vence = None
+
+    @property
+    def vence(self) -> List[Tuple[int, Fecha]]:
+        """``(inicio_venc, fecha)`` por cada "venc[e][:]" pegado a una fecha."""
+        if self._vence is None:
+            self._vence = []
+            for inicio, fin, palabra in self.palabras:
+                if palabra != 'venc':
+                    continue
+                pos = _VENC_SUFIJO.match(self.texto, fin).end()
+                i = bisect_left(self.inicios_fecha, pos)
+                if i < len(self.fechas) and self.fechas[i].inicio == pos:
+                    self._vence.append((inicio, self.fechas[i]))
+        return self._vence
+
+    def buscar(self, elemento, desde: int):
+        """Primera aparición de ``elemento`` que empieza en ``desde`` o después: ``(inicio, fin, fecha)``."""
+        if elemento == VENCE:
+            for inicio, fecha in self.vence:
+                if inicio >= desde:
+                    return inicio, fecha.fin, fecha
+            return None
+        if elemento == FECHA:
+            i = bisect_left(self.inicios_fecha, desde)
+            if i < len(self.fechas):
+                return self.fechas[i].inicio, self.fechas[i].fin, self.fechas[i]
+            return None
+        simples, pares = _partes(elemento)
+        for j in range(bisect_left(self.inicios_palabra, desde), len(self.palabras)):
+            inicio, fin, palabra = self.palabras[j]
+            if palabra in simples:
+                return inicio, fin, None
+            for _, primeras, separador, segundas in pares:
+                if palabra not in primeras or j + 1 >= len(self.palabras):
+                    continue
+                sig_inicio, sig_fin, siguiente = self.palabras[j + 1]
+                sep = separador.match(self.texto, fin)
+                if siguiente in segundas and sep and sep.end() == sig_inicio:
+                    return inicio, sig_fin, None
+        return None
+
+    def _secuencia(self, secuencia) -> Optional[Tuple[int, Fecha]]:
+        """``(inicio, fecha)`` si los elementos aparecen en orden, como la expresión ``a.*?b.*?c``."""
+        desde, primero, fecha = 0, None, None
+        for elemento in secuencia:
+            encontrado = self.buscar(elemento, desde)
+            if encontrado is None:
+                return None
+            inicio, desde, hallada = encontrado
+            primero = inicio if primero is None else primero
+            fecha = hallada or fecha
+        return primero, fecha
+
+    def aplicar(self, regla) -> Optional[Fecha]:
+        """Fecha de la regla (de la alternativa que empieza primero, si hay varias)."""
+        encontradas = [r for r in (self._secuencia(s) for s in (regla if isinstance(regla, list) else [regla]))
+                       if r is not None]
+        return min(encontradas, key=lambda r: r[0])[1] if encontradas else None
+
+
+def _puntaje(tokens: _Tokens, fecha: Fecha, palabras_tipo, hoy: datetime) -> int:
+    presentes = set()
+    i = bisect_left(tokens.inicios_palabra, fecha.inicio - VENTANA_ANTES)
+    while i < len(tokens.palabras):
+        inicio, fin, palabra = tokens.palabras[i]
+        if inicio >= fecha.inicio + VENTANA_DESPUES:
+            break
+        # Ventana de antes y ventana desde la fecha, sin cruzar el inicio de la fecha
+        if fin <= fecha.inicio or (inicio >= fecha.inicio and fin <= fecha.inicio + VENTANA_DESPUES):
+            presentes.add(palabra)
+            presentes.update(_CONTIENE.get(palabra, ()))
+        i += 1
+    puntaje = 50 * sum(1 for p in PALABRAS_VENCIMIENTO if p in presentes)
+    puntaje += 30 * sum(1 for p in palabras_tipo if p in presentes)
+    dias = (fecha.valor - hoy).days
+    if 0 <= dias <= 365 * 3:
+        puntaje += 20
+    elif dias < 0:
+        puntaje -= 100
+    elif dias > 365 * 5:
+        puntaje -= 50
+    return puntaje
+
+
+def escanear_fechas(texto: str, tipo_documento: str, hoy: datetime = None) -> Optional[Dict]:
+    """
+    Fecha de vencimiento más probable en el texto OCR de un documento.
+
+    Returns:
+        dict: ``{'fecha': 'YYYY-MM-DD', 'texto': fecha como aparece, 'estrategia':
+        'contextual' o 'puntaje', 'puntaje', 'candidatas'}``, o None si no hay
+        fechas válidas.
+    """
+    hoy = hoy or datetime.now()
+    normalizado = normalizar(texto)
+    fechas, palabras = tokenizar(normalizado, hoy)
+    validas = [f for f in fechas if f.valor is not None]
+    if not validas:
+        return None
+    tokens = _Tokens(normalizado, fechas, palabras)
+
+    for regla in REGLAS.get(tipo_documento, REGLAS['arl']):
+        fecha = tokens.aplicar(regla)
+        if fecha is not None and fecha.valor is not None:
+            return {'fecha': fecha.valor.strftime('%Y-%m-%d'), 'texto': fecha.texto,
+                    'estrategia': 'contextual', 'puntaje': None, 'candidatas': len(validas)}
+
+    palabras_tipo = PALABRAS_TIPO.get(tipo_documento, ())
+    mejor, mejor_puntaje = None, None
+    for fecha in validas:
+        puntaje = _puntaje(tokens, fecha, palabras_tipo, hoy)
+        if mejor_puntaje is None or puntaje > mejor_puntaje:
+            mejor, mejor_puntaje = fecha, puntaje
+    return {'fecha': mejor.valor.strftime('%Y-%m-%d'), 'texto': mejor.texto,
+            'estrategia': 'puntaje', 'puntaje': mejor_puntaje, 'candidatas': len(validas)}
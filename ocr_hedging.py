@@ -0,0 +1,260 @@
+"""
+Ejecución con cobertura (hedging) y tiempo límite de una cadena de fallback OCR.
+
+La cadena de ``OCRDocumentService`` (visión → OCR local + LangChain → regex
+→ webhook) se ejecutaba estrictamente en serie: una estrategia que fallaba
+lento (el webhook espera hasta 30 s) retrasaba todas las siguientes.
+
+``run_hedged`` ejecuta las estrategias en orden de preferencia sobre un pool
+de hilos:
+
+- Empieza la primera. Si falla, la siguiente arranca de inmediato; si tarda
+  más de ``hedge_delay`` sin responder, la siguiente arranca en paralelo
+  (sin cancelar la anterior).
+- Gana la primera respuesta que pase ``validar``; las demás se cancelan (las
+  que no arrancaron no se ejecutan y las que están corriendo ven
+  ``cancel_event`` activado y su resultado se descarta).
+- Nunca se espera más de ``deadline``: al vencer se devuelve un fallo con lo
+  intentado hasta ese momento.
+
+Cada estrategia recibe el instante límite absoluto (``time.monotonic()``)
+para acotar sus propios timeouts (red, OCR local) con ``remaining(deadline)``,
+y ``cancel_event`` para no empezar pasos caros si ya no hace falta: una
+estrategia abandonada sigue ocupando un hilo del pool hasta que vuelve.
+Si el pool está lleno, ``run_hedged`` no encola más: una estrategia en cola
+no arrancaría antes del límite. La cobertura se pospone mientras haya otra
+en curso; si no hay ninguna, la estrategia queda como ``saturado`` y se
+prueba la siguiente. El
+resultado incluye ``intentos``: por estrategia, cuándo arrancó, cuánto tardó
+y cómo terminó. Las estrategias corren con una copia del contexto
+(``contextvars``) del hilo que llama, para que vean, p. ej., el contexto de
+telemetría de la solicitud (ver ocr_telemetria).
+
+``run_batch`` ejecuta en paralelo varias cadenas independientes (los
+documentos de un vehículo) bajo un mismo tiempo límite, en un pool aparte:
+cada tarea espera a sus estrategias, y si compartieran pool con ellas
+podrían ocupar todos los hilos y bloquearse.
+
+Configuración (variables de entorno):
+    OCR_DEADLINE_SECONDS      presupuesto total (default 12)
+    OCR_HEDGE_DELAY_SECONDS   espera antes de lanzar la siguiente (default 4)
+    OCR_HEDGE_WORKERS         hilos de estrategias (default 16)
+    OCR_BATCH_WORKERS         hilos de tareas de ``run_batch`` (default 8)
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEADLINE_SECONDS = float(os.getenv('OCR_DEADLINE_SECONDS', '12'))
+DEFAULT_HEDGE_DELAY_SECONDS = float(os.getenv('OCR_HEDGE_DELAY_SECONDS', '4'))
+
+# Las estrategias abandonadas siguen corriendo hasta su propio timeout
+HEDGE_WORKERS = int(os.getenv('OCR_HEDGE_WORKERS', '16'))
+_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='ocr-hedge')
+_batch_executor = ThreadPoolExecutor(max_workers=int(os.getenv('OCR_BATCH_WORKERS', '8')),
+                                     thread_name_prefix='ocr-batch')
+
+Estrategia = Tuple[str, Callable[[float, threading.Event], Dict[str, Any]]]
+
+
+def remaining(deadline: Optional[float], tope: Optional[float] = None, minimo: float = 0.5) -> Optional[float]:
+    """Segundos que quedan hasta ``deadline`` (acotados por ``tope``); None si no hay límite."""
+    if deadline is None:
+        return tope
+    restante = max(minimo, deadline - time.monotonic())
+    return min(restante, tope) if tope is not None else restante
+
+
+# Estrategias enviadas a _executor que aún no terminan (corriendo o en cola)
+_en_pool = 0
+_en_pool_lock = threading.Lock()
+
+
+def _liberar_hilo():
+    global _en_pool
+    with _en_pool_lock:
+        _en_pool -= 1
+
+
+def _ejecutar(func, limite, cancel_event):
+    try:
+        return func(limite, cancel_event)
+    finally:
+        _liberar_hilo()
+
+
+def _reservar_hilo() -> bool:
+    """Cuenta un hilo de estrategia si queda alguno libre."""
+    global _en_pool
+    with _en_pool_lock:
+        if _en_pool >= HEDGE_WORKERS:
+            return False
+        _en_pool += 1
+        return True
+
+
+def _default_validar(resultado):
+    return isinstance(resultado, dict) and bool(resultado.get('success'))
+
+
+def run_hedged(estrategias: List[Estrategia], deadline: float = None, hedge_delay: float = None,
+               validar: Callable[[Dict[str, Any]], bool] = _default_validar) -> Dict[str, Any]:
+    """
+    Ejecuta ``estrategias`` (``[(nombre, func(deadline, cancel_event))]``) con cobertura.
+
+    Returns:
+        dict: El primer resultado válido, o el último fallo (o uno de tiempo
+        límite), con ``intentos`` agregado.
+    """
+    deadline = DEFAULT_DEADLINE_SECONDS if deadline is None else deadline
+    hedge_delay = DEFAULT_HEDGE_DELAY_SECONDS if hedge_delay is None else hedge_delay
+    inicio = time.monotonic()
+    limite = inicio + deadline
+    cancel_event = threading.Event()
+
+    intentos = []
+    en_curso = {}  # future -> intento
+    siguiente = 0
+    ultimo_fallo = None
+    proximo_hedge = None
+
+    def lanzar():
+        """Lanza la siguiente estrategia; False si el pool está lleno (cobertura pospuesta)."""
+        nonlocal siguiente, proximo_hedge
+        while siguiente < len(estrategias):
+            if not _reservar_hilo():
+                if en_curso:
+                    # Ya hay una en curso: reintentar la cobertura en un momento
+                    proximo_hedge = time.monotonic() + min(hedge_delay, 0.25)
+                    return False
+                nombre, _ = estrategias[siguiente]
+                siguiente += 1
+                intentos.append({'estrategia': nombre, 'estado': 'saturado'})
+                logger.warning(f"Pool de estrategias OCR lleno ({HEDGE_WORKERS}); se omite {nombre}")
+                continue
+            nombre, func = estrategias[siguiente]
+            siguiente += 1
+            intento = {'estrategia': nombre, 'inicio_ms': round((time.monotonic() - inicio) * 1000),
+                       'estado': 'en_curso'}
+            intentos.append(intento)
+            en_curso[_executor.submit(contextvars.copy_context().run, _ejecutar, func, limite, cancel_event)] = intento
+            proximo_hedge = time.monotonic() + hedge_delay
+            return True
+        return False
+
+    def terminar(intento, estado):
+        intento['estado'] = estado
+        intento['duracion_ms'] = round((time.monotonic() - inicio) * 1000) - intento['inicio_ms']
+
+    ganador = None
+    if estrategias:
+        lanzar()
+    while en_curso and ganador is None:
+        ahora = time.monotonic()
+        if ahora >= limite:
+            break
+        espera = limite - ahora
+        if siguiente < len(estrategias):
+            espera = min(espera, max(0.0, proximo_hedge - ahora))
+        listos, _ = wait(list(en_curso), timeout=espera, return_when=FIRST_COMPLETED)
+
+        for future in listos:
+            intento = en_curso.pop(future)
+            try:
+                resultado = future.result()
+            except Exception as e:
+                logger.warning(f"Estrategia OCR {intento['estrategia']} lanzó excepción: {e}")
+                resultado = {'success': False, 'message': f"Error en {intento['estrategia']}: {e}"}
+            if ganador is not None:
+                terminar(intento, 'descartado')
+            elif validar(resultado):
+                terminar(intento, 'exito')
+                ganador = resultado
+            else:
+                terminar(intento, 'fallo')
+                ultimo_fallo = resultado
+
+        if ganador is None and siguiente < len(estrategias):
+            # Fallaron todas las que corrían, o venció la espera de cobertura
+            if not en_curso or time.monotonic() >= proximo_hedge:
+                lanzar()
+
+    cancel_event.set()
+    vencido = ganador is None and time.monotonic() >= limite
+    for future, intento in en_curso.items():
+        if future.cancel():
+            # No llegó a correr: _ejecutar no descontará su hilo
+            _liberar_hilo()
+        terminar(intento, 'tiempo_limite' if vencido else 'cancelado')
+    for nombre, _ in estrategias[siguiente:]:
+        intentos.append({'estrategia': nombre, 'estado': 'no_ejecutada'})
+
+    if ganador is not None:
+        resultado = dict(ganador)
+    elif vencido:
+        resultado = {'success': False,
+                     'message': f'No se obtuvo un resultado válido en {deadline:.0f} s. Intente de nuevo o ingrese la fecha manualmente.'}
+    elif ultimo_fallo is None and any(i['estado'] == 'saturado' for i in intentos):
+        resultado = {'success': False, 'saturado': True,
+                     'message': 'El servicio OCR está ocupado. Intente de nuevo en unos segundos o ingrese la fecha manualmente.'}
+    else:
+        resultado = dict(ultimo_fallo or {'success': False, 'message': 'Ninguna estrategia disponible'})
+    resultado['intentos'] = intentos
+    resultado['duracion_total_ms'] = round((time.monotonic() - inicio) * 1000)
+    logger.info(f"Cadena OCR: {'éxito' if ganador is not None else 'sin resultado'} en "
+                f"{resultado['duracion_total_ms']} ms - " +
+                ', '.join(f"{i['estrategia']}={i['estado']}" for i in intentos))
+    return resultado
+
+
+def run_batch(tareas: Dict[str, Callable[[float], Dict[str, Any]]], deadline: float = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Ejecuta ``tareas`` (``{clave: func(limite)}``) en paralelo con un tiempo límite común.
+
+    Cada tarea recibe el instante límite absoluto (``time.monotonic()``). Las
+    que no terminan a tiempo quedan como fallo con ``tiempo_limite: True``
+    (siguen corriendo hasta su propio timeout, pero se ignoran).
+
+    Returns:
+        dict: ``{clave: resultado}`` con ``duracion_ms`` agregado a cada uno.
+    """
+    deadline = DEFAULT_DEADLINE_SECONDS if deadline is None else deadline
+    inicio = time.monotonic()
+    limite = inicio + deadline
+    futuros = {_batch_executor.submit(contextvars.copy_context().run, func, limite): clave
+               for clave, func in tareas.items()}
+    terminados = {}
+
+    # Margen para que las tareas que respetan el límite devuelvan su propio fallo
+    pendientes = set(futuros)
+    while pendientes:
+        restante = limite + 0.5 - time.monotonic()
+        if restante <= 0:
+            break
+        listos, pendientes = wait(pendientes, timeout=restante, return_when=FIRST_COMPLETED)
+        for future in listos:
+            clave = futuros[future]
+            try:
+                resultado = dict(future.result())
+            except Exception as e:
+                logger.warning(f"Tarea OCR {clave} lanzó excepción: {e}")
+                resultado = {'success': False, 'message': f'Error interno: {e}'}
+            resultado['duracion_ms'] = round((time.monotonic() - inicio) * 1000)
+            terminados[clave] = resultado
+
+    for future in pendientes:
+        future.cancel()
+        terminados[futuros[future]] = {
+            'success': False,
+            'tiempo_limite': True,
+            'message': f'No se obtuvo un resultado en {deadline:.0f} s. Intente de nuevo o ingrese la fecha manualmente.',
+            'duracion_ms': round((time.monotonic() - inicio) * 1000),
+        }
+    return {clave: terminados[clave] for clave in tareas}
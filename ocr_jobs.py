@@ -0,0 +1,435 @@
+"""
+Cola persistente de trabajos OCR (SQLite) con pool de hilos.
+
+El OCR de placas, documentos y tiquetes se hacía dentro de la petición, así
+que un worker de gunicorn quedaba ocupado durante toda la ida y vuelta a la
+API de visión. Con la cola, la vista guarda la imagen, llama a ``encolar`` y
+responde de inmediato con el id; el cliente consulta ``estado`` hasta que el
+trabajo termina.
+
+- Prioridades: menor número primero (``PRIORIDADES``: portería antes que
+  oficina); a igual prioridad, por orden de llegada.
+- Reintentos: un manejador que lanza excepción se reintenta con backoff
+  exponencial hasta ``max_intentos`` de la política del tipo (``POLITICAS``).
+  Un resultado con ``success: False`` es un resultado, no se reintenta.
+- Recuperación: cada trabajo tomado tiene un ``lease`` que el pool renueva
+  mientras el manejador corre. Si el proceso muere, ``recuperar_huerfanos``
+  (al arrancar el pool y periódicamente) devuelve a pendiente los trabajos
+  con el lease vencido. ``completar`` y ``fallar`` solo escriben si el trabajo
+  sigue en proceso a nombre del mismo worker: un worker que perdió el lease
+  no pisa el resultado del que lo retomó.
+- Limpieza: ``purgar`` borra los trabajos terminados más antiguos que la
+  retención y las imágenes de su payload que estén en ``directorio_archivos``.
+- Los manejadores se registran por tipo con ``registrar_tipo``; ``placa``,
+  ``documento`` y ``documentos`` (todos los de un vehículo en paralelo)
+  vienen registrados.
+
+Los hilos corren dentro del proceso que llama a ``iniciar_pool`` (cada worker
+web al arrancar, en ``post_fork`` de gunicorn, y en cualquier petición a
+``/ocr/jobs``) o en un proceso dedicado con ``scripts/ocr_worker.py``.
+
+Configuración (variables de entorno):
+    OCR_JOBS_PATH             default instance/ocr_jobs.db
+    OCR_JOBS_THREADS          hilos por proceso (default 2; 0 = no procesar aquí)
+    OCR_JOBS_LEASE_SECONDS    default 180
+    OCR_JOBS_RETENTION_DAYS   días que se guardan los trabajos terminados (default 7)
+    OCR_JOBS_UPLOAD_DIR       imágenes subidas a la cola (default app/static/uploads/ocr_jobs)
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'ocr_jobs.db')
+# UPLOAD_FOLDER/ocr_jobs de config.Config
+_DEFAULT_UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'static', 'uploads',
+                                   'ocr_jobs')
+
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+COMPLETADO = 'completado'
+FALLIDO = 'fallido'
+ESTADOS_FINALES = (COMPLETADO, FALLIDO)
+
+PRIORIDADES = {'porteria': 0, 'normal': 5, 'oficina': 10}
+
+# Intentos totales y base del backoff en segundos por tipo
+POLITICAS = {
+    'placa': {'max_intentos': 2, 'backoff': 1.0},
+    'documento': {'max_intentos': 3, 'backoff': 3.0},
+    'documentos': {'max_intentos': 2, 'backoff': 3.0},
+    'tiquete': {'max_intentos': 3, 'backoff': 3.0},
+}
+POLITICA_DEFAULT = {'max_intentos': 2, 'backoff': 2.0}
+
+TIPOS_DOCUMENTO = ('arl', 'soat', 'tecnomecanica', 'licencia')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_jobs (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    prioridad INTEGER NOT NULL,
+    estado TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    resultado TEXT,
+    error TEXT,
+    usuario TEXT,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    max_intentos INTEGER NOT NULL,
+    disponible_en REAL NOT NULL,
+    lease_hasta REAL,
+    worker TEXT,
+    creado REAL NOT NULL,
+    iniciado REAL,
+    terminado REAL
+);
+CREATE INDEX IF NOT EXISTS ix_ocr_jobs_cola ON ocr_jobs (estado, prioridad, disponible_en, creado);
+CREATE INDEX IF NOT EXISTS ix_ocr_jobs_lease ON ocr_jobs (estado, lease_hasta);
+"""
+
+_manejadores: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+
+
+def registrar_tipo(tipo: str, manejador: Callable[[Dict[str, Any]], Dict[str, Any]]) -> None:
+    """Registra ``manejador(payload) -> dict`` para los trabajos de ``tipo``."""
+    _manejadores[tipo] = manejador
+
+
+def tipo_soportado(tipo: str) -> bool:
+    """True si hay un manejador registrado para ``tipo``."""
+    return tipo in _manejadores
+
+
+def _procesar_placa(payload):
+    from ocr_service_backup import ocr_placa_service
+    return ocr_placa_service.process_placa_image(
+        payload['image_path'], payload.get('usuario') or 'sistema', payload.get('placa_registrada'))
+
+
+def _procesar_documento(payload):
+    from ocr_service_backup import ocr_service
+    return ocr_service.process_document(
+        payload['image_path'], payload['tipo_documento'], payload.get('usuario') or 'sistema')
+
+
+def _procesar_documentos(payload):
+    from ocr_service_backup import ocr_service
+    return ocr_service.process_documents(payload['documentos'], payload.get('usuario') or 'sistema')
+
+
+registrar_tipo('placa', _procesar_placa)
+registrar_tipo('documento', _procesar_documento)
+registrar_tipo('documentos', _procesar_documentos)
+
+
+def _archivos(payload: Dict[str, Any]):
+    """Rutas de imagen de un payload (``image_path`` o los valores de ``documentos``)."""
+    rutas = list((payload.get('documentos') or {}).values())
+    if payload.get('image_path'):
+        rutas.append(payload['image_path'])
+    return rutas
+
+
+class ColaOCR:
+    """Cola de trabajos OCR sobre SQLite (WAL, una conexión por hilo y proceso)."""
+
+    def __init__(self, path: str, lease_seconds: float = 180, retention_days: float = 7,
+                 directorio_archivos: str = None):
+        self.path = path
+        self.directorio_archivos = directorio_archivos
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_days * 86400
+        self._local = threading.local()
+        self._schema_ready = False
+        self._lock = threading.Lock()
+        self._hay_trabajo = threading.Event()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        with self._lock:
+            if not self._schema_ready:
+                conn.executescript(_SCHEMA)
+                self._schema_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def encolar(self, tipo: str, payload: Dict[str, Any], prioridad: int = PRIORIDADES['normal'],
+                usuario: str = None) -> str:
+        """Guarda un trabajo pendiente y devuelve su id."""
+        if not tipo_soportado(tipo):
+            raise ValueError(f'Tipo de trabajo OCR no soportado: {tipo}')
+        politica = POLITICAS.get(tipo, POLITICA_DEFAULT)
+        job_id = uuid.uuid4().hex
+        ahora = time.time()
+        self._conn().execute(
+            'INSERT INTO ocr_jobs (id, tipo, prioridad, estado, payload, usuario, max_intentos, disponible_en, creado) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, tipo, prioridad, PENDIENTE, json.dumps(payload, ensure_ascii=False), usuario,
+             politica['max_intentos'], ahora, ahora),
+        )
+        self._hay_trabajo.set()
+        return job_id
+
+    def tomar(self, worker: str) -> Optional[sqlite3.Row]:
+        """Marca en proceso el siguiente trabajo disponible (por prioridad) y lo devuelve."""
+        ahora = time.time()
+        return self._conn().execute(
+            'UPDATE ocr_jobs SET estado = ?, worker = ?, intentos = intentos + 1, iniciado = ?, lease_hasta = ? '
+            'WHERE id = (SELECT id FROM ocr_jobs WHERE estado = ? AND disponible_en <= ? '
+            '            ORDER BY prioridad, creado LIMIT 1) AND estado = ? '
+            'RETURNING id, tipo, payload, intentos, max_intentos, worker',
+            (EN_PROCESO, worker, ahora, ahora + self.lease_seconds, PENDIENTE, ahora, PENDIENTE),
+        ).fetchone()
+
+    def renovar(self, job_id: str, worker: str) -> bool:
+        """Extiende el lease de un trabajo en proceso de ``worker``; False si ya no es suyo."""
+        return self._conn().execute(
+            'UPDATE ocr_jobs SET lease_hasta = ? WHERE id = ? AND worker = ? AND estado = ?',
+            (time.time() + self.lease_seconds, job_id, worker, EN_PROCESO),
+        ).rowcount == 1
+
+    def completar(self, job_id: str, worker: str, resultado: Dict[str, Any]) -> bool:
+        """Guarda el resultado; False si ``worker`` ya no tenía el trabajo (se descarta)."""
+        return self._conn().execute(
+            'UPDATE ocr_jobs SET estado = ?, resultado = ?, terminado = ?, lease_hasta = NULL '
+            'WHERE id = ? AND worker = ? AND estado = ?',
+            (COMPLETADO, json.dumps(resultado, ensure_ascii=False, default=str), time.time(), job_id, worker,
+             EN_PROCESO),
+        ).rowcount == 1
+
+    def fallar(self, job_id: str, worker: str, error: str, intentos: int, max_intentos: int,
+               backoff: float) -> bool:
+        """Registra el error; devuelve True si el trabajo se reprogramó.
+
+        Si ``worker`` ya no tenía el trabajo no escribe nada y devuelve False.
+        """
+        ahora = time.time()
+        if intentos < max_intentos:
+            return self._conn().execute(
+                'UPDATE ocr_jobs SET estado = ?, error = ?, disponible_en = ?, lease_hasta = NULL, worker = NULL '
+                'WHERE id = ? AND worker = ? AND estado = ?',
+                (PENDIENTE, error, ahora + backoff * 2 ** (intentos - 1), job_id, worker, EN_PROCESO),
+            ).rowcount == 1
+        self._conn().execute(
+            'UPDATE ocr_jobs SET estado = ?, error = ?, terminado = ?, lease_hasta = NULL '
+            'WHERE id = ? AND worker = ? AND estado = ?',
+            (FALLIDO, error, ahora, job_id, worker, EN_PROCESO),
+        )
+        return False
+
+    def recuperar_huerfanos(self) -> int:
+        """Devuelve a pendiente (o falla) los trabajos cuyo lease venció; devuelve cuántos."""
+        ahora = time.time()
+        conn = self._conn()
+        fallidos = conn.execute(
+            'UPDATE ocr_jobs SET estado = ?, error = ?, terminado = ?, lease_hasta = NULL '
+            'WHERE estado = ? AND lease_hasta < ? AND intentos >= max_intentos',
+            (FALLIDO, 'El proceso que lo atendía se detuvo', ahora, EN_PROCESO, ahora),
+        ).rowcount
+        devueltos = conn.execute(
+            'UPDATE ocr_jobs SET estado = ?, lease_hasta = NULL, worker = NULL '
+            'WHERE estado = ? AND lease_hasta < ?',
+            (PENDIENTE, EN_PROCESO, ahora),
+        ).rowcount
+        if fallidos or devueltos:
+            logger.warning(f"Cola OCR: {devueltos} trabajos huérfanos reprogramados, {fallidos} fallidos")
+            self._hay_trabajo.set()
+        return fallidos + devueltos
+
+    def purgar(self) -> int:
+        """Borra los trabajos terminados más antiguos que la retención y sus imágenes; devuelve cuántos."""
+        filas = self._conn().execute(
+            'DELETE FROM ocr_jobs WHERE estado IN (?, ?) AND terminado < ? RETURNING payload',
+            ESTADOS_FINALES + (time.time() - self.retention_seconds,),
+        ).fetchall()
+        for fila in filas:
+            for ruta in _archivos(json.loads(fila['payload'])):
+                self._borrar_archivo(ruta)
+        return len(filas)
+
+    def _borrar_archivo(self, ruta: str) -> None:
+        """Borra ``ruta`` solo si está dentro de ``directorio_archivos``."""
+        if not self.directorio_archivos:
+            return
+        directorio = os.path.realpath(self.directorio_archivos)
+        if os.path.dirname(os.path.realpath(ruta)) != directorio:
+            return
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"No se pudo borrar la imagen {ruta} de la cola OCR: {e}")
+
+    def estado(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado público del trabajo (con ``resultado`` si terminó); None si no existe."""
+        fila = self._conn().execute('SELECT * FROM ocr_jobs WHERE id = ?', (job_id,)).fetchone()
+        if fila is None:
+            return None
+        datos = {
+            'job_id': fila['id'],
+            'tipo': fila['tipo'],
+            'estado': fila['estado'],
+            'prioridad': fila['prioridad'],
+            'intentos': fila['intentos'],
+            'creado': fila['creado'],
+            'usuario': fila['usuario'],
+        }
+        if fila['estado'] == PENDIENTE:
+            datos['posicion'] = self._conn().execute(
+                'SELECT COUNT(*) FROM ocr_jobs WHERE estado = ? AND (prioridad < ? OR (prioridad = ? AND creado < ?))',
+                (PENDIENTE, fila['prioridad'], fila['prioridad'], fila['creado']),
+            ).fetchone()[0]
+        if fila['terminado']:
+            datos['duracion_ms'] = round((fila['terminado'] - fila['creado']) * 1000)
+        if fila['resultado']:
+            datos['resultado'] = json.loads(fila['resultado'])
+        if fila['error']:
+            datos['error'] = fila['error']
+        return datos
+
+    def resumen(self) -> Dict[str, int]:
+        return {estado: n for estado, n in self._conn().execute(
+            'SELECT estado, COUNT(*) FROM ocr_jobs GROUP BY estado')}
+
+    def esperar_trabajo(self, segundos: float) -> None:
+        self._hay_trabajo.wait(segundos)
+        self._hay_trabajo.clear()
+
+
+class PoolOCR:
+    """Hilos que toman y ejecutan trabajos de ``cola``."""
+
+    def __init__(self, cola: ColaOCR, hilos: int = 2, app=None, poll_seconds: float = 1.0):
+        self.cola = cola
+        self.hilos = hilos
+        self.app = app
+        self.poll_seconds = poll_seconds
+        self._detener = threading.Event()
+        self._threads = []
+
+    def iniciar(self) -> None:
+        self.cola.recuperar_huerfanos()
+        for i in range(self.hilos):
+            hilo = threading.Thread(target=self._ciclo, name=f'ocr-job-{i}', daemon=True)
+            hilo.start()
+            self._threads.append(hilo)
+        hilo = threading.Thread(target=self._mantenimiento, name='ocr-job-mant', daemon=True)
+        hilo.start()
+        self._threads.append(hilo)
+        logger.info(f"Pool OCR iniciado: {self.hilos} hilos sobre {self.cola.path}")
+
+    def detener(self, timeout: float = None) -> None:
+        self._detener.set()
+        self.cola._hay_trabajo.set()
+        for hilo in self._threads:
+            hilo.join(timeout)
+
+    def _mantenimiento(self):
+        while not self._detener.wait(max(10.0, self.cola.lease_seconds / 3)):
+            try:
+                self.cola.recuperar_huerfanos()
+                self.cola.purgar()
+            except sqlite3.Error as e:
+                logger.warning(f"Mantenimiento de la cola OCR falló: {e}")
+
+    def _ciclo(self):
+        worker = f'{os.getpid()}:{threading.current_thread().name}'
+        while not self._detener.is_set():
+            try:
+                trabajo = self.cola.tomar(worker)
+            except sqlite3.Error as e:
+                logger.warning(f"Cola OCR no disponible: {e}")
+                trabajo = None
+            if trabajo is None:
+                self.cola.esperar_trabajo(self.poll_seconds)
+                continue
+            self.ejecutar(trabajo)
+
+    def _renovar_lease(self, job_id: str, worker: str, terminado: threading.Event):
+        # Un lote de documentos con reintentos HTTP puede durar más que el lease
+        while not terminado.wait(self.cola.lease_seconds / 3):
+            try:
+                if not self.cola.renovar(job_id, worker):
+                    logger.warning(f"Trabajo OCR {job_id}: {worker} perdió el lease")
+                    return
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo renovar el lease del trabajo OCR {job_id}: {e}")
+
+    def ejecutar(self, trabajo) -> None:
+        job_id, tipo, worker = trabajo['id'], trabajo['tipo'], trabajo['worker']
+        payload = json.loads(trabajo['payload'])
+        politica = POLITICAS.get(tipo, POLITICA_DEFAULT)
+        inicio = time.perf_counter()
+        terminado = threading.Event()
+        threading.Thread(target=self._renovar_lease, args=(job_id, worker, terminado),
+                         name=f'ocr-lease-{job_id[:8]}', daemon=True).start()
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    resultado = _manejadores[tipo](payload)
+            else:
+                resultado = _manejadores[tipo](payload)
+        except Exception as e:
+            terminado.set()
+            reprogramado = self.cola.fallar(job_id, worker, f'{type(e).__name__}: {e}', trabajo['intentos'],
+                                            trabajo['max_intentos'], politica['backoff'])
+            logger.error(f"Trabajo OCR {job_id} ({tipo}) falló en el intento {trabajo['intentos']}: {e}"
+                         + (' - se reintentará' if reprogramado else ''))
+            return
+        terminado.set()
+        if not self.cola.completar(job_id, worker, resultado):
+            logger.warning(f"Trabajo OCR {job_id} ({tipo}): resultado descartado, {worker} ya no tenía el trabajo")
+            return
+        logger.info(f"Trabajo OCR {job_id} ({tipo}) completado en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+
+_cola = None
+_pool = None
+_pool_pid = None
+_init_lock = threading.Lock()
+
+
+def get_cola() -> ColaOCR:
+    """Cola compartida del proceso, configurada por variables de entorno."""
+    global _cola
+    if _cola is None:
+        with _init_lock:
+            if _cola is None:
+                _cola = ColaOCR(
+                    os.getenv('OCR_JOBS_PATH') or _DEFAULT_PATH,
+                    lease_seconds=float(os.getenv('OCR_JOBS_LEASE_SECONDS', '180')),
+                    retention_days=float(os.getenv('OCR_JOBS_RETENTION_DAYS', '7')),
+                    directorio_archivos=os.getenv('OCR_JOBS_UPLOAD_DIR') or _DEFAULT_UPLOAD_DIR,
+                )
+    return _cola
+
+
+def iniciar_pool(app=None, hilos: int = None) -> Optional[PoolOCR]:
+    """Inicia (una vez por proceso) el pool de hilos; None si ``OCR_JOBS_THREADS`` es 0."""
+    global _pool, _pool_pid
+    hilos = int(os.getenv('OCR_JOBS_THREADS', '2')) if hilos is None else hilos
+    if hilos <= 0:
+        return None
+    if _pool is None or _pool_pid != os.getpid():
+        with _init_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = PoolOCR(get_cola(), hilos=hilos, app=app)
+                _pool.iniciar()
+                _pool_pid = os.getpid()
+    return _pool
@@ -0,0 +1,29 @@
+"""
+Hooks de métricas Prometheus (``app.utils.metrics``) para los módulos OCR.
+
+Los módulos OCR también corren fuera de la app Flask (scripts, benchmarks,
+``ocr_worker``). Allí importar ``app`` puede fallar con algo distinto de
+``ImportError`` (p. ej. ``KeyError`` de importlib si el paquete ``app``
+quedó a medio importar en un intento anterior), así que la importación se
+hace una sola vez aquí y cualquier error deja los hooks como no-ops.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.utils.metrics import ocr_timer, record_breaker, record_cache
+    METRICS_AVAILABLE = True
+except Exception as e:
+    logger.debug(f"Métricas de la app no disponibles ({type(e).__name__}: {e}); hooks OCR sin efecto")
+    METRICS_AVAILABLE = False
+
+    def ocr_timer(backend):
+        return lambda func: func
+
+    def record_cache(cache, hit):
+        pass
+
+    def record_breaker(backend, event):
+        pass
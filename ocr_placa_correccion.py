@@ -0,0 +1,301 @@
+"""
+Corrección de placas leídas por OCR contra las placas conocidas de la flota.
+
+Las lecturas erradas de OCR suelen ser confusiones de un carácter (O/0, I/1,
+B/8...). Cuando ``process_placa_image`` devuelve una placa que no coincide con
+``placa_registrada`` o que no está en la flota, ``IndicePlacas`` sugiere las
+placas conocidas más cercanas sin una segunda llamada paga de visión.
+
+El índice (``IndiceBorrados``, borrado simétrico: un BK-tree en Python tarda
+decenas de ms por consulta con miles de placas) guarda las placas de
+``maestro_vehiculos``, ``enturnamientos_graneles`` y las entradas de fruta
+recientes (``entry_records.placa`` de los últimos ``PLACA_INDEX_DIAS`` días).
+Las candidatas a ``MAX_EDICIONES`` ediciones de Levenshtein se ordenan con una
+distancia ponderada por confusión de OCR (sustituir 0 por O cuesta 0.25, no 1)
+y luego por fuente (maestro primero) y frecuencia.
+
+Se mantiene fresco por incrementos: cada consulta, si pasaron más de
+``PLACA_INDEX_REFRESH_SECONDS``, agrega las filas con id mayor al último
+visto. Una placa que deja de existir queda en el índice hasta la
+reconstrucción completa (``PLACA_INDEX_REBUILD_HOURS``); como sugerencia es
+inofensiva.
+
+Configuración (variables de entorno):
+    PLACA_INDEX_DIAS               días de entry_records a indexar (default 180)
+    PLACA_INDEX_REFRESH_SECONDS    default 30
+    PLACA_INDEX_REBUILD_HOURS      default 24
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_EDICIONES = 2
+# Distancia ponderada máxima para sugerir automáticamente (dos confusiones típicas)
+MAX_DISTANCIA_SUGERENCIA = 0.5
+
+# Pares que el OCR confunde; costo de sustitución reducido (simétrico)
+CONFUSIONES = {
+    ('0', 'O'): 0.25, ('0', 'D'): 0.35, ('0', 'Q'): 0.35, ('0', 'U'): 0.5,
+    ('1', 'I'): 0.25, ('1', 'L'): 0.4, ('1', 'J'): 0.5, ('1', 'T'): 0.5,
+    ('2', 'Z'): 0.3, ('4', 'A'): 0.4, ('5', 'S'): 0.3, ('6', 'G'): 0.35,
+    ('7', 'T'): 0.4, ('8', 'B'): 0.3, ('3', '8'): 0.5, ('6', '8'): 0.5,
+    ('M', 'N'): 0.5, ('U', 'V'): 0.4, ('K', 'X'): 0.5, ('C', 'G'): 0.5,
+    ('E', 'F'): 0.5, ('P', 'R'): 0.5, ('H', 'N'): 0.5, ('O', 'Q'): 0.3, ('D', 'O'): 0.35,
+}
+_COSTO_SUSTITUCION = {}
+for (a, b), costo in CONFUSIONES.items():
+    _COSTO_SUSTITUCION[a, b] = _COSTO_SUSTITUCION[b, a] = costo
+
+# Prioridad de fuente al desempatar (menor = mejor)
+PRIORIDAD_FUENTE = {'maestro_vehiculos': 0, 'enturnamientos_graneles': 1, 'entry_records': 2}
+
+
+def normalizar_placa(placa: Optional[str]) -> str:
+    return re.sub(r'[^A-Z0-9]', '', (placa or '').upper())
+
+
+def levenshtein(a: str, b: str) -> int:
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        anterior = actual
+    return anterior[-1]
+
+
+def distancia_ocr(a: str, b: str) -> float:
+    """Levenshtein con sustituciones baratas para confusiones típicas de OCR."""
+    anterior = [float(j) for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        actual = [float(i)]
+        for j, cb in enumerate(b, 1):
+            sustitucion = 0.0 if ca == cb else _COSTO_SUSTITUCION.get((ca, cb), 1.0)
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + sustitucion))
+        anterior = actual
+    return anterior[-1]
+
+
+class IndiceBorrados:
+    """
+    Índice de borrado simétrico: cada placa se registra bajo todas sus
+    variantes con hasta ``max_ediciones`` caracteres borrados. Dos cadenas a
+    distancia de Levenshtein <= k comparten alguna variante con <= k borrados,
+    así que una consulta solo revisa las placas de sus propias variantes (22
+    para 6 caracteres y k=2) en vez de recorrer un árbol.
+    """
+
+    def __init__(self, max_ediciones: int = MAX_EDICIONES):
+        self.max_ediciones = max_ediciones
+        self.variantes: Dict[str, set] = {}
+        self.tamano = 0
+
+    def _borrados(self, palabra: str) -> set:
+        nivel, todas = {palabra}, {palabra}
+        for _ in range(self.max_ediciones):
+            nivel = {v[:i] + v[i + 1:] for v in nivel for i in range(len(v))}
+            todas |= nivel
+        return todas
+
+    def agregar(self, palabra: str) -> None:
+        for variante in self._borrados(palabra):
+            self.variantes.setdefault(variante, set()).add(palabra)
+        self.tamano += 1
+
+    def buscar(self, palabra: str, radio: int) -> List[tuple]:
+        """``[(distancia, palabra)]`` a distancia de Levenshtein <= ``radio`` (``radio <= max_ediciones``)."""
+        vistos = set()
+        for variante in self._borrados(palabra):
+            vistos.update(self.variantes.get(variante, ()))
+        encontrados = []
+        for candidato in vistos:
+            d = levenshtein(palabra, candidato)
+            if d <= radio:
+                encontrados.append((d, candidato))
+        return encontrados
+
+
+class IndicePlacas:
+    """
+    Placas conocidas de una base, con refresco incremental.
+
+    ``_lock`` serializa los refrescos; ``_datos_lock`` protege el par
+    ``(indice, info)``, que las consultas leen mientras otro hilo refresca. La
+    lectura de la base se hace fuera de ``_datos_lock`` y una reconstrucción
+    completa arma el par nuevo aparte y lo cambia en una sola asignación.
+    """
+
+    def __init__(self, db_path: str, dias: int = 180, refresh_seconds: float = 30, rebuild_hours: float = 24):
+        self.db_path = db_path
+        self.dias = dias
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_hours * 3600
+        self._lock = threading.Lock()
+        self._datos_lock = threading.Lock()
+        # placa -> {'fuentes': set, 'veces': int}
+        self._datos = (IndiceBorrados(), {})
+        self._ultimo_id = {tabla: 0 for tabla in PRIORIDAD_FUENTE}
+        self._construido = 0.0
+        self._refrescado = 0.0
+
+    @property
+    def indice(self) -> IndiceBorrados:
+        return self._datos[0]
+
+    @property
+    def info(self) -> Dict[str, Dict]:
+        return self._datos[1]
+
+    @staticmethod
+    def _agregar(datos, placa: str, fuente: str, veces: int) -> None:
+        indice, info_placas = datos
+        placa = normalizar_placa(placa)
+        if len(placa) < 5:
+            return
+        info = info_placas.get(placa)
+        if info is None:
+            indice.agregar(placa)
+            info = info_placas[placa] = {'fuentes': set(), 'veces': 0}
+        info['fuentes'].add(fuente)
+        info['veces'] += veces
+
+    def agregar(self, placa: str, fuente: str, veces: int = 1) -> None:
+        with self._datos_lock:
+            self._agregar(self._datos, placa, fuente, veces)
+
+    def _leer(self, conn: sqlite3.Connection, ultimo_id: Dict[str, int]) -> List[tuple]:
+        """Filas ``(placa, tabla, veces)`` nuevas de cada tabla; avanza ``ultimo_id``."""
+        existentes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        desde = (datetime.utcnow() - timedelta(days=self.dias)).strftime('%Y-%m-%d %H:%M:%S')
+        consultas = {
+            'maestro_vehiculos': ('SELECT id, placa, 1 FROM maestro_vehiculos WHERE id > ? '
+                                  'AND (activo IS NULL OR activo = 1)', ()),
+            'enturnamientos_graneles': ('SELECT MAX(id), placa, COUNT(*) FROM enturnamientos_graneles '
+                                        'WHERE id > ? GROUP BY placa', ()),
+            'entry_records': ('SELECT MAX(id), placa, COUNT(*) FROM entry_records WHERE id > ? '
+                              'AND placa IS NOT NULL AND timestamp_registro_utc >= ? GROUP BY placa', (desde,)),
+        }
+        filas = []
+        for tabla, (sql, extra) in consultas.items():
+            if tabla not in existentes:
+                continue
+            for fila_id, placa, veces in conn.execute(sql, (ultimo_id[tabla],) + extra):
+                filas.append((placa, tabla, veces))
+                ultimo_id[tabla] = max(ultimo_id[tabla], fila_id or 0)
+        return filas
+
+    def refrescar(self, forzar: bool = False) -> None:
+        ahora = time.monotonic()
+        if not forzar and ahora - self._refrescado < self.refresh_seconds:
+            return
+        with self._lock:
+            if not forzar and ahora - self._refrescado < self.refresh_seconds:
+                return
+            reconstruir = ahora - self._construido > self.rebuild_seconds
+            ultimo_id = {tabla: 0 for tabla in PRIORIDAD_FUENTE} if reconstruir else dict(self._ultimo_id)
+            try:
+                conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, timeout=2)
+                try:
+                    inicio = time.perf_counter()
+                    filas = self._leer(conn, ultimo_id)
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo refrescar el índice de placas: {e}")
+                self._refrescado = ahora
+                return
+            if reconstruir:
+                # Índice nuevo armado aparte; las consultas siguen con el anterior hasta el cambio
+                datos = (IndiceBorrados(), {})
+                for fila in filas:
+                    self._agregar(datos, *fila)
+                with self._datos_lock:
+                    self._datos = datos
+                self._construido = ahora
+            else:
+                with self._datos_lock:
+                    for fila in filas:
+                        self._agregar(self._datos, *fila)
+            self._ultimo_id = ultimo_id
+            if filas:
+                logger.debug(f"Índice de placas: +{len(filas)} filas en {(time.perf_counter() - inicio) * 1000:.1f} ms "
+                             f"({self.indice.tamano} placas)")
+            self._refrescado = ahora
+
+    def conocida(self, placa: str) -> bool:
+        self.refrescar()
+        with self._datos_lock:
+            return normalizar_placa(placa) in self._datos[1]
+
+    def candidatos(self, placa: str, limite: int = 5, max_ediciones: int = MAX_EDICIONES) -> List[Dict]:
+        """
+        Placas conocidas cercanas a ``placa``, de la más a la menos probable.
+
+        Returns:
+            list: ``{'placa', 'distancia', 'ediciones', 'fuentes', 'veces'}``.
+        """
+        self.refrescar()
+        consulta = normalizar_placa(placa)
+        if not consulta:
+            return []
+        resultado = []
+        with self._datos_lock:
+            indice, info_placas = self._datos
+            encontrados = [(ediciones, candidata, sorted(info_placas[candidata]['fuentes'], key=PRIORIDAD_FUENTE.get),
+                            info_placas[candidata]['veces'])
+                           for ediciones, candidata in indice.buscar(consulta, max_ediciones)]
+        for ediciones, candidata, fuentes, veces in encontrados:
+            resultado.append({
+                'placa': candidata,
+                'distancia': round(distancia_ocr(consulta, candidata), 3),
+                'ediciones': ediciones,
+                'fuentes': fuentes,
+                'veces': veces,
+            })
+        resultado.sort(key=lambda c: (c['distancia'], PRIORIDAD_FUENTE[c['fuentes'][0]], -c['veces']))
+        return resultado[:limite]
+
+
+_indices: Dict[str, IndicePlacas] = {}
+_indices_lock = threading.Lock()
+
+
+def _db_path_actual() -> Optional[str]:
+    try:
+        from flask import current_app, has_app_context
+        if has_app_context() and current_app.config.get('TIQUETES_DB_PATH'):
+            return current_app.config['TIQUETES_DB_PATH']
+    except ImportError:
+        pass
+    return os.getenv('TIQUETES_DB_PATH')
+
+
+def get_indice_placas(db_path: str = None) -> Optional[IndicePlacas]:
+    """Índice compartido para ``db_path`` (default: ``TIQUETES_DB_PATH``); None si no hay base."""
+    db_path = db_path or _db_path_actual()
+    if not db_path or db_path == ':memory:' or not os.path.exists(db_path):
+        return None
+    indice = _indices.get(db_path)
+    if indice is None:
+        with _indices_lock:
+            indice = _indices.get(db_path)
+            if indice is None:
+                indice = _indices[db_path] = IndicePlacas(
+                    db_path,
+                    dias=int(os.getenv('PLACA_INDEX_DIAS', '180')),
+                    refresh_seconds=float(os.getenv('PLACA_INDEX_REFRESH_SECONDS', '30')),
+                    rebuild_hours=float(os.getenv('PLACA_INDEX_REBUILD_HOURS', '24')),
+                )
+    return indice
@@ -0,0 +1,288 @@
+"""
+Reconocimiento local de placas colombianas (OpenCV + Tesseract) antes de la nube.
+
+``OCRPlacaService`` iba siempre primero a GPT-4o. Las placas de carro
+colombianas son amarillas con caracteres negros y siguen la gramática
+``^[A-Z]{3}[0-9]{3}$``, así que una lectura local restringida resuelve la
+mayoría de fotos de portería en ~100 ms y sin costo:
+
+1. Candidatos de región: máscara de amarillo en HSV y, como respaldo,
+   contornos rectangulares con la proporción de una placa (≈2:1).
+2. Enderezado con ``minAreaRect`` + ``warpPerspective`` a altura fija.
+3. Binarización (CLAHE + Otsu, texto oscuro sobre fondo claro).
+4. Tesseract en modo línea (``--psm 7``) con lista blanca A-Z0-9.
+5. Gramática: se busca la ventana de 6 caracteres que encaja en LLLNNN,
+   corrigiendo confusiones típicas por posición (0→O en letras, O→0 en
+   números...). Cada corrección descuenta confianza.
+
+Solo se acepta la lectura si la confianza llega a ``OCR_PLACA_LOCAL_MIN_CONF``;
+si no, el servicio sigue con la visión en la nube. El umbral se calibra con
+``scripts/benchmark_placa_local.py`` sobre un conjunto de fotos etiquetadas.
+
+Configuración (variables de entorno):
+    OCR_PLACA_LOCAL_ENABLED     true/false (default true)
+    OCR_PLACA_LOCAL_MIN_CONF    confianza mínima 0-100 para aceptar (default 80)
+"""
+
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+try:
+    import pytesseract
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PLACA_RE = re.compile(r'^[A-Z]{3}[0-9]{3}$')
+
+MIN_CONFIANZA = float(os.getenv('OCR_PLACA_LOCAL_MIN_CONF', '80'))
+
+TESSERACT_CONFIG = '--psm 7 --oem 1 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+# Confusiones típicas de OCR según lo que exige la posición
+A_LETRA = {'0': 'O', '1': 'I', '2': 'Z', '4': 'A', '5': 'S', '6': 'G', '7': 'T', '8': 'B'}
+A_NUMERO = {'O': '0', 'Q': '0', 'D': '0', 'U': '0', 'I': '1', 'L': '1', 'J': '1', 'Z': '2',
+            'A': '4', 'S': '5', 'G': '6', 'T': '7', 'B': '8'}
+PENALIZACION_CORRECCION = 8
+
+# Placa colombiana: 33 x 17 cm; se aceptan perspectivas y recortes razonables
+PROPORCION_MIN, PROPORCION_MAX = 1.4, 4.5
+ALTURA_NORMALIZADA = 110
+MAX_REGIONES = 4
+MAX_LADO_DETECCION = 1280
+
+_tesseract_ok = None
+
+
+def disponible() -> bool:
+    """Si OpenCV, pytesseract y el binario de Tesseract están instalados y el camino está habilitado."""
+    global _tesseract_ok
+    if os.getenv('OCR_PLACA_LOCAL_ENABLED', 'true').lower() != 'true':
+        return False
+    if not (CV2_AVAILABLE and PYTESSERACT_AVAILABLE):
+        return False
+    if _tesseract_ok is None:
+        try:
+            pytesseract.get_tesseract_version()
+            _tesseract_ok = True
+        except Exception as e:
+            logger.warning(f"Tesseract no disponible para el camino local de placas: {e}")
+            _tesseract_ok = False
+    return _tesseract_ok
+
+
+def aplicar_gramatica(texto: str) -> Optional[Tuple[str, int]]:
+    """
+    Mejor placa LLLNNN contenida en ``texto``.
+
+    Returns:
+        (placa, correcciones) con el menor número de correcciones, o None.
+    """
+    limpio = re.sub(r'[^A-Z0-9]', '', texto.upper())
+    mejor = None
+    for inicio in range(len(limpio) - 5):
+        ventana = limpio[inicio:inicio + 6]
+        placa, correcciones = [], 0
+        for i, caracter in enumerate(ventana):
+            if i < 3:
+                if caracter.isalpha():
+                    placa.append(caracter)
+                elif caracter in A_LETRA:
+                    placa.append(A_LETRA[caracter])
+                    correcciones += 1
+                else:
+                    break
+            else:
+                if caracter.isdigit():
+                    placa.append(caracter)
+                elif caracter in A_NUMERO:
+                    placa.append(A_NUMERO[caracter])
+                    correcciones += 1
+                else:
+                    break
+        if len(placa) == 6 and (mejor is None or correcciones < mejor[1]):
+            mejor = (''.join(placa), correcciones)
+            if correcciones == 0:
+                break
+    return mejor
+
+
+def _proporcion_valida(ancho: float, alto: float) -> bool:
+    if min(ancho, alto) < 12:
+        return False
+    proporcion = max(ancho, alto) / min(ancho, alto)
+    return PROPORCION_MIN <= proporcion <= PROPORCION_MAX
+
+
+def detectar_regiones(img) -> List[Any]:
+    """Rectángulos rotados (``cv2.minAreaRect``) candidatos a placa, del más probable al menos."""
+    alto, ancho = img.shape[:2]
+    area_total = alto * ancho
+    candidatos = []
+
+    # 1. Fondo amarillo de la placa
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    mascara = cv2.inRange(hsv, (15, 80, 80), (40, 255, 255))
+    mascara = cv2.morphologyEx(mascara, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 5)))
+    contornos, _ = cv2.findContours(mascara, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for contorno in contornos:
+        area = cv2.contourArea(contorno)
+        if area < area_total * 0.002:
+            continue
+        rect = cv2.minAreaRect(contorno)
+        (_, _), (w, h), _ = rect
+        if _proporcion_valida(w, h):
+            # Más área y más "rectangular" = más probable
+            llenado = area / max(1.0, w * h)
+            candidatos.append((area * llenado, rect))
+
+    # 2. Respaldo por bordes (placas sucias, de noche o de otro color)
+    if not candidatos:
+        gris = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gris = cv2.bilateralFilter(gris, 9, 60, 60)
+        bordes = cv2.Canny(gris, 50, 180)
+        bordes = cv2.dilate(bordes, None, iterations=1)
+        contornos, _ = cv2.findContours(bordes, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        for contorno in sorted(contornos, key=cv2.contourArea, reverse=True)[:40]:
+            area = cv2.contourArea(contorno)
+            if area < area_total * 0.002:
+                break
+            aprox = cv2.approxPolyDP(contorno, 0.03 * cv2.arcLength(contorno, True), True)
+            if len(aprox) != 4:
+                continue
+            rect = cv2.minAreaRect(aprox)
+            if _proporcion_valida(*rect[1]):
+                candidatos.append((area, rect))
+
+    candidatos.sort(key=lambda c: c[0], reverse=True)
+    return [rect for _, rect in candidatos[:MAX_REGIONES]]
+
+
+def _ordenar_esquinas(puntos):
+    """Esquinas en orden superior izq., superior der., inferior der., inferior izq."""
+    suma, resta = puntos.sum(axis=1), np.diff(puntos, axis=1).ravel()
+    return np.array([puntos[suma.argmin()], puntos[resta.argmin()], puntos[suma.argmax()], puntos[resta.argmax()]],
+                    dtype='float32')
+
+
+def enderezar(img, rect):
+    """Recorte de ``rect`` rotado a horizontal y escalado a ``ALTURA_NORMALIZADA``."""
+    (cx, cy), (w, h), angulo = rect
+    if w < h:
+        w, h, angulo = h, w, angulo + 90
+    # Margen para no cortar caracteres pegados al borde
+    w, h = w * 1.06, h * 1.12
+    escala = ALTURA_NORMALIZADA / h
+    destino_w, destino_h = int(round(w * escala)), ALTURA_NORMALIZADA
+    puntos = _ordenar_esquinas(cv2.boxPoints(((cx, cy), (w, h), angulo)))
+    destino = np.array([[0, 0], [destino_w - 1, 0], [destino_w - 1, destino_h - 1], [0, destino_h - 1]], dtype='float32')
+    matriz = cv2.getPerspectiveTransform(puntos, destino)
+    return cv2.warpPerspective(img, matriz, (destino_w, destino_h), flags=cv2.INTER_CUBIC,
+                               borderMode=cv2.BORDER_REPLICATE)
+
+
+def binarizar(recorte) -> List[Any]:
+    """Variantes binarizadas (texto negro sobre blanco) del recorte enderezado."""
+    gris = cv2.cvtColor(recorte, cv2.COLOR_BGR2GRAY) if recorte.ndim == 3 else recorte
+    gris = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 8)).apply(gris)
+    _, otsu = cv2.threshold(cv2.GaussianBlur(gris, (3, 3), 0), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if otsu.mean() < 127:
+        otsu = cv2.bitwise_not(otsu)
+    adaptativa = cv2.adaptiveThreshold(gris, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15)
+    # Borde blanco: Tesseract lee mejor con margen
+    return [cv2.copyMakeBorder(_quitar_marco(b), 10, 10, 10, 10, cv2.BORDER_CONSTANT, value=255)
+            for b in (otsu, adaptativa)]
+
+
+def _quitar_marco(binaria):
+    """Borra el marco de la placa y lo que toca el borde del recorte (tornillos, carrocería)."""
+    n, etiquetas, stats, _ = cv2.connectedComponentsWithStats(cv2.bitwise_not(binaria), connectivity=8)
+    alto, ancho = binaria.shape
+    borrar = []
+    for i in range(1, n):
+        x, y, w, h, _ = stats[i]
+        toca_borde = x == 0 or y == 0 or x + w >= ancho or y + h >= alto
+        # Un carácter pegado al borde se conserva: alto de letra y angosto
+        parece_caracter = 0.35 * alto <= h <= 0.9 * alto and w <= 0.2 * ancho
+        # Ningún carácter ocupa media placa (marco) ni es tan bajo como el nombre del municipio
+        if w > 0.5 * ancho or h < 0.3 * alto or (toca_borde and not parece_caracter):
+            borrar.append(i)
+    if not borrar:
+        return binaria
+    limpia = binaria.copy()
+    limpia[np.isin(etiquetas, borrar)] = 255
+    return limpia
+
+
+def _leer(binaria) -> Tuple[str, float]:
+    datos = pytesseract.image_to_data(binaria, config=TESSERACT_CONFIG, output_type=pytesseract.Output.DICT)
+    palabras = [(t, float(c)) for t, c in zip(datos['text'], datos['conf']) if t.strip() and float(c) >= 0]
+    if not palabras:
+        return '', 0.0
+    texto = ''.join(t for t, _ in palabras)
+    # Confianza ponderada por longitud de cada palabra
+    confianza = sum(c * len(t) for t, c in palabras) / max(1, sum(len(t) for t, _ in palabras))
+    return texto, confianza
+
+
+def reconocer_placa(image_path: str, min_confianza: float = None) -> Dict[str, Any]:
+    """
+    Lectura local de la placa en ``image_path``.
+
+    Returns:
+        dict: ``success`` solo si la mejor lectura cumple la gramática y
+        ``min_confianza``; siempre incluye ``placa`` (la mejor lectura, aunque
+        no se acepte), ``confianza``, ``duracion_ms`` y ``lecturas``.
+    """
+    min_confianza = MIN_CONFIANZA if min_confianza is None else min_confianza
+    inicio = time.perf_counter()
+    resultado = {'success': False, 'placa': '', 'confianza': 0, 'metodo': 'local_tesseract', 'lecturas': []}
+
+    img = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if img is None:
+        resultado['mensaje'] = 'No se pudo leer la imagen'
+        resultado['duracion_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+        return resultado
+    factor = MAX_LADO_DETECCION / max(img.shape[:2])
+    if factor < 1:
+        img = cv2.resize(img, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+
+    mejor = None
+    for rect in detectar_regiones(img):
+        recorte = enderezar(img, rect)
+        for binaria in binarizar(recorte):
+            texto, confianza_ocr = _leer(binaria)
+            gramatica = aplicar_gramatica(texto)
+            if not gramatica:
+                resultado['lecturas'].append({'texto': texto, 'confianza': round(confianza_ocr)})
+                continue
+            placa, correcciones = gramatica
+            confianza = max(0.0, confianza_ocr - PENALIZACION_CORRECCION * correcciones)
+            resultado['lecturas'].append({'texto': texto, 'placa': placa, 'confianza': round(confianza)})
+            if mejor is None or confianza > mejor[1]:
+                mejor = (placa, confianza)
+            if mejor[1] >= min_confianza:
+                break
+        if mejor and mejor[1] >= min_confianza:
+            break
+
+    if mejor:
+        resultado['placa'], resultado['confianza'] = mejor[0], round(mejor[1])
+        resultado['success'] = mejor[1] >= min_confianza and bool(PLACA_RE.match(mejor[0]))
+    if not resultado['success']:
+        resultado['mensaje'] = ('Lectura local con baja confianza' if mejor
+                                else 'No se encontró una placa legible localmente')
+    resultado['duracion_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+    return resultado
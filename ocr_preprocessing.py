@@ -0,0 +1,166 @@
+"""
+Preparación en memoria de imágenes antes de enviarlas a los modelos de visión.
+
+Las fotos de celular llegan a 12 MP o más, con la orientación en EXIF y a
+veces en formatos que la API no acepta (HEIC, BMP, TIFF). OpenAI reduce toda
+imagen con ``detail: high`` a 2048 px de lado mayor y 768 px de lado menor,
+así que enviar más resolución solo agrega bytes y latencia de subida.
+
+``prepare_image`` lee el archivo una sola vez y, sin archivos temporales:
+
+1. Aplica la orientación EXIF.
+2. Reduce al máximo configurado para el tipo de documento (usando ``draft``
+   de JPEG para decodificar directamente a menor escala cuando se puede).
+3. Codifica en JPEG o WebP buscando la mayor calidad que cabe en el
+   presupuesto de bytes del perfil.
+
+Si la imagen original ya es un formato aceptado, cabe en las dimensiones y en
+el presupuesto y no necesita rotación, se envían los bytes originales.
+
+Los perfiles se pueden ajustar por variables de entorno:
+    OCR_IMAGE_FORMAT             jpeg | webp (default jpeg)
+    OCR_MAX_DIM_<TIPO>           lado mayor en px (p. ej. OCR_MAX_DIM_PLACA=1280)
+    OCR_MAX_KB_<TIPO>            presupuesto en KB
+"""
+
+import base64
+import io
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Formatos que la API de visión acepta tal cual
+FORMATOS_ACEPTADOS = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp', 'GIF': 'image/gif'}
+
+# max_dim: lado mayor; min_side: tope del lado menor; max_kb: presupuesto de la imagen codificada
+PERFILES = {
+    'placa': {'max_dim': 1280, 'min_side': 768, 'max_kb': 350, 'calidad': 85, 'detail': 'auto'},
+    'documento': {'max_dim': 2048, 'min_side': 768, 'max_kb': 600, 'calidad': 88, 'detail': 'high'},
+    'tiquete': {'max_dim': 2048, 'min_side': 1024, 'max_kb': 800, 'calidad': 88, 'detail': 'high'},
+}
+# Tipos de documento de graneles -> perfil
+ALIAS_PERFIL = {'arl': 'documento', 'soat': 'documento', 'tecnomecanica': 'documento', 'licencia': 'documento'}
+
+CALIDAD_MINIMA = 55
+
+# Orientación EXIF -> transformación que la corrige (como ImageOps.exif_transpose)
+_TRANSPOSICIONES = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT, 3: Image.Transpose.ROTATE_180, 4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE, 6: Image.Transpose.ROTATE_270, 7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+    detail: str
+    reencoded: bool
+
+    @property
+    def base64(self) -> str:
+        return base64.b64encode(self.data).decode('ascii')
+
+    @property
+    def data_url(self) -> str:
+        return f'data:{self.mime_type};base64,{self.base64}'
+
+
+def get_profile(tipo: str) -> Dict:
+    """Perfil de ``tipo`` con los ajustes de entorno aplicados."""
+    nombre = ALIAS_PERFIL.get(tipo, tipo if tipo in PERFILES else 'documento')
+    perfil = dict(PERFILES[nombre])
+    for clave, env in (('max_dim', f'OCR_MAX_DIM_{tipo.upper()}'), ('max_kb', f'OCR_MAX_KB_{tipo.upper()}')):
+        valor = os.getenv(env)
+        if valor:
+            perfil[clave] = int(valor)
+    perfil['formato'] = 'WEBP' if os.getenv('OCR_IMAGE_FORMAT', 'jpeg').lower() == 'webp' else 'JPEG'
+    return perfil
+
+
+def _target_size(width: int, height: int, max_dim: int, min_side: int):
+    escala = min(1.0, max_dim / max(width, height), min_side / min(width, height))
+    return max(1, round(width * escala)), max(1, round(height * escala))
+
+
+def _encode(img: Image.Image, formato: str, calidad: int) -> bytes:
+    buffer = io.BytesIO()
+    if formato == 'WEBP':
+        img.save(buffer, 'WEBP', quality=calidad, method=4)
+    else:
+        img.save(buffer, 'JPEG', quality=calidad, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def _encode_within_budget(img: Image.Image, formato: str, calidad: int, max_bytes: int) -> bytes:
+    """Mayor calidad entre ``CALIDAD_MINIMA`` y ``calidad`` que cabe en ``max_bytes``."""
+    data = _encode(img, formato, calidad)
+    if len(data) <= max_bytes:
+        return data
+    bajo, alto, mejor = CALIDAD_MINIMA, calidad - 1, None
+    while bajo <= alto:
+        medio = (bajo + alto) // 2
+        candidato = _encode(img, formato, medio)
+        if len(candidato) <= max_bytes:
+            mejor, bajo = candidato, medio + 1
+        else:
+            alto = medio - 1
+    # Si ni la calidad mínima cabe, se envía igual (mejor que fallar)
+    return mejor or _encode(img, formato, CALIDAD_MINIMA)
+
+
+def prepare_image(source: Union[str, bytes], tipo: str = 'documento') -> PreparedImage:
+    """
+    Prepara la imagen ``source`` (ruta o bytes) para el perfil ``tipo``.
+
+    Raises:
+        OSError: Si no se puede leer o decodificar la imagen.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        raw = bytes(source)
+    else:
+        with open(source, 'rb') as archivo:
+            raw = archivo.read()
+    perfil = get_profile(tipo)
+    max_bytes = perfil['max_kb'] * 1024
+
+    img = Image.open(io.BytesIO(raw))
+    formato_original = img.format
+    width, height = img.size
+    orientacion = img.getexif().get(0x0112, 1)  # Orientation
+    rotada = orientacion in (5, 6, 7, 8)
+    ancho_final, alto_final = _target_size(*((height, width) if rotada else (width, height)),
+                                           perfil['max_dim'], perfil['min_side'])
+
+    if (formato_original in FORMATOS_ACEPTADOS and orientacion == 1
+            and (ancho_final, alto_final) == (width, height) and len(raw) <= max_bytes):
+        return PreparedImage(raw, FORMATOS_ACEPTADOS[formato_original], width, height, len(raw),
+                             perfil['detail'], reencoded=False)
+
+    # Se reduce antes de rotar para no transponer la imagen completa
+    tamano_sin_rotar = (alto_final, ancho_final) if rotada else (ancho_final, alto_final)
+    if formato_original == 'JPEG':
+        # Decodificar directamente a 1/2, 1/4 u 1/8 cuando sobra resolución
+        img.draft('RGB', tamano_sin_rotar)
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    if img.size != tamano_sin_rotar:
+        # BICUBIC conserva bien el texto en reducciones de hasta ~4x y cuesta 2/3 de LANCZOS
+        img = img.resize(tamano_sin_rotar, Image.BICUBIC, reducing_gap=3.0)
+    if orientacion in _TRANSPOSICIONES:
+        img = img.transpose(_TRANSPOSICIONES[orientacion])
+
+    data = _encode_within_budget(img, perfil['formato'], perfil['calidad'], max_bytes)
+    mime_type = 'image/webp' if perfil['formato'] == 'WEBP' else 'image/jpeg'
+    logger.debug(f"Imagen {formato_original} {width}x{height} ({len(raw) // 1024} KB) -> "
+                 f"{perfil['formato']} {img.size[0]}x{img.size[1]} ({len(data) // 1024} KB)")
+    return PreparedImage(data, mime_type, img.size[0], img.size[1], len(raw), perfil['detail'], reencoded=True)
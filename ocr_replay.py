@@ -0,0 +1,242 @@
+"""
+Grabación y reproducción de las llamadas HTTP de OCR (OpenAI visión y webhooks).
+
+Para medir y probar la cadena OCR sin red:
+
+- Grabar (``OCR_RECORD_DIR``): ``http_client`` guarda cada petición a
+  OpenAI y a los webhooks con su respuesta y su latencia en
+  ``<dir>/<host>.jsonl``. De la petición solo se guarda la huella (SHA-256 del
+  cuerpo, sin el separador multipart) y el tamaño, no la imagen.
+- Reproducir (``OCR_REPLAY_URL``): ``http_client`` reescribe las URLs
+  salientes a ``<OCR_REPLAY_URL>/<host><ruta>`` y el cliente de OpenAI usa
+  ``<OCR_REPLAY_URL>/api.openai.com/v1``; ``scripts/ocr_replay_server.py``
+  responde con lo grabado (``CintaReplay``). La misma petición recibe su
+  respuesta grabada; una distinta, una respuesta grabada del mismo endpoint
+  y modelo (placas usan gpt-4o y documentos gpt-4o-mini en la misma ruta).
+  La espera sale de las latencias grabadas de ese endpoint.
+  ``crear_servidor`` arma ese servidor (también lo usa
+  ``scripts/benchmark_ocr_replay.py`` dentro del mismo proceso).
+
+Configuración (variables de entorno):
+    OCR_RECORD_DIR   directorio de grabación (default vacío = no graba)
+    OCR_REPLAY_URL   URL del servidor de reproducción (default vacío = red real)
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+RECORD_DIR = os.getenv('OCR_RECORD_DIR', '')
+REPLAY_URL = os.getenv('OCR_REPLAY_URL', '').rstrip('/')
+
+OPENAI_HOST = 'api.openai.com'
+MODOS_LATENCIA = ('muestreo', 'grabada', 'cero')
+
+_BOUNDARY = re.compile(r'boundary="?([^";]+)"?')
+_lock = threading.Lock()
+
+
+def huella(cuerpo: Optional[bytes], content_type: str = '') -> Optional[str]:
+    """SHA-256 del cuerpo de la petición; en multipart se quita el separador (aleatorio por llamada)."""
+    if not cuerpo:
+        return None
+    if isinstance(cuerpo, str):
+        cuerpo = cuerpo.encode('utf-8')
+    separador = _BOUNDARY.search(content_type or '')
+    if separador:
+        cuerpo = cuerpo.replace(separador.group(1).encode('latin-1'), b'')
+    return hashlib.sha256(cuerpo).hexdigest()
+
+
+def variante(cuerpo: Optional[bytes], content_type: str = '') -> str:
+    """Modelo pedido en un cuerpo JSON (``model``); vacío si no aplica."""
+    if not cuerpo or 'json' not in (content_type or ''):
+        return ''
+    try:
+        return str(json.loads(cuerpo).get('model') or '')
+    except (ValueError, AttributeError):
+        return ''
+
+
+def redirigir(url: str) -> str:
+    """URL equivalente en el servidor de reproducción (sin cambios si no hay ``OCR_REPLAY_URL``)."""
+    if not REPLAY_URL or url.startswith(REPLAY_URL):
+        return url
+    partes = urlsplit(url)
+    return f"{REPLAY_URL}/{partes.netloc}{partes.path}" + (f'?{partes.query}' if partes.query else '')
+
+
+def openai_base_url() -> Optional[str]:
+    """``base_url`` del cliente de OpenAI al reproducir; None para usar la API real."""
+    return f'{REPLAY_URL}/{OPENAI_HOST}/v1' if REPLAY_URL else None
+
+
+def _nombre_cinta(host: str) -> str:
+    return re.sub(r'[^A-Za-z0-9.-]', '_', host) + '.jsonl'
+
+
+def grabar(metodo: str, url: str, cuerpo: Optional[bytes], content_type: str, status: int,
+           headers: Dict[str, str], respuesta: bytes, latencia_ms: float) -> None:
+    """Agrega una llamada a la cinta de su host (si ``OCR_RECORD_DIR`` está configurado)."""
+    if not RECORD_DIR:
+        return
+    if REPLAY_URL and url.startswith(REPLAY_URL + '/'):
+        # Grabando contra el servidor de reproducción: se guarda la URL original
+        url = 'https://' + url[len(REPLAY_URL) + 1:]
+    partes = urlsplit(url)
+    try:
+        texto, codificacion = respuesta.decode('utf-8'), 'texto'
+    except UnicodeDecodeError:
+        texto, codificacion = base64.b64encode(respuesta).decode('ascii'), 'base64'
+    registro = {
+        'ts': time.time(),
+        'metodo': metodo.upper(),
+        'host': partes.netloc,
+        'ruta': partes.path,
+        'huella': huella(cuerpo, content_type),
+        'variante': variante(cuerpo, content_type),
+        'bytes_peticion': len(cuerpo or b''),
+        'status': status,
+        'content_type': headers.get('content-type') or headers.get('Content-Type') or '',
+        'cuerpo': texto,
+        'codificacion': codificacion,
+        'latencia_ms': round(latencia_ms, 1),
+    }
+    try:
+        os.makedirs(RECORD_DIR, exist_ok=True)
+        linea = json.dumps(registro, ensure_ascii=False) + '\n'
+        with _lock, open(os.path.join(RECORD_DIR, _nombre_cinta(partes.netloc)), 'a', encoding='utf-8') as cinta:
+            cinta.write(linea)
+    except OSError as e:
+        logger.warning(f"No se pudo grabar la llamada a {partes.netloc}: {e}")
+
+
+def grabar_requests(response) -> None:
+    """Graba una respuesta de ``requests`` (ver ``http_client.request``)."""
+    if not RECORD_DIR:
+        return
+    peticion = response.request
+    grabar(peticion.method, peticion.url, peticion.body, peticion.headers.get('Content-Type', ''),
+           response.status_code, response.headers, response.content, response.elapsed.total_seconds() * 1000)
+
+
+def transporte_grabador(interno):
+    """Envuelve un transporte ``httpx`` (cliente de OpenAI) para grabar cada llamada."""
+    import httpx
+
+    class TransporteGrabador(httpx.BaseTransport):
+        def handle_request(self, request):
+            inicio = time.perf_counter()
+            response = interno.handle_request(request)
+            contenido = response.read()
+            grabar(request.method, str(request.url), request.content, request.headers.get('content-type', ''),
+                   response.status_code, response.headers, contenido, (time.perf_counter() - inicio) * 1000)
+            return response
+
+        def close(self):
+            interno.close()
+
+    return TransporteGrabador()
+
+
+class CintaReplay:
+    """Llamadas grabadas indexadas por endpoint y huella, con sus latencias."""
+
+    def __init__(self, directorio: Optional[str], modo_latencia: str = 'muestreo', escala: float = 1.0,
+                 semilla: int = None):
+        if modo_latencia not in MODOS_LATENCIA:
+            raise ValueError(f'Modo de latencia no válido: {modo_latencia} (use {", ".join(MODOS_LATENCIA)})')
+        self.modo_latencia = modo_latencia
+        self.escala = escala
+        self._random = random.Random(semilla)
+        # (método, host + ruta, modelo) y, en _por_huella, además la huella
+        self._por_huella: Dict[Tuple[str, str, str, str], List[Dict[str, Any]]] = defaultdict(list)
+        self._por_endpoint: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = defaultdict(list)
+        for nombre in sorted(os.listdir(directorio)) if directorio else ():
+            if nombre.endswith('.jsonl'):
+                with open(os.path.join(directorio, nombre), encoding='utf-8') as cinta:
+                    for linea in cinta:
+                        if linea.strip():
+                            self.agregar(json.loads(linea))
+
+    def agregar(self, registro: Dict[str, Any]) -> None:
+        endpoint = (registro['metodo'], registro['host'] + registro['ruta'], registro.get('variante') or '')
+        self._por_endpoint[endpoint].append(registro)
+        if registro.get('huella'):
+            self._por_huella[endpoint + (registro['huella'],)].append(registro)
+
+    def endpoints(self) -> Dict[str, int]:
+        return {f'{metodo} {ruta}' + (f' ({modelo})' if modelo else ''): len(registros)
+                for (metodo, ruta, modelo), registros in sorted(self._por_endpoint.items())}
+
+    def responder(self, metodo: str, ruta: str, cuerpo: Optional[bytes],
+                  content_type: str = '') -> Optional[Tuple[Dict[str, Any], bytes, float]]:
+        """
+        Respuesta para una petición reproducida (``ruta`` = host + ruta original).
+
+        Returns:
+            tuple: ``(registro, cuerpo, espera_segundos)`` o None si el endpoint
+            no tiene grabaciones.
+        """
+        endpoint = (metodo.upper(), ruta, variante(cuerpo, content_type))
+        candidatos = self._por_endpoint.get(endpoint)
+        if not candidatos:
+            return None
+        exactos = self._por_huella.get(endpoint + (huella(cuerpo, content_type),))
+        registro = self._random.choice(exactos or candidatos)
+        if self.modo_latencia == 'cero':
+            espera = 0.0
+        elif self.modo_latencia == 'grabada':
+            espera = registro['latencia_ms'] / 1000
+        else:
+            espera = self._random.choice(candidatos)['latencia_ms'] / 1000
+        datos = registro['cuerpo'].encode('utf-8') if registro['codificacion'] == 'texto' \
+            else base64.b64decode(registro['cuerpo'])
+        return registro, datos, espera * self.escala
+
+
+def crear_servidor(cinta: CintaReplay, host: str = '127.0.0.1', puerto: int = 8765) -> ThreadingHTTPServer:
+    """Servidor HTTP (un hilo por petición) que responde con ``cinta``; ``puerto=0`` elige uno libre."""
+
+    class ManejadorReplay(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _responder(self):
+            largo = int(self.headers.get('Content-Length') or 0)
+            cuerpo = self.rfile.read(largo) if largo else b''
+            # /<host><ruta> (ver redirigir)
+            ruta = self.path.split('?', 1)[0].lstrip('/')
+            respuesta = cinta.responder(self.command, ruta, cuerpo, self.headers.get('Content-Type', ''))
+            if respuesta is None:
+                datos = json.dumps({'error': f'Sin grabaciones para {self.command} /{ruta}'}).encode('utf-8')
+                status, content_type = 404, 'application/json'
+            else:
+                registro, datos, espera = respuesta
+                time.sleep(espera)
+                status, content_type = registro['status'], registro['content_type'] or 'application/octet-stream'
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _responder
+
+        def log_message(self, formato, *args):
+            logger.debug(f"replay {self.address_string()} {formato % args}")
+
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorReplay)
+    servidor.daemon_threads = True
+    return servidor
@@ -5,10 +5,11 @@ Implementación con LangChain y OCR local usando Python.
 
 import logging
 import re
-import json
 import os
 import base64
-import requests
+import time
+import threading
+import http_client
 from datetime import datetime
 from typing import Dict, Optional, List, Tuple, Union, Any
 from PIL import Image
@@ -16,13 +17,7 @@ import io
 import ssl
 import certifi
 
-# Importaciones para OCR
-try:
-    import easyocr
-    EASYOCR_AVAILABLE = True
-except ImportError:
-    EASYOCR_AVAILABLE = False
-
+# Importaciones para OCR (EasyOCR se importa y carga una vez en ocr_engines)
 try:
     import pytesseract
     PYTESSERACT_AVAILABLE = True
@@ -48,6 +43,21 @@ try:
 except ImportError:
     LANGCHAIN_AVAILABLE = False
 
+# Métricas de latencia por backend (/metrics); opcional fuera de la app Flask
+from ocr_metricas import METRICS_AVAILABLE, ocr_timer
+
+from ocr_cache import OCRResultCache, get_ocr_cache, hash_file, prompt_version
+from fotos_duplicadas import get_indice_huellas
+from ocr_preprocessing import prepare_image
+from ocr_fechas import escanear_fechas
+from ocr_hedging import remaining, run_batch, run_hedged
+import ocr_engines
+import ocr_esquemas
+import ocr_telemetria
+import ocr_placa_local
+from ocr_placa_correccion import MAX_DISTANCIA_SUGERENCIA, get_indice_placas
+from ocr_breakers import BACKEND_OPENAI, BACKEND_WEBHOOK_MAKE, BACKEND_WEBHOOK_N8N, get_breaker
+
 logger = logging.getLogger(__name__)
 
 class OCRDocumentService:
@@ -80,45 +90,17 @@ class OCRDocumentService:
             'licencia': 'https://hook.us2.make.com/a2yotw5cls6qxom2iacvyaoh2b9uk9ip'
         }
 
+        # Resultados previos por contenido de imagen (ver ocr_cache)
+        self.cache = get_ocr_cache()
+
     def _init_ocr(self):
-        """Inicializa el motor de OCR preferido."""
-        # Inicializar atributos
-        self.ocr_method = None
-        
-        # Temporalmente deshabilitar EasyOCR para evitar problemas de descarga
-        # if EASYOCR_AVAILABLE:
-        #     try:
-        #         # Configurar SSL antes de inicializar EasyOCR
-        #         import ssl
-        #         import certifi
-        #         ssl._create_default_https_context = ssl._create_unverified_context
-        #         
-        #         # Configurar variables de entorno para certificados
-        #         os.environ['SSL_CERT_FILE'] = certifi.where()
-        #         os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
-        #         
-        #         self.ocr_reader = easyocr.Reader(['es', 'en'], gpu=False)
-        #         self.ocr_method = 'easyocr'
-        #         logger.info("EasyOCR inicializado correctamente")
-        #     except Exception as e:
-        #         logger.error(f"Error inicializando EasyOCR: {e}")
-        #         self.ocr_reader = None
-        
-        logger.info("EasyOCR temporalmente deshabilitado para debugging")
-        
-        if not self.ocr_reader and PYTESSERACT_AVAILABLE:
-            try:
-                # Verificar que Tesseract esté disponible
-                pytesseract.get_tesseract_version()
-                self.ocr_method = 'tesseract'
-                logger.info("Tesseract OCR inicializado correctamente")
-            except Exception as e:
-                logger.error(f"Error inicializando Tesseract: {e}")
-                self.ocr_method = None
-        
-        if not self.ocr_reader and self.ocr_method != 'tesseract':
+        """Elige el motor de OCR local; los modelos se comparten en ocr_engines."""
+        # EasyOCR sigue deshabilitado para documentos (descarga de modelos en producción)
+        self.ocr_method = 'tesseract' if ocr_engines.disponible('tesseract') else None
+        if self.ocr_method:
+            logger.info("Tesseract OCR disponible para documentos")
+        else:
             logger.warning("No se pudo inicializar ningún motor de OCR local")
-            self.ocr_method = None
 
     def _init_langchain(self):
         """Inicializa LangChain con el LLM disponible."""
@@ -126,9 +108,8 @@ class OCRDocumentService:
         openai_api_key = os.getenv('OPENAI_API_KEY')
         if openai_api_key:
             try:
-                # Importar OpenAI directamente para capacidades de visión
-                import openai
-                self.openai_client = openai.OpenAI(api_key=openai_api_key)
+                # Cliente de OpenAI compartido (pool de conexiones, ver http_client)
+                self.openai_client = http_client.get_openai_client(openai_api_key)
                 logger.info("OpenAI GPT-4o-mini (visión) inicializado correctamente")
                 self.vision_available = True
                 return
@@ -263,7 +244,7 @@ RESPONDE ÚNICAMENTE con un JSON en este formato:
 JSON:"""
         return self._create_prompt_template(template)
 
-    def process_document(self, image_path: str, document_type: str, user: str) -> Dict:
+    def process_document(self, image_path: str, document_type: str, user: str, deadline: float = None) -> Dict:
         """
         Procesa un documento y extrae la fecha de vencimiento usando OCR local + LangChain.
         
@@ -271,137 +252,212 @@ JSON:"""
             image_path: Ruta al archivo de imagen
             document_type: Tipo de documento (arl, soat, tecnomecanica, licencia)
             user: Usuario que realiza el procesamiento
+            deadline: Segundos máximos para la cadena (default OCR_DEADLINE_SECONDS)
             
         Returns:
             Dict con resultado del procesamiento
         """
-        try:
-            # Validar tipo de documento
-            if document_type not in self.document_prompts:
-                return {
-                    'success': False,
-                    'message': f'Tipo de documento "{document_type}" no soportado.'
-                }
-            
-            # Método 1: GPT-4o-mini con visión (PREFERIDO)
-            if hasattr(self, 'vision_available') and self.vision_available:
-                vision_result = self._process_with_gpt4_vision(image_path, document_type)
-                if vision_result['success']:
-                    return vision_result
-                logger.warning(f"GPT-4o-mini visión falló para {document_type}, intentando OCR local")
+        with ocr_telemetria.contexto('documento', document_type, user, image_path):
+            try:
+                # Validar tipo de documento
+                if document_type not in self.document_prompts:
+                    return {
+                        'success': False,
+                        'message': f'Tipo de documento "{document_type}" no soportado.'
+                    }
             
-            # Método 2: OCR local + LangChain
-            if self.ocr_method and hasattr(self, 'llm') and self.llm:
-                local_result = self._process_with_local_ocr_langchain(image_path, document_type)
-                if local_result['success']:
-                    return local_result
-                logger.warning(f"OCR local + LangChain falló para {document_type}, intentando regex")
+                # La misma foto ya procesada (recarga, reintento) no vuelve a llamar a la API
+                clave_cache = self._cache_key(image_path, document_type)
+                if clave_cache:
+                    cached = self.cache.get(clave_cache, 'ocr_documento')
+                    if cached:
+                        logger.info(f"Resultado de {document_type} tomado de la caché OCR")
+                        cached.update({'ruta_imagen': image_path, 'cache': True})
+                        ocr_telemetria.registrar_cache(confianza=cached.get('confianza'))
+                        return cached
             
-            # Método 3: OCR local + regex inteligente
-            if self.ocr_method:
-                regex_result = self._process_with_regex_fallback(image_path, document_type)
-                if regex_result['success']:
-                    return regex_result
-                logger.warning(f"OCR + regex falló para {document_type}, intentando webhook")
+                # Estrategias en orden de preferencia; run_hedged lanza la siguiente si
+                # la actual falla o tarda más de OCR_HEDGE_DELAY_SECONDS, y nunca
+                # espera más de OCR_DEADLINE_SECONDS en total
+                estrategias = []
+                openai_disponible = get_breaker(BACKEND_OPENAI).disponible()
+                # Método 1: GPT-4o-mini con visión (PREFERIDO)
+                if hasattr(self, 'vision_available') and self.vision_available and openai_disponible:
+                    estrategias.append(('gpt4_vision', lambda limite, cancel:
+                                        self._process_with_gpt4_vision(image_path, document_type, deadline=limite)))
+                # Método 2: OCR local + LangChain
+                if self.ocr_method and hasattr(self, 'llm') and self.llm and openai_disponible:
+                    estrategias.append(('ocr_langchain', lambda limite, cancel:
+                                        self._process_with_local_ocr_langchain(image_path, document_type,
+                                                                               deadline=limite, cancel=cancel)))
+                # Método 3: OCR local + regex inteligente
+                if self.ocr_method:
+                    estrategias.append(('ocr_regex', lambda limite, cancel:
+                                        self._process_with_regex_fallback(image_path, document_type,
+                                                                          deadline=limite, cancel=cancel)))
+                # Método 4: Webhook fallback
+                if get_breaker(BACKEND_WEBHOOK_MAKE).disponible():
+                    estrategias.append(('webhook', lambda limite, cancel:
+                                        self._process_with_webhook(image_path, document_type, user, deadline=limite)))
+                if not openai_disponible:
+                    logger.warning("OpenAI con circuito abierto; se omite en la cadena OCR")
             
-            # Método 4: Webhook fallback
-            webhook_result = self._process_with_webhook(image_path, document_type, user)
-            return webhook_result
+                result = run_hedged(estrategias, deadline=deadline)
+                if not result['success']:
+                    logger.warning(f"Ninguna estrategia OCR resolvió {document_type}: {result.get('message')}")
+                return self._cache_result(clave_cache, result)
             
-        except Exception as e:
-            logger.error(f"Error procesando documento {document_type}: {e}")
-            return {
-                'success': False,
-                'message': f'Error interno procesando el documento: {str(e)}'
-            }
+            except Exception as e:
+                logger.error(f"Error procesando documento {document_type}: {e}")
+                return {
+                    'success': False,
+                    'message': f'Error interno procesando el documento: {str(e)}'
+                }
+
+    def process_documents(self, documentos: Dict[str, str], user: str, deadline: float = None) -> Dict:
+        """
+        Procesa en paralelo los documentos de un vehículo con un tiempo límite común.
+
+        La inspección de graneles esperaba la suma de los cuatro documentos;
+        así espera aproximadamente el más lento.
+
+        Args:
+            documentos: ``{tipo_documento: ruta_imagen}``
+            user: Usuario que realiza el procesamiento
+            deadline: Segundos máximos para todo el lote (default OCR_DEADLINE_SECONDS)
+
+        Returns:
+            Dict con ``documentos`` (por tipo, el resultado de ``process_document``
+            más ``estado``: ok, fallo, tiempo_limite o no_soportado) y totales.
+        """
+        inicio = time.monotonic()
+        tareas = {}
+        for document_type, image_path in documentos.items():
+            tareas[document_type] = (lambda limite, tipo=document_type, ruta=image_path:
+                                     self.process_document(ruta, tipo, user, deadline=max(0.0, limite - time.monotonic())))
+        resultados = run_batch(tareas, deadline=deadline)
+
+        for document_type, result in resultados.items():
+            if result.get('success'):
+                result['estado'] = 'ok'
+            elif document_type not in self.document_prompts:
+                result['estado'] = 'no_soportado'
+            elif result.get('tiempo_limite') or any(i.get('estado') == 'tiempo_limite' for i in result.get('intentos', [])):
+                result['estado'] = 'tiempo_limite'
+            else:
+                result['estado'] = 'fallo'
+
+        exitosos = sum(1 for r in resultados.values() if r['estado'] == 'ok')
+        duracion_ms = round((time.monotonic() - inicio) * 1000)
+        logger.info(f"Lote de documentos: {exitosos}/{len(resultados)} resueltos en {duracion_ms} ms - " +
+                    ', '.join(f"{tipo}={r['estado']}" for tipo, r in resultados.items()))
+        return {
+            'success': bool(resultados) and exitosos == len(resultados),
+            'documentos': resultados,
+            'exitosos': exitosos,
+            'total': len(resultados),
+            'duracion_total_ms': duracion_ms,
+        }
 
-    def _process_with_gpt4_vision(self, image_path: str, document_type: str) -> Dict:
+    def _cache_key(self, image_path: str, document_type: str) -> Optional[str]:
+        """Clave de caché (contenido + tipo + versión del prompt), o None si no se puede leer la imagen."""
+        try:
+            image_hash = hash_file(image_path)
+        except OSError:
+            return None
+        version = prompt_version(self._create_vision_prompt(document_type), 'gpt-4o-mini')
+        return OCRResultCache.make_key(image_hash, document_type, version)
+
+    def _cache_result(self, clave_cache: Optional[str], result: Dict) -> Dict:
+        if clave_cache:
+            # Los tiempos de la cadena son de esta ejecución, no del resultado
+            self.cache.put(clave_cache, {k: v for k, v in result.items() if k not in ('intentos', 'duracion_total_ms')})
+        return result
+
+    @ocr_timer('documento_gpt4_vision')
+    @ocr_telemetria.medir('documento_gpt4_vision')
+    def _process_with_gpt4_vision(self, image_path: str, document_type: str, deadline: float = None) -> Dict:
         """
         Procesa el documento usando GPT-4o-mini con capacidades de visión.
         Analiza directamente la imagen sin necesidad de OCR previo.
         """
         try:
-            # Preparar imagen para GPT-4o-mini
-            image_base64, mime_type = self._encode_image_to_base64(image_path)
+            # Preparar imagen para GPT-4o-mini (orientación, tamaño y codificación en memoria)
+            imagen = prepare_image(image_path, document_type)
+            ocr_telemetria.anotar(bytes_enviados=len(imagen.data))
             
             # Crear prompt específico para análisis de imagen
             prompt = self._create_vision_prompt(document_type)
             
             # Llamar a GPT-4o-mini con visión
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:{mime_type};base64,{image_base64}",
-                                    "detail": "high"
+            with get_breaker(BACKEND_OPENAI).llamada():
+                response = self.openai_client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": prompt
+                                },
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": imagen.data_url,
+                                        "detail": imagen.detail
+                                    }
                                 }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=500,
-                temperature=0.1
-            )
-            
-            # Procesar respuesta
-            content = response.choices[0].message.content
-            logger.info(f"Respuesta completa de GPT-4o-mini: {content}")
+                            ]
+                        }
+                    ],
+                    max_tokens=500,
+                    temperature=0.1,
+                    timeout=remaining(deadline),
+                    **ocr_esquemas.parametros_salida('documento')
+                )
+            ocr_telemetria.anotar_uso(response, 'gpt-4o-mini')
             
-            # Parsear respuesta JSON
+            # Respuesta con el esquema de documento (ver ocr_esquemas)
             try:
-                # Limpiar respuesta y extraer JSON
-                json_start = content.find('{')
-                json_end = content.rfind('}') + 1
-                json_str = content[json_start:json_end] if json_start != -1 else content
-                
-                result = json.loads(json_str)
-                
-                fecha_encontrada = result.get('fecha_encontrada')
-                
-                if fecha_encontrada and fecha_encontrada != 'null':
-                    # Validar formato de fecha específicamente para GPT-4o-mini
-                    fecha_validada = self._validate_gpt4_date(fecha_encontrada)
-                    
-                    if fecha_validada:
-                        return {
-                            'success': True,
-                            'fecha_vencimiento': fecha_validada,
-                            'confianza': result.get('confianza', 95),
-                            'texto_completo': result.get('texto_visible', ''),
-                            'texto_relevante': result.get('contexto', ''),
-                            'metodo': 'gpt4_vision',
-                            'message': f'Documento {document_type.upper()} procesado exitosamente con GPT-4o-mini visión.',
-                            'ruta_imagen': image_path
-                        }
-                    else:
-                        logger.warning(f"GPT-4o-mini fecha no válida: '{fecha_encontrada}' - respuesta completa: {result}")
-                        return {
-                            'success': False,
-                            'message': f'Fecha extraída por GPT-4o-mini no es válida: {fecha_encontrada}'
-                        }
-                else:
-                    logger.warning(f"GPT-4o-mini no encontró fecha - respuesta parseada: {result}")
-                    return {
-                        'success': False,
-                        'message': 'GPT-4o-mini no encontró fecha de vencimiento en la imagen'
-                    }
-                    
-            except json.JSONDecodeError as e:
-                logger.error(f"Error parseando respuesta JSON de GPT-4o-mini: {e}\nRespuesta: {content}")
+                content = ocr_esquemas.contenido_mensaje(response)
+                logger.info(f"Respuesta completa de GPT-4o-mini: {content}")
+                extraccion = ocr_esquemas.validar_documento(content)
+            except ocr_esquemas.ErrorEsquema as e:
+                logger.error(f"Respuesta de GPT-4o-mini fuera del esquema: {e}")
                 return {
                     'success': False,
                     'message': 'Error procesando respuesta de GPT-4o-mini'
                 }
             
+            fecha_encontrada = extraccion.fecha_encontrada
+            if not fecha_encontrada:
+                logger.warning(f"GPT-4o-mini no encontró fecha - respuesta: {extraccion}")
+                return {
+                    'success': False,
+                    'message': 'GPT-4o-mini no encontró fecha de vencimiento en la imagen'
+                }
+            
+            # Validar formato y rango de la fecha específicamente para GPT-4o-mini
+            fecha_validada = self._validate_gpt4_date(fecha_encontrada)
+            if not fecha_validada:
+                logger.warning(f"GPT-4o-mini fecha no válida: '{fecha_encontrada}' - respuesta: {extraccion}")
+                return {
+                    'success': False,
+                    'message': f'Fecha extraída por GPT-4o-mini no es válida: {fecha_encontrada}'
+                }
+            
+            return {
+                'success': True,
+                'fecha_vencimiento': fecha_validada,
+                'confianza': extraccion.confianza,
+                'texto_completo': extraccion.texto_visible,
+                'texto_relevante': extraccion.contexto,
+                'metodo': 'gpt4_vision',
+                'message': f'Documento {document_type.upper()} procesado exitosamente con GPT-4o-mini visión.',
+                'ruta_imagen': image_path
+            }
+            
         except Exception as e:
             logger.error(f"Error en GPT-4o-mini visión: {e}")
             return {
@@ -409,56 +465,16 @@ JSON:"""
                 'message': f'Error en procesamiento con GPT-4o-mini: {str(e)}'
             }
 
-    def _encode_image_to_base64(self, image_path: str) -> tuple[str, str]:
+    def _encode_image_to_base64(self, image_path: str, document_type: str = 'documento') -> tuple[str, str]:
         """
-        Convierte una imagen a base64 para enviar a GPT-4o-mini y detecta el formato
+        Convierte una imagen a base64 para enviar a GPT-4o-mini (ver ocr_preprocessing)
         
         Returns:
             tuple: (base64_string, mime_type)
         """
         try:
-            # Detectar formato de imagen usando PIL
-            from PIL import Image
-            import os
-            
-            # Abrir imagen para detectar formato real
-            with Image.open(image_path) as img:
-                format_detected = img.format.lower()
-                
-                # Mapear formatos PIL a tipos MIME soportados por OpenAI
-                mime_mapping = {
-                    'jpeg': 'image/jpeg',
-                    'jpg': 'image/jpeg', 
-                    'png': 'image/png',
-                    'gif': 'image/gif',
-                    'webp': 'image/webp'
-                }
-                
-                mime_type = mime_mapping.get(format_detected, 'image/jpeg')
-                logger.info(f"Formato detectado: {format_detected}, MIME type: {mime_type}")
-                
-                # Si no es un formato soportado, convertir a JPEG
-                if format_detected not in mime_mapping:
-                    logger.warning(f"Formato {format_detected} no soportado por OpenAI, convirtiendo a JPEG")
-                    
-                    # Convertir a JPEG y guardar temporalmente
-                    temp_path = image_path.replace(os.path.splitext(image_path)[1], '_converted.jpg')
-                    
-                    # Convertir imagen a RGB si es necesario (para JPEG)
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        img = img.convert('RGB')
-                    
-                    img.save(temp_path, 'JPEG', quality=95)
-                    image_path = temp_path
-                    mime_type = 'image/jpeg'
-                    logger.info(f"Imagen convertida a JPEG: {temp_path}")
-            
-            # Leer archivo (original o convertido) y codificar
-            with open(image_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-                
-            return encoded_string, mime_type
-            
+            imagen = prepare_image(image_path, document_type)
+            return imagen.base64, imagen.mime_type
         except Exception as e:
             logger.error(f"Error codificando imagen a base64: {e}")
             raise
@@ -531,13 +547,22 @@ FORMATO ESPERADO: Fecha en formato DD-MM-YYYY convertida a YYYY-MM-DD
         
         return base_instructions + type_specific.get(document_type, type_specific['arl'])
 
-    def _process_with_local_ocr_langchain(self, image_path: str, document_type: str) -> Dict:
+    @ocr_timer('documento_ocr_langchain')
+    @ocr_telemetria.medir('documento_ocr_langchain')
+    def _process_with_local_ocr_langchain(self, image_path: str, document_type: str, deadline: float = None,
+                                          cancel: threading.Event = None) -> Dict:
         """
         Procesa el documento usando OCR local + LangChain.
+
+        ``deadline`` (instante ``time.monotonic()``) acota el OCR y la llamada
+        al modelo; con ``cancel`` activado (otra estrategia ya ganó) no se
+        empieza ningún paso.
         """
         try:
             # Paso 1: Extraer texto con OCR
-            extracted_text = self._extract_text_from_image(image_path)
+            if cancel is not None and cancel.is_set():
+                return {'success': False, 'message': 'Cancelado: otra estrategia ya respondió'}
+            extracted_text = self._extract_text_from_image(image_path, deadline=deadline)
             
             if not extracted_text or len(extracted_text.strip()) < 10:
                 return {
@@ -548,54 +573,54 @@ FORMATO ESPERADO: Fecha en formato DD-MM-YYYY convertida a YYYY-MM-DD
             logger.info(f"Texto extraído ({len(extracted_text)} caracteres): {extracted_text[:200]}...")
             
             # Paso 2: Procesar texto con LangChain
+            if cancel is not None and cancel.is_set():
+                return {'success': False, 'message': 'Cancelado: otra estrategia ya respondió'}
             prompt = self.document_prompts[document_type]
-            chain = LLMChain(llm=self.llm, prompt=prompt)
+            llm = self.llm
+            if deadline is not None and hasattr(llm, 'bind'):
+                # Timeout por petición del cliente de OpenAI, acotado al tiempo que queda
+                llm = llm.bind(timeout=remaining(deadline))
+            chain = LLMChain(llm=llm, prompt=prompt)
             
-            response = chain.run(text=extracted_text)
+            with get_breaker(BACKEND_OPENAI).llamada(), \
+                    ocr_telemetria.contar_tokens_langchain(getattr(self.llm, 'model_name', None)):
+                response = chain.run(text=extracted_text)
             
-            # Paso 3: Parsear respuesta JSON
+            # Paso 3: Validar la respuesta (texto libre con JSON, ver ocr_esquemas)
             try:
-                # Limpiar respuesta y extraer JSON
-                json_start = response.find('{')
-                json_end = response.rfind('}') + 1
-                json_str = response[json_start:json_end] if json_start != -1 else response
-                
-                result = json.loads(json_str)
-                
-                fecha_encontrada = result.get('fecha_encontrada')
-                
-                if fecha_encontrada and fecha_encontrada != 'null':
-                    # Validar formato de fecha
-                    fecha_validada = self._validate_and_format_date(fecha_encontrada)
-                    
-                    if fecha_validada:
-                        return {
-                            'success': True,
-                            'fecha_vencimiento': fecha_validada,
-                            'confianza': result.get('confianza', 85),
-                            'texto_completo': extracted_text,
-                            'texto_relevante': result.get('texto_relevante', ''),
-                            'metodo': 'local_ocr_langchain',
-                            'message': f'Documento {document_type.upper()} procesado exitosamente con OCR local + LangChain.'
-                        }
-                    else:
-                        return {
-                            'success': False,
-                            'message': f'Fecha extraída no es válida: {fecha_encontrada}'
-                        }
-                else:
-                    return {
-                        'success': False,
-                        'message': 'No se encontró fecha de vencimiento en el documento'
-                    }
-                    
-            except json.JSONDecodeError as e:
-                logger.error(f"Error parseando respuesta JSON: {e}\nRespuesta: {response}")
+                extraccion = ocr_esquemas.validar_documento(response, confianza_defecto=85)
+            except ocr_esquemas.ErrorEsquema as e:
+                logger.error(f"Respuesta de LangChain fuera del esquema: {e}\nRespuesta: {response}")
                 return {
                     'success': False,
                     'message': 'Error procesando respuesta del modelo de IA'
                 }
             
+            fecha_encontrada = extraccion.fecha_encontrada
+            if not fecha_encontrada:
+                return {
+                    'success': False,
+                    'message': 'No se encontró fecha de vencimiento en el documento'
+                }
+            
+            # Validar formato de fecha
+            fecha_validada = self._validate_and_format_date(fecha_encontrada)
+            if not fecha_validada:
+                return {
+                    'success': False,
+                    'message': f'Fecha extraída no es válida: {fecha_encontrada}'
+                }
+            
+            return {
+                'success': True,
+                'fecha_vencimiento': fecha_validada,
+                'confianza': extraccion.confianza,
+                'texto_completo': extracted_text,
+                'texto_relevante': extraccion.contexto,
+                'metodo': 'local_ocr_langchain',
+                'message': f'Documento {document_type.upper()} procesado exitosamente con OCR local + LangChain.'
+            }
+            
         except Exception as e:
             logger.error(f"Error en procesamiento local OCR+LangChain: {e}")
             return {
@@ -603,37 +628,33 @@ FORMATO ESPERADO: Fecha en formato DD-MM-YYYY convertida a YYYY-MM-DD
                 'message': f'Error en procesamiento local: {str(e)}'
             }
 
-    def _extract_text_from_image(self, image_path: str) -> str:
+    def _extract_text_from_image(self, image_path: str, deadline: float = None) -> str:
         """
         Extrae texto de una imagen usando el motor de OCR disponible.
+        Con ``deadline`` la espera del motor se acota al tiempo que queda.
         """
+        if not self.ocr_method:
+            return ""
         try:
-            if self.ocr_method == 'easyocr' and self.ocr_reader:
-                # Usar EasyOCR
-                results = self.ocr_reader.readtext(image_path)
-                text = ' '.join([result[1] for result in results])
-                return text
-                
-            elif self.ocr_method == 'tesseract':
-                # Usar Tesseract
-                image = Image.open(image_path)
-                text = pytesseract.image_to_string(image, lang='spa+eng')
-                return text
-            
-            else:
-                return ""
-                
+            timeout = remaining(deadline, tope=ocr_engines.TIMEOUT_SECONDS) if deadline is not None else None
+            return ocr_engines.extraer_texto(image_path, motor=self.ocr_method, idiomas=['es', 'en'],
+                                             timeout=timeout)
         except Exception as e:
             logger.error(f"Error extrayendo texto de imagen: {e}")
             return ""
 
-    def _process_with_regex_fallback(self, image_path: str, document_type: str) -> Dict:
+    @ocr_timer('documento_ocr_regex')
+    @ocr_telemetria.medir('documento_ocr_regex')
+    def _process_with_regex_fallback(self, image_path: str, document_type: str, deadline: float = None,
+                                     cancel: threading.Event = None) -> Dict:
         """
         Procesa el documento usando OCR + regex simple como fallback.
         """
         try:
             # Extraer texto con OCR
-            extracted_text = self._extract_text_from_image(image_path)
+            if cancel is not None and cancel.is_set():
+                return {'success': False, 'message': 'Cancelado: otra estrategia ya respondió'}
+            extracted_text = self._extract_text_from_image(image_path, deadline=deadline)
             
             if not extracted_text or len(extracted_text.strip()) < 10:
                 return {
@@ -679,207 +700,24 @@ FORMATO ESPERADO: Fecha en formato DD-MM-YYYY convertida a YYYY-MM-DD
 
     def _extract_date_with_regex(self, text: str, document_type: str) -> Optional[str]:
         """
-        Extrae fechas usando análisis inteligente específico por tipo de documento.
+        Extrae la fecha de vencimiento del texto OCR con el escáner de un solo
+        recorrido (reglas contextuales por tipo y puntaje por contexto, ver ocr_fechas).
         """
         try:
-            logger.info(f"Analizando texto para {document_type}: {text[:200]}...")
-            
-            # Preprocesar texto para mejor análisis
-            text_clean = self._preprocess_text_for_analysis(text)
-            
-            # Estrategia 1: Buscar con patrones específicos contextualmente
-            contextual_date = self._extract_contextual_date(text_clean, document_type)
-            if contextual_date:
-                logger.info(f"Fecha encontrada con análisis contextual: {contextual_date}")
-                return contextual_date
-            
-            # Estrategia 2: Análisis de múltiples fechas con priorización
-            prioritized_date = self._extract_prioritized_date(text_clean, document_type)
-            if prioritized_date:
-                logger.info(f"Fecha encontrada con análisis priorizado: {prioritized_date}")
-                return prioritized_date
-            
-            # Estrategia 3: Búsqueda genérica de fechas válidas
-            generic_date = self._extract_generic_future_date(text_clean)
-            if generic_date:
-                logger.info(f"Fecha encontrada con análisis genérico: {generic_date}")
-                return generic_date
-            
+            resultado = escanear_fechas(text, document_type)
+            if resultado:
+                logger.info(f"Fecha encontrada ({resultado['estrategia']}, {resultado['candidatas']} candidatas): "
+                            f"{resultado['fecha']}")
+                return resultado['fecha']
             logger.warning(f"No se encontró fecha válida en el texto para {document_type}")
             return None
-            
         except Exception as e:
             logger.error(f"Error en extracción inteligente: {e}")
             return None
-    
-    def _preprocess_text_for_analysis(self, text: str) -> str:
-        """
-        Preprocesa el texto para análisis más efectivo.
-        """
-        # Limpiar y normalizar texto
-        text_clean = text.lower()
-        text_clean = re.sub(r'\s+', ' ', text_clean)  # Normalizar espacios
-        text_clean = re.sub(r'[^\w\s\/\-\.\:]', ' ', text_clean)  # Limpiar caracteres especiales
-        
-        # Normalizar términos comunes
-        replacements = {
-            'vencimiento': 'vence',
-            'vigencia': 'vence',
-            'valido hasta': 'vence',
-            'válido hasta': 'vence',
-            'expira': 'vence',
-            'caducidad': 'vence',
-            'fecha vence': 'vence',
-            'fecha de vencimiento': 'vence',
-        }
-        
-        for old, new in replacements.items():
-            text_clean = text_clean.replace(old, new)
-        
-        return text_clean
-    
-    def _extract_contextual_date(self, text: str, document_type: str) -> Optional[str]:
-        """
-        Extrae fechas usando contexto específico del tipo de documento.
-        """
-        # Patrones más inteligentes por tipo de documento
-        context_patterns = {
-            'arl': [
-                r'(?:arl|riesgo[s]?\s+laboral[es]?).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
-                r'venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4}).*?(?:arl|riesgo)',
-                r'(?:poliza|póliza).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
-            ],
-            'soat': [
-                r'(?:soat|seguro.*?obligatorio).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
-                r'venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4}).*?(?:soat|seguro)',
-                r'(?:poliza|póliza).*?(?:soat|obligatorio).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
-            ],
-            'tecnomecanica': [
-                r'(?:tecnomecanica|tecnomecánica|revisión).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
-                r'venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4}).*?(?:tecnomecanica|revisión)',
-                r'(?:próxima|siguiente)\s+(?:revisión|tecnomecanica).*?(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
-            ],
-            'licencia': [
-                r'(?:licencia|conducir).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
-                r'venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4}).*?(?:licencia|conducir)',
-                r'(?:categoria|categoría).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
-            ]
-        }
-        
-        patterns = context_patterns.get(document_type, context_patterns['arl'])
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-            if match:
-                candidate_date = match.group(1)
-                if self._validate_and_format_date(candidate_date):
-                    return candidate_date
-        
-        return None
-    
-    def _extract_prioritized_date(self, text: str, document_type: str) -> Optional[str]:
-        """
-        Extrae fechas analizando múltiples candidatos y priorizando los más probables.
-        """
-        # Encontrar todas las fechas posibles
-        date_patterns = [
-            r'(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{4})',  # dd/mm/yyyy
-            r'(\d{4}[\/\-\.]\d{1,2}[\/\-\.]\d{1,2})',  # yyyy/mm/dd
-            r'(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2})',  # dd/mm/yy
-        ]
-        
-        all_dates = []
-        for pattern in date_patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                date_str = match.group(1)
-                start_pos = match.start()
-                context_before = text[max(0, start_pos-30):start_pos].lower()
-                context_after = text[start_pos:start_pos+50].lower()
-                
-                # Calcular puntuación de prioridad
-                priority_score = self._calculate_date_priority(
-                    date_str, context_before, context_after, document_type
-                )
-                
-                validated_date = self._validate_and_format_date(date_str)
-                if validated_date:
-                    all_dates.append((validated_date, priority_score, date_str))
-        
-        # Ordenar por puntuación y devolver la mejor
-        if all_dates:
-            all_dates.sort(key=lambda x: x[1], reverse=True)
-            best_date = all_dates[0]
-            logger.info(f"Mejor fecha seleccionada: {best_date[0]} (puntuación: {best_date[1]})")
-            return best_date[0]
-        
-        return None
-    
-    def _calculate_date_priority(self, date_str: str, context_before: str, context_after: str, document_type: str) -> int:
-        """
-        Calcula puntuación de prioridad para una fecha basada en el contexto.
-        """
-        score = 0
-        combined_context = context_before + " " + context_after
-        
-        # Palabras clave que indican vencimiento
-        vencimiento_keywords = ['venc', 'vigencia', 'válido', 'expira', 'caducidad']
-        for keyword in vencimiento_keywords:
-            if keyword in combined_context:
-                score += 50
-        
-        # Palabras específicas por tipo de documento
-        type_keywords = {
-            'arl': ['arl', 'riesgo', 'laboral', 'poliza'],
-            'soat': ['soat', 'seguro', 'obligatorio', 'vehiculo'],
-            'tecnomecanica': ['tecnomecanica', 'revisión', 'mecánica'],
-            'licencia': ['licencia', 'conducir', 'categoria']
-        }
-        
-        for keyword in type_keywords.get(document_type, []):
-            if keyword in combined_context:
-                score += 30
-        
-        # Penalizar fechas muy pasadas o muy futuras
-        try:
-            validated_date = self._validate_and_format_date(date_str)
-            if validated_date:
-                date_obj = datetime.strptime(validated_date, '%Y-%m-%d')
-                current_date = datetime.now()
-                days_diff = (date_obj - current_date).days
-                
-                if 0 <= days_diff <= 365*3:  # Fecha futura dentro de 3 años
-                    score += 20
-                elif days_diff < 0:  # Fecha pasada
-                    score -= 100
-                elif days_diff > 365*5:  # Muy futura
-                    score -= 50
-        except:
-            pass
-        
-        return score
-    
-    def _extract_generic_future_date(self, text: str) -> Optional[str]:
-        """
-        Extrae la primera fecha futura válida encontrada en el texto.
-        """
-        date_pattern = r'(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})'
-        matches = re.findall(date_pattern, text)
-        
-        for date_str in matches:
-            validated_date = self._validate_and_format_date(date_str)
-            if validated_date:
-                # Verificar que sea fecha futura
-                try:
-                    date_obj = datetime.strptime(validated_date, '%Y-%m-%d')
-                    if date_obj > datetime.now():
-                        return validated_date
-                except:
-                    continue
-        
-        return None
 
-    def _process_with_webhook(self, image_path: str, document_type: str, user: str) -> Dict:
+    @ocr_timer('documento_webhook')
+    @ocr_telemetria.medir('documento_webhook')
+    def _process_with_webhook(self, image_path: str, document_type: str, user: str, deadline: float = None) -> Dict:
         """
         Procesa el documento usando webhook como fallback.
         """
@@ -888,14 +726,20 @@ FORMATO ESPERADO: Fecha en formato DD-MM-YYYY convertida a YYYY-MM-DD
             webhook_url = self.webhook_urls[document_type]
             
             with open(image_path, 'rb') as image_file:
-                files = {'imagen': image_file}
-                data = {
-                    'tipo_documento': document_type,
-                    'usuario': user,
-                    'timestamp': datetime.now().isoformat()
-                }
-                
-                response = requests.post(webhook_url, files=files, data=data, timeout=30)
+                # En memoria para poder reenviarla si hay reintento
+                files = {'imagen': (os.path.basename(image_path), image_file.read())}
+            ocr_telemetria.anotar(bytes_enviados=len(files['imagen'][1]))
+            data = {
+                'tipo_documento': document_type,
+                'usuario': user,
+                'timestamp': datetime.now().isoformat()
+            }
+            
+            with get_breaker(BACKEND_WEBHOOK_MAKE).llamada() as llamada:
+                response = http_client.post(webhook_url, files=files, data=data, timeout=30,
+                                            deadline=deadline, reintentar=True)
+                if response.status_code != 200:
+                    llamada.fallo(f'HTTP {response.status_code}')
             
             if response.status_code == 200:
                 result = response.json()
@@ -1086,6 +930,20 @@ class OCRPlacaService:
     Servicio especializado para OCR de placas vehiculares con GPT-4 Vision
     """
     
+    PLACA_PROMPT = """Eres un experto en reconocimiento de placas vehiculares colombianas.
+
+Analiza esta imagen y extrae ÚNICAMENTE el texto de la placa vehicular que veas.
+
+FORMATO ESPERADO: 3 letras seguidas de 3 números (ejemplo: ABC123)
+
+INSTRUCCIONES:
+1. Identifica la placa vehicular en la imagen
+2. Extrae solo las letras y números de la placa
+3. Responde ÚNICAMENTE con el texto de la placa en formato ABC123
+4. Si no puedes identificar claramente la placa, responde "NO_DETECTADA"
+
+RESPUESTA:"""
+
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.ocr_engine = 'easyocr'  # 'easyocr' o 'tesseract'
@@ -1097,8 +955,7 @@ class OCRPlacaService:
         
         if self.openai_api_key:
             try:
-                import openai
-                self.openai_client = openai.OpenAI(api_key=self.openai_api_key)
+                self.openai_client = http_client.get_openai_client(self.openai_api_key)
                 self.logger.info("OpenAI GPT-4o Vision inicializado para placas")
             except Exception as e:
                 self.logger.error(f"Error inicializando OpenAI Vision: {e}")
@@ -1122,6 +979,11 @@ class OCRPlacaService:
         
         # Webhook fallback para placas (método final)
         self.webhook_url = "https://primary-production-6eccf.up.railway.app/webhook/4109b3f4-db19-440e-b153-59b685ba914d"
+        
+        # Resultados previos por contenido de imagen (ver ocr_cache)
+        self.cache = get_ocr_cache()
+        # Fotos de placa iguales o casi iguales ya cargadas (ver fotos_duplicadas)
+        self.huellas = get_indice_huellas()
     
     def _init_fallback_services(self):
         """Inicializa servicios de fallback solo cuando son necesarios"""
@@ -1143,70 +1005,50 @@ class OCRPlacaService:
             self.logger.error(f"Error inicializando LLM: {e}")
             self.llm = None
         
-        # Configurar OCR Engine local (método terciario)
-        if self.ocr_engine == 'easyocr':
-            try:
-                import easyocr
-                self.ocr_reader = easyocr.Reader(['es', 'en'], gpu=False)
-                self.logger.info("EasyOCR inicializado para placas")
-            except Exception as e:
-                self.logger.error(f"Error inicializando EasyOCR: {e}")
-                self.ocr_reader = None
+        # Configurar OCR Engine local (método terciario), compartido entre servicios
+        motor = self.ocr_engine if ocr_engines.disponible(self.ocr_engine) else 'tesseract'
+        self.ocr_reader = motor if ocr_engines.disponible(motor) else None
+        if self.ocr_reader:
+            self.logger.info(f"OCR local para placas: {self.ocr_reader} (ocr_engines)")
+        else:
+            self.logger.error("No hay motor de OCR local para placas")
     
     def _encode_image(self, image_path: str) -> tuple[str, str]:
         """
-        Codifica imagen a base64 para envío a OpenAI y detecta el formato
+        Codifica imagen a base64 para envío a OpenAI (ver ocr_preprocessing)
         
         Returns:
             tuple: (base64_string, mime_type)
         """
         try:
-            # Detectar formato de imagen usando PIL
-            from PIL import Image
-            import os
-            
-            # Abrir imagen para detectar formato real
-            with Image.open(image_path) as img:
-                format_detected = img.format.lower()
-                
-                # Mapear formatos PIL a tipos MIME soportados por OpenAI
-                mime_mapping = {
-                    'jpeg': 'image/jpeg',
-                    'jpg': 'image/jpeg', 
-                    'png': 'image/png',
-                    'gif': 'image/gif',
-                    'webp': 'image/webp'
-                }
-                
-                mime_type = mime_mapping.get(format_detected, 'image/jpeg')
-                self.logger.info(f"Formato detectado: {format_detected}, MIME type: {mime_type}")
-                
-                # Si no es un formato soportado, convertir a JPEG
-                if format_detected not in mime_mapping:
-                    self.logger.warning(f"Formato {format_detected} no soportado por OpenAI, convirtiendo a JPEG")
-                    
-                    # Convertir a JPEG y guardar temporalmente
-                    temp_path = image_path.replace(os.path.splitext(image_path)[1], '_converted.jpg')
-                    
-                    # Convertir imagen a RGB si es necesario (para JPEG)
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        img = img.convert('RGB')
-                    
-                    img.save(temp_path, 'JPEG', quality=95)
-                    image_path = temp_path
-                    mime_type = 'image/jpeg'
-                    self.logger.info(f"Imagen convertida a JPEG: {temp_path}")
-            
-            # Leer archivo (original o convertido) y codificar
-            with open(image_path, "rb") as image_file:
-                base64_string = base64.b64encode(image_file.read()).decode('utf-8')
-                
-            return base64_string, mime_type
-            
+            imagen = prepare_image(image_path, 'placa')
+            return imagen.base64, imagen.mime_type
         except Exception as e:
             self.logger.error(f"Error codificando imagen: {e}")
             return "", "image/jpeg"
 
+    @ocr_timer('placa_local')
+    @ocr_telemetria.medir('placa_local')
+    def _process_with_local_fast_path(self, image_path: str) -> Dict[str, Any]:
+        """
+        Lectura local de la placa (ver ocr_placa_local); success solo con confianza alta
+        """
+        try:
+            result = ocr_placa_local.reconocer_placa(image_path)
+            result.pop('lecturas', None)
+            return result
+        except Exception as e:
+            self.logger.error(f"Error en lectura local de placa: {e}")
+            return {
+                'success': False,
+                'placa': '',
+                'confianza': 0,
+                'metodo': 'local_tesseract',
+                'mensaje': f'Error lectura local: {str(e)}'
+            }
+
+    @ocr_timer('placa_openai_vision')
+    @ocr_telemetria.medir('placa_openai_vision')
     def _process_with_openai_vision(self, image_path: str, placa_registrada: str = None) -> Dict[str, Any]:
         """
         Procesa imagen usando OpenAI GPT-4 Vision para reconocer placas
@@ -1231,89 +1073,62 @@ class OCRPlacaService:
                     'metodo': 'openai_vision',
                     'mensaje': 'Error codificando imagen'
                 }
-
-            # Crear prompt para reconocimiento de placa
-            prompt = """Eres un experto en reconocimiento de placas vehiculares colombianas.
-
-Analiza esta imagen y extrae ÚNICAMENTE el texto de la placa vehicular que veas.
-
-FORMATO ESPERADO: 3 letras seguidas de 3 números (ejemplo: ABC123)
-
-INSTRUCCIONES:
-1. Identifica la placa vehicular en la imagen
-2. Extrae solo las letras y números de la placa
-3. Responde ÚNICAMENTE con el texto de la placa en formato ABC123
-4. Si no puedes identificar claramente la placa, responde "NO_DETECTADA"
-
-RESPUESTA:"""
+            ocr_telemetria.anotar(bytes_enviados=len(base64_image) * 3 // 4)
 
             # Llamar a OpenAI Vision
-            response = self.openai_client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:{mime_type};base64,{base64_image}"
+            with get_breaker(BACKEND_OPENAI).llamada():
+                response = self.openai_client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": self.PLACA_PROMPT},
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": f"data:{mime_type};base64,{base64_image}"
+                                    }
                                 }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=50,
-                temperature=0.1
-            )
+                            ]
+                        }
+                    ],
+                    max_tokens=50,
+                    temperature=0.1,
+                    **ocr_esquemas.parametros_salida('placa')
+                )
+            ocr_telemetria.anotar_uso(response, self.model)
 
-            placa_text = response.choices[0].message.content.strip().upper()
-            
-            # Validar respuesta
-            if placa_text == "NO_DETECTADA":
+            # Respuesta con el esquema de placa, o texto si no hay salida estructurada (ver ocr_esquemas)
+            try:
+                extraccion = ocr_esquemas.validar_placa(ocr_esquemas.contenido_mensaje(response))
+            except ocr_esquemas.ErrorEsquema as e:
                 return {
                     'success': False,
                     'placa': '',
                     'confianza': 0,
                     'metodo': 'openai_vision',
-                    'mensaje': 'OpenAI no pudo detectar placa en la imagen'
+                    'mensaje': str(e)
                 }
-
-            # Validar formato de placa colombiana
-            import re
-            placa_pattern = r'^[A-Z]{3}[0-9]{3}$'
             
-            if re.match(placa_pattern, placa_text):
+            if extraccion.placa is None:
                 return {
-                    'success': True,
-                    'placa': placa_text,
-                    'confianza': 95,
+                    'success': False,
+                    'placa': '',
+                    'confianza': 0,
                     'metodo': 'openai_vision',
-                    'placa_registrada': placa_registrada,
-                    'coincide': placa_text == placa_registrada.upper() if placa_registrada else None
+                    'mensaje': 'OpenAI no pudo detectar placa en la imagen'
                 }
-            else:
-                # Intentar extraer placa de respuesta más larga
-                placa_matches = re.findall(r'[A-Z]{3}[0-9]{3}', placa_text)
-                if placa_matches:
-                    placa_detectada = placa_matches[0]
-                    return {
-                        'success': True,
-                        'placa': placa_detectada,
-                        'confianza': 85,
-                        'metodo': 'openai_vision_extracted',
-                        'placa_registrada': placa_registrada,
-                        'coincide': placa_detectada == placa_registrada.upper() if placa_registrada else None
-                    }
-                else:
-                    return {
-                        'success': False,
-                        'placa': '',
-                        'confianza': 0,
-                        'metodo': 'openai_vision',
-                        'mensaje': f'Formato de placa inválido: {placa_text}'
-                    }
+            
+            placa = extraccion.placa
+            return {
+                'success': True,
+                'placa': placa,
+                'confianza': 85 if extraccion.extraida else 95,
+                'metodo': 'openai_vision_extracted' if extraccion.extraida else 'openai_vision',
+                'placa_registrada': placa_registrada,
+                'coincide': placa == placa_registrada.upper() if placa_registrada else None
+            }
 
         except Exception as e:
             self.logger.error(f"Error en OpenAI Vision: {e}")
@@ -1327,32 +1142,11 @@ RESPUESTA:"""
 
     def _extract_text_from_image(self, image_path: str) -> str:
         """
-        Extrae texto de imagen usando OCR local con lazy loading
+        Extrae texto de imagen con el motor local compartido (se carga una vez por proceso)
         """
         try:
-            # Lazy loading: Solo inicializar EasyOCR si es necesario y no se ha inicializado
-            if self.ocr_engine == 'easyocr' and not self.ocr_reader:
-                try:
-                    import easyocr
-                    self.logger.info("Inicializando EasyOCR bajo demanda...")
-                    self.ocr_reader = easyocr.Reader(['es', 'en'], gpu=False)
-                    self.logger.info("EasyOCR inicializado bajo demanda para placas")
-                except Exception as e:
-                    self.logger.error(f"Error inicializando EasyOCR bajo demanda: {e}")
-                    self.ocr_reader = None
-            
-            if self.ocr_engine == 'easyocr' and self.ocr_reader:
-                # Usar EasyOCR
-                results = self.ocr_reader.readtext(image_path)
-                text = ' '.join([item[1] for item in results])
-            else:
-                # Usar Tesseract como fallback
-                from PIL import Image
-                import pytesseract
-                image = Image.open(image_path)
-                text = pytesseract.image_to_string(image, lang='spa+eng')
-            
-            return text.strip()
+            return ocr_engines.extraer_texto(image_path, motor=self.ocr_reader or self.ocr_engine,
+                                            idiomas=['es', 'en']).strip()
         except Exception as e:
             self.logger.error(f"Error en OCR local: {e}")
             return ""
@@ -1376,6 +1170,8 @@ Texto extraído de la imagen: {text}"""
             template=template
         )
     
+    @ocr_timer('placa_langchain')
+    @ocr_telemetria.medir('placa_langchain')
     def _process_with_langchain(self, extracted_text: str) -> Dict[str, Any]:
         """
         Procesa el texto extraído con LangChain + OpenAI para identificar la placa
@@ -1407,7 +1203,9 @@ Texto extraído de la imagen: {text}"""
             chain = LLMChain(llm=self.llm, prompt=prompt)
             
             # Ejecutar cadena LangChain
-            response = chain.run(text=extracted_text)
+            with get_breaker(BACKEND_OPENAI).llamada(), \
+                    ocr_telemetria.contar_tokens_langchain(getattr(self.llm, 'model_name', None)):
+                response = chain.run(text=extracted_text)
             placa_text = response.strip()
             
             # Validar formato de placa (3 letras + 3 números)
@@ -1450,14 +1248,22 @@ Texto extraído de la imagen: {text}"""
                 'mensaje': f'Error LangChain: {str(e)}'
             }
     
+    @ocr_timer('placa_webhook')
+    @ocr_telemetria.medir('placa_webhook')
     def _process_with_webhook(self, image_path: str) -> Dict[str, Any]:
         """
         Procesa imagen usando webhook de n8n como fallback
         """
         try:
             with open(image_path, 'rb') as image_file:
-                files = {'image': image_file}
-                response = requests.post(self.webhook_url, files=files, timeout=30)
+                files = {'image': (os.path.basename(image_path), image_file.read())}
+            ocr_telemetria.anotar(bytes_enviados=len(files['image'][1]))
+            with get_breaker(BACKEND_WEBHOOK_N8N).llamada() as llamada:
+                # Un solo intento: la placa se lee en la portería dentro de la petición y
+                # el POST no es idempotente (3 intentos de 30 s rozan el timeout de gunicorn)
+                response = http_client.post(self.webhook_url, files=files, timeout=30)
+                if response.status_code != 200:
+                    llamada.fallo(f'HTTP {response.status_code}')
             
             if response.status_code == 200:
                 placa_text = response.text.strip()
@@ -1500,6 +1306,57 @@ Texto extraído de la imagen: {text}"""
                 'mensaje': f'Error webhook: {str(e)}'
             }
     
+    def _cache_key(self, image_path: str) -> Optional[str]:
+        """Clave de caché (contenido + versión del prompt), o None si no se puede leer la imagen."""
+        try:
+            image_hash = hash_file(image_path)
+        except OSError:
+            return None
+        return OCRResultCache.make_key(image_hash, 'placa', self._version_analisis())
+
+    def _version_analisis(self) -> str:
+        return prompt_version(self.PLACA_PROMPT, self.model)
+
+    def _cache_result(self, clave_cache: Optional[str], result: Dict[str, Any]) -> Dict[str, Any]:
+        if clave_cache:
+            self.cache.put(clave_cache, result)
+        return result
+
+    def _finalizar(self, clave_cache: Optional[str], result: Dict[str, Any], placa_registrada: str,
+                   image_path: str, duplicado=None) -> Dict[str, Any]:
+        """Guarda la lectura (caché OCR e índice de huellas), marca la foto repetida y sugiere correcciones."""
+        self._cache_result(clave_cache, result)
+        if result.get('success'):
+            self.huellas.guardar_analisis(image_path, 'placa', self._version_analisis(), result)
+        if duplicado:
+            result['posible_duplicado'] = duplicado.como_dict()
+        return self._sugerir_correccion(result, placa_registrada)
+
+    def _sugerir_correccion(self, result: Dict[str, Any], placa_registrada: str = None) -> Dict[str, Any]:
+        """
+        Agrega placas conocidas cercanas cuando la lectura no coincide con la
+        registrada o no está en la flota (ver ocr_placa_correccion)
+        """
+        placa = result.get('placa')
+        if not result.get('success') or not placa or result.get('coincide'):
+            return result
+        try:
+            indice = get_indice_placas()
+            if indice is None or (not placa_registrada and indice.conocida(placa)):
+                return result
+            candidatos = indice.candidatos(placa)
+        except Exception as e:
+            self.logger.warning(f"No se pudieron calcular correcciones de placa: {e}")
+            return result
+        result['candidatos'] = candidatos
+        if candidatos and candidatos[0]['distancia'] <= MAX_DISTANCIA_SUGERENCIA:
+            result['placa_sugerida'] = candidatos[0]['placa']
+            if placa_registrada:
+                result['coincide_con_correccion'] = candidatos[0]['placa'] == placa_registrada.upper()
+            self.logger.info(f"🔧 Lectura {placa} corregible a {result['placa_sugerida']} "
+                             f"(distancia OCR {candidatos[0]['distancia']})")
+        return result
+
     def process_placa_image(self, image_path: str, user: str = "sistema", placa_registrada: str = None) -> Dict[str, Any]:
         """
         Procesa imagen de placa vehicular optimizado para velocidad
@@ -1512,79 +1369,128 @@ Texto extraído de la imagen: {text}"""
         Returns:
             Dict con resultado del procesamiento de placa
         """
-        try:
-            self.logger.info(f"Procesando placa: {image_path} por usuario: {user}")
-            if placa_registrada:
-                self.logger.info(f"Placa registrada para comparación: {placa_registrada}")
+        with ocr_telemetria.contexto('placa', 'placa', user, image_path):
+            try:
+                self.logger.info(f"Procesando placa: {image_path} por usuario: {user}")
+                if placa_registrada:
+                    self.logger.info(f"Placa registrada para comparación: {placa_registrada}")
             
-            # MÉTODO OPTIMIZADO: OpenAI GPT-4 Vision (Directo y rápido)
-            if self.openai_client:
-                self.logger.info("🤖 Intentando con OpenAI GPT-4 Vision...")
-                result = self._process_with_openai_vision(image_path, placa_registrada)
+                # La misma foto ya procesada (recarga, reintento) no vuelve a llamar a la API
+                clave_cache = self._cache_key(image_path)
+                # Una foto igual o casi igual ya cargada se marca; si FOTOS_HUELLAS_REUSO
+                # incluye placas, se reutiliza su lectura
+                duplicado = self.huellas.registrar(image_path, 'placa', referencia=user)
+                cached = self.cache.get(clave_cache, 'ocr_placa') if clave_cache else None
+                if cached:
+                    cached['cache'] = True
+                    ocr_telemetria.registrar_cache(confianza=cached.get('confianza'))
+                    cached['placa_registrada'] = placa_registrada
+                    cached['coincide'] = cached['placa'] == placa_registrada.upper() if placa_registrada else None
+                    if duplicado:
+                        cached['posible_duplicado'] = duplicado.como_dict()
+                    self.logger.info(f"✅ Placa tomada de la caché OCR: {cached['placa']}")
+                    return self._sugerir_correccion(cached, placa_registrada)
+
+                previo = self.huellas.analisis_reutilizable('placa', duplicado, self._version_analisis())
+                if previo:
+                    previo['duplicado_de'] = duplicado.ruta
+                    previo['placa_registrada'] = placa_registrada
+                    previo['coincide'] = previo['placa'] == placa_registrada.upper() if placa_registrada else None
+                    ocr_telemetria.registrar_cache(confianza=previo.get('confianza'))
+                    self.logger.info(f"✅ Placa reutilizada de la foto casi igual {duplicado.ruta}: {previo['placa']}")
+                    return self._finalizar(clave_cache, previo, placa_registrada, image_path, duplicado)
+            
+                # MÉTODO LOCAL: OpenCV + Tesseract restringido a la gramática de placa (sin red)
+                if ocr_placa_local.disponible():
+                    result = self._process_with_local_fast_path(image_path)
+                    if result['success']:
+                        result['placa_registrada'] = placa_registrada
+                        result['coincide'] = result['placa'] == placa_registrada.upper() if placa_registrada else None
+                        self.logger.info(f"✅ Placa leída localmente: {result['placa']} ({result['confianza']}%)")
+                        return self._finalizar(clave_cache, result, placa_registrada, image_path, duplicado)
+                    self.logger.info(f"🔍 Lectura local insuficiente ({result.get('placa') or 'sin placa'}, "
+                                     f"{result.get('confianza', 0)}%), usando la nube")
+            
+                # MÉTODO OPTIMIZADO: OpenAI GPT-4 Vision (Directo y rápido)
+                openai_disponible = get_breaker(BACKEND_OPENAI).disponible()
+                if self.openai_client and openai_disponible:
+                    self.logger.info("🤖 Intentando con OpenAI GPT-4 Vision...")
+                    result = self._process_with_openai_vision(image_path, placa_registrada)
                 
-                if result['success']:
-                    self.logger.info(f"✅ OpenAI Vision procesó exitosamente: {result['placa']}")
-                    return result
+                    if result['success']:
+                        self.logger.info(f"✅ OpenAI Vision procesó exitosamente: {result['placa']}")
+                        return self._finalizar(clave_cache, result, placa_registrada, image_path, duplicado)
+                    else:
+                        self.logger.warning(f"⚠️ OpenAI Vision falló: {result.get('mensaje', 'Sin mensaje')}")
+                elif self.openai_client:
+                    self.logger.warning("OpenAI con circuito abierto, usando fallbacks")
                 else:
-                    self.logger.warning(f"⚠️ OpenAI Vision falló: {result.get('mensaje', 'Sin mensaje')}")
-            else:
-                self.logger.warning("OpenAI no disponible, usando fallbacks")
+                    self.logger.warning("OpenAI no disponible, usando fallbacks")
             
-            # FALLBACKS: Solo si OpenAI no está disponible o falló y están habilitados
-            if self.enable_fallbacks:
-                # Inicializar servicios de fallback si no se han inicializado
-                if not self.llm and not self.ocr_reader:
-                    self.logger.info("Inicializando servicios de fallback por primera vez...")
-                    self._init_fallback_services()
+                # FALLBACKS: Solo si OpenAI no está disponible o falló y están habilitados
+                if self.enable_fallbacks:
+                    # Inicializar servicios de fallback si no se han inicializado
+                    if not self.llm and not self.ocr_reader:
+                        self.logger.info("Inicializando servicios de fallback por primera vez...")
+                        self._init_fallback_services()
                 
-                # MÉTODO 2: OCR Local + LangChain (Secundario)
-                if self.ocr_reader or self.llm:
-                    extracted_text = self._extract_text_from_image(image_path)
+                    # MÉTODO 2: OCR Local + LangChain (Secundario)
+                    if self.ocr_reader or (self.llm and openai_disponible):
+                        extracted_text = self._extract_text_from_image(image_path)
                     
-                    if extracted_text:
-                        self.logger.info(f"🔍 Texto OCR extraído: {extracted_text}")
-                        self.logger.info("🧠 Intentando con LangChain...")
+                        if extracted_text:
+                            self.logger.info(f"🔍 Texto OCR extraído: {extracted_text}")
+                            self.logger.info("🧠 Intentando con LangChain...")
                         
-                        result = self._process_with_langchain(extracted_text)
+                            result = self._process_with_langchain(extracted_text)
                         
-                        if result['success']:
-                            # Añadir verificación de placa registrada si se proporcionó
-                            if placa_registrada:
-                                result['placa_registrada'] = placa_registrada
-                                result['coincide'] = result['placa'] == placa_registrada.upper()
+                            if result['success']:
+                                # Añadir verificación de placa registrada si se proporcionó
+                                if placa_registrada:
+                                    result['placa_registrada'] = placa_registrada
+                                    result['coincide'] = result['placa'] == placa_registrada.upper()
                             
-                            self.logger.info(f"✅ LangChain procesó exitosamente: {result['placa']}")
-                            return result
+                                self.logger.info(f"✅ LangChain procesó exitosamente: {result['placa']}")
+                                return self._finalizar(clave_cache, result, placa_registrada, image_path, duplicado)
+                            else:
+                                self.logger.warning(f"⚠️ LangChain falló: {result.get('mensaje', 'Sin mensaje')}")
                         else:
-                            self.logger.warning(f"⚠️ LangChain falló: {result.get('mensaje', 'Sin mensaje')}")
-                    else:
-                        self.logger.warning("⚠️ No se pudo extraer texto con OCR local")
+                            self.logger.warning("⚠️ No se pudo extraer texto con OCR local")
             
-            # MÉTODO 3: Webhook Fallback (Final)
-            self.logger.info("🔄 Usando webhook fallback para placa...")
-            result = self._process_with_webhook(image_path)
+                # MÉTODO 3: Webhook Fallback (Final)
+                if not get_breaker(BACKEND_WEBHOOK_N8N).disponible():
+                    self.logger.error("❌ Webhook de placas con circuito abierto; sin más métodos")
+                    return {
+                        'success': False,
+                        'placa': '',
+                        'confianza': 0,
+                        'metodo': 'webhook_n8n',
+                        'mensaje': 'Servicios de reconocimiento no disponibles en este momento. Ingrese la placa manualmente.'
+                    }
+                self.logger.info("🔄 Usando webhook fallback para placa...")
+                result = self._process_with_webhook(image_path)
             
-            if result['success']:
-                # Añadir verificación de placa registrada si se proporcionó
-                if placa_registrada:
-                    result['placa_registrada'] = placa_registrada
-                    result['coincide'] = result['placa'] == placa_registrada.upper()
+                if result['success']:
+                    # Añadir verificación de placa registrada si se proporcionó
+                    if placa_registrada:
+                        result['placa_registrada'] = placa_registrada
+                        result['coincide'] = result['placa'] == placa_registrada.upper()
                 
-                self.logger.info(f"✅ Webhook procesó exitosamente: {result['placa']}")
-            else:
-                self.logger.error(f"❌ Webhook falló: {result.get('mensaje', 'Sin mensaje')}")
+                    self.logger.info(f"✅ Webhook procesó exitosamente: {result['placa']}")
+                else:
+                    self.logger.error(f"❌ Webhook falló: {result.get('mensaje', 'Sin mensaje')}")
             
-            return result
+                return self._finalizar(clave_cache, result, placa_registrada, image_path, duplicado)
         
-        except Exception as e:
-            self.logger.error(f"❌ Error general procesando placa: {e}")
-            return {
-                'success': False,
-                'placa': '',
-                'confianza': 0,
-                'metodo': 'error',
-                'mensaje': f'Error general: {str(e)}'
-            }
+            except Exception as e:
+                self.logger.error(f"❌ Error general procesando placa: {e}")
+                return {
+                    'success': False,
+                    'placa': '',
+                    'confianza': 0,
+                    'metodo': 'error',
+                    'mensaje': f'Error general: {str(e)}'
+                }
 
 # Instancia global del servicio de placas
 ocr_placa_service = OCRPlacaService() 
\ No newline at end of file
@@ -0,0 +1,457 @@
+"""
+Telemetría persistente de llamadas OCR.
+
+Cada resultado trae ``metodo`` y ``confianza``, pero nada los guardaba. Aquí
+se registra cada llamada a un backend (visión, OCR local + LangChain, regex,
+webhook, lectura local de placa) y cada acierto de la caché OCR con:
+duración, bytes de la imagen original y de la enviada, tokens, costo
+estimado, resultado, confianza y usuario. ``resumen`` agrega los datos para
+el panel de monitoreo y sirve para ajustar fallbacks, TTL de caché y tamaños
+de imagen con datos.
+
+Uso desde los servicios:
+
+- ``contexto(servicio, tipo, usuario, image_path)`` alrededor de una
+  solicitud (``process_document``, ``process_placa_image``); agrupa sus
+  llamadas con un ``solicitud_id``. Se propaga a los hilos de
+  ``ocr_hedging`` porque allí las tareas se lanzan con ``copy_context``.
+- ``@medir(metodo)`` en cada método de backend (junto a ``ocr_timer``).
+- ``anotar(...)`` dentro del backend para lo que solo él sabe: tokens de
+  ``response.usage``, modelo y bytes enviados.
+
+Las filas se acumulan en memoria y un hilo las escribe en lote en SQLite
+(WAL, una conexión por hilo y proceso). Un error de telemetría se registra y
+se descarta; nunca interrumpe el OCR.
+
+Configuración (variables de entorno):
+    OCR_TELEMETRY_ENABLED         true/false (default true)
+    OCR_TELEMETRY_PATH            default instance/ocr_telemetria.db
+    OCR_TELEMETRY_RETENTION_DAYS  default 90
+    OCR_TELEMETRY_FLUSH_SECONDS   default 5
+"""
+
+import atexit
+import contextvars
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'ocr_telemetria.db')
+
+# USD por millón de tokens (entrada, salida); modelos desconocidos no suman costo
+PRECIOS_USD_POR_MILLON = {
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4-turbo': (10.00, 30.00),
+    'gpt-4': (30.00, 60.00),
+    'gpt-3.5-turbo': (0.50, 1.50),
+}
+
+# Límites superiores (bytes) de los rangos de tamaño de imagen del resumen
+RANGOS_BYTES = (100 * 1024, 250 * 1024, 500 * 1024, 1024 * 1024, 2 * 1024 * 1024, 5 * 1024 * 1024)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_llamadas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    solicitud_id TEXT,
+    servicio TEXT NOT NULL,
+    metodo TEXT NOT NULL,
+    tipo TEXT,
+    resultado TEXT NOT NULL,
+    duracion_ms INTEGER NOT NULL,
+    bytes_imagen INTEGER,
+    bytes_enviados INTEGER,
+    tokens_entrada INTEGER,
+    tokens_salida INTEGER,
+    costo_usd REAL,
+    modelo TEXT,
+    confianza REAL,
+    usuario TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_ocr_llamadas_ts ON ocr_llamadas (ts);
+CREATE INDEX IF NOT EXISTS ix_ocr_llamadas_servicio_metodo ON ocr_llamadas (servicio, metodo, ts);
+"""
+
+_COLUMNAS = ('ts', 'solicitud_id', 'servicio', 'metodo', 'tipo', 'resultado', 'duracion_ms', 'bytes_imagen',
+             'bytes_enviados', 'tokens_entrada', 'tokens_salida', 'costo_usd', 'modelo', 'confianza',
+             'usuario', 'error')
+
+# Solicitud en curso (servicio, tipo, usuario...) y llamada en curso (lo que anota el backend)
+_solicitud = contextvars.ContextVar('ocr_telemetria_solicitud', default=None)
+_llamada = contextvars.ContextVar('ocr_telemetria_llamada', default=None)
+
+
+def costo_estimado(modelo: Optional[str], tokens_entrada: Optional[int], tokens_salida: Optional[int]) -> Optional[float]:
+    """Costo en USD según ``PRECIOS_USD_POR_MILLON``; None si el modelo no tiene precio."""
+    if not modelo or (tokens_entrada is None and tokens_salida is None):
+        return None
+    # El prefijo más largo primero: gpt-4o-mini antes que gpt-4o antes que gpt-4
+    for prefijo in sorted(PRECIOS_USD_POR_MILLON, key=len, reverse=True):
+        if modelo.startswith(prefijo):
+            entrada, salida = PRECIOS_USD_POR_MILLON[prefijo]
+            return ((tokens_entrada or 0) * entrada + (tokens_salida or 0) * salida) / 1_000_000
+    return None
+
+
+def _percentil(valores: List[float], p: float) -> Optional[float]:
+    """Percentil por rango más cercano de ``valores`` ya ordenados."""
+    if not valores:
+        return None
+    indice = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+def _rango_bytes(tamano: Optional[int]) -> Optional[str]:
+    if tamano is None:
+        return None
+    inferior = 0
+    for superior in RANGOS_BYTES:
+        if tamano < superior:
+            return f'{inferior // 1024}-{superior // 1024} KB'
+        inferior = superior
+    return f'>{inferior // 1024} KB'
+
+
+class OCRTelemetry:
+    """Registro en SQLite de llamadas OCR, escrito en lote por un hilo."""
+
+    # Filas en memoria que fuerzan una escritura antes del intervalo
+    FLUSH_EVERY = 200
+    # Cada cuántas escrituras se borran las filas viejas
+    PURGE_EVERY = 100
+
+    def __init__(self, path: str, retention_days: float, flush_seconds: float = 5, enabled: bool = True):
+        self.path = path
+        self.retention_days = retention_days
+        self.flush_seconds = flush_seconds
+        self.enabled = enabled
+        self._local = threading.local()
+        self._pendientes = []
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._hilo_pid = None
+        self._despertar = threading.Event()
+        self._escrituras = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        with self._lock:
+            if not self._schema_ready:
+                conn.executescript(_SCHEMA)
+                self._schema_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def registrar(self, fila: Dict[str, Any]) -> None:
+        """Encola una fila (claves de ``_COLUMNAS``); se escribe en el próximo lote."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._pendientes.append(tuple(fila.get(c) for c in _COLUMNAS))
+            lleno = len(self._pendientes) >= self.FLUSH_EVERY
+            # El hilo de escritura no sobrevive al fork de gunicorn
+            if self._hilo_pid != os.getpid():
+                self._hilo_pid = os.getpid()
+                threading.Thread(target=self._ciclo, name='ocr-telemetria', daemon=True).start()
+        if lleno:
+            self._despertar.set()
+
+    def _ciclo(self) -> None:
+        while True:
+            self._despertar.wait(self.flush_seconds)
+            self._despertar.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Escribe las filas pendientes; devuelve cuántas."""
+        with self._lock:
+            filas, self._pendientes = self._pendientes, []
+        if not filas:
+            return 0
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute('BEGIN')
+                conn.executemany(
+                    f"INSERT INTO ocr_llamadas ({', '.join(_COLUMNAS)}) VALUES ({', '.join('?' * len(_COLUMNAS))})",
+                    filas,
+                )
+            self._escrituras += 1
+            if self._escrituras % self.PURGE_EVERY == 1:
+                self.purgar()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo guardar la telemetría OCR ({len(filas)} llamadas): {e}")
+            return 0
+        return len(filas)
+
+    def purgar(self) -> int:
+        """Borra las llamadas más viejas que ``retention_days``."""
+        limite = time.time() - self.retention_days * 86400
+        return self._conn().execute('DELETE FROM ocr_llamadas WHERE ts < ?', (limite,)).rowcount
+
+    def llamadas(self, horas: float = 24, limite: int = 100) -> List[Dict[str, Any]]:
+        """Llamadas más recientes de las últimas ``horas``."""
+        self.flush()
+        conn = self._conn()
+        cursor = conn.execute(
+            f"SELECT {', '.join(_COLUMNAS)} FROM ocr_llamadas WHERE ts >= ? ORDER BY ts DESC LIMIT ?",
+            (time.time() - horas * 3600, limite),
+        )
+        return [dict(zip(_COLUMNAS, fila)) for fila in cursor]
+
+    def resumen(self, horas: float = 24) -> Dict[str, Any]:
+        """
+        Agregados de las últimas ``horas`` para el panel.
+
+        Returns:
+            dict: ``metodos`` (por servicio y método: llamadas, tasa de éxito,
+            p50/p95 de duración, bytes, tokens y costo), ``cache`` (tasa de
+            aciertos por servicio), ``tamanos`` (duración y éxito por rango de
+            bytes enviados a la API) y ``costo_por_dia``.
+        """
+        self.flush()
+        desde = time.time() - horas * 3600
+        conn = self._conn()
+
+        grupos = {}
+        filas = conn.execute(
+            'SELECT servicio, metodo, resultado, duracion_ms, bytes_imagen, bytes_enviados, tokens_entrada, '
+            'tokens_salida, costo_usd, confianza FROM ocr_llamadas WHERE ts >= ? ORDER BY duracion_ms',
+            (desde,),
+        )
+        tamanos = {}
+        for (servicio, metodo, resultado, duracion, bytes_imagen, bytes_enviados, tokens_entrada,
+             tokens_salida, costo, confianza) in filas:
+            g = grupos.setdefault((servicio, metodo), {
+                'servicio': servicio, 'metodo': metodo, 'llamadas': 0, 'exitos': 0, 'errores': 0,
+                'duraciones': [], 'bytes': [], 'confianzas': [], 'tokens_entrada': 0, 'tokens_salida': 0,
+                'costo_usd': 0.0,
+            })
+            g['llamadas'] += 1
+            g['exitos'] += resultado in ('exito', 'cache')
+            g['errores'] += resultado == 'error'
+            g['duraciones'].append(duracion)
+            if bytes_imagen is not None:
+                g['bytes'].append(bytes_imagen)
+            if confianza is not None and resultado == 'exito':
+                g['confianzas'].append(confianza)
+            g['tokens_entrada'] += tokens_entrada or 0
+            g['tokens_salida'] += tokens_salida or 0
+            g['costo_usd'] += costo or 0.0
+
+            rango = _rango_bytes(bytes_enviados)
+            if rango:
+                t = tamanos.setdefault((servicio, metodo, rango), {
+                    'servicio': servicio, 'metodo': metodo, 'rango': rango, 'llamadas': 0, 'exitos': 0,
+                    'duraciones': []})
+                t['llamadas'] += 1
+                t['exitos'] += resultado == 'exito'
+                t['duraciones'].append(duracion)
+
+        metodos = []
+        for g in grupos.values():
+            duraciones = g.pop('duraciones')
+            tamanos_imagen = g.pop('bytes')
+            confianzas = g.pop('confianzas')
+            g.update({
+                'tasa_exito': round(g['exitos'] / g['llamadas'], 3),
+                'p50_ms': _percentil(duraciones, 50),
+                'p95_ms': _percentil(duraciones, 95),
+                'bytes_promedio': round(sum(tamanos_imagen) / len(tamanos_imagen)) if tamanos_imagen else None,
+                'confianza_promedio': round(sum(confianzas) / len(confianzas), 1) if confianzas else None,
+                'costo_usd': round(g['costo_usd'], 4),
+            })
+            metodos.append(g)
+        metodos.sort(key=lambda g: (g['servicio'], -g['llamadas']))
+
+        for t in tamanos.values():
+            duraciones = t.pop('duraciones')
+            t['tasa_exito'] = round(t['exitos'] / t['llamadas'], 3)
+            t['p50_ms'] = _percentil(duraciones, 50)
+
+        cache = {}
+        for servicio, aciertos, total in conn.execute(
+            "SELECT servicio, SUM(metodo = 'cache'), COUNT(DISTINCT COALESCE(solicitud_id, id)) "
+            'FROM ocr_llamadas WHERE ts >= ? GROUP BY servicio', (desde,)
+        ):
+            cache[servicio] = {'aciertos': aciertos, 'solicitudes': total,
+                               'tasa_aciertos': round(aciertos / total, 3) if total else None}
+
+        costo_por_dia = [
+            {'dia': dia, 'llamadas': llamadas, 'costo_usd': round(costo or 0.0, 4)}
+            for dia, llamadas, costo in conn.execute(
+                "SELECT date(ts, 'unixepoch', 'localtime'), COUNT(*), SUM(costo_usd) FROM ocr_llamadas "
+                'WHERE ts >= ? GROUP BY 1 ORDER BY 1', (desde,)
+            )
+        ]
+        return {
+            'horas': horas,
+            'metodos': metodos,
+            'cache': cache,
+            'tamanos': sorted(tamanos.values(), key=lambda t: (t['servicio'], t['metodo'], t['rango'])),
+            'costo_por_dia': costo_por_dia,
+            'costo_total_usd': round(sum(d['costo_usd'] for d in costo_por_dia), 4),
+        }
+
+
+_telemetria = None
+_telemetria_lock = threading.Lock()
+
+
+def get_telemetria() -> OCRTelemetry:
+    """Registro compartido del proceso, configurado por variables de entorno."""
+    global _telemetria
+    if _telemetria is None:
+        with _telemetria_lock:
+            if _telemetria is None:
+                _telemetria = OCRTelemetry(
+                    path=os.getenv('OCR_TELEMETRY_PATH') or _DEFAULT_PATH,
+                    retention_days=float(os.getenv('OCR_TELEMETRY_RETENTION_DAYS', '90')),
+                    flush_seconds=float(os.getenv('OCR_TELEMETRY_FLUSH_SECONDS', '5')),
+                    enabled=os.getenv('OCR_TELEMETRY_ENABLED', 'true').lower() == 'true',
+                )
+                atexit.register(_telemetria.flush)
+    return _telemetria
+
+
+# --- Instrumentación de los servicios ----------------------------------------
+
+def _tamano_archivo(ruta: Optional[str]) -> Optional[int]:
+    try:
+        return os.path.getsize(ruta) if ruta else None
+    except OSError:
+        return None
+
+
+@contextmanager
+def contexto(servicio: str, tipo: str = None, usuario: str = None, image_path: str = None):
+    """Datos comunes (y un ``solicitud_id``) de las llamadas de una solicitud OCR."""
+    datos = {
+        'solicitud_id': uuid.uuid4().hex[:16],
+        'servicio': servicio,
+        'tipo': tipo,
+        'usuario': usuario,
+        'bytes_imagen': _tamano_archivo(image_path),
+    }
+    token = _solicitud.set(datos)
+    try:
+        yield datos
+    finally:
+        _solicitud.reset(token)
+
+
+def anotar(**datos) -> None:
+    """
+    Agrega datos a la llamada en curso (dentro de un método con ``@medir``).
+
+    Claves útiles: ``tokens_entrada``, ``tokens_salida``, ``modelo``,
+    ``bytes_enviados``.
+    """
+    llamada = _llamada.get()
+    if llamada is not None:
+        llamada.update({k: v for k, v in datos.items() if v is not None})
+
+
+def anotar_uso(response, modelo: str = None) -> None:
+    """Tokens de una respuesta de ``chat.completions`` (``response.usage``)."""
+    usage = getattr(response, 'usage', None)
+    anotar(modelo=getattr(response, 'model', None) or modelo,
+           tokens_entrada=getattr(usage, 'prompt_tokens', None),
+           tokens_salida=getattr(usage, 'completion_tokens', None))
+
+
+@contextmanager
+def contar_tokens_langchain(modelo: str = None):
+    """Anota los tokens de las cadenas LangChain ejecutadas dentro del bloque (si LangChain lo permite)."""
+    try:
+        from langchain.callbacks import get_openai_callback
+    except ImportError:
+        anotar(modelo=modelo)
+        yield
+        return
+    with get_openai_callback() as cb:
+        try:
+            yield
+        finally:
+            anotar(modelo=modelo, tokens_entrada=cb.prompt_tokens, tokens_salida=cb.completion_tokens)
+
+
+def _guardar(metodo: str, resultado: str, duracion_ms: int, datos: Dict[str, Any]) -> None:
+    try:
+        solicitud = _solicitud.get() or {}
+        fila = {
+            'ts': time.time(),
+            'metodo': metodo,
+            'resultado': resultado,
+            'duracion_ms': duracion_ms,
+            **{k: solicitud.get(k) for k in ('solicitud_id', 'servicio', 'tipo', 'usuario', 'bytes_imagen')},
+            **datos,
+        }
+        fila['servicio'] = fila.get('servicio') or metodo.split('_', 1)[0]
+        if fila.get('costo_usd') is None:
+            fila['costo_usd'] = costo_estimado(fila.get('modelo'), fila.get('tokens_entrada'),
+                                               fila.get('tokens_salida'))
+        if fila.get('usuario') is not None:
+            fila['usuario'] = str(fila['usuario'])
+        get_telemetria().registrar(fila)
+    except Exception as e:
+        logger.warning(f"Telemetría OCR descartada para {metodo}: {e}")
+
+
+def medir(metodo: str):
+    """
+    Decorador para métodos de backend OCR que devuelven un dict con 'success'.
+
+    Registra resultado (``exito``, ``fallo`` o ``error`` si lanza), duración,
+    confianza y lo anotado con ``anotar``. La excepción se propaga.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            datos = {}
+            token = _llamada.set(datos)
+            inicio = time.perf_counter()
+            resultado = 'error'
+            try:
+                result = func(*args, **kwargs)
+                if isinstance(result, dict):
+                    resultado = 'exito' if result.get('success') else 'fallo'
+                    confianza = result.get('confianza')
+                    if isinstance(confianza, (int, float)) and resultado == 'exito':
+                        datos.setdefault('confianza', confianza)
+                    if resultado == 'fallo':
+                        datos.setdefault('error', str(result.get('message') or result.get('mensaje') or '')[:200] or None)
+                else:
+                    resultado = 'fallo'
+                return result
+            except Exception as e:
+                datos.setdefault('error', f'{type(e).__name__}: {e}'[:200])
+                raise
+            finally:
+                _llamada.reset(token)
+                _guardar(metodo, resultado, round((time.perf_counter() - inicio) * 1000), datos)
+        return wrapper
+    return decorator
+
+
+def registrar_cache(metodo: str = 'cache', confianza: float = None) -> None:
+    """Registra un acierto de la caché OCR en la solicitud en curso."""
+    _guardar(metodo, 'cache', 0, {'confianza': confianza if isinstance(confianza, (int, float)) else None})
@@ -10,6 +10,7 @@ Usage:
     python run.py --prod             # Producción sin debug
     python run.py --port 8000        # Puerto personalizado (default: 5001)
     python run.py --host 0.0.0.0     # Host personalizado
+    python run.py --profile-startup  # Reporte JSON de arranque (importaciones, blueprints, memoria)
 """
 
 import os
@@ -34,6 +35,11 @@ except ImportError:
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
+# El perfilado de arranque debe activarse antes de importar la aplicación
+from startup_profiler import startup_profiler, is_enabled_from_env, print_summary
+if '--profile-startup' in sys.argv or is_enabled_from_env():
+    startup_profiler.start(entrypoint='run.py')
+
 try:
     from app import create_app
     from config.config import DevelopmentConfig, ProductionConfig
@@ -70,6 +76,16 @@ def parse_arguments():
         action='store_true',
         help='Forzar modo debug (override de variables de entorno)'
     )
+    parser.add_argument(
+        '--profile-startup',
+        action='store_true',
+        help='Medir el arranque, escribir el reporte JSON y terminar sin iniciar el servidor'
+    )
+    parser.add_argument(
+        '--profile-output',
+        default=None,
+        help='Ruta del reporte de arranque (default: logs/startup/startup_<fecha>_<pid>.json)'
+    )
     return parser.parse_args()
 
 
@@ -177,7 +193,16 @@ def main():
     try:
         # Crear aplicación
         print("🔄 Creando aplicación Flask...")
-        app = create_app(config_class)
+        with startup_profiler.fase('create_app'):
+            app = create_app(config_class)
+
+        if startup_profiler.active:
+            startup_profiler.stop()
+            report_path = startup_profiler.write_report(args.profile_output, config_class.__name__)
+            print_summary(startup_profiler.build_report(config_class.__name__))
+            print(f"📝 Reporte de arranque escrito en: {report_path}")
+            if args.profile_startup:
+                return
 
         # Mostrar información de inicio
         display_startup_info(app, args.host, args.port, debug_mode)
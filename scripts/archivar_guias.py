@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Archiva las guías cerradas antiguas en bases SQLite por año.
+
+Mueve de ``TIQUETES_DB_PATH`` a ``<TIQUETES_ARCHIVE_DIR>/<base>_<año>.db``
+las guías con salida registradas antes del corte (entry_records,
+pesajes_bruto, clasificaciones, fotos_clasificacion, pesajes_neto y
+salidas). La aplicación sigue viéndolas a través de ``db_archive``: las
+consultas por guía o con rangos de fechas antiguos adjuntan los archivos
+necesarios.
+
+Conviene ejecutarlo fuera del horario de operación (las escrituras se hacen
+por lotes, pero cada lote bloquea la base caliente). ``--vacuum`` compacta la
+base caliente al final (requiere acceso exclusivo y espacio libre igual a su
+tamaño).
+
+Usage:
+    python scripts/archivar_guias.py --dry-run
+    python scripts/archivar_guias.py --meses 12
+    python scripts/archivar_guias.py --antes-de 2025-01-01 --vacuum
+    python scripts/archivar_guias.py --db instance/oleoflores_prod.db --dir /datos/archivo --meses 18
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import get_config  # noqa: E402
+from db_archive import archivar_guias, archive_dir  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Archiva guías cerradas en bases SQLite por año')
+    corte = parser.add_mutually_exclusive_group()
+    corte.add_argument('--meses', type=int, default=12, help='Archivar guías de hace más de N meses (default 12)')
+    corte.add_argument('--antes-de', default=None, help='Fecha de corte YYYY-MM-DD (UTC)')
+    parser.add_argument('--db', default=None, help='Base caliente (default TIQUETES_DB_PATH de la configuración)')
+    parser.add_argument('--dir', default=None, help='Directorio de archivos (default TIQUETES_ARCHIVE_DIR)')
+    parser.add_argument('--lote', type=int, default=20000, help='Guías por transacción')
+    parser.add_argument('--dry-run', action='store_true', help='Solo mostrar cuántas guías se moverían')
+    parser.add_argument('--vacuum', action='store_true', help='VACUUM de la base caliente al terminar')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    config = get_config()
+    db_path = args.db or config.TIQUETES_DB_PATH
+    if not os.path.exists(db_path):
+        print(f"❌ No existe la base {db_path}")
+        return 1
+    directorio = args.dir or config.TIQUETES_ARCHIVE_DIR or archive_dir(db_path)
+
+    if args.antes_de:
+        corte = datetime.strptime(args.antes_de, '%Y-%m-%d')
+    else:
+        corte = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=30 * args.meses)
+    corte_utc = corte.strftime('%Y-%m-%d %H:%M:%S')
+
+    print(f"🗄️  Base caliente: {db_path}")
+    print(f"📁 Archivos: {directorio}")
+    print(f"✂️  Corte: guías cerradas registradas antes de {corte_utc} UTC")
+
+    if args.dry_run:
+        resumen = archivar_guias(db_path, corte_utc, directorio, dry_run=True)
+        if not resumen:
+            print("ℹ️  No hay guías para archivar")
+        for anio, info in resumen.items():
+            print(f"  {anio}: {info['guias']:,} guías -> {info['ruta']}")
+        return 0
+
+    def progreso(anio, movidas, total):
+        print(f"\r  {anio}: {movidas:,}/{total:,} guías", end='', flush=True)
+        if movidas == total:
+            print()
+
+    inicio = time.perf_counter()
+    tamano_antes = os.path.getsize(db_path)
+    resumen = archivar_guias(db_path, corte_utc, directorio, lote=args.lote, progreso=progreso)
+    if not resumen:
+        print("ℹ️  No hay guías para archivar")
+        return 0
+    for anio, info in resumen.items():
+        filas = ', '.join(f"{tabla}={n:,}" for tabla, n in info.items() if tabla not in ('guias', 'ruta'))
+        print(f"  ✅ {anio}: {info['guias']:,} guías ({filas})")
+
+    if args.vacuum:
+        print("🧹 VACUUM de la base caliente...")
+        conn = sqlite3.connect(db_path, timeout=60)
+        conn.execute('VACUUM')
+        conn.close()
+        print(f"   {tamano_antes / 1e6:.1f} MB -> {os.path.getsize(db_path) / 1e6:.1f} MB")
+
+    print(f"✅ Archivado completo en {time.perf_counter() - inicio:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
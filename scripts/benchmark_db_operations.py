@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+"""
+Benchmark de la capa de datos: funciones públicas de db_operations y db_utils.
+
+Para cada tamaño (número de guías; default 10k, 100k y 1M) construye una
+base SQLite con el esquema de producción y varios años de datos sintéticos
+(``scripts/generar_datos_sinteticos.py``),
+la guarda en caché en ``logs/benchmarks/data/`` y mide cada función sobre una
+copia (las funciones de escritura modifican la base).
+
+Cada caso se ejecuta ``--repeat`` veces; en cada repetición la función se
+llama las veces necesarias para superar ``--min-time`` segundos, y se reporta
+el tiempo por llamada (mínimo, mediana, media, máximo). El resultado se guarda
+en JSON con el commit actual para comparar entre commits:
+
+    python scripts/benchmark_db_operations.py --compare logs/benchmarks/db_ops_<antes>.json
+
+Las listas sin filtro (p. ej. ``get_clasificaciones()``) solo se miden hasta
+``--full-scan-limit`` guías; con más filas la aplicación siempre filtra.
+
+Usage:
+    python scripts/benchmark_db_operations.py
+    python scripts/benchmark_db_operations.py --sizes 10000 --only get_pesajes_neto,get_clasificaciones
+    python scripts/benchmark_db_operations.py --sizes 10000,100000 --compare logs/benchmarks/db_ops_base.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+PROJECT_ROOT = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.generar_datos_sinteticos import copy_schema, find_schema_source, generar  # noqa: E402
+
+DATA_DIR = PROJECT_ROOT / 'logs' / 'benchmarks' / 'data'
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark de db_operations/db_utils')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='Número de guías por escenario')
+    parser.add_argument('--years', type=int, default=3, help='Años de operación simulados')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help='Segundos mínimos por repetición')
+    parser.add_argument('--full-scan-limit', type=int, default=100000)
+    parser.add_argument('--only', default=None, help='Casos a ejecutar (separados por coma)')
+    parser.add_argument('--schema-from', default=None, help='Base de la que copiar el esquema')
+    parser.add_argument('--rebuild', action='store_true', help='Regenerar las bases en caché')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--log-level', default='WARNING',
+                        help='Nivel de logging durante la medición (default WARNING)')
+    parser.add_argument('--compare', default=None, help='JSON de una ejecución anterior')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Razón de mediana que cuenta como regresión al comparar')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados')
+    return parser.parse_args()
+
+
+# ---------------------------------------------------------------------------
+# Datos
+# ---------------------------------------------------------------------------
+
+def ensure_database(size, args, schema_source):
+    """Base en caché para ``size`` guías (se construye si no existe)."""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    destino = DATA_DIR / f'db_ops_{size}_{args.years}y_s{args.seed}.db'
+    if destino.exists() and not args.rebuild:
+        return destino
+    temporal = destino.with_suffix('.tmp')
+    if temporal.exists():
+        temporal.unlink()
+    print(f"🏗️  Generando base de {size:,} guías ({args.years} años)...")
+    inicio = time.perf_counter()
+    conn = copy_schema(schema_source, temporal)
+    generar(conn, guias=size, years=args.years, graneles=False, seed=args.seed)
+    conn.execute('ANALYZE')
+    conn.close()
+    os.replace(temporal, destino)
+    print(f"   lista en {time.perf_counter() - inicio:.1f}s: {destino}")
+    return destino
+
+
+def sample_context(db_path, seed):
+    """Guías, proveedores y fechas reales de la base para los casos."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    max_id = conn.execute("SELECT MAX(id) FROM entry_records").fetchone()[0] or 0
+    ids = [rng.randint(1, max_id) for _ in range(200)] if max_id else []
+    filas = conn.execute(
+        f"SELECT codigo_guia, codigo_proveedor FROM entry_records WHERE id IN ({','.join('?' * len(ids))})", ids
+    ).fetchall() if ids else []
+    ultima = conn.execute("SELECT MAX(timestamp_registro_utc) FROM entry_records").fetchone()[0]
+    fecha_validacion = conn.execute(
+        "SELECT fecha_aplicable_validacion FROM validaciones_diarias_sap ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    conn.close()
+    hasta = datetime.strptime(ultima, '%Y-%m-%d %H:%M:%S').date() if ultima else datetime.utcnow().date()
+    return {
+        'guias': [f[0] for f in filas] or ['SIN_DATOS'],
+        'proveedores': [f[1] for f in filas] or ['0000000A'],
+        'fecha_desde': (hasta - timedelta(days=7)).isoformat(),
+        'fecha_hasta': hasta.isoformat(),
+        'fecha_validacion': fecha_validacion[0] if fecha_validacion else hasta.isoformat(),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Casos
+# ---------------------------------------------------------------------------
+
+def build_cases(ctx, full_scan):
+    """Lista de (nombre, función sin argumentos)."""
+    import db_operations as ops
+    import db_utils
+
+    rng = random.Random(7)
+    contador = iter(range(10**9))
+    semana = {'fecha_desde': ctx['fecha_desde'], 'fecha_hasta': ctx['fecha_hasta']}
+
+    def guia():
+        return rng.choice(ctx['guias'])
+
+    def proveedor():
+        return rng.choice(ctx['proveedores'])
+
+    def nueva_guia():
+        return f"BENCH{next(contador):09d}_{datetime.utcnow():%Y%m%d%H%M%S}"
+
+    ahora = lambda: datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')  # noqa: E731
+
+    casos = [
+        # db_operations: lecturas
+        ('get_pesajes_bruto[50 guias]', lambda: ops.get_pesajes_bruto({'codigos_guia': rng.sample(ctx['guias'], min(50, len(ctx['guias'])))})),
+        ('get_pesaje_bruto_by_codigo_guia', lambda: ops.get_pesaje_bruto_by_codigo_guia(guia())),
+        ('get_clasificaciones[semana]', lambda: ops.get_clasificaciones(semana)),
+        ('get_clasificaciones[proveedor]', lambda: ops.get_clasificaciones({'codigo_proveedor': proveedor()})),
+        ('get_fotos_clasificacion', lambda: ops.get_fotos_clasificacion(guia())),
+        ('get_clasificacion_by_codigo_guia', lambda: ops.get_clasificacion_by_codigo_guia(guia())),
+        ('get_pesajes_neto[semana]', lambda: ops.get_pesajes_neto(filtros=dict(semana))),
+        ('get_pesajes_neto[legacy semana]', lambda: ops.get_pesajes_neto(
+            ctx['fecha_desde'], ctx['fecha_hasta'], None, db_path=ctx['db_path'])),
+        ('get_pesaje_neto_by_codigo_guia', lambda: ops.get_pesaje_neto_by_codigo_guia(guia())),
+        ('get_provider_by_code', lambda: ops.get_provider_by_code(proveedor())),
+        ('get_entry_records_by_provider_code', lambda: ops.get_entry_records_by_provider_code(proveedor())),
+        ('get_salidas[semana]', lambda: ops.get_salidas(semana)),
+        ('get_salida_by_codigo_guia', lambda: ops.get_salida_by_codigo_guia(guia())),
+        ('get_validacion_diaria_sap', lambda: ops.get_validacion_diaria_sap(ctx['fecha_validacion'])),
+        ('get_resumen_validaciones_diarias', lambda: ops.get_resumen_validaciones_diarias(60)),
+        # db_operations: escrituras
+        ('store_pesaje_bruto', lambda: ops.store_pesaje_bruto({
+            'codigo_guia': nueva_guia(), 'codigo_proveedor': proveedor(), 'peso_bruto': 20000,
+            'tipo_pesaje': 'directo', 'timestamp_pesaje_utc': ahora()})),
+        ('update_pesaje_bruto', lambda: ops.update_pesaje_bruto(guia(), {'peso_bruto': rng.randint(8000, 32000)})),
+        ('store_clasificacion[update]', lambda: ops.store_clasificacion({
+            'codigo_guia': guia(), 'verde_manual': rng.randint(0, 30), 'estado': 'completado',
+            'clasificacion_manual_json': json.dumps({'verdes': 3})})),
+        ('store_pesaje_neto', lambda: ops.store_pesaje_neto({
+            'codigo_guia': nueva_guia(), 'peso_bruto': 20000, 'peso_tara': 5000, 'peso_neto': 15000,
+            'timestamp_pesaje_neto_utc': ahora()})),
+        ('store_salida', lambda: ops.store_salida({
+            'codigo_guia': nueva_guia(), 'timestamp_salida_utc': ahora(), 'estado': 'completado'})),
+        ('guardar_actualizar_validacion_sap', lambda: ops.guardar_actualizar_validacion_sap(
+            ctx['fecha_validacion'], ahora(), 500000, 'ok', True, None, '{}', db_path=ctx['db_path'])),
+        # db_utils
+        ('db_utils.store_entry_record', lambda: db_utils.store_entry_record({
+            'codigo_guia': nueva_guia(), 'codigo_proveedor': proveedor(), 'nombre_proveedor': 'Bench',
+            'timestamp_registro_utc': ahora(), 'placa': 'BEN123'})),
+        ('db_utils.get_entry_records[semana]', lambda: db_utils.get_entry_records(semana)),
+        ('db_utils.get_entry_records[proveedor]', lambda: db_utils.get_entry_records({'codigo_proveedor': proveedor()})),
+        ('db_utils.get_entry_record_by_guide_code', lambda: db_utils.get_entry_record_by_guide_code(guia())),
+        ('db_utils.get_latest_entry_by_provider_code', lambda: db_utils.get_latest_entry_by_provider_code(proveedor())),
+        ('db_utils.update_pesaje_bruto', lambda: db_utils.update_pesaje_bruto(guia(), {'peso_bruto': 21000})),
+        ('db_utils.get_pesaje_bruto_by_codigo_guia', lambda: db_utils.get_pesaje_bruto_by_codigo_guia(guia())),
+        ('db_utils.get_entry_records_by_provider_code', lambda: db_utils.get_entry_records_by_provider_code(proveedor())),
+    ]
+    if full_scan:
+        casos += [
+            ('get_pesajes_bruto[todo]', lambda: ops.get_pesajes_bruto()),
+            ('get_clasificaciones[todo]', lambda: ops.get_clasificaciones()),
+            ('get_pesajes_neto[todo]', lambda: ops.get_pesajes_neto()),
+            ('get_salidas[todo]', lambda: ops.get_salidas()),
+            ('db_utils.get_entry_records[todo]', lambda: db_utils.get_entry_records()),
+        ]
+    return casos
+
+
+def time_case(func, repeat, min_time):
+    """Tiempo por llamada (segundos) en cada repetición."""
+    func()  # Calentamiento (caché de páginas de SQLite, imports)
+    inicio = time.perf_counter()
+    func()
+    una = max(time.perf_counter() - inicio, 1e-6)
+    numero = max(1, min(1000, int(min_time / una)))
+    tiempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        for _ in range(numero):
+            func()
+        tiempos.append((time.perf_counter() - inicio) / numero)
+    return tiempos, numero
+
+
+def run_size(size, args, schema_source, only):
+    from flask import Flask
+
+    base = ensure_database(size, args, schema_source)
+    temp_dir = tempfile.mkdtemp(prefix='oleoflores_bench_')
+    db_path = Path(temp_dir) / base.name
+    shutil.copy2(base, db_path)
+
+    app = Flask('benchmark_db_operations')
+    app.config['TIQUETES_DB_PATH'] = str(db_path)
+    ctx = sample_context(db_path, args.seed)
+    ctx['db_path'] = str(db_path)
+
+    resultados = {}
+    try:
+        with app.app_context():
+            for nombre, func in build_cases(ctx, size <= args.full_scan_limit):
+                if only and not any(o in nombre for o in only):
+                    continue
+                tiempos, numero = time_case(func, args.repeat, args.min_time)
+                resultados[nombre] = {
+                    'llamadas_por_repeticion': numero,
+                    'min_ms': round(min(tiempos) * 1000, 4),
+                    'mediana_ms': round(statistics.median(tiempos) * 1000, 4),
+                    'media_ms': round(statistics.mean(tiempos) * 1000, 4),
+                    'max_ms': round(max(tiempos) * 1000, 4),
+                }
+                print(f"  {nombre:<48}{resultados[nombre]['mediana_ms']:>12.3f} ms")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return resultados
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(actual, anterior_path, threshold):
+    """Imprime cambios de mediana contra otra ejecución. Devuelve el número de regresiones."""
+    anterior = json.loads(Path(anterior_path).read_text())
+    regresiones = 0
+    print(f"\n📊 Comparación contra {anterior_path} (commit {anterior.get('commit')})")
+    for size, casos in actual['resultados'].items():
+        previos = anterior.get('resultados', {}).get(size, {})
+        for nombre, datos in casos.items():
+            if nombre not in previos:
+                continue
+            razon = datos['mediana_ms'] / max(previos[nombre]['mediana_ms'], 1e-9)
+            marca = '🔴' if razon >= threshold else ('🟢' if razon <= 1 / threshold else '  ')
+            if razon >= threshold:
+                regresiones += 1
+            print(f"{marca} {size:>8} {nombre:<48}{previos[nombre]['mediana_ms']:>10.3f} → "
+                  f"{datos['mediana_ms']:>10.3f} ms (x{razon:.2f})")
+    return regresiones
+
+
+def main():
+    args = parse_arguments()
+    logging.basicConfig(level=args.log_level.upper())
+    logging.getLogger().setLevel(args.log_level.upper())
+    for nombre in ('db_operations', 'db_utils'):
+        logging.getLogger(nombre).setLevel(args.log_level.upper())
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    only = [o.strip() for o in args.only.split(',')] if args.only else None
+    schema_source = find_schema_source(args.schema_from)
+
+    reporte = {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'parametros': {'years': args.years, 'repeat': args.repeat, 'min_time': args.min_time, 'seed': args.seed},
+        'resultados': {},
+    }
+    for size in sizes:
+        print(f"\n⏱️  {size:,} guías")
+        reporte['resultados'][str(size)] = run_size(size, args, schema_source, only)
+
+    output = Path(args.output) if args.output else (
+        PROJECT_ROOT / 'logs' / 'benchmarks' / f"db_ops_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(reporte, indent=2, sort_keys=True))
+    print(f"\n📝 Resultados en: {output}")
+
+    if args.compare:
+        regresiones = compare(reporte, args.compare, args.threshold)
+        if regresiones:
+            print(f"❌ {regresiones} regresiones (≥ x{args.threshold})")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+"""
+Compara el escáner de fechas (``ocr_fechas``) con la extracción anterior de
+``OCRDocumentService`` sobre un corpus etiquetado de textos OCR.
+
+Por cada texto del corpus (JSONL con ``tipo``, ``texto``, ``esperada`` y
+``hoy``, la fecha de referencia con que se etiquetó) mide:
+
+- Acierto: fecha extraída igual a ``esperada``, para ambas implementaciones.
+- Coincidencia: textos en que ambas devuelven la misma fecha.
+- Tiempo por texto (mejor de ``--repeticiones`` rondas sobre el corpus).
+
+La implementación anterior está copiada aquí (``extraer_anterior``) tal como
+estaba en ``ocr_service_backup.py``, con ``hoy`` como parámetro.
+
+Usage:
+    python scripts/benchmark_fechas_documentos.py
+    python scripts/benchmark_fechas_documentos.py --corpus otro.jsonl --repeticiones 50
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from ocr_fechas import escanear_fechas  # noqa: E402
+
+CORPUS_DEFAULT = PROJECT_ROOT / 'scripts' / 'datos' / 'corpus_fechas_documentos.jsonl'
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark de extracción de fechas de documentos')
+    parser.add_argument('--corpus', default=str(CORPUS_DEFAULT), help='Corpus JSONL etiquetado')
+    parser.add_argument('--repeticiones', type=int, default=20, help='Rondas sobre el corpus para medir tiempo')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados')
+    return parser.parse_args()
+
+
+# --- Implementación anterior (referencia) -----------------------------------
+
+def _validar_anterior(date_string, hoy):
+    if not date_string:
+        return None
+    date_clean = re.sub(r'[^\d\/\-\.]', ' ', str(date_string)).strip()
+    date_patterns = [
+        r'(\d{1,2})[\/\-\.](\d{1,2})[\/\-\.](\d{4})',
+        r'(\d{4})[\/\-\.](\d{1,2})[\/\-\.](\d{1,2})',
+        r'(\d{1,2})[\/\-\.](\d{1,2})[\/\-\.](\d{2})',
+    ]
+    for pattern in date_patterns:
+        match = re.search(pattern, date_clean)
+        if match:
+            try:
+                if len(match.group(3)) == 4:
+                    if len(match.group(1)) == 4:
+                        year, month, day = match.groups()
+                    else:
+                        day, month, year = match.groups()
+                else:
+                    day, month, year_short = match.groups()
+                    year = f"20{year_short}" if int(year_short) <= 30 else f"19{year_short}"
+                date_obj = datetime(int(year), int(month), int(day))
+                if date_obj.year < hoy.year - 5 or date_obj.year > hoy.year + 10:
+                    continue
+                return date_obj.strftime('%Y-%m-%d')
+            except (ValueError, TypeError):
+                continue
+    return None
+
+
+def _preprocesar_anterior(text):
+    text_clean = text.lower()
+    text_clean = re.sub(r'\s+', ' ', text_clean)
+    text_clean = re.sub(r'[^\w\s\/\-\.\:]', ' ', text_clean)
+    for old in ('vencimiento', 'vigencia', 'valido hasta', 'válido hasta', 'expira', 'caducidad',
+                'fecha vence', 'fecha de vencimiento'):
+        text_clean = text_clean.replace(old, 'vence')
+    return text_clean
+
+
+_CONTEXTO_ANTERIOR = {
+    'arl': [
+        r'(?:arl|riesgo[s]?\s+laboral[es]?).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
+        r'venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4}).*?(?:arl|riesgo)',
+        r'(?:poliza|póliza).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
+    ],
+    'soat': [
+        r'(?:soat|seguro.*?obligatorio).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
+        r'venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4}).*?(?:soat|seguro)',
+        r'(?:poliza|póliza).*?(?:soat|obligatorio).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
+    ],
+    'tecnomecanica': [
+        r'(?:tecnomecanica|tecnomecánica|revisión).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
+        r'venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4}).*?(?:tecnomecanica|revisión)',
+        r'(?:próxima|siguiente)\s+(?:revisión|tecnomecanica).*?(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
+    ],
+    'licencia': [
+        r'(?:licencia|conducir).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
+        r'venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4}).*?(?:licencia|conducir)',
+        r'(?:categoria|categoría).*?venc[e]?\s*:?\s*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
+    ],
+}
+
+
+def _prioridad_anterior(date_str, context_before, context_after, document_type, hoy):
+    score = 0
+    combined_context = context_before + " " + context_after
+    for keyword in ['venc', 'vigencia', 'válido', 'expira', 'caducidad']:
+        if keyword in combined_context:
+            score += 50
+    type_keywords = {
+        'arl': ['arl', 'riesgo', 'laboral', 'poliza'],
+        'soat': ['soat', 'seguro', 'obligatorio', 'vehiculo'],
+        'tecnomecanica': ['tecnomecanica', 'revisión', 'mecánica'],
+        'licencia': ['licencia', 'conducir', 'categoria'],
+    }
+    for keyword in type_keywords.get(document_type, []):
+        if keyword in combined_context:
+            score += 30
+    validated_date = _validar_anterior(date_str, hoy)
+    if validated_date:
+        days_diff = (datetime.strptime(validated_date, '%Y-%m-%d') - hoy).days
+        if 0 <= days_diff <= 365 * 3:
+            score += 20
+        elif days_diff < 0:
+            score -= 100
+        elif days_diff > 365 * 5:
+            score -= 50
+    return score
+
+
+def extraer_anterior(text, document_type, hoy):
+    """Estrategias contextual, priorizada y genérica de la versión anterior."""
+    text = _preprocesar_anterior(text)
+    for pattern in _CONTEXTO_ANTERIOR.get(document_type, _CONTEXTO_ANTERIOR['arl']):
+        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+        if match and _validar_anterior(match.group(1), hoy):
+            return _validar_anterior(match.group(1), hoy)
+    all_dates = []
+    for pattern in [r'(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{4})', r'(\d{4}[\/\-\.]\d{1,2}[\/\-\.]\d{1,2})',
+                    r'(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2})']:
+        for match in re.finditer(pattern, text):
+            start_pos = match.start()
+            score = _prioridad_anterior(match.group(1), text[max(0, start_pos - 30):start_pos].lower(),
+                                        text[start_pos:start_pos + 50].lower(), document_type, hoy)
+            validated = _validar_anterior(match.group(1), hoy)
+            if validated:
+                all_dates.append((validated, score))
+    if all_dates:
+        all_dates.sort(key=lambda x: x[1], reverse=True)
+        return all_dates[0][0]
+    for date_str in re.findall(r'(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})', text):
+        validated = _validar_anterior(date_str, hoy)
+        if validated and datetime.strptime(validated, '%Y-%m-%d') > hoy:
+            return validated
+    return None
+
+
+# --- Benchmark ----------------------------------------------------------------
+
+def extraer_nuevo(text, document_type, hoy):
+    resultado = escanear_fechas(text, document_type, hoy=hoy)
+    return resultado['fecha'] if resultado else None
+
+
+def medir(funcion, corpus, repeticiones):
+    """Mejor tiempo por texto (µs) entre ``repeticiones`` rondas."""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for caso in corpus:
+            funcion(caso['texto'], caso['tipo'], caso['_hoy'])
+        ronda = (time.perf_counter() - inicio) / len(corpus) * 1e6
+        mejor = ronda if mejor is None else min(mejor, ronda)
+    return round(mejor, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_arguments()
+    with open(args.corpus, encoding='utf-8') as archivo:
+        corpus = [json.loads(linea) for linea in archivo if linea.strip()]
+    if not corpus:
+        print(f"❌ Corpus vacío: {args.corpus}")
+        return 1
+    for caso in corpus:
+        caso['_hoy'] = datetime.strptime(caso.get('hoy') or datetime.now().strftime('%Y-%m-%d'), '%Y-%m-%d')
+
+    print(f"📄 {len(corpus)} textos etiquetados ({args.corpus})")
+    filas = []
+    for caso in corpus:
+        anterior = extraer_anterior(caso['texto'], caso['tipo'], caso['_hoy'])
+        nuevo = extraer_nuevo(caso['texto'], caso['tipo'], caso['_hoy'])
+        filas.append({'id': caso['id'], 'tipo': caso['tipo'], 'esperada': caso['esperada'],
+                      'anterior': anterior, 'nuevo': nuevo})
+        if anterior != nuevo or nuevo != caso['esperada']:
+            marca = '✅' if nuevo == caso['esperada'] else '❌'
+            print(f"  {marca} {caso['id']:<20} esperada={caso['esperada']}  anterior={anterior}  nuevo={nuevo}"
+                  f"  ({caso.get('nota', '')})")
+
+    total = len(filas)
+    resumen = {
+        'textos': total,
+        'acierto_anterior': round(sum(f['anterior'] == f['esperada'] for f in filas) / total, 3),
+        'acierto_nuevo': round(sum(f['nuevo'] == f['esperada'] for f in filas) / total, 3),
+        'coincidencia': round(sum(f['anterior'] == f['nuevo'] for f in filas) / total, 3),
+        'anterior_us_por_texto': medir(extraer_anterior, corpus, args.repeticiones),
+        'nuevo_us_por_texto': medir(extraer_nuevo, corpus, args.repeticiones),
+    }
+    resumen['aceleracion'] = round(resumen['anterior_us_por_texto'] / resumen['nuevo_us_por_texto'], 2)
+
+    print(f"\n📊 Acierto: anterior {resumen['acierto_anterior']:.1%}, nuevo {resumen['acierto_nuevo']:.1%} "
+          f"(misma fecha en {resumen['coincidencia']:.1%})")
+    print(f"   Tiempo por texto: anterior {resumen['anterior_us_por_texto']} µs, "
+          f"nuevo {resumen['nuevo_us_por_texto']} µs ({resumen['aceleracion']}x)")
+
+    reporte = {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'parametros': {'corpus': args.corpus, 'repeticiones': args.repeticiones},
+        'resumen': resumen,
+        'textos': filas,
+    }
+    output = Path(args.output) if args.output else (
+        PROJECT_ROOT / 'logs' / 'benchmarks' / f"fechas_documentos_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(reporte, indent=2, ensure_ascii=False))
+    print(f"\n📝 Resultados en: {output}")
+    return 0 if resumen['acierto_nuevo'] >= resumen['acierto_anterior'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
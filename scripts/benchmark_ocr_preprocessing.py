@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+"""
+Benchmark de la preparación de imágenes para los modelos de visión.
+
+Compara, por imagen y perfil (placa y documento), el camino anterior (abrir
+con PIL para detectar formato, convertir a ``_converted.jpg`` si hace falta y
+enviar el archivo completo en base64) contra ``ocr_preprocessing.prepare_image``:
+
+- Tamaño del payload base64.
+- Tiempo de preparación (mediana de ``--repeat``).
+- Latencia estimada de subida con ``--uplink-mbps`` (la portería sube por un
+  enlace modesto) y el total preparación + subida.
+- Con ``--live``, latencia real de punta a punta contra OpenAI (requiere
+  OPENAI_API_KEY; cada imagen genera llamadas pagas).
+
+Sin ``--images`` genera fotos sintéticas tipo celular (4032x3024, EXIF de
+rotación, texto y ruido) en un directorio temporal.
+
+Usage:
+    python scripts/benchmark_ocr_preprocessing.py
+    python scripts/benchmark_ocr_preprocessing.py --images uploads/placas --uplink-mbps 4
+    python scripts/benchmark_ocr_preprocessing.py --images muestras/ --live --model gpt-4o-mini
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from ocr_preprocessing import prepare_image  # noqa: E402
+
+EXTENSIONES = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff', '.heic', '.gif'}
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark de preparación de imágenes OCR')
+    parser.add_argument('--images', default=None, help='Directorio con imágenes reales')
+    parser.add_argument('--synthetic', type=int, default=6, help='Imágenes sintéticas si no hay --images')
+    parser.add_argument('--perfiles', default='placa,soat', help='Perfiles a medir (separados por coma)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--uplink-mbps', type=float, default=8.0, help='Ancho de banda de subida para estimar')
+    parser.add_argument('--live', action='store_true', help='Medir latencia real contra OpenAI')
+    parser.add_argument('--model', default='gpt-4o-mini')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados')
+    return parser.parse_args()
+
+
+def generar_sinteticas(directorio, cantidad, seed=7):
+    """Fotos 4032x3024 con texto, ruido y EXIF de orientación (como las de un celular)."""
+    rng = random.Random(seed)
+    rutas = []
+    for i in range(cantidad):
+        img = Image.new('RGB', (4032, 3024), (rng.randint(150, 220),) * 3)
+        draw = ImageDraw.Draw(img)
+        for _ in range(400):
+            x, y = rng.randrange(4032), rng.randrange(3024)
+            draw.rectangle([x, y, x + rng.randint(5, 200), y + rng.randint(5, 60)],
+                           fill=tuple(rng.randint(0, 255) for _ in range(3)))
+        for linea in range(30):
+            draw.text((200, 150 + linea * 90), f'VENCE 2{rng.randint(0, 9)}/0{rng.randint(1, 9)}/2026 ABC{i}{linea}',
+                      fill=(0, 0, 0))
+        exif = Image.Exif()
+        exif[0x0112] = rng.choice((1, 6, 8))
+        ruta = Path(directorio) / f'sintetica_{i}.jpg'
+        img.save(ruta, 'JPEG', quality=92, exif=exif)
+        rutas.append(ruta)
+    return rutas
+
+
+def legacy_encode(image_path):
+    """Camino anterior de _encode_image_to_base64 (incluye el archivo temporal)."""
+    with Image.open(image_path) as img:
+        formato = img.format.lower()
+        mime_type = {'jpeg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif', 'webp': 'image/webp'}.get(formato)
+        if mime_type is None:
+            temp_path = str(image_path).replace(os.path.splitext(str(image_path))[1], '_converted.jpg')
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGB')
+            img.save(temp_path, 'JPEG', quality=95)
+            image_path, mime_type = temp_path, 'image/jpeg'
+    with open(image_path, 'rb') as archivo:
+        return base64.b64encode(archivo.read()).decode('utf-8'), mime_type
+
+
+def medir(func, repeat):
+    tiempos, resultado = [], None
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        resultado = func()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), resultado
+
+
+def llamada_live(client, model, data_url, detail):
+    inicio = time.perf_counter()
+    client.chat.completions.create(
+        model=model,
+        messages=[{'role': 'user', 'content': [
+            {'type': 'text', 'text': 'Responde solo OK.'},
+            {'type': 'image_url', 'image_url': {'url': data_url, 'detail': detail}},
+        ]}],
+        max_tokens=5,
+        temperature=0,
+    )
+    return time.perf_counter() - inicio
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_arguments()
+    perfiles = [p.strip() for p in args.perfiles.split(',') if p.strip()]
+    temp_dir = None
+    if args.images:
+        rutas = sorted(p for p in Path(args.images).iterdir() if p.suffix.lower() in EXTENSIONES)
+        if not rutas:
+            print(f"❌ No hay imágenes en {args.images}")
+            return 1
+    else:
+        temp_dir = tempfile.mkdtemp(prefix='oleoflores_ocr_bench_')
+        print(f"🖼️  Generando {args.synthetic} fotos sintéticas en {temp_dir}...")
+        rutas = generar_sinteticas(temp_dir, args.synthetic)
+
+    client = None
+    if args.live:
+        if not os.getenv('OPENAI_API_KEY'):
+            print("❌ --live requiere OPENAI_API_KEY")
+            return 1
+        import openai
+        client = openai.OpenAI()
+
+    bytes_por_segundo = args.uplink_mbps * 1e6 / 8
+    filas = []
+    try:
+        for ruta in rutas:
+            t_legacy, (b64_legacy, mime_legacy) = medir(lambda: legacy_encode(ruta), args.repeat)
+            for perfil in perfiles:
+                t_nuevo, imagen = medir(lambda: prepare_image(str(ruta), perfil), args.repeat)
+                b64_nuevo = imagen.base64
+                fila = {
+                    'imagen': ruta.name,
+                    'perfil': perfil,
+                    'dimensiones': f'{imagen.width}x{imagen.height}',
+                    'payload_anterior_kb': round(len(b64_legacy) / 1024, 1),
+                    'payload_nuevo_kb': round(len(b64_nuevo) / 1024, 1),
+                    'prep_anterior_ms': round(t_legacy * 1000, 2),
+                    'prep_nuevo_ms': round(t_nuevo * 1000, 2),
+                    'subida_anterior_ms': round(len(b64_legacy) / bytes_por_segundo * 1000, 1),
+                    'subida_nueva_ms': round(len(b64_nuevo) / bytes_por_segundo * 1000, 1),
+                }
+                fila['total_anterior_ms'] = round(fila['prep_anterior_ms'] + fila['subida_anterior_ms'], 1)
+                fila['total_nuevo_ms'] = round(fila['prep_nuevo_ms'] + fila['subida_nueva_ms'], 1)
+                if client:
+                    detail = 'high' if perfil != 'placa' else 'auto'
+                    fila['live_anterior_ms'] = round(
+                        llamada_live(client, args.model, f'data:{mime_legacy};base64,{b64_legacy}', detail) * 1000)
+                    fila['live_nuevo_ms'] = round(llamada_live(client, args.model, imagen.data_url, detail) * 1000)
+                filas.append(fila)
+                print(f"  {ruta.name:<28}{perfil:<8}{fila['payload_anterior_kb']:>9.0f} → {fila['payload_nuevo_kb']:>6.0f} KB"
+                      f"   total {fila['total_anterior_ms']:>8.0f} → {fila['total_nuevo_ms']:>6.0f} ms"
+                      + (f"   live {fila['live_anterior_ms']} → {fila['live_nuevo_ms']} ms" if client else ''))
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    resumen = {}
+    for perfil in perfiles:
+        del_perfil = [f for f in filas if f['perfil'] == perfil]
+        resumen[perfil] = {
+            clave: round(statistics.median(f[clave] for f in del_perfil), 1)
+            for clave in del_perfil[0] if clave.endswith(('_kb', '_ms'))
+        }
+    print("\n📊 Medianas por perfil")
+    for perfil, datos in resumen.items():
+        print(f"  {perfil:<8} payload {datos['payload_anterior_kb']:.0f} → {datos['payload_nuevo_kb']:.0f} KB, "
+              f"preparación+subida {datos['total_anterior_ms']:.0f} → {datos['total_nuevo_ms']:.0f} ms")
+
+    reporte = {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'parametros': {'uplink_mbps': args.uplink_mbps, 'repeat': args.repeat, 'live': args.live,
+                       'model': args.model if args.live else None,
+                       'imagenes': args.images or f'{args.synthetic} sintéticas'},
+        'resumen': resumen,
+        'imagenes': filas,
+    }
+    output = Path(args.output) if args.output else (
+        PROJECT_ROOT / 'logs' / 'benchmarks' / f"ocr_preprocessing_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(reporte, indent=2, ensure_ascii=False))
+    print(f"\n📝 Resultados en: {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+"""
+Throughput y latencia de cola de ``process_placa_image`` / ``process_document``
+contra llamadas OCR reproducidas, sin red.
+
+Levanta en este proceso el servidor de ``ocr_replay`` con las cintas de
+``--cintas`` (grabadas con ``OCR_RECORD_DIR``) o, con ``--sintetico``, con
+una cinta generada (respuestas válidas de GPT-4o, GPT-4o-mini y los webhooks
+con latencias log-normales). Apunta los servicios a él con
+``OCR_REPLAY_URL`` y, para cada nivel de ``--concurrencia``, ejecuta
+``--solicitudes`` llamadas y mide solicitudes por segundo, p50/p95/p99 y
+tasa de éxito. La caché OCR y la telemetría se desactivan para que cada
+solicitud recorra la cadena completa.
+
+Usage:
+    python scripts/benchmark_ocr_replay.py --sintetico
+    python scripts/benchmark_ocr_replay.py --cintas instance/ocr_cintas --images uploads/placas --servicio placa
+    python scripts/benchmark_ocr_replay.py --sintetico --concurrencia 1,8,32 --latencia cero
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlsplit
+
+PROJECT_ROOT = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+import ocr_esquemas  # noqa: E402
+import ocr_replay  # noqa: E402
+
+EXTENSIONES = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+TIPOS_DOCUMENTO = ('arl', 'soat', 'tecnomecanica', 'licencia')
+
+# Mediana (ms) y sigma log-normal de la cinta sintética, por backend
+LATENCIAS_SINTETICAS = {
+    'gpt-4o': (1800, 0.35),
+    'gpt-4o-mini': (2400, 0.45),
+    'webhook_documentos': (6000, 0.5),
+    'webhook_placas': (4000, 0.5),
+}
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark de la cadena OCR con llamadas reproducidas')
+    origen = parser.add_mutually_exclusive_group(required=True)
+    origen.add_argument('--cintas', help='Directorio con cintas grabadas (OCR_RECORD_DIR)')
+    origen.add_argument('--sintetico', action='store_true', help='Generar una cinta sintética')
+    parser.add_argument('--images', default=None, help='Directorio con imágenes (default: sintéticas)')
+    parser.add_argument('--servicio', choices=('placa', 'documento', 'ambos'), default='ambos')
+    parser.add_argument('--concurrencia', default='1,4,16', help='Niveles de concurrencia (separados por coma)')
+    parser.add_argument('--solicitudes', type=int, default=64, help='Solicitudes por nivel y servicio')
+    parser.add_argument('--latencia', choices=ocr_replay.MODOS_LATENCIA, default='muestreo')
+    parser.add_argument('--escala', type=float, default=1.0, help='Factor sobre las latencias reproducidas')
+    parser.add_argument('--tasa-error', type=float, default=0.0,
+                        help='Fracción de respuestas 503 de OpenAI en la cinta sintética')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados')
+    return parser.parse_args()
+
+
+def _chat_completion(modelo, contenido, rng):
+    prompt, salida = rng.randint(800, 1300), rng.randint(5, 80)
+    return json.dumps({
+        'id': f'chatcmpl-replay{rng.randrange(10 ** 9)}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': modelo,
+        'choices': [{'index': 0, 'finish_reason': 'stop', 'logprobs': None,
+                     'message': {'role': 'assistant', 'content': contenido}}],
+        'usage': {'prompt_tokens': prompt, 'completion_tokens': salida, 'total_tokens': prompt + salida},
+    })
+
+
+def registros_sinteticos(url_documentos, url_placas, por_endpoint, tasa_error, rng):
+    """Llamadas con respuestas válidas y latencias log-normales (ver LATENCIAS_SINTETICAS)."""
+    def registro(url, variante, backend, status, content_type, cuerpo):
+        mediana, sigma = LATENCIAS_SINTETICAS[backend]
+        partes = urlsplit(url)
+        return {'ts': time.time(), 'metodo': 'POST', 'host': partes.netloc, 'ruta': partes.path, 'huella': None,
+                'variante': variante, 'bytes_peticion': 0, 'status': status, 'content_type': content_type,
+                'cuerpo': cuerpo, 'codificacion': 'texto',
+                'latencia_ms': round(mediana * math.exp(rng.gauss(0, sigma)), 1)}
+
+    url_openai = f'https://{ocr_replay.OPENAI_HOST}/v1/chat/completions'
+    error_openai = json.dumps({'error': {'message': 'Service unavailable', 'type': 'server_error'}})
+    registros = []
+    for _ in range(por_endpoint):
+        placa = ''.join(rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ') for _ in range(3)) + f'{rng.randrange(1000):03d}'
+        fecha = (datetime.now() + timedelta(days=rng.randint(30, 700))).strftime('%Y-%m-%d')
+        documento = json.dumps({'fecha_encontrada': fecha, 'confianza': rng.randint(85, 98),
+                                'texto_visible': 'VIGENCIA HASTA', 'contexto': f'Vence {fecha}'})
+        # Con salida estructurada (ocr_esquemas) la placa también llega como JSON
+        respuesta_placa = json.dumps({'placa': placa}) if ocr_esquemas.SALIDA_ESTRUCTURADA else placa
+        for modelo, contenido in (('gpt-4o', respuesta_placa), ('gpt-4o-mini', documento)):
+            if rng.random() < tasa_error:
+                registros.append(registro(url_openai, modelo, modelo, 503, 'application/json', error_openai))
+            else:
+                registros.append(registro(url_openai, modelo, modelo, 200, 'application/json',
+                                          _chat_completion(modelo, contenido, rng)))
+        registros.append(registro(url_documentos, '', 'webhook_documentos', 200, 'application/json',
+                                  json.dumps({'success': True, 'fecha_vencimiento': fecha})))
+        registros.append(registro(url_placas, '', 'webhook_placas', 200, 'text/plain', placa))
+    return registros
+
+
+def generar_imagenes(directorio, cantidad, rng):
+    """Fotos sintéticas (rectángulo con texto) para que el preprocesamiento tenga trabajo real."""
+    rutas = []
+    for i in range(cantidad):
+        imagen = Image.new('RGB', (1600, 1200), (rng.randrange(80, 200),) * 3)
+        dibujo = ImageDraw.Draw(imagen)
+        dibujo.rectangle((500, 450, 1100, 750), fill=(235, 200, 40), outline=(0, 0, 0), width=8)
+        dibujo.text((620, 580), f'ABC{i:03d}', fill=(0, 0, 0))
+        ruta = Path(directorio) / f'replay_{i:02d}.jpg'
+        imagen.save(ruta, 'JPEG', quality=90)
+        rutas.append(ruta)
+    return rutas
+
+
+def percentil(valores, q):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))] if ordenados else None
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar_nivel(funcion, rutas, solicitudes, concurrencia):
+    """Ejecuta ``solicitudes`` llamadas con ``concurrencia`` hilos; devuelve métricas del nivel."""
+    def una(i):
+        inicio = time.perf_counter()
+        resultado = funcion(str(rutas[i % len(rutas)]), i)
+        return time.perf_counter() - inicio, resultado
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        medidas = list(pool.map(una, range(solicitudes)))
+    total = time.perf_counter() - inicio
+    latencias = [m[0] * 1000 for m in medidas]
+    metodos = {}
+    for _, resultado in medidas:
+        metodo = resultado.get('metodo') or 'sin_resultado'
+        metodos[metodo] = metodos.get(metodo, 0) + 1
+    return {
+        'concurrencia': concurrencia,
+        'solicitudes': solicitudes,
+        'duracion_s': round(total, 2),
+        'solicitudes_por_s': round(solicitudes / total, 2),
+        'p50_ms': round(percentil(latencias, 0.50)),
+        'p95_ms': round(percentil(latencias, 0.95)),
+        'p99_ms': round(percentil(latencias, 0.99)),
+        'max_ms': round(max(latencias)),
+        'tasa_exito': round(sum(1 for _, r in medidas if r.get('success')) / solicitudes, 3),
+        'metodos': metodos,
+    }
+
+
+def main():
+    args = parse_arguments()
+    logging.basicConfig(level=logging.WARNING)
+    niveles = [int(n) for n in args.concurrencia.split(',') if n.strip()]
+    rng = random.Random(args.semilla)
+    if args.cintas and not os.path.isdir(args.cintas):
+        print(f"❌ No existe el directorio de cintas {args.cintas}")
+        return 1
+
+    # Servidor en un puerto libre; los servicios se crean después de apuntarlos a él
+    cinta = ocr_replay.CintaReplay(args.cintas, modo_latencia=args.latencia, escala=args.escala, semilla=args.semilla)
+    servidor = ocr_replay.crear_servidor(cinta, '127.0.0.1', 0)
+    url = f'http://127.0.0.1:{servidor.server_port}'
+    os.environ['OCR_REPLAY_URL'] = ocr_replay.REPLAY_URL = url
+    os.environ['OCR_CACHE_ENABLED'] = 'false'
+    os.environ['OCR_TELEMETRY_ENABLED'] = 'false'
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-replay')
+    os.environ.setdefault('ENABLE_OCR_FALLBACKS', 'false')
+    from ocr_service_backup import OCRDocumentService, OCRPlacaService
+    servicio_documentos, servicio_placas = OCRDocumentService(), OCRPlacaService()
+
+    if args.sintetico:
+        for registro in registros_sinteticos(servicio_documentos.webhook_urls['soat'], servicio_placas.webhook_url,
+                                             200, args.tasa_error, rng):
+            cinta.agregar(registro)
+    print(f"📼 Reproduciendo en {url} (latencia {args.latencia}, escala {args.escala}):")
+    for endpoint, total in cinta.endpoints().items():
+        print(f"   {total:>6}  {endpoint}")
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    temp_dir = None
+    if args.images:
+        rutas = sorted(p for p in Path(args.images).iterdir() if p.suffix.lower() in EXTENSIONES)
+        if not rutas:
+            print(f"❌ No hay imágenes en {args.images}")
+            return 1
+    else:
+        temp_dir = tempfile.mkdtemp(prefix='oleoflores_ocr_replay_')
+        rutas = generar_imagenes(temp_dir, 8, rng)
+
+    funciones = {
+        'placa': lambda ruta, i: servicio_placas.process_placa_image(ruta, user='benchmark'),
+        'documento': lambda ruta, i: servicio_documentos.process_document(
+            ruta, TIPOS_DOCUMENTO[i % len(TIPOS_DOCUMENTO)], 'benchmark'),
+    }
+    servicios = list(funciones) if args.servicio == 'ambos' else [args.servicio]
+    resultados = {}
+    try:
+        for servicio in servicios:
+            print(f"\n📊 {servicio}")
+            print(f"   {'conc':>5}{'sol/s':>9}{'p50':>8}{'p95':>8}{'p99':>8}{'éxito':>8}  métodos")
+            resultados[servicio] = []
+            for concurrencia in niveles:
+                nivel = ejecutar_nivel(funciones[servicio], rutas, args.solicitudes, concurrencia)
+                resultados[servicio].append(nivel)
+                print(f"   {concurrencia:>5}{nivel['solicitudes_por_s']:>9.2f}{nivel['p50_ms']:>8}"
+                      f"{nivel['p95_ms']:>8}{nivel['p99_ms']:>8}{nivel['tasa_exito']:>8.0%}  "
+                      + ', '.join(f'{m}={n}' for m, n in sorted(nivel['metodos'].items())))
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    reporte = {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'parametros': {'cintas': args.cintas or 'sintética', 'latencia': args.latencia, 'escala': args.escala,
+                       'solicitudes': args.solicitudes, 'concurrencia': niveles, 'tasa_error': args.tasa_error,
+                       'imagenes': args.images or f'{len(rutas)} sintéticas', 'semilla': args.semilla},
+        'resultados': resultados,
+    }
+    output = Path(args.output) if args.output else (
+        PROJECT_ROOT / 'logs' / 'benchmarks' / f"ocr_replay_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(reporte, indent=2, ensure_ascii=False))
+    print(f"\n📝 Resultados en: {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
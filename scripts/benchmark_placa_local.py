@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+Mide el camino local de placas (``ocr_placa_local``) sobre fotos etiquetadas.
+
+Por cada foto se ejecuta la lectura local una vez y se guarda la mejor
+lectura con su confianza; luego, para cada umbral de ``--umbrales``:
+
+- Cobertura: fotos aceptadas localmente (sin llamada a la nube).
+- Precisión: aceptadas cuya placa es la correcta.
+- Aceptadas incorrectas: las que llegarían a la operación con placa errada.
+
+Con ``--nube`` también se llama a OpenAI GPT-4o para comparar latencia y
+acierto (requiere OPENAI_API_KEY; cada foto es una llamada paga).
+
+Las etiquetas salen de ``--labels`` (CSV ``archivo,placa``) o, sin él, del
+nombre del archivo (``ABC123.jpg``, ``ABC123_noche.jpg``).
+
+Usage:
+    python scripts/benchmark_placa_local.py --images muestras/placas
+    python scripts/benchmark_placa_local.py --images fotos/ --labels etiquetas.csv --umbrales 60,70,80,90
+    python scripts/benchmark_placa_local.py --images fotos/ --nube
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import ocr_placa_local  # noqa: E402
+
+EXTENSIONES = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+ETIQUETA_NOMBRE = re.compile(r'^([A-Z]{3}[0-9]{3})', re.IGNORECASE)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark del reconocimiento local de placas')
+    parser.add_argument('--images', required=True, help='Directorio con fotos de placas')
+    parser.add_argument('--labels', default=None, help='CSV archivo,placa (default: placa en el nombre)')
+    parser.add_argument('--umbrales', default='50,60,70,75,80,85,90,95', help='Umbrales de confianza a evaluar')
+    parser.add_argument('--nube', action='store_true', help='Comparar con OpenAI GPT-4o visión')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados')
+    return parser.parse_args()
+
+
+def cargar_etiquetas(directorio, labels):
+    rutas = sorted(p for p in Path(directorio).iterdir() if p.suffix.lower() in EXTENSIONES)
+    if labels:
+        with open(labels, newline='', encoding='utf-8') as archivo:
+            etiquetas = {fila['archivo']: fila['placa'].strip().upper() for fila in csv.DictReader(archivo)}
+        return [(ruta, etiquetas[ruta.name]) for ruta in rutas if ruta.name in etiquetas]
+    pares = []
+    for ruta in rutas:
+        coincidencia = ETIQUETA_NOMBRE.match(ruta.stem)
+        if coincidencia:
+            pares.append((ruta, coincidencia.group(1).upper()))
+    return pares
+
+
+def percentil(valores, q):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))] if ordenados else None
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_arguments()
+    if not ocr_placa_local.disponible():
+        print("❌ El camino local requiere opencv-python, pytesseract y el binario de Tesseract")
+        return 1
+    pares = cargar_etiquetas(args.images, args.labels)
+    if not pares:
+        print(f"❌ No hay fotos etiquetadas en {args.images}")
+        return 1
+    umbrales = [float(u) for u in args.umbrales.split(',') if u.strip()]
+
+    servicio = None
+    if args.nube:
+        if not os.getenv('OPENAI_API_KEY'):
+            print("❌ --nube requiere OPENAI_API_KEY")
+            return 1
+        from ocr_service_backup import OCRPlacaService
+        servicio = OCRPlacaService()
+
+    print(f"🚗 {len(pares)} fotos etiquetadas")
+    filas = []
+    for ruta, esperada in pares:
+        # Umbral 0: se guarda la mejor lectura y se decide por umbral después
+        resultado = ocr_placa_local.reconocer_placa(str(ruta), min_confianza=0)
+        fila = {
+            'imagen': ruta.name,
+            'esperada': esperada,
+            'local': resultado['placa'],
+            'confianza': resultado['confianza'],
+            'local_ms': resultado['duracion_ms'],
+        }
+        if servicio:
+            inicio = time.perf_counter()
+            nube = servicio._process_with_openai_vision(str(ruta))
+            fila['nube'] = nube.get('placa', '')
+            fila['nube_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+        filas.append(fila)
+        marca = '✅' if fila['local'] == esperada else '❌'
+        print(f"  {marca} {ruta.name:<30}{esperada}  local={fila['local'] or '-':<7}{fila['confianza']:>4}%"
+              f"{fila['local_ms']:>8.0f} ms" + (f"   nube={fila['nube'] or '-'} {fila['nube_ms']:.0f} ms" if servicio else ''))
+
+    total = len(filas)
+    por_umbral = []
+    for umbral in umbrales:
+        aceptadas = [f for f in filas if f['local'] and f['confianza'] >= umbral]
+        correctas = sum(1 for f in aceptadas if f['local'] == f['esperada'])
+        por_umbral.append({
+            'umbral': umbral,
+            'cobertura': round(len(aceptadas) / total, 3),
+            'precision': round(correctas / len(aceptadas), 3) if aceptadas else None,
+            'aceptadas_incorrectas': len(aceptadas) - correctas,
+            'llamadas_nube_evitadas': len(aceptadas),
+        })
+
+    latencias = [f['local_ms'] for f in filas]
+    resumen = {
+        'fotos': total,
+        'acierto_mejor_lectura': round(sum(1 for f in filas if f['local'] == f['esperada']) / total, 3),
+        'local_p50_ms': statistics.median(latencias),
+        'local_p95_ms': percentil(latencias, 0.95),
+    }
+    if servicio:
+        latencias_nube = [f['nube_ms'] for f in filas]
+        resumen.update({
+            'acierto_nube': round(sum(1 for f in filas if f['nube'] == f['esperada']) / total, 3),
+            'nube_p50_ms': statistics.median(latencias_nube),
+            'nube_p95_ms': percentil(latencias_nube, 0.95),
+        })
+
+    print(f"\n📊 Local: p50 {resumen['local_p50_ms']:.0f} ms, p95 {resumen['local_p95_ms']:.0f} ms, "
+          f"mejor lectura correcta {resumen['acierto_mejor_lectura']:.0%}")
+    if servicio:
+        print(f"   Nube:  p50 {resumen['nube_p50_ms']:.0f} ms, p95 {resumen['nube_p95_ms']:.0f} ms, "
+              f"acierto {resumen['acierto_nube']:.0%}")
+    print(f"\n  {'umbral':>6}  {'cobertura':>9}  {'precisión':>9}  {'erradas':>7}")
+    for fila in por_umbral:
+        precision = f"{fila['precision']:.1%}" if fila['precision'] is not None else '-'
+        print(f"  {fila['umbral']:>6.0f}  {fila['cobertura']:>9.1%}  {precision:>9}  {fila['aceptadas_incorrectas']:>7}")
+    print(f"\n  Umbral actual (OCR_PLACA_LOCAL_MIN_CONF): {ocr_placa_local.MIN_CONFIANZA:.0f}")
+
+    reporte = {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'parametros': {'images': args.images, 'labels': args.labels, 'nube': args.nube},
+        'resumen': resumen,
+        'umbrales': por_umbral,
+        'fotos': filas,
+    }
+    output = Path(args.output) if args.output else (
+        PROJECT_ROOT / 'logs' / 'benchmarks' / f"placa_local_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(reporte, indent=2, ensure_ascii=False))
+    print(f"\n📝 Resultados en: {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
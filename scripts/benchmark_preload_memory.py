@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+Benchmark de memoria por worker: gunicorn con y sin preload_app.
+
+Arranca gunicorn dos veces (GUNICORN_PRELOAD=true y false) con la misma
+cantidad de workers, espera a que estén listos, opcionalmente hace algunas
+peticiones de calentamiento y mide por worker:
+
+- RSS: memoria residente (cuenta páginas compartidas en cada proceso)
+- PSS: memoria proporcional (las páginas compartidas se reparten)
+- USS: memoria privada (lo que se libera al matar ese worker)
+
+PSS/USS son las métricas que muestran el beneficio del copy-on-write. Solo
+funciona en Linux (lee /proc/<pid>/smaps_rollup).
+
+Usage:
+    python scripts/benchmark_preload_memory.py
+    python scripts/benchmark_preload_memory.py --workers 4 --warmup-path /auth/login --requests 20
+    python scripts/benchmark_preload_memory.py --app wsgi:application --output logs/benchmarks/preload.json
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Memoria por worker con y sin preload')
+    parser.add_argument('--app', default='wsgi:application', help='Módulo WSGI (default: wsgi:application)')
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--startup-timeout', type=float, default=180.0,
+                        help='Segundos máximos esperando a que los workers estén listos')
+    parser.add_argument('--settle', type=float, default=5.0,
+                        help='Segundos de espera tras el arranque antes de medir')
+    parser.add_argument('--warmup-path', default=None, help='Ruta a pedir antes de medir (p. ej. /auth/login)')
+    parser.add_argument('--requests', type=int, default=10, help='Peticiones de calentamiento')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados')
+    return parser.parse_args()
+
+
+def read_smaps_rollup(pid):
+    """RSS/PSS/USS en MB de un proceso."""
+    valores = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as fh:
+            for line in fh:
+                partes = line.split()
+                if len(partes) >= 2 and partes[0].endswith(':') and partes[1].isdigit():
+                    valores[partes[0][:-1]] = int(partes[1])
+    except OSError:
+        return None
+    uss = valores.get('Private_Clean', 0) + valores.get('Private_Dirty', 0)
+    return {
+        'rss_mb': round(valores.get('Rss', 0) / 1024, 2),
+        'pss_mb': round(valores.get('Pss', 0) / 1024, 2),
+        'uss_mb': round(uss / 1024, 2),
+    }
+
+
+def child_pids(pid):
+    """PIDs hijos directos de un proceso."""
+    hijos = []
+    for entrada in os.listdir('/proc'):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entrada}/stat') as fh:
+                # El nombre del comando va entre paréntesis y puede tener espacios
+                campos = fh.read().rsplit(')', 1)[1].split()
+            if int(campos[1]) == pid:
+                hijos.append(int(entrada))
+        except (OSError, IndexError, ValueError):
+            continue
+    return hijos
+
+
+def run_scenario(args, preload):
+    env = os.environ.copy()
+    env.update({
+        'GUNICORN_PRELOAD': 'true' if preload else 'false',
+        'GUNICORN_WORKERS': str(args.workers),
+        'GUNICORN_BIND': f'127.0.0.1:{args.port}',
+    })
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', str(PROJECT_ROOT / 'gunicorn.conf.py'), args.app]
+    print(f"🚀 Iniciando gunicorn (preload={preload}): {' '.join(cmd)}")
+    proceso = subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        inicio = time.monotonic()
+        listo = False
+        while time.monotonic() - inicio < args.startup_timeout:
+            if proceso.poll() is not None:
+                raise RuntimeError(f"gunicorn terminó con código {proceso.returncode}")
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{args.port}/', timeout=2)
+                listo = True
+            except urllib.error.HTTPError:
+                listo = True  # Cualquier respuesta HTTP indica que hay workers atendiendo
+            except OSError:
+                pass
+            if listo and len(child_pids(proceso.pid)) >= args.workers:
+                break
+            time.sleep(0.5)
+        else:
+            raise RuntimeError("Tiempo de arranque agotado")
+        tiempo_arranque = time.monotonic() - inicio
+
+        if args.warmup_path:
+            for _ in range(args.requests):
+                try:
+                    urllib.request.urlopen(f'http://127.0.0.1:{args.port}{args.warmup_path}', timeout=30)
+                except OSError:
+                    pass
+        time.sleep(args.settle)
+
+        workers = [read_smaps_rollup(pid) for pid in child_pids(proceso.pid)]
+        workers = [w for w in workers if w]
+        maestro = read_smaps_rollup(proceso.pid)
+
+        def promedio(clave):
+            return round(sum(w[clave] for w in workers) / len(workers), 2) if workers else None
+
+        return {
+            'preload': preload,
+            'startup_seconds': round(tiempo_arranque, 2),
+            'master': maestro,
+            'workers': workers,
+            'avg_worker_rss_mb': promedio('rss_mb'),
+            'avg_worker_pss_mb': promedio('pss_mb'),
+            'avg_worker_uss_mb': promedio('uss_mb'),
+            'total_pss_mb': round(sum(w['pss_mb'] for w in workers) + (maestro or {}).get('pss_mb', 0), 2),
+        }
+    finally:
+        proceso.send_signal(signal.SIGTERM)
+        try:
+            proceso.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+
+
+def main():
+    if not sys.platform.startswith('linux'):
+        print("❌ Este benchmark requiere Linux (/proc/<pid>/smaps_rollup)")
+        return 1
+
+    args = parse_arguments()
+    resultados = {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'app': args.app,
+        'workers': args.workers,
+        'escenarios': [run_scenario(args, preload=False), run_scenario(args, preload=True)],
+    }
+
+    print("=" * 72)
+    print(f"{'Escenario':<14}{'RSS/worker':>14}{'PSS/worker':>14}{'USS/worker':>14}{'PSS total':>14}")
+    for escenario in resultados['escenarios']:
+        nombre = 'preload' if escenario['preload'] else 'sin preload'
+        print(f"{nombre:<14}{escenario['avg_worker_rss_mb']:>14}{escenario['avg_worker_pss_mb']:>14}"
+              f"{escenario['avg_worker_uss_mb']:>14}{escenario['total_pss_mb']:>14}")
+    print("=" * 72)
+
+    output = Path(args.output) if args.output else (
+        PROJECT_ROOT / 'logs' / 'benchmarks' / f"preload_memory_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(resultados, indent=2, sort_keys=True))
+    print(f"📝 Resultados en: {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+"""
+Compara ``tiquete_parser.parse_markdown_response`` con la implementación
+anterior sobre respuestas sintéticas de validación de tiquetes.
+
+Casos (``respuestas_sinteticas``):
+
+- pequena: tabla de 12 campos con "Se Acarreó"/"Se Cargó" y nota (la respuesta típica).
+- grande: la misma tabla con ``--filas`` campos.
+- mal_formada: texto sin saltos de línea con muchas celdas vacías y marcas repetidas.
+- texto_plano: descripción de una imagen que no es un tiquete.
+
+Por caso mide el mejor tiempo por llamada entre ``--repeticiones`` rondas y
+verifica que ambas implementaciones devuelvan lo mismo. La anterior
+configuraba ``logging.basicConfig(level=logging.DEBUG)`` al importarse y
+registraba cada fila, así que ambas se miden con el nivel ``--nivel-log``
+(default DEBUG, el que imponía la anterior) hacia un stream descartado.
+
+La implementación anterior está copiada aquí (``parse_anterior``) tal como
+estaba en ``tiquete_parser.py``, sin el ``basicConfig``; la usan también
+las pruebas de ``test/test_tiquete_parser.py`` como referencia.
+
+Usage:
+    python scripts/benchmark_tiquete_parser.py
+    python scripts/benchmark_tiquete_parser.py --filas 20000 --repeticiones 5 --nivel-log WARNING
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from tiquete_parser import parse_markdown_response  # noqa: E402
+
+logger_anterior = logging.getLogger('tiquete_parser_anterior')
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark del parser de respuestas de tiquetes')
+    parser.add_argument('--filas', type=int, default=5000, help='Campos de la tabla en el caso grande')
+    parser.add_argument('--repeticiones', type=int, default=20, help='Rondas por caso para medir tiempo')
+    parser.add_argument('--nivel-log', default='DEBUG', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument('--semilla', type=int, default=7)
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados')
+    return parser.parse_args()
+
+
+# --- Implementación anterior (referencia) -----------------------------------
+
+def parse_anterior(response_text):
+    """``parse_markdown_response`` antes del tokenizador de una pasada."""
+    parsed_data = {
+        'table_data': [],
+        'nota': '',
+        'acarreo': '',
+        'cargo': '',
+        'descripcion': ''
+    }
+    if not response_text or not isinstance(response_text, str):
+        logger_anterior.error(f"Respuesta inválida: {response_text}")
+        return parsed_data
+    try:
+        logger_anterior.debug(f"Parseando respuesta: {response_text[:200]}...")
+        if '|' in response_text and ('Campo' in response_text or 'Información Original' in response_text):
+            acarreo_match = re.search(r"Se Acarreó:\s*([^\n|]*)", response_text, re.IGNORECASE)
+            if acarreo_match:
+                parsed_data['acarreo'] = acarreo_match.group(1).strip()
+            cargo_match = re.search(r"Se Cargó:\s*([^\n|]*)", response_text, re.IGNORECASE)
+            if cargo_match:
+                parsed_data['cargo'] = cargo_match.group(1).strip()
+            parts = None
+            if "Nota de Validación:" in response_text:
+                parts = response_text.split("Nota de Validación:")
+            elif "**Nota de Validación:**" in response_text:
+                parts = response_text.split("**Nota de Validación:**")
+            elif "Nota:" in response_text:
+                parts = response_text.split("Nota:")
+            else:
+                parts = [response_text, ""]
+                logger_anterior.warning("No se encontró sección de nota en la respuesta")
+            table_text = parts[0].strip()
+            rows = table_text.split('\n')
+            header_found = False
+            for row in rows:
+                row = row.strip()
+                if not row or '---' in row:
+                    continue
+                if '|' not in row:
+                    continue
+                columns = [col.strip() for col in row.split('|') if col.strip()]
+                if not header_found:
+                    if 'Campo' in columns[0]:
+                        header_found = True
+                    continue
+                if len(columns) >= 3:
+                    entry = {
+                        'campo': columns[0].strip(),
+                        'original': columns[1].strip(),
+                        'sugerido': columns[2].strip()
+                    }
+                    logger_anterior.debug(f"Agregando entrada a table_data: {entry}")
+                    parsed_data['table_data'].append(entry)
+            if len(parts) > 1:
+                nota = parts[1].strip()
+                if "Status:" in nota:
+                    nota = nota.split("Status:")[0].strip()
+                parsed_data['nota'] = nota
+            if not parsed_data['table_data']:
+                logger_anterior.warning("No se encontraron datos en la tabla de la respuesta")
+        else:
+            logger_anterior.info("Respuesta en formato de texto plano (descripción)")
+            parsed_data['descripcion'] = response_text.strip()
+            parsed_data['nota'] = "La imagen no contiene un tiquete válido. Se muestra una descripción general."
+        logger_anterior.debug(f"Datos parseados completos: {parsed_data}")
+    except Exception as e:
+        logger_anterior.error(f"Error parseando respuesta: {str(e)}")
+        logger_anterior.error(f"Texto recibido: {response_text}")
+    return parsed_data
+
+
+# --- Respuestas sintéticas ------------------------------------------------------
+
+CAMPOS = ['Nombre del Conductor', 'Cédula', 'Placa', 'Fecha', 'Hora', 'Producto', 'Peso Bruto',
+          'Peso Tara', 'Peso Neto', 'Código', 'Origen', 'Destino']
+
+
+def tabla_tiquete(filas, rng):
+    """Respuesta con tabla de ``filas`` campos, acarreo/cargo y nota de validación."""
+    lineas = ['| Campo | Información Original | Sugerido |', '|-------|---------------------|----------|']
+    for i in range(filas):
+        campo = CAMPOS[i % len(CAMPOS)] + (f' {i // len(CAMPOS)}' if i >= len(CAMPOS) else '')
+        original = f'{rng.randint(0, 99999)}'
+        sugerido = original if rng.random() < 0.8 else f'{rng.randint(0, 99999)}'
+        lineas.append(f'| {campo} | {original} | {sugerido} |')
+    lineas += ['', f'Se Acarreó: {rng.choice(["SI", "NO"])}', f'Se Cargó: {rng.choice(["SI", "NO"])}', '',
+               'Nota de Validación: Los pesos coinciden con la báscula y la placa es legible.', '', 'Status: 200']
+    return '\n'.join(lineas)
+
+
+def mal_formada(tamano, rng):
+    """Texto sin saltos de línea con celdas vacías, separadores y marcas repetidas."""
+    piezas = ['|', '| |', ' Campo ', 'Se Cargó:', 'Nota:', '---', 'x', ' | Información Original', '\t']
+    return ''.join(rng.choice(piezas) for _ in range(tamano))
+
+
+def respuestas_sinteticas(filas, semilla=7):
+    rng = random.Random(semilla)
+    return {
+        'pequena': tabla_tiquete(len(CAMPOS), rng),
+        'grande': tabla_tiquete(filas, rng),
+        'mal_formada': mal_formada(filas * 4, rng),
+        'texto_plano': 'La imagen muestra un camión en una báscula; no se ve ningún tiquete. ' * 20,
+    }
+
+
+# --- Benchmark ----------------------------------------------------------------
+
+def medir(funcion, texto, repeticiones):
+    """Mejor tiempo por llamada (µs) entre ``repeticiones`` rondas."""
+    llamadas = max(1, 2000 // max(1, len(texto) // 500))
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(llamadas):
+            funcion(texto)
+        ronda = (time.perf_counter() - inicio) / llamadas * 1e6
+        mejor = ronda if mejor is None else min(mejor, ronda)
+    return round(mejor, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_arguments()
+    logging.basicConfig(level=getattr(logging, args.nivel_log), stream=io.StringIO())
+    casos = respuestas_sinteticas(args.filas, args.semilla)
+
+    print(f"🧾 {len(casos)} casos sintéticos (tabla grande de {args.filas} filas, log {args.nivel_log})")
+    filas = []
+    for nombre, texto in casos.items():
+        coinciden = parse_anterior(texto) == parse_markdown_response(texto)
+        anterior = medir(parse_anterior, texto, args.repeticiones)
+        nuevo = medir(parse_markdown_response, texto, args.repeticiones)
+        filas.append({'caso': nombre, 'caracteres': len(texto), 'coinciden': coinciden,
+                      'anterior_us': anterior, 'nuevo_us': nuevo, 'aceleracion': round(anterior / nuevo, 2)})
+        marca = '✅' if coinciden else '❌'
+        print(f"  {marca} {nombre:<12} {len(texto):>9} car.  anterior {anterior:>10} µs  "
+              f"nuevo {nuevo:>10} µs  ({filas[-1]['aceleracion']}x)")
+
+    reporte = {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'parametros': {'filas': args.filas, 'repeticiones': args.repeticiones,
+                       'nivel_log': args.nivel_log, 'semilla': args.semilla},
+        'casos': filas,
+    }
+    output = Path(args.output) if args.output else (
+        PROJECT_ROOT / 'logs' / 'benchmarks' / f"tiquete_parser_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(reporte, indent=2, ensure_ascii=False))
+    print(f"\n📝 Resultados en: {output}")
+    return 0 if all(f['coinciden'] for f in filas) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
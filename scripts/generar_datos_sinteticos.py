@@ -0,0 +1,658 @@
+#!/usr/bin/env python
+"""
+Generador de datos sintéticos realistas para todo el esquema.
+
+Llena, con inserciones masivas (``executemany`` por lotes dentro de
+transacciones grandes, ``synchronous=OFF``):
+
+- Flujo de fruta: ``entry_records``, ``pesajes_bruto``, ``clasificaciones``
+  (con sus columnas JSON), ``fotos_clasificacion``, ``pesajes_neto``,
+  ``salidas`` y ``validaciones_diarias_sap``.
+- Graneles: ``RegistroEntradaGraneles``, ``enturnamientos_graneles``,
+  ``PrimerPesajeGranel``, ``InspeccionVehiculo``, ``ControlCalidadGranel``,
+  ``CargueGranel`` y ``PesajeBrutoGranel``.
+- Sellos: ``tipos_sello``, ``maestro_vehiculos``, ``solicitudes_sello``,
+  ``sellos`` y ``movimientos_sello``.
+
+Las distribuciones se configuran con un JSON (``--perfil``) que se mezcla con
+``PERFIL_DEFAULT``: cantidad y sesgo (Zipf) de proveedores, placas por
+proveedor, curva horaria de llegadas (hora local de Bogotá), pesos por día de
+la semana y por mes (temporada de cosecha), y la mezcla de estados (hasta qué
+etapa llegó cada guía). Los valores por defecto salen de la base de
+producción de 2025.
+
+Se puede usar como script o como módulo (``generar(conn, perfil, ...)``), que
+es como lo usan el benchmark de la capa de datos y la prueba de carga.
+
+Usage:
+    python scripts/generar_datos_sinteticos.py --db /tmp/sintetica.db --guias 1000000 --years 3
+    python scripts/generar_datos_sinteticos.py --db /tmp/s.db --guias 50000 --perfil perfil_cosecha.json
+    python scripts/generar_datos_sinteticos.py --mostrar-perfil > perfil.json
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+PROJECT_ROOT = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BOGOTA_UTC_OFFSET = timedelta(hours=5)
+
+PERFIL_DEFAULT = {
+    'proveedores': {'cantidad': 360, 'zipf_s': 1.05},
+    'placas_por_proveedor': {'min': 1, 'max': 3},
+    # Llegadas por hora local (0-23); producción: 06:00-18:00 con pico a las 13-14h
+    'curva_horaria': [1, 0, 0, 0, 0, 1, 12, 18, 24, 34, 42, 46, 54, 60, 59, 48, 40, 20, 6, 2, 1, 1, 1, 1],
+    # Lunes..Domingo
+    'pesos_dia_semana': [1.0, 1.0, 1.0, 1.0, 1.0, 0.8, 0.3],
+    # Enero..Diciembre (picos de cosecha en marzo-junio y septiembre-noviembre)
+    'pesos_mes': [0.8, 0.9, 1.1, 1.3, 1.4, 1.2, 0.9, 0.8, 1.0, 1.2, 1.3, 0.9],
+    # Etapa final de cada guía (fracciones, se normalizan)
+    'estados_fruta': {
+        'entrada': 0.02, 'pesaje_bruto': 0.02, 'clasificacion': 0.01, 'pesaje_neto': 0.02, 'salida': 0.93,
+    },
+    'clasificacion_automatica': 0.6,
+    'fotos_por_clasificacion': {'min': 3, 'max': 12},
+    'racimos': {'min': 300, 'max': 1500},
+    'peso_bruto_kg': {'min': 8000, 'max': 34000},
+    'tara_kg': {'min': 4000, 'max': 9000},
+    'graneles': {
+        'por_dia': 18,
+        'productos': {'ACEITE CRUDO DE PALMA': 0.55, 'ACEITE DE PALMISTE': 0.15, 'TORTA DE PALMISTE': 0.2,
+                      'OLEINA': 0.1},
+        'clientes': 40,
+        'transportadoras': 15,
+        # Etapa final de cada registro
+        'estados': {'enturnado': 0.02, 'registrado': 0.03, 'primer_pesaje': 0.03, 'inspeccion': 0.02,
+                    'cargue': 0.03, 'pesaje_bruto': 0.87},
+        'rechazo_inspeccion': 0.03,
+        'vehiculos': 450,
+    },
+    'sellos': {
+        'tipos': [['Sello Botella', 'SB'], ['Sello Cable', 'SC'], ['Sello Plástico', 'SP']],
+        'por_vehiculo': {'min': 4, 'max': 8},
+        'anulados': 0.015,
+        'stock_almacen': 2000,
+    },
+}
+
+ESTADOS_SELLO = ['EN_ALMACEN_LABORATORIO', 'EN_PROCESO_INSTALACION', 'INSTALADO', 'VALIDADO_DESPACHADO', 'ANULADO']
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Genera datos sintéticos para el esquema de Oleoflores')
+    parser.add_argument('--db', help='Base destino (se crea con el esquema si no existe)')
+    parser.add_argument('--schema-from', default=None, help='Base de la que copiar el esquema')
+    parser.add_argument('--guias', type=int, default=100000, help='Guías de fruta a generar')
+    parser.add_argument('--years', type=float, default=3, help='Años de operación (hasta hoy)')
+    parser.add_argument('--hasta', default=None, help='Última fecha YYYY-MM-DD (default hoy)')
+    parser.add_argument('--perfil', default=None, help='JSON con distribuciones (se mezcla con el default)')
+    parser.add_argument('--sin-graneles', action='store_true')
+    parser.add_argument('--sin-sellos', action='store_true')
+    parser.add_argument('--batch', type=int, default=50000, help='Filas por executemany')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--mostrar-perfil', action='store_true', help='Imprime el perfil default y termina')
+    return parser.parse_args()
+
+
+# ---------------------------------------------------------------------------
+# Utilidades
+# ---------------------------------------------------------------------------
+
+def merge_perfil(base, override):
+    """Mezcla recursiva de diccionarios (el override gana)."""
+    resultado = dict(base)
+    for clave, valor in (override or {}).items():
+        if isinstance(valor, dict) and isinstance(resultado.get(clave), dict):
+            resultado[clave] = merge_perfil(resultado[clave], valor)
+        else:
+            resultado[clave] = valor
+    return resultado
+
+
+def find_schema_source(path=None):
+    if path:
+        return Path(path)
+    candidatos = [p for p in (PROJECT_ROOT / 'instance').glob('*.db*') if p.is_file()]
+    if not candidatos:
+        raise SystemExit("❌ No hay base en instance/ para copiar el esquema; use --schema-from")
+    return max(candidatos, key=lambda p: p.stat().st_mtime)
+
+
+def copy_schema(schema_source, destino):
+    """Crea ``destino`` con tablas, índices, vistas y triggers de ``schema_source``."""
+    origen = sqlite3.connect(f'file:{schema_source}?mode=ro', uri=True)
+    objetos = origen.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+        "ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 WHEN 'view' THEN 2 ELSE 3 END"
+    ).fetchall()
+    origen.close()
+    conn = sqlite3.connect(destino)
+    for (sql,) in objetos:
+        conn.execute(sql)
+    conn.commit()
+    return conn
+
+
+class _Sampler:
+    """Muestreo ponderado rápido (búsqueda binaria sobre pesos acumulados)."""
+
+    def __init__(self, valores, pesos, rng):
+        self.valores = list(valores)
+        self.acumulados = list(itertools.accumulate(pesos))
+        self.total = self.acumulados[-1]
+        self.rng = rng
+
+    def __call__(self):
+        return self.valores[bisect.bisect_right(self.acumulados, self.rng.random() * self.total)]
+
+
+class _BulkWriter:
+    """Acumula filas por tabla y las inserta con executemany al llenar el lote."""
+
+    def __init__(self, conn, batch):
+        self.conn = conn
+        self.batch = batch
+        self.sql = {}
+        self.rows = {}
+        self.counts = {}
+
+    def add(self, tabla, columnas, fila):
+        if tabla not in self.sql:
+            self.sql[tabla] = (f'INSERT INTO "{tabla}" ({", ".join(columnas)}) '
+                               f'VALUES ({", ".join("?" * len(columnas))})')
+            self.rows[tabla] = []
+            self.counts[tabla] = 0
+        lote = self.rows[tabla]
+        lote.append(fila)
+        if len(lote) >= self.batch:
+            self._flush_table(tabla)
+
+    def _flush_table(self, tabla):
+        lote = self.rows[tabla]
+        if lote:
+            self.conn.executemany(self.sql[tabla], lote)
+            self.counts[tabla] += len(lote)
+            lote.clear()
+
+    def flush(self):
+        for tabla in self.rows:
+            self._flush_table(tabla)
+        self.conn.commit()
+
+
+def _next_id(conn, tabla):
+    return (conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{tabla}"').fetchone()[0] or 0) + 1
+
+
+def _fmt(dt):
+    return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _placa(rng):
+    return (''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(3))
+            + f'{rng.randint(0, 999):03d}')
+
+
+def _dias(desde, hasta):
+    dia = desde
+    while dia <= hasta:
+        yield dia
+        dia += timedelta(days=1)
+
+
+def _llegadas_por_dia(perfil, desde, hasta, total):
+    """Reparte ``total`` llegadas entre los días según pesos de semana y mes."""
+    dias = list(_dias(desde, hasta))
+    pesos = [perfil['pesos_dia_semana'][d.weekday()] * perfil['pesos_mes'][d.month - 1] for d in dias]
+    suma = sum(pesos) or 1.0
+    cuotas = [total * p / suma for p in pesos]
+    enteros = [int(c) for c in cuotas]
+    # Repartir el residuo a los días con mayor parte fraccionaria
+    faltan = total - sum(enteros)
+    for i in sorted(range(len(dias)), key=lambda i: cuotas[i] - enteros[i], reverse=True)[:faltan]:
+        enteros[i] += 1
+    return list(zip(dias, enteros))
+
+
+def _horas_del_dia(dia, cantidad, hora_sampler, rng):
+    """Timestamps UTC ordenados de ``cantidad`` llegadas en el día local ``dia``."""
+    base = datetime(dia.year, dia.month, dia.day) + BOGOTA_UTC_OFFSET
+    segundos = sorted(hora_sampler() * 3600 + rng.randrange(3600) for _ in range(cantidad))
+    return [base + timedelta(seconds=s) for s in segundos]
+
+
+# ---------------------------------------------------------------------------
+# Flujo de fruta
+# ---------------------------------------------------------------------------
+
+ENTRY_COLS = ('codigo_guia', 'nombre_proveedor', 'codigo_proveedor', 'timestamp_registro_utc', 'num_cedula',
+              'placa', 'conductor', 'transportador', 'codigo_transportador', 'tipo_fruta', 'cantidad_racimos',
+              'acarreo', 'cargo', 'image_filename', 'qr_filename', 'fecha_tiquete', 'is_madre', 'estado',
+              'fecha_creacion', 'is_active')
+BRUTO_COLS = ('codigo_guia', 'codigo_proveedor', 'nombre_proveedor', 'peso_bruto', 'tipo_pesaje',
+              'timestamp_pesaje_utc', 'imagen_pesaje', 'codigo_guia_transporte_sap', 'estado', 'fecha_creacion')
+CLASIF_COLS = ('codigo_guia', 'codigo_proveedor', 'nombre_proveedor', 'timestamp_clasificacion_utc',
+               'verde_manual', 'sobremaduro_manual', 'danio_corona_manual', 'pendunculo_largo_manual',
+               'podrido_manual', 'verde_automatico', 'sobremaduro_automatico', 'danio_corona_automatico',
+               'pendunculo_largo_automatico', 'podrido_automatico', 'clasificacion_manual_json',
+               'clasificacion_automatica_json', 'total_racimos_detectados', 'clasificacion_consolidada',
+               'timestamp_fin_auto', 'tiempo_procesamiento_auto', 'estado', 'fecha_creacion')
+FOTO_COLS = ('codigo_guia', 'ruta_foto', 'numero_foto', 'tipo_foto', 'fecha_subida', 'hora_subida', 'estado',
+             'fecha_creacion')
+NETO_COLS = ('codigo_guia', 'codigo_proveedor', 'nombre_proveedor', 'peso_bruto', 'peso_tara', 'peso_neto',
+             'peso_producto', 'tipo_pesaje_neto', 'timestamp_pesaje_neto_utc', 'respuesta_sap', 'estado',
+             'fecha_creacion', 'fecha_pesaje_neto', 'hora_pesaje_neto')
+SALIDA_COLS = ('codigo_guia', 'codigo_proveedor', 'nombre_proveedor', 'timestamp_salida_utc',
+               'comentarios_salida', 'estado', 'fecha_creacion')
+VALIDACION_COLS = ('fecha_aplicable_validacion', 'timestamp_creacion_utc', 'peso_neto_total_validado',
+                   'mensaje_webhook', 'exito_webhook', 'ruta_foto_validacion', 'filtros_aplicados_json',
+                   'fecha_creacion')
+ETAPAS_FRUTA = ['entrada', 'pesaje_bruto', 'clasificacion', 'pesaje_neto', 'salida']
+CATEGORIAS = ('verde', 'sobremaduro', 'danio_corona', 'pendunculo_largo', 'podrido')
+
+
+def _clasificacion_json(rng, total):
+    conteos = {c: rng.randint(0, max(1, total // 15)) for c in CATEGORIAS + ('maduro',)}
+    return {c: {'cantidad': n, 'porcentaje': round(100.0 * n / total, 2)} for c, n in conteos.items()}
+
+
+def generar_fruta(writer, perfil, desde, hasta, total, rng):
+    prov_cfg = perfil['proveedores']
+    proveedores = [f"{150000 + i:07d}{rng.choice('AB')}" for i in range(prov_cfg['cantidad'])]
+    proveedor = _Sampler(proveedores, [1.0 / (r + 1) ** prov_cfg['zipf_s'] for r in range(len(proveedores))], rng)
+    placas = {p: [_placa(rng) for _ in range(rng.randint(perfil['placas_por_proveedor']['min'],
+                                                          perfil['placas_por_proveedor']['max']))]
+              for p in proveedores}
+    hora = _Sampler(range(24), perfil['curva_horaria'], rng)
+    etapa = _Sampler(range(len(ETAPAS_FRUTA)), [perfil['estados_fruta'].get(e, 0) for e in ETAPAS_FRUTA], rng)
+    fotos_min, fotos_max = perfil['fotos_por_clasificacion']['min'], perfil['fotos_por_clasificacion']['max']
+
+    neto_por_dia = {}
+    for dia, cantidad in _llegadas_por_dia(perfil, desde, hasta, total):
+        usadas = set()
+        for ts in _horas_del_dia(dia, cantidad, hora, rng):
+            prov = proveedor()
+            guia = f"{prov}_{ts:%Y%m%d%H%M%S}"
+            while guia in usadas:
+                ts += timedelta(seconds=1)
+                guia = f"{prov}_{ts:%Y%m%d%H%M%S}"
+            usadas.add(guia)
+            nombre = f'Proveedor {prov}'
+            ts_str = _fmt(ts)
+            alcance = etapa()
+            writer.add('entry_records', ENTRY_COLS, (
+                guia, nombre, prov, ts_str, str(rng.randint(10**7, 10**10)), rng.choice(placas[prov]),
+                f'Conductor {rng.randint(1, 3000)}', f'Transportes {prov[-4:]}', prov[:6],
+                'RACIMOS', rng.randint(perfil['racimos']['min'], perfil['racimos']['max']),
+                rng.choice(('NO', 'NO', 'NO', 'SI')), rng.choice(('NO', 'NO', 'SI')),
+                f'tiquete_{guia}.jpg', f'qr_{guia}.png', f'{ts - BOGOTA_UTC_OFFSET:%d/%m/%Y}', 0,
+                None, ts_str, 1,
+            ))
+            if alcance < 1:
+                continue
+
+            t_bruto = ts + timedelta(minutes=rng.randint(5, 40))
+            peso_bruto = rng.randint(perfil['peso_bruto_kg']['min'], perfil['peso_bruto_kg']['max'])
+            writer.add('pesajes_bruto', BRUTO_COLS, (
+                guia, prov, nombre, peso_bruto, 'directo' if rng.random() < 0.98 else 'virtual', _fmt(t_bruto),
+                f'pesaje_{guia}.jpg', str(rng.randint(10**9, 10**10)), None, _fmt(t_bruto),
+            ))
+            if alcance < 2:
+                continue
+
+            t_clasif = t_bruto + timedelta(minutes=rng.randint(10, 60))
+            manual = [rng.randint(0, 30) for _ in CATEGORIAS]
+            auto = rng.random() < perfil['clasificacion_automatica']
+            total_racimos = rng.randint(60, 160) if auto else None
+            auto_json = _clasificacion_json(rng, total_racimos) if auto else None
+            writer.add('clasificaciones', CLASIF_COLS, (
+                guia, prov, nombre, _fmt(t_clasif), *manual,
+                *((auto_json[c]['porcentaje'] for c in CATEGORIAS) if auto else (None,) * len(CATEGORIAS)),
+                json.dumps({'numero_muestra': rng.randint(20, 100), 'verdes': manual[0],
+                            'sobremaduros': manual[1], 'danio_corona': manual[2],
+                            'pedunculo_largo': manual[3], 'podridos': manual[4]}),
+                json.dumps({'codigo_guia': guia, 'conteo_total_racimos': total_racimos,
+                            'categorias': auto_json, 'detalle_errores': []}) if auto else None,
+                total_racimos, json.dumps(auto_json) if auto else None,
+                _fmt(t_clasif + timedelta(seconds=12)) if auto else None,
+                round(rng.uniform(5, 40), 1) if auto else None, 'completado', _fmt(t_clasif),
+            ))
+            if auto:
+                fecha, hora_txt = (t_clasif - BOGOTA_UTC_OFFSET).strftime('%d/%m/%Y %H:%M:%S').split(' ')
+                for numero in range(1, rng.randint(fotos_min, fotos_max) + 1):
+                    writer.add('fotos_clasificacion', FOTO_COLS, (
+                        guia, f'uploads/{guia}/{t_clasif:%Y%m%d%H%M%S}_Clasifiacion_Racimos_MLB_{numero}.jpg',
+                        numero, 'original', fecha, hora_txt, 'activo', _fmt(t_clasif),
+                    ))
+            if alcance < 3:
+                continue
+
+            t_neto = t_clasif + timedelta(minutes=rng.randint(15, 90))
+            tara = rng.randint(perfil['tara_kg']['min'], min(perfil['tara_kg']['max'], peso_bruto - 1000))
+            local = t_neto - BOGOTA_UTC_OFFSET
+            writer.add('pesajes_neto', NETO_COLS, (
+                guia, prov, nombre, peso_bruto, tara, peso_bruto - tara, peso_bruto - tara, 'directo',
+                _fmt(t_neto), 'OK', 'completado', _fmt(t_neto), f'{local:%d/%m/%Y}', f'{local:%H:%M:%S}',
+            ))
+            neto_por_dia[dia] = neto_por_dia.get(dia, 0) + peso_bruto - tara
+            if alcance < 4:
+                continue
+
+            t_salida = t_neto + timedelta(minutes=rng.randint(3, 25))
+            writer.add('salidas', SALIDA_COLS, (
+                guia, prov, nombre, _fmt(t_salida), '', 'completado', _fmt(t_salida),
+            ))
+
+    for dia in _dias(desde, hasta):
+        if dia not in neto_por_dia:
+            continue
+        creado = _fmt(datetime(dia.year, dia.month, dia.day, 23, 30) + BOGOTA_UTC_OFFSET)
+        writer.add('validaciones_diarias_sap', VALIDACION_COLS, (
+            dia.isoformat(), creado, neto_por_dia[dia], 'Validación exitosa', 1,
+            f'uploads/validaciones/{dia:%Y%m%d}.jpg', json.dumps({'fecha_desde': dia.isoformat()}), creado,
+        ))
+
+
+# ---------------------------------------------------------------------------
+# Graneles y sellos
+# ---------------------------------------------------------------------------
+
+REGISTRO_COLS = ('id', 'producto', 'fecha_autorizacion', 'placa', 'trailer', 'cedula_conductor',
+                 'nombre_conductor', 'telefono_conductor', 'transportadora', 'cliente', 'tipo_venta', 'origen',
+                 'destino', 'kg_cargar', 'localidad', 'arl', 'eps', 'vencimiento_arl', 'vencimiento_soat',
+                 'vencimiento_tecnomecanica', 'vencimiento_licencia', 'foto_arl', 'foto_soat',
+                 'foto_tecnomecanica', 'foto_licencia', 'estado_registro', 'timestamp_registro', 'tipo_registro',
+                 'usuario_registro', 'guia_registro', 'tipo_cargue', 'tipo_formulario', 'pedido')
+ENTURNE_COLS = ('placa', 'foto_path', 'timestamp_enturnado', 'estado', 'usuario_guardia', 'registro_entrada_id',
+                'timestamp_asignado_recepcionista', 'usuario_recepcionista')
+PRIMER_COLS = ('id_registro_granel', 'peso_primer_kg', 'codigo_sap_granel', 'timestamp_primer_pesaje',
+               'usuario_pesaje', 'foto_soporte_path', 'codigo_guia_transporte_sap')
+INSPECCION_COLS = ('id_registro_granel', 'localidad', 'transportadora', 'tipo_vehiculo', 'producto_cargar',
+                   'elementos_seguridad', 'estado_vehiculo', 'vehiculo_apto_cargue', 'motivo_rechazo',
+                   'numero_tanque_almacenamiento', 'temperatura_cargue', 'sellos_carrotanque',
+                   'usuario_inspeccion', 'timestamp_inspeccion')
+CALIDAD_COLS = ('id_registro_granel', 'parametros_calidad', 'resultado_calidad', 'timestamp_calidad',
+                'usuario_calidad')
+CARGUE_COLS = ('id', 'id_registro_granel', 'timestamp_inicio_cargue', 'timestamp_fin_cargue',
+               'volumen_medidor_litros', 'usuario_cargue', 'numero_tanque_origen', 'temperatura_producto',
+               'estado_cargue')
+PESAJE_GRANEL_COLS = ('id_registro_granel', 'id_cargue', 'peso_bruto_kg', 'peso_tara_kg', 'peso_neto_kg',
+                      'timestamp_pesaje_bruto', 'volumen_medidor_referencia', 'factor_conversion',
+                      'peso_teorico_kg', 'diferencia_porcentual', 'tolerancia_porcentual', 'dentro_tolerancia',
+                      'requiere_validacion', 'estado_validacion', 'usuario_pesaje', 'numero_remision_sap',
+                      'numero_pesaje', 'es_pesaje_oficial')
+VEHICULO_COLS = ('placa', 'cantidad_sellos_estandar', 'puntos_sellado', 'activo', 'usuario_creacion',
+                 'fecha_creacion')
+TIPO_SELLO_COLS = ('id', 'nombre', 'prefijo', 'proveedor', 'longitud_serial', 'sellos_por_lote', 'activo',
+                   'usuario_creacion', 'fecha_creacion')
+SOLICITUD_COLS = ('id', 'placa_vehiculo', 'cantidad_solicitada', 'cantidad_sugerida', 'requiere_aprobacion',
+                  'aprobada', 'estado', 'usuario_solicita', 'fecha_solicitud', 'usuario_despacha',
+                  'fecha_despacho', 'fecha_instalacion_completa', 'fecha_validacion_final', 'fecha_creacion')
+SELLO_COLS = ('id', 'numero_serie', 'tipo_sello_id', 'lote_ingreso', 'estado', 'fecha_cambio_estado',
+              'fecha_ingreso', 'usuario_ingreso', 'solicitud_sello_id', 'fecha_despacho', 'placa_vehiculo',
+              'punto_instalacion', 'fecha_instalacion', 'usuario_instala', 'fecha_validacion_final',
+              'motivo_anulacion', 'fecha_anulacion', 'fecha_creacion')
+MOVIMIENTO_COLS = ('sello_id', 'estado_anterior', 'estado_nuevo', 'usuario', 'timestamp', 'placa_vehiculo',
+                   'solicitud_id')
+ETAPAS_GRANEL = ['enturnado', 'registrado', 'primer_pesaje', 'inspeccion', 'cargue', 'pesaje_bruto']
+
+
+def generar_graneles(writer, conn, perfil, desde, hasta, rng, con_sellos=True):
+    cfg = perfil['graneles']
+    sellos_cfg = perfil['sellos']
+    producto = _Sampler(cfg['productos'].keys(), cfg['productos'].values(), rng)
+    etapa = _Sampler(range(len(ETAPAS_GRANEL)), [cfg['estados'].get(e, 0) for e in ETAPAS_GRANEL], rng)
+    hora = _Sampler(range(24), perfil['curva_horaria'], rng)
+    clientes = [f'Cliente {i:03d}' for i in range(cfg['clientes'])]
+    transportadoras = [f'Transportadora {i:02d}' for i in range(cfg['transportadoras'])]
+
+    # Vehículos (maestro de placas con su cantidad estándar de sellos)
+    existentes = {r[0] for r in conn.execute('SELECT placa FROM maestro_vehiculos')}
+    vehiculos = {}
+    while len(vehiculos) < cfg['vehiculos']:
+        placa = _placa(rng)
+        if placa not in existentes:
+            vehiculos[placa] = rng.randint(sellos_cfg['por_vehiculo']['min'], sellos_cfg['por_vehiculo']['max'])
+    inicio_str = _fmt(datetime(desde.year, desde.month, desde.day))
+    for placa, cantidad in vehiculos.items():
+        writer.add('maestro_vehiculos', VEHICULO_COLS, (
+            placa, cantidad, json.dumps([f'Escotilla {i + 1}' for i in range(cantidad)]), 1, 'generador', inicio_str,
+        ))
+    placas = list(vehiculos)
+
+    # Tipos de sello (respetando los prefijos ya existentes)
+    tipo_ids = []
+    prefijos = {r[0]: r[1] for r in conn.execute('SELECT prefijo, id FROM tipos_sello')}
+    siguiente_tipo = _next_id(conn, 'tipos_sello')
+    for nombre, prefijo in sellos_cfg['tipos']:
+        if prefijo in prefijos:
+            tipo_ids.append((prefijos[prefijo], prefijo))
+            continue
+        writer.add('tipos_sello', TIPO_SELLO_COLS, (
+            siguiente_tipo, nombre, prefijo, 'Proveedor de sellos', 8, 500, 1, 'generador', inicio_str,
+        ))
+        tipo_ids.append((siguiente_tipo, prefijo))
+        siguiente_tipo += 1
+
+    registro_id = _next_id(conn, 'RegistroEntradaGraneles')
+    cargue_id = _next_id(conn, 'CargueGranel')
+    solicitud_id = _next_id(conn, 'solicitudes_sello')
+    sello_id = _next_id(conn, 'sellos')
+    serial = itertools.count(conn.execute('SELECT COUNT(*) FROM sellos').fetchone()[0] + 1)
+
+    def nuevo_sello(tipo, prefijo, t, estado, **extra):
+        nonlocal sello_id
+        fila = {
+            'id': sello_id, 'numero_serie': f'{prefijo}{next(serial):08d}', 'tipo_sello_id': tipo,
+            'lote_ingreso': f'L{t:%Y%m}', 'estado': estado, 'fecha_cambio_estado': _fmt(t),
+            'fecha_ingreso': _fmt(t - timedelta(days=rng.randint(5, 60))), 'usuario_ingreso': 'laboratorio',
+            'fecha_creacion': _fmt(t),
+        }
+        fila.update(extra)
+        writer.add('sellos', SELLO_COLS, tuple(fila.get(c) for c in SELLO_COLS))
+        sello_id += 1
+        return fila['id']
+
+    total = int(cfg['por_dia'] * ((hasta - desde).days + 1))
+    for dia, cantidad in _llegadas_por_dia(perfil, desde, hasta, total):
+        for ts in _horas_del_dia(dia, cantidad, hora, rng):
+            alcance = etapa()
+            placa = rng.choice(placas)
+            t_registro = ts + timedelta(minutes=rng.randint(5, 60))
+            registro_actual = registro_id if alcance >= 1 else None
+            writer.add('enturnamientos_graneles', ENTURNE_COLS, (
+                placa, f'uploads/enturnamiento/{placa}_{ts:%Y%m%d%H%M%S}.jpg', _fmt(ts),
+                'asignado' if registro_actual else 'en_turno', 'guarda', registro_actual,
+                _fmt(t_registro) if registro_actual else None, 'recepcion' if registro_actual else None,
+            ))
+            if alcance < 1:
+                continue
+
+            registro_id += 1
+            prod = producto()
+            kg = rng.randint(20000, 36000)
+            vence = (dia + timedelta(days=rng.randint(-10, 400))).isoformat()
+            estado = ETAPAS_GRANEL[alcance]
+            rechazado = alcance >= 3 and rng.random() < cfg['rechazo_inspeccion']
+            if rechazado:
+                estado, alcance = 'rechazado', 3
+            writer.add('RegistroEntradaGraneles', REGISTRO_COLS, (
+                registro_actual, prod, dia.isoformat(), placa, f'R{rng.randint(10000, 99999)}',
+                str(rng.randint(10**7, 10**10)), f'Conductor {rng.randint(1, 2000)}', f'3{rng.randint(10**8, 10**9 - 1)}',
+                rng.choice(transportadoras), rng.choice(clientes), rng.choice(('Nacional', 'Exportación')),
+                'Planta Oleoflores', f'Destino {rng.randint(1, 30)}', str(kg), 'Planta', 'ARL Sura', 'EPS Sanitas',
+                vence, vence, vence, vence,
+                *(f'uploads/graneles/{registro_actual}_{d}.jpg' for d in ('arl', 'soat', 'tecno', 'licencia')),
+                estado, _fmt(t_registro), 'manual', 'recepcion', f'G{registro_actual:08d}',
+                'Cargue', 'Graneles Cliente', str(rng.randint(10**6, 10**7)),
+            ))
+            if alcance < 2:
+                continue
+
+            t_primer = t_registro + timedelta(minutes=rng.randint(10, 60))
+            tara = rng.randint(12000, 18000)
+            writer.add('PrimerPesajeGranel', PRIMER_COLS, (
+                registro_actual, tara, str(rng.randint(10**6, 10**7)), _fmt(t_primer), 'bascula',
+                f'uploads/graneles/{registro_actual}_primer.jpg', str(rng.randint(10**9, 10**10)),
+            ))
+            if alcance < 3:
+                continue
+
+            t_insp = t_primer + timedelta(minutes=rng.randint(10, 45))
+            writer.add('InspeccionVehiculo', INSPECCION_COLS, (
+                registro_actual, 'Planta', rng.choice(transportadoras), 'Carrotanque', prod, 'Completos',
+                'Bueno', 'NO' if rechazado else 'SI', 'Tanque con residuos' if rechazado else None,
+                f'TK-{rng.randint(1, 12)}', round(rng.uniform(35, 55), 1), '', 'inspector', _fmt(t_insp),
+            ))
+            writer.add('ControlCalidadGranel', CALIDAD_COLS, (
+                registro_actual, json.dumps({'acidez': round(rng.uniform(2, 5), 2), 'humedad': round(rng.uniform(0.1, 0.5), 2)}),
+                'rechazado' if rechazado else 'aprobado', _fmt(t_insp + timedelta(minutes=10)), 'calidad',
+            ))
+            if alcance < 4:
+                continue
+
+            t_cargue = t_insp + timedelta(minutes=rng.randint(15, 90))
+            t_fin = t_cargue + timedelta(minutes=rng.randint(30, 120))
+            litros = round(kg / 0.91, 1)
+            writer.add('CargueGranel', CARGUE_COLS, (
+                cargue_id, registro_actual, _fmt(t_cargue), _fmt(t_fin), litros, 'cargue',
+                f'TK-{rng.randint(1, 12)}', round(rng.uniform(35, 55), 1), 'completado',
+            ))
+
+            if con_sellos:
+                n_sellos = vehiculos[placa]
+                t_sol = t_insp + timedelta(minutes=5)
+                terminado = alcance >= 5
+                writer.add('solicitudes_sello', SOLICITUD_COLS, (
+                    solicitud_id, placa, n_sellos, n_sellos, 0, 1,
+                    'VALIDADO_DESPACHADO' if terminado else 'INSTALADO', 'inspector', _fmt(t_sol), 'laboratorio',
+                    _fmt(t_sol + timedelta(minutes=5)), _fmt(t_fin), _fmt(t_fin + timedelta(minutes=20)) if terminado else None,
+                    _fmt(t_sol),
+                ))
+                tipo, prefijo = rng.choice(tipo_ids)
+                for punto in range(n_sellos):
+                    anulado = rng.random() < sellos_cfg['anulados']
+                    estado_sello = 'ANULADO' if anulado else ('VALIDADO_DESPACHADO' if terminado else 'INSTALADO')
+                    sid = nuevo_sello(
+                        tipo, prefijo, t_fin, estado_sello, solicitud_sello_id=solicitud_id,
+                        fecha_despacho=_fmt(t_sol + timedelta(minutes=5)), placa_vehiculo=placa,
+                        punto_instalacion=f'Escotilla {punto + 1}', fecha_instalacion=_fmt(t_fin),
+                        usuario_instala='inspector',
+                        fecha_validacion_final=_fmt(t_fin + timedelta(minutes=20)) if terminado and not anulado else None,
+                        motivo_anulacion='Sello defectuoso' if anulado else None,
+                        fecha_anulacion=_fmt(t_fin) if anulado else None,
+                    )
+                    transiciones = ['EN_ALMACEN_LABORATORIO', 'EN_PROCESO_INSTALACION', 'INSTALADO']
+                    if anulado:
+                        transiciones[-1] = 'ANULADO'
+                    elif terminado:
+                        transiciones.append('VALIDADO_DESPACHADO')
+                    for anterior, nuevo in zip(transiciones, transiciones[1:]):
+                        writer.add('movimientos_sello', MOVIMIENTO_COLS, (
+                            sid, anterior, nuevo, 'inspector', _fmt(t_fin), placa, solicitud_id,
+                        ))
+                solicitud_id += 1
+
+            if alcance < 5:
+                cargue_id += 1
+                continue
+            t_pesaje = t_fin + timedelta(minutes=rng.randint(5, 30))
+            bruto = tara + kg + rng.randint(-300, 300)
+            teorico = litros * 0.91
+            diferencia = round(100.0 * ((bruto - tara) - teorico) / teorico, 3)
+            writer.add('PesajeBrutoGranel', PESAJE_GRANEL_COLS, (
+                registro_actual, cargue_id, bruto, tara, bruto - tara, _fmt(t_pesaje), litros, 0.91,
+                round(teorico, 1), diferencia, 0.5, int(abs(diferencia) <= 0.5), int(abs(diferencia) > 0.5),
+                'aprobado' if abs(diferencia) <= 0.5 else 'pendiente', 'bascula', str(rng.randint(10**7, 10**8)),
+                1, 1,
+            ))
+            cargue_id += 1
+
+    if con_sellos:
+        # Inventario sin usar en el almacén del laboratorio
+        ahora = datetime(hasta.year, hasta.month, hasta.day)
+        for _ in range(sellos_cfg['stock_almacen']):
+            tipo, prefijo = rng.choice(tipo_ids)
+            nuevo_sello(tipo, prefijo, ahora, 'EN_ALMACEN_LABORATORIO')
+
+
+# ---------------------------------------------------------------------------
+# Punto de entrada
+# ---------------------------------------------------------------------------
+
+def generar(conn, perfil=None, guias=100000, years=3, hasta=None, graneles=True, sellos=True,
+            batch=50000, seed=42):
+    """
+    Genera datos en ``conn`` (la base ya debe tener el esquema).
+
+    Returns:
+        dict: Filas insertadas por tabla, más 'segundos' y 'filas_por_segundo'.
+    """
+    perfil = merge_perfil(PERFIL_DEFAULT, perfil)
+    rng = random.Random(seed)
+    hasta = hasta or date.today()
+    desde = hasta - timedelta(days=max(int(365 * years) - 1, 0))
+
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA journal_mode=MEMORY')
+    conn.execute('PRAGMA cache_size=-200000')
+    inicio = time.perf_counter()
+    writer = _BulkWriter(conn, batch)
+    generar_fruta(writer, perfil, desde, hasta, guias, rng)
+    if graneles:
+        generar_graneles(writer, conn, perfil, desde, hasta, rng, con_sellos=sellos)
+    writer.flush()
+    segundos = time.perf_counter() - inicio
+
+    resumen = dict(writer.counts)
+    total = sum(resumen.values())
+    resumen['segundos'] = round(segundos, 2)
+    resumen['filas_por_segundo'] = round(total / segundos) if segundos else total
+    return resumen
+
+
+def main():
+    args = parse_arguments()
+    if args.mostrar_perfil:
+        print(json.dumps(PERFIL_DEFAULT, indent=2, ensure_ascii=False))
+        return 0
+    if not args.db:
+        print("❌ Indique la base destino con --db")
+        return 1
+
+    perfil = json.loads(Path(args.perfil).read_text()) if args.perfil else None
+    destino = Path(args.db)
+    if destino.exists():
+        conn = sqlite3.connect(destino)
+        print(f"🗄️  Agregando datos a {destino}")
+    else:
+        schema_source = find_schema_source(args.schema_from)
+        conn = copy_schema(schema_source, destino)
+        print(f"🗄️  Base nueva {destino} con el esquema de {schema_source}")
+
+    hasta = datetime.strptime(args.hasta, '%Y-%m-%d').date() if args.hasta else None
+    print(f"🚀 Generando {args.guias:,} guías de fruta en {args.years} años...")
+    resumen = generar(conn, perfil, guias=args.guias, years=args.years, hasta=hasta,
+                      graneles=not args.sin_graneles, sellos=not args.sin_sellos,
+                      batch=args.batch, seed=args.seed)
+    conn.execute('ANALYZE')
+    conn.close()
+
+    for tabla, filas in sorted(resumen.items()):
+        if tabla not in ('segundos', 'filas_por_segundo'):
+            print(f"  {tabla:<28}{filas:>12,}")
+    print(f"✅ {resumen['segundos']}s ({resumen['filas_por_segundo'] * 60:,} filas/minuto)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,557 @@
+#!/usr/bin/env python
+"""
+Prueba de carga de extremo a extremo: simula la llegada de camiones a planta.
+
+Levanta la aplicación Flask real (``create_app``) contra una base SQLite
+temporal con el esquema de producción y reproduce, con hilos concurrentes:
+
+- Flujo de fruta: entrada → pesaje bruto (con verificación de placa OCR) →
+  clasificación → pesaje neto → salida.
+- Flujo de graneles: registro de entrada → OCR de documento → primer pesaje →
+  inspección del vehículo → guía.
+- Lectores opcionales que consultan los listados mientras tanto (como las
+  pantallas de báscula y calidad).
+
+Los camiones llegan según un proceso de Poisson (``--rate`` por minuto) y cada
+uno recorre su flujo en un hilo del pool (``--concurrency``). OCR y webhooks
+no salen a internet: toda petición HTTP de ``requests`` a un host externo se
+redirige a un servidor local que responde con datos fijos tras
+``--stub-latency-ms`` (OpenAI se desactiva quitando ``OPENAI_API_KEY``).
+
+Reporta por paso: peticiones, errores, p50/p95/p99; throughput total; espera
+en cola de los camiones; y esperas/errores por bloqueo de SQLite (sentencias
+de escritura o COMMIT que tardan más de ``--lock-wait-ms`` y excepciones
+``database is locked``). Con la capacidad sostenida estima camiones por día
+de planta (``--plant-hours``).
+
+Los campos de cada formulario están en ``FLUJOS`` más abajo; si una ruta
+cambia sus nombres de campos, se ajustan ahí.
+
+Usage:
+    python scripts/load_test_flujo.py --duration 120 --rate 40 --concurrency 16
+    python scripts/load_test_flujo.py --mix fruta=1 --readers 4 --stub-latency-ms 800
+    python scripts/load_test_flujo.py --schema-from instance/oleoflores_dev.db --keep-db
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+PROJECT_ROOT = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(PROJECT_ROOT))
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'COMMIT')
+LECTURAS = ['/registros-entrada', '/pesaje/pesajes', '/clasificacion/clasificaciones',
+            '/pesaje-neto/lista_pesajes_neto', '/graneles/lista-pendientes-guarda']
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Prueba de carga del flujo de camiones')
+    parser.add_argument('--duration', type=float, default=60.0, help='Segundos generando llegadas')
+    parser.add_argument('--rate', type=float, default=30.0, help='Camiones que llegan por minuto')
+    parser.add_argument('--concurrency', type=int, default=16, help='Camiones atendidos en paralelo')
+    parser.add_argument('--mix', default='fruta=0.7,graneles=0.3', help='Proporción de flujos')
+    parser.add_argument('--readers', type=int, default=2, help='Hilos consultando listados')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='Pausa entre pasos de un camión')
+    parser.add_argument('--stub-latency-ms', type=float, default=300.0, help='Latencia simulada de OCR/webhooks')
+    parser.add_argument('--lock-wait-ms', type=float, default=50.0,
+                        help='Una escritura más lenta que esto cuenta como espera por bloqueo')
+    parser.add_argument('--plant-hours', type=float, default=14.0, help='Horas operativas por día')
+    parser.add_argument('--drain-timeout', type=float, default=300.0,
+                        help='Segundos máximos esperando a los camiones en curso')
+    parser.add_argument('--schema-from', default=None,
+                        help='Base SQLite de la que copiar el esquema (default: la más reciente en instance/)')
+    parser.add_argument('--image', default=str(PROJECT_ROOT / 'placa_test.jpg'), help='Imagen para los uploads')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--keep-db', action='store_true', help='No borrar la base temporal al terminar')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados')
+    return parser.parse_args()
+
+
+# ---------------------------------------------------------------------------
+# Base temporal y stubs
+# ---------------------------------------------------------------------------
+
+def find_schema_source(path=None):
+    if path:
+        return Path(path)
+    candidatos = [p for p in (PROJECT_ROOT / 'instance').glob('*.db*') if p.is_file()]
+    if not candidatos:
+        raise SystemExit("❌ No hay base en instance/ para copiar el esquema; use --schema-from")
+    return max(candidatos, key=lambda p: p.stat().st_mtime)
+
+
+def create_temp_database(schema_source, directory):
+    """Crea una base vacía con el esquema (tablas, índices, vistas, triggers) de ``schema_source``."""
+    destino = Path(directory) / 'loadtest.db'
+    origen = sqlite3.connect(f'file:{schema_source}?mode=ro', uri=True)
+    objetos = origen.execute(
+        "SELECT type, sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+        "ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 WHEN 'view' THEN 2 ELSE 3 END"
+    ).fetchall()
+    origen.close()
+
+    conn = sqlite3.connect(destino)
+    conn.execute('PRAGMA journal_mode=WAL')
+    for _, sql in objetos:
+        conn.execute(sql)
+    cur = conn.execute(
+        "INSERT INTO users (username, email, password_hash, is_active, is_admin, user_role) "
+        "VALUES ('loadtest', 'loadtest@oleoflores.local', 'x', 1, 1, 'admin')"
+    )
+    user_id = cur.lastrowid
+    conn.commit()
+    conn.close()
+    return destino, user_id
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    latency = 0.3
+
+    def _responder(self):
+        longitud = int(self.headers.get('Content-Length') or 0)
+        if longitud:
+            self.rfile.read(longitud)
+        time.sleep(self.latency)
+        cuerpo = json.dumps({
+            'success': True,
+            'placa': 'ABC123',
+            'confianza': 0.95,
+            'fecha_vencimiento': '2027-12-31',
+            'mensaje': 'respuesta simulada',
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    do_GET = do_POST = do_PUT = _responder
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(latency_ms):
+    _StubHandler.latency = latency_ms / 1000.0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def redirect_external_http(stub_port):
+    """Toda petición de ``requests`` a un host no local va al servidor stub."""
+    import requests
+
+    original_request = requests.Session.request
+
+    def request(self, method, url, *args, **kwargs):
+        partes = urlsplit(url)
+        if partes.hostname not in ('127.0.0.1', 'localhost'):
+            url = urlunsplit(('http', f'127.0.0.1:{stub_port}', partes.path or '/', partes.query, ''))
+        return original_request(self, method, url, *args, **kwargs)
+
+    requests.Session.request = request
+
+
+# ---------------------------------------------------------------------------
+# Aplicación
+# ---------------------------------------------------------------------------
+
+def build_app(db_path, temp_dir):
+    # Sin OpenAI: los servicios OCR caen al webhook (redirigido al stub)
+    os.environ.pop('OPENAI_API_KEY', None)
+    os.environ.setdefault('FLASK_SECRET_KEY', 'loadtest')
+
+    from config.config import TestingConfig
+    from app import create_app
+
+    class LoadTestConfig(TestingConfig):
+        DEBUG = False
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'check_same_thread': False, 'timeout': 20}}
+        TIQUETES_DB_PATH = str(db_path)
+        DB_PATH = str(db_path)
+        WTF_CSRF_ENABLED = False
+        METRICS_MULTIPROC_DIR = ''
+        PROFILER_ENABLED = False
+        UPLOAD_FOLDER = Path(temp_dir) / 'uploads'
+
+    return create_app(LoadTestConfig)
+
+
+class Stats:
+    """Latencias y resultados por (flujo, paso), seguras entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {}
+        self.estados = {}
+        self.errores = {}
+        self.esperas_cola = {}
+        self.camiones = {}
+        self.sin_terminar = {}
+        self.lock_waits = 0
+        self.lock_errors = 0
+
+    def registrar(self, flujo, paso, segundos, status):
+        clave = f'{flujo}.{paso}'
+        with self._lock:
+            self.latencias.setdefault(clave, []).append(segundos)
+            estados = self.estados.setdefault(clave, {})
+            estados[status] = estados.get(status, 0) + 1
+            if status == 'error' or (isinstance(status, int) and status >= 400):
+                self.errores[clave] = self.errores.get(clave, 0) + 1
+
+    def registrar_camion(self, flujo, espera, completo):
+        with self._lock:
+            self.esperas_cola.setdefault(flujo, []).append(espera)
+            datos = self.camiones.setdefault(flujo, {'completos': 0, 'incompletos': 0})
+            datos['completos' if completo else 'incompletos'] += 1
+
+    def registrar_sin_terminar(self, flujo, motivo):
+        """Camión que no terminó dentro del drenaje (``timeout``) o cuyo hilo lanzó excepción (``error``)."""
+        with self._lock:
+            datos = self.sin_terminar.setdefault(flujo, {'timeout': 0, 'error': 0})
+            datos[motivo] += 1
+
+    def observar_sql(self, lock_wait_s):
+        from db_connection import is_lock_error
+
+        def observer(segundos, sql, error):
+            if error is not None and is_lock_error(error):
+                with self._lock:
+                    self.lock_errors += 1
+            elif sql and segundos > lock_wait_s and sql.lstrip()[:7].upper().startswith(WRITE_PREFIXES):
+                with self._lock:
+                    self.lock_waits += 1
+        return observer
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    # Rango más cercano
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p / 100.0 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+# ---------------------------------------------------------------------------
+# Flujos
+# ---------------------------------------------------------------------------
+
+def _json(response):
+    try:
+        return response.get_json(silent=True) or {}
+    except Exception:
+        return {}
+
+
+def _pick(data, *claves):
+    for clave in claves:
+        if data.get(clave):
+            return data[clave]
+    return None
+
+
+def flujo_fruta(n, rng, imagen):
+    codigo_proveedor = f"{rng.randint(150000, 150999):07d}A"
+    guia = f"{codigo_proveedor}_{datetime.now():%Y%m%d%H%M%S}{n:05d}"
+    placa = f"{''.join(rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ') for _ in range(3))}{rng.randint(100, 999)}"
+    peso_bruto = rng.randint(8000, 32000)
+    ctx = {'codigo_guia': guia}
+
+    yield 'entrada', 'POST', '/registrar-entrada', {
+        'codigo_guia': guia, 'codigo_proveedor': codigo_proveedor,
+        'nombre_proveedor': f'Proveedor {codigo_proveedor}', 'placa': placa,
+        'conductor': f'Conductor {n}', 'num_cedula': str(rng.randint(10**7, 10**9)),
+        'transportador': 'Transportes Prueba', 'codigo_transportador': '900123',
+        'tipo_fruta': 'RACIMOS', 'cantidad_racimos': str(rng.randint(300, 1500)),
+        'acarreo': rng.choice(['Si', 'No']), 'cargo': rng.choice(['Si', 'No']),
+        'fecha_tiquete': f'{datetime.now():%d/%m/%Y}', 'nota': 'prueba de carga',
+    }, None, ctx
+    yield 'verificar_placa', 'POST', '/pesaje/verificar_placa_pesaje', {
+        'codigo_guia': ctx['codigo_guia'], 'placa': placa,
+    }, imagen, ctx
+    yield 'pesaje_bruto', 'POST', '/pesaje/registrar_peso_directo', {
+        'codigo_guia': ctx['codigo_guia'], 'peso_bruto': str(peso_bruto), 'tipo_pesaje': 'directo',
+    }, None, ctx
+    yield 'clasificacion', 'POST', '/clasificacion/registrar_clasificacion', {
+        'codigo_guia': ctx['codigo_guia'],
+        **{campo: str(rng.randint(0, 30)) for campo in
+           ('verde', 'sobremaduro', 'danio_corona', 'pendunculo_largo', 'podrido')},
+    }, None, ctx
+    yield 'pesaje_neto', 'POST', '/pesaje-neto/registrar_peso_neto_directo', {
+        'codigo_guia': ctx['codigo_guia'], 'peso_tara': str(rng.randint(4000, 7000)),
+    }, None, ctx
+    yield 'salida', 'POST', '/salida/completar_registro_salida', {
+        'codigo_guia': ctx['codigo_guia'], 'comentarios_salida': 'prueba de carga',
+    }, None, ctx
+
+
+def flujo_graneles(n, rng, imagen):
+    placa = f"{''.join(rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ') for _ in range(3))}{rng.randint(100, 999)}"
+    ctx = {}
+
+    yield 'registro', 'POST', '/graneles/guardar_registro_granel', {
+        'producto': rng.choice(['ACEITE CRUDO', 'PALMISTE', 'TORTA']), 'placa': placa,
+        'trailer': f'R{rng.randint(10000, 99999)}', 'cedula_conductor': str(rng.randint(10**7, 10**9)),
+        'nombre_conductor': f'Conductor {n}', 'telefono_conductor': '3000000000',
+        'transportadora': 'Transportes Prueba', 'cliente': 'Cliente Prueba', 'tipo_venta': 'Nacional',
+        'origen': 'Planta', 'destino': 'Cliente', 'kg_cargar': str(rng.randint(20000, 35000)),
+        'fecha_autorizacion': f'{datetime.now():%Y-%m-%d}',
+    }, None, ctx
+    if not ctx.get('id'):
+        return
+    yield 'documento_ocr', 'POST', '/graneles/procesar_documento_ocr', {
+        'document_type': rng.choice(['arl', 'soat', 'tecnomecanica', 'licencia']),
+        'id_registro_granel': str(ctx['id']),
+    }, imagen, ctx
+    yield 'primer_pesaje', 'POST', f"/graneles/registrar-primer-pesaje/{ctx['id']}", {
+        'peso_primer_kg': str(rng.randint(14000, 18000)), 'codigo_sap_granel': str(rng.randint(10**6, 10**7)),
+    }, None, ctx
+    yield 'inspeccion', 'POST', f"/graneles/inspeccion-vehiculo/{ctx['id']}", {
+        'observaciones': 'prueba de carga',
+    }, None, ctx
+    yield 'guia', 'GET', f"/graneles/guia/{ctx['id']}", None, None, ctx
+
+
+FLUJOS = {'fruta': flujo_fruta, 'graneles': flujo_graneles}
+
+
+def ejecutar_camion(app, user_id, flujo, n, llegada, stats, args, imagen_bytes):
+    from io import BytesIO
+
+    inicio = time.perf_counter()
+    espera = inicio - llegada
+    rng = random.Random(hash((args.seed, n)))
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+
+    completo = True
+    for paso, metodo, ruta, data, con_imagen, ctx in FLUJOS[flujo](n, rng, imagen_bytes):
+        if con_imagen:
+            data = dict(data or {}, imagen=(BytesIO(imagen_bytes), 'foto.jpg'), file=(BytesIO(imagen_bytes), 'foto.jpg'))
+        t0 = time.perf_counter()
+        try:
+            response = client.open(ruta, method=metodo, data=data,
+                                   content_type='multipart/form-data' if con_imagen else None)
+            status = response.status_code
+            datos = _json(response)
+            if paso == 'entrada':
+                ctx['codigo_guia'] = _pick(datos, 'codigo_guia', 'guia') or ctx['codigo_guia']
+            elif paso == 'registro':
+                ctx['id'] = _pick(datos, 'id', 'id_registro', 'id_registro_granel', 'registro_id')
+        except Exception:
+            status = 'error'
+        stats.registrar(flujo, paso, time.perf_counter() - t0, status)
+        if status == 'error' or status >= 500:
+            completo = False
+        if args.think_ms:
+            time.sleep(args.think_ms / 1000.0)
+    stats.registrar_camion(flujo, espera, completo)
+
+
+def lector(app, user_id, stats, stop_event):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    while not stop_event.is_set():
+        ruta = random.choice(LECTURAS)
+        t0 = time.perf_counter()
+        try:
+            status = client.get(ruta).status_code
+        except Exception:
+            status = 'error'
+        stats.registrar('lectura', ruta.strip('/').replace('/', '_'), time.perf_counter() - t0, status)
+        stop_event.wait(0.5)
+
+
+def parse_mix(spec):
+    mix = {}
+    for item in spec.split(','):
+        nombre, _, peso = item.partition('=')
+        if nombre.strip() in FLUJOS:
+            mix[nombre.strip()] = float(peso or 1)
+    if not mix:
+        raise SystemExit(f"❌ --mix sin flujos válidos ({', '.join(FLUJOS)})")
+    return mix
+
+
+# ---------------------------------------------------------------------------
+# Reporte
+# ---------------------------------------------------------------------------
+
+def build_report(stats, args, duracion_total, schema_source):
+    pasos = {}
+    total_peticiones = 0
+    for clave, valores in sorted(stats.latencias.items()):
+        total_peticiones += len(valores)
+        pasos[clave] = {
+            'peticiones': len(valores),
+            'errores': stats.errores.get(clave, 0),
+            'estados': {str(k): v for k, v in stats.estados[clave].items()},
+            'p50_ms': round(percentil(valores, 50) * 1000, 1),
+            'p95_ms': round(percentil(valores, 95) * 1000, 1),
+            'p99_ms': round(percentil(valores, 99) * 1000, 1),
+            'max_ms': round(max(valores) * 1000, 1),
+        }
+    camiones_completos = sum(c['completos'] for c in stats.camiones.values())
+    camiones_por_segundo = camiones_completos / duracion_total if duracion_total else 0
+    return {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'parametros': {
+            'duration': args.duration, 'rate_por_minuto': args.rate, 'concurrency': args.concurrency,
+            'mix': args.mix, 'readers': args.readers, 'stub_latency_ms': args.stub_latency_ms,
+            'lock_wait_ms': args.lock_wait_ms, 'schema_from': str(schema_source),
+        },
+        'duracion_s': round(duracion_total, 2),
+        'peticiones_por_segundo': round(total_peticiones / duracion_total, 2) if duracion_total else 0,
+        'camiones': stats.camiones,
+        'camiones_sin_terminar': stats.sin_terminar,
+        'camiones_por_hora': round(camiones_por_segundo * 3600, 1),
+        'camiones_por_dia_planta': round(camiones_por_segundo * 3600 * args.plant_hours),
+        'espera_cola_ms': {
+            flujo: {'p50': round(percentil(v, 50) * 1000, 1), 'p95': round(percentil(v, 95) * 1000, 1)}
+            for flujo, v in stats.esperas_cola.items()
+        },
+        'sqlite': {'lock_waits': stats.lock_waits, 'lock_errors': stats.lock_errors},
+        'pasos': pasos,
+    }
+
+
+def print_report(reporte):
+    print("=" * 88)
+    print(f"{'Paso':<42}{'n':>7}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    print("-" * 88)
+    for clave, paso in reporte['pasos'].items():
+        print(f"{clave:<42}{paso['peticiones']:>7}{paso['errores']:>6}"
+              f"{paso['p50_ms']:>10}{paso['p95_ms']:>10}{paso['p99_ms']:>10}")
+    print("-" * 88)
+    print(f"⏱️  Duración: {reporte['duracion_s']}s  |  {reporte['peticiones_por_segundo']} peticiones/s")
+    for flujo, datos in reporte['camiones'].items():
+        cola = reporte['espera_cola_ms'].get(flujo, {})
+        print(f"🚚 {flujo}: {datos['completos']} completos, {datos['incompletos']} incompletos, "
+              f"espera en cola p50={cola.get('p50')}ms p95={cola.get('p95')}ms")
+    for flujo, datos in reporte['camiones_sin_terminar'].items():
+        print(f"⚠️  {flujo}: {datos['timeout']} sin terminar al vencer el drenaje, {datos['error']} con excepción")
+    print(f"📈 Capacidad observada: {reporte['camiones_por_hora']} camiones/hora "
+          f"≈ {reporte['camiones_por_dia_planta']} por día de planta")
+    print(f"🔒 SQLite: {reporte['sqlite']['lock_waits']} esperas por bloqueo, "
+          f"{reporte['sqlite']['lock_errors']} errores 'database is locked'")
+    print("   (si la espera en cola crece durante la prueba, la tasa de llegada supera la capacidad)")
+    print("=" * 88)
+
+
+def main():
+    args = parse_arguments()
+    if args.seed is not None:
+        random.seed(args.seed)
+    mix = parse_mix(args.mix)
+    imagen_bytes = Path(args.image).read_bytes()
+
+    schema_source = find_schema_source(args.schema_from)
+    temp_dir = tempfile.mkdtemp(prefix='oleoflores_loadtest_')
+    db_path, user_id = create_temp_database(schema_source, temp_dir)
+    print(f"🗄️  Base temporal: {db_path} (esquema de {schema_source})")
+
+    stub = start_stub_server(args.stub_latency_ms)
+    redirect_external_http(stub.server_address[1])
+    print(f"🧪 Stub OCR/webhooks en 127.0.0.1:{stub.server_address[1]} ({args.stub_latency_ms:.0f} ms)")
+
+    app = build_app(db_path, temp_dir)
+
+    import db_connection
+    stats = Stats()
+    db_connection.add_query_observer(stats.observar_sql(args.lock_wait_ms / 1000.0))
+    try:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        @event.listens_for(Engine, 'handle_error')
+        def _contar_bloqueos(context):
+            if db_connection.is_lock_error(getattr(context, 'original_exception', None)):
+                with stats._lock:
+                    stats.lock_errors += 1
+    except ImportError:
+        pass
+
+    stop_event = threading.Event()
+    lectores = [threading.Thread(target=lector, args=(app, user_id, stats, stop_event), daemon=True)
+                for _ in range(args.readers)]
+    for hilo in lectores:
+        hilo.start()
+
+    flujos, pesos = zip(*mix.items())
+    print(f"🚀 Llegadas: {args.rate}/min durante {args.duration}s, concurrencia {args.concurrency}, mix {mix}")
+    inicio = time.perf_counter()
+    futures = []
+    # Sin "with": al salir del bloque se esperaría a todos los camiones aunque venza el drenaje
+    pool = ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix='camion')
+    try:
+        n = 0
+        proxima = inicio
+        while proxima - inicio < args.duration:
+            ahora = time.perf_counter()
+            if proxima > ahora:
+                time.sleep(proxima - ahora)
+            flujo = random.choices(flujos, weights=pesos)[0]
+            futures.append((flujo, pool.submit(ejecutar_camion, app, user_id, flujo, n, proxima,
+                                               stats, args, imagen_bytes)))
+            n += 1
+            proxima += random.expovariate(args.rate / 60.0)
+        limite = time.perf_counter() + args.drain_timeout
+        for flujo, future in futures:
+            try:
+                future.result(timeout=max(0.0, limite - time.perf_counter()))
+            except FuturesTimeoutError:
+                stats.registrar_sin_terminar(flujo, 'timeout')
+            except Exception as e:
+                print(f"❌ Camión de {flujo} falló: {type(e).__name__}: {e}")
+                stats.registrar_sin_terminar(flujo, 'error')
+    finally:
+        # Los camiones aún en cola no arrancan; los que corren terminan su paso actual
+        pool.shutdown(wait=False, cancel_futures=True)
+    duracion_total = time.perf_counter() - inicio
+    stop_event.set()
+    stub.shutdown()
+
+    reporte = build_report(stats, args, duracion_total, schema_source)
+    print_report(reporte)
+
+    output = Path(args.output) if args.output else (
+        PROJECT_ROOT / 'logs' / 'benchmarks' / f"load_test_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(reporte, indent=2, sort_keys=True))
+    print(f"📝 Resultados en: {output}")
+
+    if args.keep_db:
+        print(f"🗄️  Base conservada en {db_path}")
+    else:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Servidor local que reproduce llamadas OCR grabadas (OpenAI visión y webhooks).
+
+Las cintas se graban con ``OCR_RECORD_DIR`` (ver ``ocr_replay``). Para
+apuntar la app o un benchmark a este servidor, exportar
+``OCR_REPLAY_URL=http://127.0.0.1:<puerto>`` antes de arrancarlos.
+
+Modos de latencia:
+    muestreo  espera tomada al azar de las latencias grabadas del endpoint (default)
+    grabada   la latencia de la respuesta reproducida
+    cero      sin espera (solo el costo del pipeline local)
+
+Usage:
+    OCR_RECORD_DIR=instance/ocr_cintas python run.py            # grabar
+    python scripts/ocr_replay_server.py --cintas instance/ocr_cintas
+    python scripts/ocr_replay_server.py --cintas instance/ocr_cintas --latencia cero --puerto 9000
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import ocr_replay  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Servidor de reproducción de llamadas OCR')
+    parser.add_argument('--cintas', default=os.getenv('OCR_RECORD_DIR') or 'instance/ocr_cintas',
+                        help='Directorio con las cintas grabadas (*.jsonl)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--latencia', choices=ocr_replay.MODOS_LATENCIA, default='muestreo')
+    parser.add_argument('--escala', type=float, default=1.0, help='Factor sobre las latencias (0.5 = la mitad)')
+    parser.add_argument('--semilla', type=int, default=None, help='Semilla para elecciones reproducibles')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    if not os.path.isdir(args.cintas):
+        print(f"❌ No existe el directorio de cintas {args.cintas}")
+        return 1
+    cinta = ocr_replay.CintaReplay(args.cintas, modo_latencia=args.latencia, escala=args.escala, semilla=args.semilla)
+    endpoints = cinta.endpoints()
+    if not endpoints:
+        print(f"❌ No hay llamadas grabadas en {args.cintas}")
+        return 1
+
+    print(f"📼 Cintas de {args.cintas}:")
+    for endpoint, total in endpoints.items():
+        print(f"   {total:>6}  {endpoint}")
+    servidor = ocr_replay.crear_servidor(cinta, args.host, args.puerto)
+    print(f"🚀 Reproduciendo en http://{args.host}:{servidor.server_port} (latencia {args.latencia}, "
+          f"escala {args.escala}); exportar OCR_REPLAY_URL=http://{args.host}:{servidor.server_port}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Servidor detenido")
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
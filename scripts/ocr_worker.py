@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Worker dedicado de la cola OCR (``ocr_jobs``).
+
+Atiende los trabajos encolados por la web en un proceso aparte, para que el
+OCR no comparta CPU ni memoria con los workers de gunicorn. En ese caso,
+poner ``OCR_JOBS_THREADS=0`` en la web para que no procese también ahí.
+
+Con ``--resumen`` solo muestra los trabajos por estado y sale.
+
+Usage:
+    python scripts/ocr_worker.py
+    python scripts/ocr_worker.py --hilos 4 --prod
+    python scripts/ocr_worker.py --resumen
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import ocr_jobs  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Worker de la cola OCR')
+    parser.add_argument('--hilos', type=int, default=2,
+                        help='Hilos de proceso (default 2)')
+    parser.add_argument('--prod', action='store_true', help='Usar ProductionConfig')
+    parser.add_argument('--resumen', action='store_true', help='Mostrar trabajos por estado y salir')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    cola = ocr_jobs.get_cola()
+
+    if args.resumen:
+        print(f"📋 Cola OCR ({cola.path}):")
+        for estado, total in sorted(cola.resumen().items()):
+            print(f"   {estado:<12}{total:>6}")
+        return 0
+    if args.hilos <= 0:
+        print("❌ --hilos debe ser mayor que 0")
+        return 1
+
+    # App context para los servicios que leen current_app (TIQUETES_DB_PATH, etc.)
+    from app import create_app
+    from config.config import DevelopmentConfig, ProductionConfig
+    app = create_app(ProductionConfig if args.prod else DevelopmentConfig)
+
+    detener = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: detener.set())
+    signal.signal(signal.SIGINT, lambda *_: detener.set())
+
+    pool = ocr_jobs.PoolOCR(cola, hilos=args.hilos, app=app)
+    pool.iniciar()
+    print(f"🚀 Worker OCR atendiendo {cola.path} con {args.hilos} hilos (Ctrl+C para detener)")
+    detener.wait()
+    print("🛑 Deteniendo: los trabajos en curso terminan; los no terminados se recuperan por lease")
+    pool.detener(timeout=ocr_jobs.get_cola().lease_seconds)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
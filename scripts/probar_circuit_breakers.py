@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""
+Prueba los circuit breakers OCR contra servidores falsos locales.
+
+Levanta en 127.0.0.1 un servidor HTTP que imita el webhook de make.com, el de
+n8n y ``/v1/chat/completions`` de OpenAI, y cuyo comportamiento se cambia
+entre ``ok``, ``error`` (HTTP 503) y ``lento``. Apunta los servicios OCR a
+él y recorre, por backend:
+
+1. Llamadas sanas: el circuito sigue cerrado.
+2. Fallos seguidos: el circuito se abre y las llamadas se rechazan sin red.
+3. Vencida la apertura, la llamada de prueba falla: se reabre por más tiempo.
+4. El backend se recupera: la llamada de prueba cierra el circuito.
+
+No hace llamadas externas ni necesita OPENAI_API_KEY real.
+
+Usage:
+    python scripts/probar_circuit_breakers.py
+    python scripts/probar_circuit_breakers.py --backends webhook_n8n --apertura 1
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+BACKENDS = ('webhook_make', 'webhook_n8n', 'openai')
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Prueba de circuit breakers OCR con servidores falsos')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help='Backends a probar (separados por coma)')
+    parser.add_argument('--apertura', type=float, default=1.0, help='OCR_BREAKER_OPEN_SECONDS para la prueba')
+    parser.add_argument('--lento', type=float, default=1.0, help='OCR_BREAKER_SLOW_SECONDS para la prueba')
+    return parser.parse_args()
+
+
+class FakeBackend(BaseHTTPRequestHandler):
+    """Responde según ``modo`` del servidor: ok, error o lento."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.llamadas += 1
+        modo = self.server.modo
+        if modo == 'lento':
+            time.sleep(self.server.demora)
+        if modo == 'error':
+            self._responder(503, 'text/plain', b'Service Unavailable')
+        elif self.path.endswith('/chat/completions'):
+            cuerpo = {
+                'id': 'chatcmpl-fake', 'object': 'chat.completion', 'created': int(time.time()), 'model': 'gpt-4o',
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': 'ABC123'}}],
+                'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2},
+            }
+            self._responder(200, 'application/json', json.dumps(cuerpo).encode())
+        elif self.path.startswith('/make'):
+            self._responder(200, 'application/json', json.dumps({'fecha_vencimiento': '2026-12-31'}).encode())
+        else:
+            self._responder(200, 'text/plain', b'ABC123')
+
+    def _responder(self, status, tipo, cuerpo):
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+
+def main():
+    args = parse_arguments()
+    # Configuración de prueba antes de importar los servicios
+    os.environ.update({
+        'OCR_BREAKERS_ENABLED': 'true',
+        'OCR_BREAKER_MIN_CALLS': '4',
+        'OCR_BREAKER_ERROR_RATE': '0.5',
+        'OCR_BREAKER_OPEN_SECONDS': str(args.apertura),
+        'OCR_BREAKER_SLOW_SECONDS': str(args.lento),
+        'OCR_CACHE_ENABLED': 'false',
+        'OPENAI_API_KEY': 'sk-fake',
+    })
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), FakeBackend)
+    servidor.modo, servidor.llamadas, servidor.demora = 'ok', 0, args.lento * 1.5
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{servidor.server_port}'
+    print(f"🧪 Servidor falso en {base}")
+
+    from PIL import Image
+
+    import openai
+    from ocr_breakers import get_breaker
+    from ocr_service_backup import OCRDocumentService, OCRPlacaService
+
+    imagen = os.path.join(tempfile.mkdtemp(prefix='oleoflores_breakers_'), 'placa.jpg')
+    Image.new('RGB', (320, 120), (230, 230, 230)).save(imagen, 'JPEG')
+
+    documentos = OCRDocumentService()
+    documentos.webhook_urls = {tipo: f'{base}/make' for tipo in documentos.webhook_urls}
+    placas = OCRPlacaService()
+    placas.webhook_url = f'{base}/n8n'
+    placas.openai_client = openai.OpenAI(api_key='sk-fake', base_url=f'{base}/v1', max_retries=0)
+
+    llamar = {
+        'webhook_make': lambda: documentos._process_with_webhook(imagen, 'soat', 'prueba'),
+        'webhook_n8n': lambda: placas._process_with_webhook(imagen),
+        'openai': lambda: placas._process_with_openai_vision(imagen),
+    }
+
+    fallidas = 0
+    for backend in [b.strip() for b in args.backends.split(',') if b.strip()]:
+        breaker = get_breaker(backend)
+        breaker.reset()
+        print(f"\n🔌 {backend}")
+
+        def fase(descripcion, modo, veces, esperado):
+            nonlocal fallidas
+            servidor.modo = modo
+            antes = servidor.llamadas
+            inicio = time.perf_counter()
+            for _ in range(veces):
+                llamar[backend]()
+            ms = (time.perf_counter() - inicio) * 1000 / veces
+            estado = breaker.estado
+            ok = estado == esperado
+            fallidas += not ok
+            print(f"  {'✅' if ok else '❌'} {descripcion:<42} estado={estado:<12} "
+                  f"llamadas HTTP={servidor.llamadas - antes}/{veces}  {ms:7.1f} ms/llamada  salud={breaker.salud()}")
+
+        fase('sano', 'ok', 3, 'cerrado')
+        fase('fallos seguidos', 'error', 4, 'abierto')
+        fase('rechazo sin red mientras está abierto', 'error', 5, 'abierto')
+        time.sleep(args.apertura + 0.1)
+        fase('prueba en semiapertura falla (reabre x2)', 'error', 1, 'abierto')
+        time.sleep(args.apertura * 2 + 0.1)
+        fase('prueba en semiapertura funciona (cierra)', 'ok', 1, 'cerrado')
+        fase('llamadas lentas cuentan como fallo', 'lento', 4, 'abierto')
+        print(f"  📋 {json.dumps(breaker.snapshot(), ensure_ascii=False)}")
+
+    servidor.shutdown()
+    print("\n✅ Circuit breakers OK" if not fallidas else f"\n❌ {fallidas} fases con estado inesperado")
+    return 1 if fallidas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""
+Oleoflores Smart Flow - Perfilador de arranque
+
+Mide el costo de arrancar la aplicación: tiempo de importación por módulo,
+tiempo de registro por blueprint, tiempo de inicialización de extensiones y
+memoria residente después de ``create_app``. El resultado se escribe como un
+reporte JSON estable (claves ordenadas) para poder compararlo entre versiones.
+
+Este módulo vive en la raíz del proyecto (igual que ``db_operations.py``) a
+propósito: importarlo no debe disparar la importación del paquete ``app``,
+porque el gancho de importación tiene que instalarse antes que Flask.
+
+Usage:
+    python run.py --profile-startup                       # Genera el reporte y termina
+    PROFILE_STARTUP=true (wsgi.py)                        # Reporte por worker al arrancar
+    python startup_profiler.py comparar viejo.json nuevo.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPORT_VERSION = 1
+DEFAULT_REPORT_DIR = Path(__file__).parent / 'logs' / 'startup'
+
+
+def is_enabled_from_env():
+    """Indica si la variable de entorno PROFILE_STARTUP activa el perfilado."""
+    return os.environ.get('PROFILE_STARTUP', 'false').lower() == 'true'
+
+
+def read_memory_mb():
+    """
+    Memoria residente actual y pico del proceso en MB.
+
+    Usa /proc en Linux y cae a ``resource.getrusage`` en otras plataformas
+    (donde solo está disponible el pico).
+    """
+    rss = peak = None
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) / 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    if peak is None:
+        try:
+            import resource
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # macOS reporta bytes, Linux reporta KB
+            peak = maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+        except (ImportError, OSError):
+            pass
+
+    return rss, peak
+
+
+class _TimingLoader:
+    """Envuelve el loader real de un módulo para medir su ejecución."""
+
+    def __init__(self, loader, profiler, fullname):
+        self._loader = loader
+        self._profiler = profiler
+        self._fullname = fullname
+
+    def create_module(self, spec):
+        # Los módulos de extensión (.so) hacen casi todo el trabajo aquí
+        create = getattr(self._loader, 'create_module', None)
+        if create is None:
+            return None
+        with self._profiler._timed_import(self._fullname):
+            return create(spec)
+
+    def exec_module(self, module):
+        with self._profiler._timed_import(self._fullname):
+            self._loader.exec_module(module)
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+
+class _TimingFinder:
+    """Meta path finder que delega en los demás finders y envuelve el loader."""
+
+    def __init__(self, profiler):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+            find_spec = getattr(finder, 'find_spec', None)
+            if find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimingLoader(spec.loader, self._profiler, fullname)
+        return spec
+
+
+class StartupProfiler:
+    """
+    Acumula las mediciones de un arranque.
+
+    Mientras no esté activo, ``fase`` e ``instrument_app`` no hacen nada, por
+    lo que ``create_app`` puede llamarlos siempre sin costo apreciable.
+    """
+
+    def __init__(self):
+        self.active = False
+        self._finder = None
+        self._started_at = None
+        self._import_stack = []
+        self.entrypoint = None
+        self.modules = {}
+        self.phases = {}
+        self.extensions = {}
+        self.blueprints = {}
+        self.memory = {}
+
+    def start(self, entrypoint=None):
+        """Instala el gancho de importación y arranca el reloj."""
+        if self.active:
+            return
+        self.active = True
+        self.entrypoint = entrypoint
+        self._started_at = time.perf_counter()
+        self._finder = _TimingFinder(self)
+        sys.meta_path.insert(0, self._finder)
+
+    def stop(self):
+        """Retira el gancho de importación y toma la medición de memoria."""
+        if not self.active:
+            return
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        self._finder = None
+        self.phases['total'] = time.perf_counter() - self._started_at
+        rss, peak = read_memory_mb()
+        self.memory = {'rss_mb': rss, 'peak_rss_mb': peak}
+        self.active = False
+
+    @contextmanager
+    def _timed_import(self, fullname):
+        frame = [fullname, time.perf_counter(), 0.0]
+        self._import_stack.append(frame)
+        try:
+            yield
+        finally:
+            self._import_stack.pop()
+            inclusive = time.perf_counter() - frame[1]
+            entry = self.modules.setdefault(fullname, {'inclusive_s': 0.0, 'self_s': 0.0})
+            entry['inclusive_s'] += inclusive
+            entry['self_s'] += inclusive - frame[2]
+            if self._import_stack:
+                self._import_stack[-1][2] += inclusive
+
+    @contextmanager
+    def fase(self, nombre, grupo='fases'):
+        """Mide un bloque de arranque (``grupo`` puede ser 'fases' o 'extensiones')."""
+        if not self.active:
+            yield
+            return
+        destino = self.extensions if grupo == 'extensiones' else self.phases
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            destino[nombre] = destino.get(nombre, 0.0) + time.perf_counter() - inicio
+
+    def instrument_app(self, app):
+        """Envuelve ``app.register_blueprint`` para medir cada blueprint."""
+        if not self.active:
+            return
+        original = app.register_blueprint
+
+        def register_blueprint(blueprint, **options):
+            inicio = time.perf_counter()
+            try:
+                return original(blueprint, **options)
+            finally:
+                # Paquete raíz del blueprint, p. ej. app.blueprints.entrada
+                paquete = '.'.join(blueprint.import_name.split('.')[:3])
+                self.blueprints[blueprint.name] = {
+                    'modulo': paquete,
+                    'register_s': time.perf_counter() - inicio,
+                }
+
+        app.register_blueprint = register_blueprint
+
+    def build_report(self, config_name=None):
+        """Construye el reporte como diccionario serializable."""
+        blueprints = {}
+        for nombre, datos in self.blueprints.items():
+            import_s = self.modules.get(datos['modulo'], {}).get('inclusive_s', 0.0)
+            blueprints[nombre] = {
+                'modulo': datos['modulo'],
+                'import_s': round(import_s, 6),
+                'register_s': round(datos['register_s'], 6),
+            }
+
+        return {
+            'version': REPORT_VERSION,
+            'generado_utc': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+            'entrypoint': self.entrypoint,
+            'config': config_name,
+            'pid': os.getpid(),
+            'python': platform.python_version(),
+            'memoria': {k: round(v, 2) if v is not None else None for k, v in self.memory.items()},
+            'fases': {k: round(v, 6) for k, v in self.phases.items()},
+            'extensiones': {k: round(v, 6) for k, v in self.extensions.items()},
+            'blueprints': blueprints,
+            'modulos': {
+                nombre: {k: round(v, 6) for k, v in datos.items()}
+                for nombre, datos in self.modules.items()
+            },
+        }
+
+    def write_report(self, path=None, config_name=None):
+        """Escribe el reporte JSON y devuelve la ruta usada."""
+        if path is None:
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            path = DEFAULT_REPORT_DIR / f'startup_{stamp}_{os.getpid()}.json'
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(self.build_report(config_name), fh, indent=2, sort_keys=True, ensure_ascii=False)
+        return path
+
+
+def print_summary(report, top=15):
+    """Imprime un resumen legible del reporte."""
+    print("=" * 60)
+    print("⏱️  Perfil de arranque")
+    print("=" * 60)
+    memoria = report.get('memoria', {})
+    print(f"   Total: {report['fases'].get('total', 0):.3f}s | RSS: {memoria.get('rss_mb')} MB "
+          f"(pico {memoria.get('peak_rss_mb')} MB)")
+    for nombre, segundos in sorted(report['fases'].items(), key=lambda x: -x[1]):
+        print(f"   fase {nombre:<28} {segundos:8.3f}s")
+    for nombre, segundos in sorted(report['extensiones'].items(), key=lambda x: -x[1]):
+        print(f"   extensión {nombre:<23} {segundos:8.3f}s")
+    for nombre, datos in sorted(report['blueprints'].items(), key=lambda x: -(x[1]['import_s'] + x[1]['register_s'])):
+        print(f"   blueprint {nombre:<23} import {datos['import_s']:7.3f}s  registro {datos['register_s']:7.3f}s")
+    print(f"   Top {top} módulos por tiempo propio:")
+    modulos = sorted(report['modulos'].items(), key=lambda x: -x[1]['self_s'])[:top]
+    for nombre, datos in modulos:
+        print(f"     {nombre:<45} {datos['self_s']:7.3f}s (incl. {datos['inclusive_s']:.3f}s)")
+    print("=" * 60)
+
+
+def compare_reports(viejo, nuevo, top=20):
+    """
+    Compara dos reportes y devuelve las diferencias ordenadas por impacto.
+
+    Returns:
+        dict: {'fases': [...], 'extensiones': [...], 'blueprints': [...], 'modulos': [...], 'memoria': {...}}
+              donde cada lista contiene tuplas (nombre, antes, despues, delta).
+    """
+    def _delta(antes_dict, despues_dict, valor=lambda v: v):
+        nombres = set(antes_dict) | set(despues_dict)
+        filas = []
+        for nombre in nombres:
+            antes = valor(antes_dict[nombre]) if nombre in antes_dict else 0.0
+            despues = valor(despues_dict[nombre]) if nombre in despues_dict else 0.0
+            filas.append((nombre, antes, despues, despues - antes))
+        return sorted(filas, key=lambda fila: -abs(fila[3]))
+
+    memoria = {}
+    for clave in ('rss_mb', 'peak_rss_mb'):
+        antes = viejo.get('memoria', {}).get(clave)
+        despues = nuevo.get('memoria', {}).get(clave)
+        memoria[clave] = (antes, despues, (despues - antes) if antes is not None and despues is not None else None)
+
+    return {
+        'fases': _delta(viejo['fases'], nuevo['fases']),
+        'extensiones': _delta(viejo['extensiones'], nuevo['extensiones']),
+        'blueprints': _delta(viejo['blueprints'], nuevo['blueprints'],
+                             lambda d: d['import_s'] + d['register_s']),
+        'modulos': _delta(viejo['modulos'], nuevo['modulos'], lambda d: d['self_s'])[:top],
+        'memoria': memoria,
+    }
+
+
+def _main(argv=None):
+    parser = argparse.ArgumentParser(description='Herramientas para reportes de arranque')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    comparar = subparsers.add_parser('comparar', help='Comparar dos reportes JSON')
+    comparar.add_argument('viejo')
+    comparar.add_argument('nuevo')
+    comparar.add_argument('--top', type=int, default=20)
+    mostrar = subparsers.add_parser('mostrar', help='Mostrar el resumen de un reporte')
+    mostrar.add_argument('reporte')
+    args = parser.parse_args(argv)
+
+    if args.comando == 'mostrar':
+        with open(args.reporte, encoding='utf-8') as fh:
+            print_summary(json.load(fh))
+        return 0
+
+    with open(args.viejo, encoding='utf-8') as fh:
+        viejo = json.load(fh)
+    with open(args.nuevo, encoding='utf-8') as fh:
+        nuevo = json.load(fh)
+    diferencias = compare_reports(viejo, nuevo, top=args.top)
+
+    for seccion in ('fases', 'extensiones', 'blueprints', 'modulos'):
+        print(f"--- {seccion} (segundos: antes → después, delta)")
+        for nombre, antes, despues, delta in diferencias[seccion]:
+            print(f"   {nombre:<45} {antes:8.3f} → {despues:8.3f}  {delta:+8.3f}")
+    print("--- memoria (MB)")
+    for clave, (antes, despues, delta) in diferencias['memoria'].items():
+        print(f"   {clave:<45} {antes} → {despues}  {delta:+.2f}" if delta is not None
+              else f"   {clave:<45} {antes} → {despues}")
+    return 0
+
+
+startup_profiler = StartupProfiler()
+
+
+if __name__ == '__main__':
+    sys.exit(_main())
@@ -0,0 +1,189 @@
+"""
+Pruebas de ``db_archive.archivar_guias`` y ``scripts/archivar_guias.py`` sobre
+una base caliente en ``tmp_path``.
+
+La base de prueba solo tiene tres tablas del flujo (``entry_records``,
+``pesajes_bruto`` y ``salidas``) con las columnas que usa el archivado; las
+demás de ``TABLAS_ARCHIVO`` no existen y se omiten, como en una base vieja.
+"""
+
+import importlib.util
+import os
+import sqlite3
+import sys
+
+import pytest
+
+import db_archive
+from db_archive import archivar_guias, archive_path, tabla_historica
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORTE = '2024-01-01 00:00:00'
+
+# codigo_guia -> (registro UTC, salida UTC o None si sigue abierta)
+GUIAS = {
+    '0150076A_20230314080000': ('2023-03-14 13:00:00', '2023-03-14 18:00:00'),
+    '0150076A_20230920070000': ('2023-09-20 12:00:00', '2023-09-20 15:30:00'),
+    '0150077B_20230611090000': ('2023-06-11 14:00:00', None),
+    '0150076A_20240105080000': ('2024-01-05 13:00:00', '2024-01-05 16:00:00'),
+}
+CERRADAS_2023 = ['0150076A_20230314080000', '0150076A_20230920070000']
+
+
+def _crear_base(ruta, guias=GUIAS):
+    conn = sqlite3.connect(ruta)
+    conn.executescript("""
+        CREATE TABLE entry_records (id INTEGER PRIMARY KEY, codigo_guia TEXT UNIQUE, timestamp_registro_utc TEXT);
+        CREATE TABLE pesajes_bruto (id INTEGER PRIMARY KEY, codigo_guia TEXT UNIQUE, peso_bruto REAL);
+        CREATE TABLE salidas (id INTEGER PRIMARY KEY, codigo_guia TEXT UNIQUE, timestamp_salida_utc TEXT);
+    """)
+    _agregar_guias(conn, guias)
+    conn.close()
+
+
+def _agregar_guias(conn, guias):
+    for codigo, (registro, salida) in guias.items():
+        conn.execute('INSERT INTO entry_records (codigo_guia, timestamp_registro_utc) VALUES (?, ?)', (codigo, registro))
+        conn.execute('INSERT INTO pesajes_bruto (codigo_guia, peso_bruto) VALUES (?, ?)', (codigo, 12000))
+        if salida:
+            conn.execute('INSERT INTO salidas (codigo_guia, timestamp_salida_utc) VALUES (?, ?)', (codigo, salida))
+    conn.commit()
+
+
+def _codigos(ruta, tabla):
+    conn = sqlite3.connect(ruta)
+    try:
+        return sorted(fila[0] for fila in conn.execute(f'SELECT codigo_guia FROM {tabla}'))
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def base(tmp_path):
+    ruta = str(tmp_path / 'tiquetes.db')
+    _crear_base(ruta)
+    return ruta
+
+
+def test_mueve_las_cerradas_y_siguen_legibles(base):
+    resumen = archivar_guias(base, CORTE)
+    archivo = archive_path(base, 2023)
+    assert resumen == {2023: {'guias': 2, 'ruta': archivo, 'entry_records': 2, 'pesajes_bruto': 2, 'salidas': 2}}
+    # La abierta de 2023 y la cerrada después del corte quedan en la base caliente
+    assert _codigos(base, 'entry_records') == ['0150076A_20240105080000', '0150077B_20230611090000']
+    assert _codigos(archivo, 'pesajes_bruto') == CERRADAS_2023
+
+    conn = sqlite3.connect(base)
+    try:
+        # Sin guías ni rango: solo la base caliente
+        assert tabla_historica(conn, 'entry_records') == 'entry_records'
+        vista = tabla_historica(conn, 'entry_records', codigos_guia=[CERRADAS_2023[0]])
+        assert vista == 'historico_entry_records'
+        fila = conn.execute(f'SELECT timestamp_registro_utc FROM {vista} WHERE codigo_guia = ?',
+                            (CERRADAS_2023[0],)).fetchone()
+        assert fila == ('2023-03-14 13:00:00',)
+        vista = tabla_historica(conn, 'salidas', desde_utc='2023-06-01 00:00:00')
+        assert sorted(f[0] for f in conn.execute(f'SELECT codigo_guia FROM {vista}')) == [
+            '0150076A_20230314080000', '0150076A_20230920070000', '0150076A_20240105080000']
+    finally:
+        conn.close()
+
+
+def test_reejecutar_no_hace_nada(base):
+    archivar_guias(base, CORTE, lote=1)
+    archivo = archive_path(base, 2023)
+    antes = os.path.getsize(archivo), _codigos(archivo, 'entry_records')
+
+    assert archivar_guias(base, CORTE) == {}
+    assert (os.path.getsize(archivo), _codigos(archivo, 'entry_records')) == antes
+    assert len(_codigos(base, 'entry_records')) == 2
+
+
+def test_conserva_lo_ya_archivado(base):
+    archivar_guias(base, CORTE)
+    archivo = archive_path(base, 2023)
+
+    # Otra guía de 2023 que se cierra después (p. ej. restaurada desde un respaldo)
+    conn = sqlite3.connect(base)
+    conn.execute("INSERT INTO salidas (codigo_guia, timestamp_salida_utc) "
+                 "VALUES ('0150077B_20230611090000', '2023-06-12 10:00:00')")
+    conn.commit()
+    conn.close()
+
+    assert archivar_guias(base, CORTE)[2023]['guias'] == 1
+    assert _codigos(archivo, 'entry_records') == sorted(CERRADAS_2023 + ['0150077B_20230611090000'])
+    conn = sqlite3.connect(archivo)
+    try:
+        maximo = conn.execute("SELECT valor FROM archivo_info WHERE clave = 'max_registro_utc'").fetchone()
+    finally:
+        conn.close()
+    # Un lote con registros más viejos no baja la fecha máxima del archivo
+    assert maximo == ('2023-09-20 12:00:00',)
+
+
+def test_id_reutilizado_no_pisa_la_fila_archivada(tmp_path):
+    base = str(tmp_path / 'tiquetes.db')
+    _crear_base(base, {codigo: GUIAS[codigo] for codigo in CERRADAS_2023})
+    archivar_guias(base, CORTE)
+
+    # Con la base caliente vacía, SQLite vuelve a entregar los id 1 y 2
+    nuevas = {'0150078C_20231102080000': ('2023-11-02 13:00:00', '2023-11-02 17:00:00'),
+              '0150078C_20231103080000': ('2023-11-03 13:00:00', '2023-11-03 17:00:00')}
+    conn = sqlite3.connect(base)
+    _agregar_guias(conn, nuevas)
+    assert [f[0] for f in conn.execute('SELECT id FROM salidas ORDER BY id')] == [1, 2]
+    conn.close()
+
+    assert archivar_guias(base, CORTE)[2023]['salidas'] == 2
+    archivo = archive_path(base, 2023)
+    conn = sqlite3.connect(archivo)
+    try:
+        filas = dict(conn.execute('SELECT codigo_guia, id FROM salidas'))
+    finally:
+        conn.close()
+    assert sorted(filas) == sorted(CERRADAS_2023 + list(nuevas))
+    assert [filas[codigo] for codigo in CERRADAS_2023] == [1, 2]
+
+
+def test_lote_con_conteos_distintos_se_revierte(base):
+    archivo = archive_path(base, 2023)
+    os.makedirs(os.path.dirname(archivo))
+    conn = sqlite3.connect(base)
+    db_archive._crear_archivo(conn, archivo)
+    conn.close()
+    # El archivo descarta en silencio la salida de la segunda guía
+    conn = sqlite3.connect(archivo)
+    conn.execute(f"""CREATE TRIGGER descarta BEFORE INSERT ON salidas
+                     WHEN NEW.codigo_guia = '{CERRADAS_2023[1]}' BEGIN SELECT RAISE(IGNORE); END""")
+    conn.commit()
+    conn.close()
+
+    with pytest.raises(sqlite3.IntegrityError, match='salidas: 0 filas copiadas'):
+        archivar_guias(base, CORTE, lote=1)
+    # El primer lote quedó archivado; del segundo no se borró ni se copió nada
+    assert _codigos(archivo, 'entry_records') == CERRADAS_2023[:1]
+    assert CERRADAS_2023[1] in _codigos(base, 'entry_records')
+    assert CERRADAS_2023[1] in _codigos(base, 'salidas')
+
+
+def test_script_archiva_con_corte_y_directorio(base, tmp_path, monkeypatch, capsys):
+    spec = importlib.util.spec_from_file_location(
+        'archivar_guias_script', os.path.join(PROJECT_ROOT, 'scripts', 'archivar_guias.py'))
+    script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(script)
+    directorio = str(tmp_path / 'historico')
+
+    monkeypatch.setattr(sys, 'argv', ['archivar_guias.py', '--db', base, '--dir', directorio,
+                                      '--antes-de', '2024-01-01', '--dry-run'])
+    assert script.main() == 0
+    assert '2023: 2 guías' in capsys.readouterr().out
+    assert len(_codigos(base, 'entry_records')) == 4
+
+    monkeypatch.setattr(sys, 'argv', ['archivar_guias.py', '--db', base, '--dir', directorio,
+                                      '--antes-de', '2024-01-01', '--vacuum'])
+    assert script.main() == 0
+    assert '2023: 2 guías' in capsys.readouterr().out
+    assert _codigos(archive_path(base, 2023, directorio), 'salidas') == CERRADAS_2023
+
+    assert script.main() == 0
+    assert 'No hay guías para archivar' in capsys.readouterr().out
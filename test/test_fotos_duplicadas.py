@@ -0,0 +1,144 @@
+"""
+Pruebas de ``fotos_duplicadas.IndiceHuellas`` sobre una base en ``tmp_path``.
+
+Para fijar distancias exactas, la mayoría de las pruebas reemplaza ``dhash``
+por un diccionario ruta -> hash; el SHA-256 sale del contenido real de cada
+archivo. ``test_dhash_real_tolera_recompresion`` usa el dHash verdadero.
+"""
+
+import pytest
+from PIL import Image, ImageDraw
+
+import fotos_duplicadas
+from fotos_duplicadas import IndiceHuellas, distancia
+
+BASE = 0x0123456789ABCDEF
+
+
+def _cambiar_bits(valor, bandas):
+    """``valor`` con un bit cambiado en cada banda de ``bandas`` (distancia = len(bandas))."""
+    for banda in bandas:
+        valor ^= 1 << (8 * banda + 3)
+    return valor
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    tabla = {}
+    monkeypatch.setattr(fotos_duplicadas, 'dhash', lambda archivo: tabla[str(archivo)])
+    return tabla
+
+
+@pytest.fixture
+def indice(tmp_path):
+    return IndiceHuellas(str(tmp_path / 'huellas.db'), umbral=6, reuso=('clasificacion',), umbral_reuso=2)
+
+
+@pytest.fixture
+def foto(tmp_path, hashes):
+    def crear(nombre, contenido, valor):
+        ruta = tmp_path / nombre
+        ruta.write_bytes(contenido)
+        hashes[str(ruta)] = valor
+        return str(ruta)
+    return crear
+
+
+def test_copia_exacta_por_sha256(indice, foto):
+    assert indice.registrar(foto('a.jpg', b'foto-1', BASE), 'clasificacion', 'G-1') is None
+    # Mismo contenido: gana el SHA-256 aunque el dHash difiera
+    coincidencia = indice.registrar(foto('b.jpg', b'foto-1', _cambiar_bits(BASE, [0])), 'clasificacion', 'G-2')
+    assert coincidencia.exacta and coincidencia.referencia == 'G-1'
+    assert coincidencia.ruta.endswith('a.jpg')
+
+
+def test_casi_igual_por_bandas_hasta_el_umbral(indice, foto):
+    indice.registrar(foto('a.jpg', b'foto-1', BASE), 'clasificacion', 'G-1')
+    # Seis bits en seis bandas distintas: solo dos bandas quedan iguales
+    cercana = _cambiar_bits(BASE, [0, 1, 2, 3, 4, 5])
+    assert distancia(BASE, cercana) == 6
+    coincidencia = indice.registrar(foto('b.jpg', b'foto-2', cercana), 'clasificacion', 'G-2')
+    assert coincidencia is not None and not coincidencia.exacta
+    assert coincidencia.distancia == 6
+
+
+def test_sin_coincidencia_sobre_el_umbral(indice, foto):
+    indice.registrar(foto('a.jpg', b'foto-1', BASE), 'clasificacion', 'G-1')
+    # Distancia 7 comparte una banda (la fila se mide) pero supera el umbral
+    assert indice.registrar(foto('b.jpg', b'foto-2', _cambiar_bits(BASE, range(7))), 'clasificacion') is None
+    # Sin bandas en común no se mide
+    assert indice.registrar(foto('c.jpg', b'foto-3', BASE ^ ((1 << 64) - 1)), 'clasificacion') is None
+
+
+def test_ambitos_separados(indice, foto):
+    indice.registrar(foto('a.jpg', b'foto-1', BASE), 'clasificacion', 'G-1')
+    assert indice.registrar(foto('b.jpg', b'foto-1', BASE), 'placa', 'ABC123') is None
+
+
+def test_reuso_solo_en_ambitos_configurados_y_misma_version(indice, foto):
+    analisis = {'verde': 10, 'maduro': 90}
+    for ambito in ('clasificacion', 'placa'):
+        original = foto(f'{ambito}-a.jpg', f'{ambito}-1'.encode(), BASE)
+        indice.registrar(original, ambito, 'G-1')
+        indice.guardar_analisis(original, ambito, 'v1', analisis)
+
+    cercana = indice.registrar(foto('clasificacion-b.jpg', b'c-2', _cambiar_bits(BASE, [0, 1])), 'clasificacion')
+    reutilizado = indice.analisis_reutilizable('clasificacion', cercana, 'v1')
+    assert reutilizado == analisis and reutilizado is not cercana.analisis
+    assert indice.analisis_reutilizable('clasificacion', cercana, 'v2') is None
+
+    # Dentro del umbral de "casi igual" pero no del de reuso
+    lejana = indice.registrar(foto('clasificacion-c.jpg', b'c-3', _cambiar_bits(BASE, [3, 4, 5])), 'clasificacion')
+    assert lejana.distancia == 3 and lejana.analisis == analisis
+    assert indice.analisis_reutilizable('clasificacion', lejana, 'v1') is None
+
+    # placa no está en ``reuso``: se marca pero no se reutiliza
+    placa = indice.registrar(foto('placa-b.jpg', b'placa-1', BASE), 'placa')
+    assert placa.exacta and indice.analisis_reutilizable('placa', placa, 'v1') is None
+
+    assert indice.resumen()['ambitos']['clasificacion']['reusos_analisis'] == 1
+
+
+def test_reemplazar_contenido_borra_el_analisis(indice, foto, tmp_path, hashes):
+    ruta = foto('a.jpg', b'foto-1', BASE)
+    indice.registrar(ruta, 'clasificacion', 'G-1')
+    indice.guardar_analisis(ruta, 'clasificacion', 'v1', {'verde': 10})
+
+    # Registrar otra vez el mismo contenido conserva el análisis
+    indice.registrar(ruta, 'clasificacion', 'G-1')
+    assert indice.registrar(foto('b.jpg', b'foto-2', BASE), 'clasificacion').analisis == {'verde': 10}
+
+    # Misma ruta con otro contenido: el análisis ya no aplica
+    nuevo = _cambiar_bits(BASE, [7])
+    (tmp_path / 'a.jpg').write_bytes(b'foto-1-editada')
+    hashes[ruta] = nuevo
+    indice.registrar(ruta, 'clasificacion', 'G-1')
+    coincidencia = indice.registrar(foto('c.jpg', b'foto-1-editada', nuevo), 'clasificacion')
+    assert coincidencia.exacta and coincidencia.ruta == ruta
+    assert coincidencia.analisis is None
+
+
+def test_deshabilitado_o_archivo_faltante(tmp_path, foto):
+    apagado = IndiceHuellas(str(tmp_path / 'apagado.db'), enabled=False)
+    assert apagado.registrar(foto('a.jpg', b'x', BASE), 'clasificacion') is None
+    indice = IndiceHuellas(str(tmp_path / 'huellas.db'))
+    assert indice.registrar(str(tmp_path / 'no-existe.jpg'), 'clasificacion') is None
+
+
+def test_dhash_real_tolera_recompresion(tmp_path):
+    imagen = Image.new('RGB', (640, 480), (30, 90, 40))
+    dibujo = ImageDraw.Draw(imagen)
+    for i in range(8):
+        dibujo.ellipse((40 + 70 * i, 100 + 20 * (i % 3), 100 + 70 * i, 160 + 20 * (i % 3)),
+                       fill=(200 - 20 * i, 40 + 25 * i, 20))
+    dibujo.rectangle((0, 380, 640, 480), fill=(120, 110, 100))
+    original, reenviada, otra = tmp_path / 'original.png', tmp_path / 'reenviada.jpg', tmp_path / 'otra.png'
+    imagen.save(original)
+    imagen.resize((320, 240)).save(reenviada, quality=40)
+    imagen.transpose(Image.Transpose.FLIP_LEFT_RIGHT).save(otra)
+
+    indice = IndiceHuellas(str(tmp_path / 'huellas.db'))
+    indice.registrar(str(original), 'clasificacion', 'G-1')
+    coincidencia = indice.registrar(str(reenviada), 'clasificacion', 'G-2')
+    assert coincidencia is not None and not coincidencia.exacta and coincidencia.referencia == 'G-1'
+    assert distancia(fotos_duplicadas.dhash(str(original)), fotos_duplicadas.dhash(str(otra))) > indice.umbral
@@ -0,0 +1,146 @@
+"""
+Pruebas de ``ocr_breakers.CircuitBreaker`` con ``permitir``/``registrar``.
+
+El módulo lee la hora con ``time.monotonic``; las pruebas reemplazan su
+``time`` por un reloj que solo avanza cuando la prueba lo pide.
+"""
+
+import time as time_real
+from types import SimpleNamespace
+
+import pytest
+
+import ocr_breakers
+from ocr_breakers import ABIERTO, CERRADO, SEMIABIERTO, CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = SimpleNamespace(ahora=1000.0)
+    reloj.avanzar = lambda segundos: setattr(reloj, 'ahora', reloj.ahora + segundos)
+    monkeypatch.setattr(ocr_breakers, 'time', SimpleNamespace(
+        monotonic=lambda: reloj.ahora, time=time_real.time, perf_counter=time_real.perf_counter,
+        strftime=time_real.strftime, localtime=time_real.localtime))
+    return reloj
+
+
+def _breaker(**kwargs):
+    config = dict(ventana_segundos=60, min_llamadas=4, umbral_error=0.5, lento_segundos=10,
+                  apertura_segundos=30, apertura_maxima=100)
+    config.update(kwargs)
+    return CircuitBreaker('prueba', **config)
+
+
+def _llamar(breaker, ok, latencia=0.1):
+    assert breaker.permitir()
+    breaker.registrar(ok, latencia, None if ok else 'HTTP 502')
+
+
+def _abrir(breaker):
+    for ok in (True, True, False, False):
+        _llamar(breaker, ok)
+    assert breaker.estado == ABIERTO
+
+
+def test_abre_al_llegar_a_la_tasa_de_error(reloj):
+    breaker = _breaker()
+    _llamar(breaker, False)
+    _llamar(breaker, False)
+    # Dos de dos, pero aún por debajo de min_llamadas
+    assert breaker.estado == CERRADO
+    _llamar(breaker, True)
+    _llamar(breaker, True)
+    # Un éxito no abre aunque la tasa sea 50 %
+    assert breaker.estado == CERRADO
+    _llamar(breaker, False)
+    assert breaker.estado == ABIERTO
+    assert not breaker.permitir() and not breaker.disponible()
+    assert breaker.snapshot()['rechazadas'] == 1
+    assert breaker.salud() == 0.0
+
+
+def test_ventana_olvida_fallos_viejos(reloj):
+    breaker = _breaker()
+    for _ in range(3):
+        _llamar(breaker, False)
+    reloj.avanzar(61)
+    for ok in (True, True, True, False):
+        _llamar(breaker, ok)
+    assert breaker.estado == CERRADO
+
+
+def test_semiapertura_admite_una_sola_prueba(reloj):
+    breaker = _breaker()
+    _abrir(breaker)
+    reloj.avanzar(29.9)
+    assert not breaker.permitir()
+    reloj.avanzar(0.2)
+    assert breaker.estado == SEMIABIERTO and breaker.disponible()
+    assert breaker.permitir()
+    # La prueba está en curso: las demás se rechazan
+    assert not breaker.disponible()
+    assert not breaker.permitir()
+    breaker.registrar(True, 0.1)
+    assert breaker.estado == CERRADO
+    assert breaker.snapshot()['llamadas_ventana'] == 0
+    assert breaker.permitir()
+
+
+def test_apertura_se_duplica_hasta_el_maximo(reloj):
+    breaker = _breaker()
+    _abrir(breaker)
+    duraciones = []
+    for _ in range(4):
+        duraciones.append(breaker.snapshot()['reabre_en_segundos'])
+        reloj.avanzar(duraciones[-1])
+        _llamar(breaker, False)
+        assert breaker.estado == ABIERTO
+    assert duraciones == [30, 60, 100, 100]
+
+    # Una prueba exitosa reinicia la cuenta: la siguiente apertura vuelve a durar 30 s
+    reloj.avanzar(100)
+    _llamar(breaker, True)
+    assert breaker.estado == CERRADO
+    _abrir(breaker)
+    assert breaker.snapshot()['reabre_en_segundos'] == 30
+
+
+def test_llamada_lenta_cuenta_como_fallo(reloj):
+    breaker = _breaker()
+    for _ in range(2):
+        _llamar(breaker, True)
+    for _ in range(2):
+        _llamar(breaker, True, latencia=12)
+    assert breaker.estado == ABIERTO
+    assert breaker.ultimo_error == 'lenta (12.0 s)'
+
+
+def test_prueba_lenta_reabre(reloj):
+    breaker = _breaker()
+    _abrir(breaker)
+    reloj.avanzar(30)
+    _llamar(breaker, True, latencia=15)
+    assert breaker.estado == ABIERTO
+    assert breaker.snapshot()['reabre_en_segundos'] == 60
+
+
+def test_deshabilitado_solo_mide(reloj):
+    breaker = _breaker(habilitado=False)
+    for _ in range(6):
+        _llamar(breaker, False)
+    assert breaker.estado == CERRADO and breaker.disponible()
+    assert breaker.snapshot()['fallos_ventana'] == 6
+
+
+def test_llamada_registra_excepciones_y_fallos_marcados(reloj):
+    breaker = _breaker(min_llamadas=2)
+    with pytest.raises(ConnectionError):
+        with breaker.llamada():
+            raise ConnectionError('sin red')
+    assert breaker.ultimo_error == 'ConnectionError: sin red'
+    with breaker.llamada() as control:
+        control.fallo('HTTP 502')
+    assert breaker.estado == ABIERTO
+    with pytest.raises(CircuitOpenError):
+        with breaker.llamada():
+            pytest.fail('no debe llamar con el circuito abierto')
@@ -0,0 +1,169 @@
+"""
+Pruebas de los validadores de ``ocr_esquemas`` y de
+``tiquete_parser.parse_structured_response``.
+
+Las respuestas de ``chat.completions`` se simulan con ``SimpleNamespace``
+(solo los atributos que lee ``contenido_mensaje``).
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import ocr_esquemas
+from ocr_esquemas import ErrorEsquema
+from tiquete_parser import NOTA_NO_TIQUETE, parse_markdown_response, parse_structured_response
+
+TIQUETE = {
+    'es_tiquete': True,
+    'campos': [{'campo': 'Placa', 'original': ' ABC123 ', 'sugerido': 'ABC123'},
+               {'campo': 'Peso Neto', 'original': '12.345 kg', 'sugerido': '12345'}],
+    'acarreo': 'SI',
+    'cargo': 'NO',
+    'nota': ' Pesos coinciden. ',
+    'descripcion': '',
+}
+
+
+def _respuesta(content, refusal=None, finish_reason='stop'):
+    mensaje = SimpleNamespace(content=content, refusal=refusal)
+    return SimpleNamespace(choices=[SimpleNamespace(message=mensaje, finish_reason=finish_reason)])
+
+
+# --- contenido_mensaje -----------------------------------------------------------
+
+def test_contenido_del_mensaje():
+    assert ocr_esquemas.contenido_mensaje(_respuesta('{"placa": "ABC123"}')) == '{"placa": "ABC123"}'
+    assert ocr_esquemas.contenido_mensaje(_respuesta(None)) == ''
+
+
+def test_rechazo_del_modelo():
+    with pytest.raises(ErrorEsquema, match='rechazó'):
+        ocr_esquemas.contenido_mensaje(_respuesta(None, refusal='No puedo ayudar con eso'))
+
+
+def test_respuesta_cortada_por_tokens():
+    with pytest.raises(ErrorEsquema, match='max_tokens'):
+        ocr_esquemas.contenido_mensaje(_respuesta('{"placa": "AB', finish_reason='length'))
+
+
+# --- cargar_json ------------------------------------------------------------------
+
+def test_json_dentro_de_texto():
+    texto = 'Claro, aquí está el resultado:\n{"fecha_encontrada": "2027-03-01", "confianza": 90} Saludos {x}'
+    assert ocr_esquemas.cargar_json(texto) == {'fecha_encontrada': '2027-03-01', 'confianza': 90}
+
+
+@pytest.mark.parametrize('contenido', ['', '   ', 'sin json', '{"cortado": ', '[1, 2]'])
+def test_json_invalido(contenido):
+    with pytest.raises(ErrorEsquema):
+        ocr_esquemas.cargar_json(contenido)
+
+
+# --- validar_documento ------------------------------------------------------------
+
+def test_documento_valido():
+    extraccion = ocr_esquemas.validar_documento(json.dumps(
+        {'fecha_encontrada': '2027-03-01', 'confianza': 140, 'contexto': 'Vence: 01/03/2027', 'texto_visible': 'SOAT'}))
+    assert extraccion == ocr_esquemas.ExtraccionDocumento('2027-03-01', 100, 'Vence: 01/03/2027', 'SOAT')
+
+
+def test_documento_sin_esquema_completa_campos():
+    extraccion = ocr_esquemas.validar_documento(
+        'Resultado: {"fecha_encontrada": "null", "texto_relevante": "sin fecha"}', confianza_defecto=30)
+    assert extraccion == ocr_esquemas.ExtraccionDocumento(None, 30, 'sin fecha', '')
+
+
+@pytest.mark.parametrize('confianza, esperada', [('85', 85), (72.6, 73)])
+def test_documento_confianza_convertida(confianza, esperada):
+    extraccion = ocr_esquemas.validar_documento({'fecha_encontrada': None, 'confianza': confianza})
+    assert extraccion.confianza == esperada
+
+
+@pytest.mark.parametrize('confianza', [True, False])
+def test_documento_confianza_booleana(confianza):
+    with pytest.raises(ErrorEsquema, match='booleano'):
+        ocr_esquemas.validar_documento({'fecha_encontrada': '2027-03-01', 'confianza': confianza})
+
+
+def test_documento_sin_fecha():
+    with pytest.raises(ErrorEsquema, match='faltan fecha_encontrada'):
+        ocr_esquemas.validar_documento({'confianza': 90})
+
+
+# --- validar_placa ----------------------------------------------------------------
+
+@pytest.mark.parametrize('contenido, placa, extraida', [
+    ('{"placa": "abc-123"}', 'ABC123', False),
+    ('{"placa": null}', None, False),
+    ('{"placa": "NO_DETECTADA"}', None, False),
+    ('NO_DETECTADA', None, False),
+    ('abc 123', 'ABC123', False),
+    ('La placa del vehículo es XYZ789, visible al frente.', 'XYZ789', True),
+])
+def test_placa(contenido, placa, extraida):
+    assert ocr_esquemas.validar_placa(contenido) == ocr_esquemas.ExtraccionPlaca(placa, extraida)
+
+
+@pytest.mark.parametrize('contenido', ['{"placa": "AB1234"}', '{"placa": "ABC123", "color": "rojo"}', '{}',
+                                       'no se ve ninguna placa'])
+def test_placa_invalida(contenido):
+    with pytest.raises(ErrorEsquema):
+        ocr_esquemas.validar_placa(contenido)
+
+
+# --- validar_tiquete / parse_structured_response -------------------------------------
+
+def test_tiquete_estructurado():
+    assert parse_structured_response(json.dumps(TIQUETE)) == {
+        'table_data': [{'campo': 'Placa', 'original': 'ABC123', 'sugerido': 'ABC123'},
+                       {'campo': 'Peso Neto', 'original': '12.345 kg', 'sugerido': '12345'}],
+        'nota': 'Pesos coinciden.',
+        'acarreo': 'SI',
+        'cargo': 'NO',
+        'descripcion': '',
+    }
+
+
+def test_tiquete_desde_dict_de_webhook():
+    assert parse_structured_response(dict(TIQUETE))['acarreo'] == 'SI'
+
+
+def test_no_es_tiquete():
+    datos = {**TIQUETE, 'es_tiquete': False, 'nota': '', 'descripcion': 'Un camión en la báscula'}
+    resultado = parse_structured_response(datos)
+    assert resultado['table_data'] == []
+    assert resultado['nota'] == NOTA_NO_TIQUETE
+    assert resultado['descripcion'] == 'Un camión en la báscula'
+
+
+@pytest.mark.parametrize('cambio, mensaje', [
+    ({'extra': 1}, 'no permitidas extra'),
+    ({'campos': [{'campo': 'Placa', 'original': 'ABC123'}]}, r'\$.campos\[0\]: faltan sugerido'),
+    ({'campos': [{'campo': 'Placa', 'original': 'ABC123', 'sugerido': 'ABC123', 'x': ''}]}, 'no permitidas x'),
+    ({'es_tiquete': 1}, 'se esperaba boolean'),
+    ({'acarreo': True}, 'booleano'),
+])
+def test_tiquete_fuera_del_esquema(cambio, mensaje):
+    with pytest.raises(ErrorEsquema, match=mensaje):
+        parse_structured_response({**TIQUETE, **cambio})
+
+
+def test_tiquete_sin_claves():
+    datos = dict(TIQUETE)
+    del datos['nota']
+    with pytest.raises(ErrorEsquema, match='faltan nota'):
+        parse_structured_response(datos)
+
+
+def test_markdown_con_json_fuera_del_esquema_se_parsea_como_texto():
+    # Empieza con "{" pero no cumple el esquema: se usa el parser de tabla
+    texto = '{"nota": "x"}\n| Campo | Información Original | Sugerido |\n| Placa | ABC123 | ABC123 |\nNota: ok'
+    resultado = parse_markdown_response(texto)
+    assert resultado['table_data'] == [{'campo': 'Placa', 'original': 'ABC123', 'sugerido': 'ABC123'}]
+    assert resultado['nota'] == 'ok'
+
+
+def test_markdown_delega_el_json_del_esquema():
+    assert parse_markdown_response(json.dumps(TIQUETE)) == parse_structured_response(TIQUETE)
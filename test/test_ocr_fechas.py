@@ -0,0 +1,71 @@
+"""
+Pruebas de ``ocr_fechas.escanear_fechas`` sobre el corpus etiquetado.
+
+El corpus (``scripts/datos/corpus_fechas_documentos.jsonl``) es el mismo del
+benchmark; la referencia es la implementación anterior copiada en
+``scripts/benchmark_fechas_documentos.py``.
+"""
+
+import importlib.util
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from ocr_fechas import escanear_fechas
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(PROJECT_ROOT, 'scripts', 'datos', 'corpus_fechas_documentos.jsonl')
+# Acierto medido al introducir el escáner (69 de 80 textos)
+ACIERTO_MINIMO = 0.86
+
+_spec = importlib.util.spec_from_file_location(
+    'benchmark_fechas_documentos', os.path.join(PROJECT_ROOT, 'scripts', 'benchmark_fechas_documentos.py'))
+benchmark = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(benchmark)
+
+with open(CORPUS, encoding='utf-8') as _archivo:
+    CASOS = [json.loads(linea) for linea in _archivo if linea.strip()]
+
+
+def _hoy(caso):
+    return datetime.strptime(caso['hoy'], '%Y-%m-%d')
+
+
+def _fecha(texto, tipo, hoy):
+    resultado = escanear_fechas(texto, tipo, hoy=hoy)
+    return resultado['fecha'] if resultado else None
+
+
+def test_acierto_no_baja():
+    aciertos = sum(_fecha(c['texto'], c['tipo'], _hoy(c)) == c['esperada'] for c in CASOS)
+    anteriores = sum(benchmark.extraer_anterior(c['texto'], c['tipo'], _hoy(c)) == c['esperada'] for c in CASOS)
+    assert aciertos / len(CASOS) >= ACIERTO_MINIMO
+    assert aciertos >= anteriores
+
+
+ACERTABA_ANTERIOR = [c for c in CASOS if benchmark.extraer_anterior(c['texto'], c['tipo'], _hoy(c)) == c['esperada']]
+
+
+@pytest.mark.parametrize('caso', ACERTABA_ANTERIOR, ids=[c['id'] for c in ACERTABA_ANTERIOR])
+def test_acierta_donde_acertaba_la_anterior(caso):
+    assert _fecha(caso['texto'], caso['tipo'], _hoy(caso)) == caso['esperada']
+
+
+def test_aaaa_mm_dd_se_lee_completa():
+    # Antes el patrón dd/mm/yy encontraba '25-05-12' dentro de '2025-05-12'
+    texto = 'REVISION TECNICO MECANICA\nPlaca ABC123 2025-05-12'
+    resultado = escanear_fechas(texto, 'tecnomecanica', hoy=datetime(2024, 10, 19))
+    assert (resultado['fecha'], resultado['texto']) == ('2025-05-12', '2025-05-12')
+
+
+def test_contextual_gana_al_puntaje():
+    texto = 'CERTIFICADO ARL SURA\nExpedido 09/02/2025\nVence: 09/07/2028'
+    resultado = escanear_fechas(texto, 'arl', hoy=datetime(2026, 10, 19))
+    assert resultado['fecha'] == '2028-07-09' and resultado['estrategia'] == 'contextual'
+    assert resultado['candidatas'] == 2
+
+
+def test_sin_fechas_validas():
+    assert escanear_fechas('Sin fechas legibles 99/99/9999', 'soat', hoy=datetime(2026, 10, 19)) is None
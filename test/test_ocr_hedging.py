@@ -0,0 +1,144 @@
+"""
+Pruebas de ``ocr_hedging.run_hedged`` y ``run_batch`` con estrategias de prueba.
+
+Las estrategias lentas esperan ``cancel_event`` (o un evento propio) en vez
+de dormir, así que cada prueba termina en cuanto ``run_hedged`` decide y los
+hilos del pool quedan libres para la siguiente.
+"""
+
+import threading
+import time
+
+import ocr_hedging
+from ocr_hedging import run_batch, run_hedged
+
+
+def _exito(nombre):
+    return lambda limite, cancel: {'success': True, 'fuente': nombre}
+
+
+def _fallo(nombre):
+    return lambda limite, cancel: {'success': False, 'message': f'{nombre} sin resultado'}
+
+
+def _bloqueada(cancelaciones, nombre):
+    """Espera hasta que la cancelen (o 5 s) y anota si vio la cancelación."""
+    def estrategia(limite, cancel):
+        cancelaciones[nombre] = cancel.wait(5)
+        return {'success': True, 'fuente': nombre}
+    return estrategia
+
+
+def _estados(resultado):
+    return {i['estrategia']: i['estado'] for i in resultado['intentos']}
+
+
+def _esperar_pool_libre():
+    fin = time.monotonic() + 2
+    while ocr_hedging._en_pool and time.monotonic() < fin:
+        time.sleep(0.01)
+    return ocr_hedging._en_pool
+
+
+def test_cobertura_arranca_despues_del_retardo():
+    cancelaciones = {}
+    resultado = run_hedged([('lenta', _bloqueada(cancelaciones, 'lenta')), ('rapida', _exito('rapida'))],
+                           deadline=5, hedge_delay=0.1)
+    assert resultado['success'] and resultado['fuente'] == 'rapida'
+    inicios = {i['estrategia']: i['inicio_ms'] for i in resultado['intentos']}
+    assert inicios['lenta'] < 50
+    assert 90 <= inicios['rapida'] < 1000
+    assert _estados(resultado) == {'lenta': 'cancelado', 'rapida': 'exito'}
+    assert _esperar_pool_libre() == 0
+    assert cancelaciones == {'lenta': True}
+
+
+def test_fallo_pasa_a_la_siguiente_sin_esperar():
+    inicio = time.monotonic()
+    resultado = run_hedged([('falla', _fallo('falla')), ('ok', _exito('ok'))], deadline=5, hedge_delay=10)
+    assert resultado['success'] and resultado['fuente'] == 'ok'
+    assert time.monotonic() - inicio < 1
+    assert _estados(resultado) == {'falla': 'fallo', 'ok': 'exito'}
+
+
+def test_excepcion_cuenta_como_fallo():
+    def explota(limite, cancel):
+        raise RuntimeError('sin red')
+
+    resultado = run_hedged([('explota', explota), ('ok', _exito('ok'))], deadline=5, hedge_delay=10)
+    assert resultado['success']
+    assert _estados(resultado) == {'explota': 'fallo', 'ok': 'exito'}
+
+
+def test_ganador_cancela_las_demas():
+    cancelaciones = {}
+    tercera_arranco = threading.Event()
+    tercera = _bloqueada(cancelaciones, 'tercera')
+
+    def lenta_valida(limite, cancel):
+        # Responde en cuanto corren las tres, lejos del momento de lanzar la cuarta
+        tercera_arranco.wait(5)
+        return {'success': True, 'fuente': 'primera'}
+
+    def tercera_avisa(limite, cancel):
+        tercera_arranco.set()
+        return tercera(limite, cancel)
+
+    resultado = run_hedged([('primera', lenta_valida), ('segunda', _bloqueada(cancelaciones, 'segunda')),
+                            ('tercera', tercera_avisa), ('cuarta', _exito('cuarta'))],
+                           deadline=5, hedge_delay=0.2)
+    assert resultado['fuente'] == 'primera'
+    assert _estados(resultado) == {'primera': 'exito', 'segunda': 'cancelado', 'tercera': 'cancelado',
+                                   'cuarta': 'no_ejecutada'}
+    assert _esperar_pool_libre() == 0
+    assert cancelaciones == {'segunda': True, 'tercera': True}
+
+
+def test_tiempo_limite_devuelve_intentos():
+    cancelaciones = {}
+    inicio = time.monotonic()
+    resultado = run_hedged([('a', _bloqueada(cancelaciones, 'a')), ('b', _bloqueada(cancelaciones, 'b'))],
+                           deadline=0.3, hedge_delay=0.1)
+    assert 0.3 <= time.monotonic() - inicio < 1.5
+    assert resultado['success'] is False
+    assert 'No se obtuvo un resultado válido' in resultado['message']
+    assert _estados(resultado) == {'a': 'tiempo_limite', 'b': 'tiempo_limite'}
+    assert all('duracion_ms' in i for i in resultado['intentos'])
+    assert _esperar_pool_libre() == 0
+
+
+def test_todas_fallan_devuelve_el_ultimo_fallo():
+    resultado = run_hedged([('a', _fallo('a')), ('b', _fallo('b'))], deadline=5, hedge_delay=10)
+    assert resultado['success'] is False and resultado['message'] == 'b sin resultado'
+    assert _estados(resultado) == {'a': 'fallo', 'b': 'fallo'}
+
+
+def test_pool_lleno_no_encola(monkeypatch):
+    monkeypatch.setattr(ocr_hedging, '_en_pool', ocr_hedging.HEDGE_WORKERS)
+    resultado = run_hedged([('a', _exito('a')), ('b', _exito('b'))], deadline=5, hedge_delay=0.1)
+    assert resultado['success'] is False and resultado['saturado'] is True
+    assert _estados(resultado) == {'a': 'saturado', 'b': 'saturado'}
+
+
+def test_batch_tiempo_limite_por_clave():
+    soltar = threading.Event()
+
+    def lenta(limite):
+        soltar.wait(5)
+        return {'success': True}
+
+    def explota(limite):
+        raise ValueError('imagen corrupta')
+
+    try:
+        inicio = time.monotonic()
+        resultados = run_batch({'arl': lambda limite: {'success': True, 'fecha': '2025-01-31'},
+                                'soat': lenta, 'licencia': explota}, deadline=0.2)
+        assert time.monotonic() - inicio < 2
+    finally:
+        soltar.set()
+    assert list(resultados) == ['arl', 'soat', 'licencia']
+    assert resultados['arl']['success'] and resultados['arl']['fecha'] == '2025-01-31'
+    assert resultados['soat']['success'] is False and resultados['soat']['tiempo_limite'] is True
+    assert resultados['licencia']['success'] is False and 'imagen corrupta' in resultados['licencia']['message']
+    assert all('duracion_ms' in r for r in resultados.values())
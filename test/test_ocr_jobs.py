@@ -0,0 +1,183 @@
+"""
+Pruebas de ``ocr_jobs.ColaOCR`` y ``PoolOCR`` sobre una base en ``tmp_path``.
+
+Los manejadores reales llaman al servicio OCR; aquí se registran tipos de
+prueba con ``monkeypatch`` y la política de reintentos usa backoffs de
+milisegundos.
+"""
+
+import time
+
+import pytest
+
+import ocr_jobs
+from ocr_jobs import ColaOCR, PoolOCR
+
+
+@pytest.fixture
+def cola(tmp_path):
+    return ColaOCR(str(tmp_path / 'ocr_jobs.db'), lease_seconds=60, directorio_archivos=str(tmp_path / 'ocr_jobs'))
+
+
+@pytest.fixture
+def tipos(monkeypatch):
+    """Tipos ``ok``, ``falla`` y ``sin_exito`` con backoff corto."""
+    llamadas = []
+
+    def ok(payload):
+        llamadas.append(payload)
+        return {'success': True, 'eco': payload.get('n')}
+
+    def falla(payload):
+        llamadas.append(payload)
+        raise RuntimeError('API caída')
+
+    monkeypatch.setitem(ocr_jobs._manejadores, 'ok', ok)
+    monkeypatch.setitem(ocr_jobs._manejadores, 'falla', falla)
+    monkeypatch.setitem(ocr_jobs._manejadores, 'sin_exito', lambda payload: {'success': False, 'message': 'ilegible'})
+    monkeypatch.setitem(ocr_jobs.POLITICAS, 'falla', {'max_intentos': 2, 'backoff': 0.05})
+    return llamadas
+
+
+def test_tipo_no_registrado(cola):
+    with pytest.raises(ValueError):
+        cola.encolar('desconocido', {})
+
+
+def test_toma_por_prioridad_y_llegada(cola, tipos):
+    ids = {}
+    for nombre, prioridad in [('normal1', 'normal'), ('oficina', 'oficina'), ('porteria', 'porteria'),
+                              ('normal2', 'normal')]:
+        ids[cola.encolar('ok', {'n': nombre}, prioridad=ocr_jobs.PRIORIDADES[prioridad])] = nombre
+    assert cola.estado(next(i for i, n in ids.items() if n == 'oficina'))['posicion'] == 3
+
+    orden = []
+    while (trabajo := cola.tomar('w')) is not None:
+        orden.append(ids[trabajo['id']])
+        assert trabajo['intentos'] == 1
+    assert orden == ['porteria', 'normal1', 'normal2', 'oficina']
+    assert cola.resumen() == {ocr_jobs.EN_PROCESO: 4}
+
+
+def test_reintento_con_backoff_y_luego_fallido(cola, tipos):
+    pool = PoolOCR(cola, hilos=0)
+    job_id = cola.encolar('falla', {'n': 1})
+
+    pool.ejecutar(cola.tomar('w'))
+    datos = cola.estado(job_id)
+    assert datos['estado'] == ocr_jobs.PENDIENTE and datos['intentos'] == 1
+    assert 'API caída' in datos['error']
+    # Aún dentro del backoff: no se puede tomar
+    assert cola.tomar('w') is None
+
+    time.sleep(0.08)
+    trabajo = cola.tomar('w')
+    assert trabajo['intentos'] == 2
+    pool.ejecutar(trabajo)
+    datos = cola.estado(job_id)
+    assert datos['estado'] == ocr_jobs.FALLIDO and 'duracion_ms' in datos
+    assert len(tipos) == 2
+
+
+def test_resultado_sin_exito_no_se_reintenta(cola, tipos):
+    job_id = cola.encolar('sin_exito', {})
+    PoolOCR(cola, hilos=0).ejecutar(cola.tomar('w'))
+    datos = cola.estado(job_id)
+    assert datos['estado'] == ocr_jobs.COMPLETADO
+    assert datos['resultado'] == {'success': False, 'message': 'ilegible'}
+
+
+def test_lease_vencido_vuelve_a_pendiente(tmp_path, tipos):
+    cola = ColaOCR(str(tmp_path / 'ocr_jobs.db'), lease_seconds=0.05)
+    job_id = cola.encolar('ok', {'n': 1})
+    assert cola.tomar('muerto')['intentos'] == 1
+    assert cola.recuperar_huerfanos() == 0
+
+    time.sleep(0.08)
+    assert cola.recuperar_huerfanos() == 1
+    assert cola.estado(job_id)['estado'] == ocr_jobs.PENDIENTE
+    # ok admite 2 intentos (POLITICA_DEFAULT): el segundo lease vencido lo deja fallido
+    assert cola.tomar('muerto')['intentos'] == 2
+    time.sleep(0.08)
+    assert cola.recuperar_huerfanos() == 1
+    datos = cola.estado(job_id)
+    assert datos['estado'] == ocr_jobs.FALLIDO
+    assert datos['error'] == 'El proceso que lo atendía se detuvo'
+
+
+def test_worker_sin_lease_no_pisa_al_que_lo_retomo(tmp_path, tipos):
+    cola = ColaOCR(str(tmp_path / 'ocr_jobs.db'), lease_seconds=0.05)
+    job_id = cola.encolar('ok', {'n': 1})
+    lento = cola.tomar('lento')
+    time.sleep(0.08)
+    assert cola.recuperar_huerfanos() == 1
+    nuevo = cola.tomar('nuevo')
+
+    # El worker original termina tarde: no escribe ni reprograma
+    assert not cola.renovar(job_id, 'lento')
+    assert not cola.completar(job_id, 'lento', {'success': True, 'eco': 'lento'})
+    assert not cola.fallar(job_id, 'lento', 'tarde', lento['intentos'], lento['max_intentos'], 0)
+    assert cola.estado(job_id)['estado'] == ocr_jobs.EN_PROCESO
+
+    assert cola.completar(job_id, nuevo['worker'], {'success': True, 'eco': 'nuevo'})
+    assert cola.estado(job_id)['resultado']['eco'] == 'nuevo'
+    # Ya terminado: ni el mismo worker lo vuelve a escribir
+    assert not cola.completar(job_id, 'nuevo', {'success': False})
+
+
+def test_pool_renueva_el_lease_mientras_corre(tmp_path, monkeypatch):
+    cola = ColaOCR(str(tmp_path / 'ocr_jobs.db'), lease_seconds=0.06)
+    huerfanos = []
+
+    def lento(payload):
+        # Dura más que varios leases; el mantenimiento no debe darlo por huérfano
+        for _ in range(5):
+            time.sleep(0.04)
+            huerfanos.append(cola.recuperar_huerfanos())
+        return {'success': True}
+
+    monkeypatch.setitem(ocr_jobs._manejadores, 'lento', lento)
+    job_id = cola.encolar('lento', {})
+    PoolOCR(cola, hilos=0).ejecutar(cola.tomar('w'))
+    assert huerfanos == [0] * 5
+    datos = cola.estado(job_id)
+    assert datos['estado'] == ocr_jobs.COMPLETADO and datos['intentos'] == 1
+
+
+def test_purgar_borra_trabajos_viejos_y_sus_imagenes(tmp_path, tipos):
+    directorio = tmp_path / 'ocr_jobs'
+    directorio.mkdir()
+    cola = ColaOCR(str(tmp_path / 'ocr_jobs.db'), retention_days=0, directorio_archivos=str(directorio))
+    placa, arl, ajena, pendiente = (directorio / 'placa.jpg', directorio / 'arl.jpg', tmp_path / 'ajena.jpg',
+                                    directorio / 'pendiente.jpg')
+    for ruta in (placa, arl, ajena, pendiente):
+        ruta.write_bytes(b'jpg')
+
+    terminado = cola.encolar('ok', {'image_path': str(placa)})
+    lote = cola.encolar('ok', {'documentos': {'arl': str(arl), 'soat': str(ajena)}})
+    for _ in range(2):
+        trabajo = cola.tomar('w')
+        assert cola.completar(trabajo['id'], 'w', {'success': True})
+    en_cola = cola.encolar('ok', {'image_path': str(pendiente)})
+
+    time.sleep(0.01)
+    assert cola.purgar() == 2
+    assert cola.estado(terminado) is None and cola.estado(lote) is None
+    assert cola.estado(en_cola)['estado'] == ocr_jobs.PENDIENTE
+    assert not placa.exists() and not arl.exists()
+    # Fuera del directorio de la cola o de un trabajo vivo: no se toca
+    assert ajena.exists() and pendiente.exists()
+
+
+def test_pool_procesa_trabajos(cola, tipos):
+    pool = PoolOCR(cola, hilos=2, poll_seconds=0.05)
+    pool.iniciar()
+    try:
+        ids = [cola.encolar('ok', {'n': n}) for n in range(5)]
+        fin = time.monotonic() + 5
+        while time.monotonic() < fin and cola.resumen() != {ocr_jobs.COMPLETADO: 5}:
+            time.sleep(0.02)
+    finally:
+        pool.detener(timeout=2)
+    assert [cola.estado(i)['resultado']['eco'] for i in ids] == list(range(5))
+    assert all(not hilo.is_alive() for hilo in pool._threads)
@@ -0,0 +1,161 @@
+"""
+Pruebas de ``tiquete_parser.parse_markdown_response`` con entradas generadas.
+
+Las entradas salen de generadores con semilla fija (gramática de respuestas
+de tiquete, mutaciones y texto aleatorio con las marcas del formato), así que
+cada ejecución es reproducible. La referencia es la implementación anterior,
+copiada en ``scripts/benchmark_tiquete_parser.py``.
+"""
+
+import importlib.util
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+
+import pytest
+
+from tiquete_parser import parse_markdown_response
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASOS = 400
+
+_spec = importlib.util.spec_from_file_location(
+    'benchmark_tiquete_parser', os.path.join(PROJECT_ROOT, 'scripts', 'benchmark_tiquete_parser.py'))
+benchmark = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(benchmark)
+
+PIEZAS = ['|', '| |', '||', ' ', '\n', '\r\n', '\t', '---', 'Campo', 'Información Original', 'Sugerido',
+          'Se Acarreó:', 'se acarreó:', 'Se Cargó:', 'SE CARGÓ:', 'Nota:', 'Nota de Validación:',
+          '**Nota de Validación:**', 'Status:', 'SI', 'NO', '123', 'ABC123', 'ñ', '{', '}', '💥']
+
+
+def _celda(rng):
+    return rng.choice(['', ' ', 'ABC123', 'Juan Pérez', '12.345 kg', '2024-05-01', 'N/A', 'Campo extra',
+                       'valor con : dos puntos', f'{rng.randint(0, 10 ** 6)}'])
+
+
+def _respuesta(rng):
+    """Respuesta con la forma del formato: tabla, etiquetas y nota, con variaciones."""
+    lineas = []
+    if rng.random() < 0.3:
+        lineas.append(rng.choice(['Aquí está la validación:', '| sin | encabezado | aún |', '']))
+    lineas.append(rng.choice(['| Campo | Información Original | Sugerido |',
+                              '|Campo|Información Original|Sugerido|', 'Campo | Original | Sugerido']))
+    if rng.random() < 0.8:
+        lineas.append('|---|---|---|')
+    for _ in range(rng.randint(0, 15)):
+        celdas = [_celda(rng) for _ in range(rng.choice([2, 3, 3, 3, 4]))]
+        lineas.append(' ' * rng.randint(0, 2) + '| ' + ' | '.join(celdas) + ' |')
+    for etiqueta in ('Se Acarreó:', 'Se Cargó:'):
+        if rng.random() < 0.7:
+            formato = rng.choice(['{e} {v}', '| {e} | {v} |', '{e}{v}', '**{e}** {v}'])
+            lineas.append(formato.format(e=rng.choice([etiqueta, etiqueta.upper()]), v=rng.choice(['SI', 'NO', ''])))
+    marca = rng.choice(['Nota de Validación:', 'Nota:', '**Nota de Validación:**', None])
+    if marca:
+        lineas.append(f'{marca} {rng.choice(["Todo coincide.", "Revisar la placa.", ""])}')
+        if rng.random() < 0.3:
+            lineas.append(f'{marca} repetida')
+    if rng.random() < 0.3:
+        lineas.append('Status: 200')
+    return rng.choice(['\n', '\r\n']).join(lineas)
+
+
+def _mutar(texto, rng):
+    """Borra, duplica o inserta piezas del formato en posiciones al azar."""
+    for _ in range(rng.randint(1, 5)):
+        posicion = rng.randint(0, len(texto))
+        operacion = rng.random()
+        if operacion < 0.4:
+            texto = texto[:posicion] + rng.choice(PIEZAS) + texto[posicion:]
+        elif operacion < 0.7:
+            texto = texto[:posicion] + texto[posicion + rng.randint(1, 20):]
+        else:
+            texto = texto[:posicion] + texto[posicion:posicion + rng.randint(1, 40)] + texto[posicion:]
+    return texto
+
+
+def _anterior(texto, caplog):
+    """Resultado de la implementación anterior, o None si abortó por excepción interna."""
+    caplog.clear()
+    with caplog.at_level(logging.ERROR, logger=benchmark.logger_anterior.name):
+        resultado = benchmark.parse_anterior(texto)
+    abortado = any(r.name == benchmark.logger_anterior.name and 'Error parseando' in r.getMessage()
+                   for r in caplog.records)
+    return None if abortado else resultado
+
+
+def _verificar_forma(resultado):
+    assert set(resultado) == {'table_data', 'nota', 'acarreo', 'cargo', 'descripcion'}
+    for clave in ('nota', 'acarreo', 'cargo', 'descripcion'):
+        assert isinstance(resultado[clave], str)
+    for fila in resultado['table_data']:
+        assert set(fila) == {'campo', 'original', 'sugerido'}
+        assert all(valor and valor == valor.strip() and '|' not in valor for valor in fila.values())
+
+
+@pytest.mark.parametrize('semilla', range(CASOS))
+def test_igual_a_la_implementacion_anterior(semilla, caplog):
+    rng = random.Random(semilla)
+    texto = _respuesta(rng)
+    if semilla % 2:
+        texto = _mutar(texto, rng)
+    esperado = _anterior(texto, caplog)
+    resultado = parse_markdown_response(texto)
+    _verificar_forma(resultado)
+    if esperado is not None:
+        assert resultado == esperado
+
+
+@pytest.mark.parametrize('semilla', range(CASOS))
+def test_texto_aleatorio_no_falla(semilla):
+    rng = random.Random(10_000 + semilla)
+    texto = ''.join(rng.choice(PIEZAS) if rng.random() < 0.5 else chr(rng.randint(1, 0x2FF))
+                    for _ in range(rng.randint(0, 300)))
+    _verificar_forma(parse_markdown_response(texto))
+
+
+@pytest.mark.parametrize('semilla', range(50))
+def test_filas_generadas_se_recuperan(semilla):
+    rng = random.Random(20_000 + semilla)
+    filas = [{'campo': f'Campo {i}', 'original': f'orig {rng.randint(0, 999)}', 'sugerido': f'sug {i}'}
+             for i in range(rng.randint(1, 40))]
+    texto = '\n'.join(['| Campo | Información Original | Sugerido |', '|---|---|---|']
+                      + [f"| {f['campo']} | {f['original']} | {f['sugerido']} |" for f in filas]
+                      + ['', 'Se Acarreó: SI', 'Se Cargó: NO', 'Nota de Validación: ok', 'Status: 200'])
+    resultado = parse_markdown_response(texto)
+    assert resultado['table_data'] == filas
+    assert (resultado['acarreo'], resultado['cargo'], resultado['nota']) == ('SI', 'NO', 'ok')
+
+
+def test_fila_vacia_antes_del_encabezado_se_ignora():
+    # La implementación anterior abortaba con IndexError en esta fila y perdía la tabla y la nota
+    texto = '| |\n| Campo | Información Original | Sugerido |\n| Placa | ABC123 | ABC123 |\nNota: ok'
+    resultado = parse_markdown_response(texto)
+    assert resultado['table_data'] == [{'campo': 'Placa', 'original': 'ABC123', 'sugerido': 'ABC123'}]
+    assert resultado['nota'] == 'ok'
+
+
+@pytest.mark.parametrize('nombre', ['grande', 'mal_formada'])
+def test_tiempo_lineal(nombre):
+    def mejor_tiempo(texto):
+        tiempos = []
+        for _ in range(3):
+            inicio = time.perf_counter()
+            parse_markdown_response(texto)
+            tiempos.append(time.perf_counter() - inicio)
+        return min(tiempos)
+
+    pequeno = benchmark.respuestas_sinteticas(1000)[nombre]
+    grande = benchmark.respuestas_sinteticas(16000)[nombre]
+    # 16 veces el texto: lineal da ~16x; se deja margen para el ruido del equipo
+    assert mejor_tiempo(grande) < 48 * max(mejor_tiempo(pequeno), 1e-4)
+
+
+def test_importar_no_configura_logging():
+    codigo = ('import logging, tiquete_parser; raiz = logging.getLogger(); '
+              'print(len(raiz.handlers), raiz.level)')
+    salida = subprocess.check_output([sys.executable, '-c', codigo], cwd=PROJECT_ROOT, text=True)
+    assert salida.split() == ['0', str(logging.WARNING)]
@@ -1,19 +1,88 @@
-# parser.py
+"""
+Parser de las respuestas de validación de tiquetes.
 
-# parser.py
+La respuesta llega como una tabla markdown (``| Campo | Información Original |
+Sugerido |``) seguida de una nota de validación, como texto plano cuando la
+imagen no es un tiquete, o como JSON con el esquema de ``ocr_esquemas``.
+
+``parse_markdown_response`` ubica las marcas ("Se Acarreó:", "Se Cargó:",
+"Nota de Validación:"/"Nota:") con búsquedas compiladas que se detienen en
+la primera aparición, sin partir el texto, y recorre una sola vez las líneas
+de la sección de tabla, así que el tiempo es lineal aunque la respuesta sea
+grande o esté mal formada. El módulo no configura logging al importarse.
+"""
 
-import re
 import logging
+import re
+
+import ocr_esquemas
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# En parser.py
+NOTA_NO_TIQUETE = "La imagen no contiene un tiquete válido. Se muestra una descripción general."
+
+# "Se Acarreó:"/"Se Cargó:" y su valor, hasta el fin de línea o la siguiente celda
+_ETIQUETAS = {
+    'acarreo': re.compile(r'Se Acarreó:\s*([^\n|]*)', re.IGNORECASE),
+    'cargo': re.compile(r'Se Cargó:\s*([^\n|]*)', re.IGNORECASE),
+}
+# Marcas de nota en orden de preferencia
+_MARCAS_NOTA = ('Nota de Validación:', 'Nota:')
+
+
+def parse_structured_response(response):
+    """
+    Parsea una respuesta con el esquema de tiquete (``ocr_esquemas.ESQUEMA_TIQUETE``),
+    ya sea el JSON de una llamada con salida estructurada o el dict de un webhook.
+
+    Devuelve el mismo dict que ``parse_markdown_response``.
+
+    Raises:
+        ocr_esquemas.ErrorEsquema: Si la respuesta no cumple el esquema.
+    """
+    return ocr_esquemas.validar_tiquete(response).como_parsed_data()
+
+
+def _seccion_nota(texto):
+    """
+    Límites de la tabla y de la nota: la tabla va hasta la primera marca de
+    nota y la nota hasta la siguiente marca igual (o el final del texto).
+
+    Returns:
+        tuple: ``(fin_tabla, inicio_nota, fin_nota)`` o None si no hay marca.
+    """
+    for marca in _MARCAS_NOTA:
+        inicio = texto.find(marca)
+        if inicio != -1:
+            fin = texto.find(marca, inicio + len(marca))
+            return inicio, inicio + len(marca), fin if fin != -1 else len(texto)
+    return None
+
+
+def _filas(tabla):
+    """Filas ``campo | original | sugerido`` después del encabezado (la fila que empieza con "Campo")."""
+    filas = []
+    encabezado = False
+    for fila in tabla.split('\n'):
+        if '|' not in fila or '---' in fila:
+            continue
+        columnas = [columna.strip() for columna in fila.split('|')]
+        columnas = [columna for columna in columnas if columna]
+        if not columnas:
+            continue
+        if not encabezado:
+            encabezado = 'Campo' in columnas[0]
+            continue
+        if len(columnas) >= 3:
+            filas.append({'campo': columnas[0], 'original': columnas[1], 'sugerido': columnas[2]})
+    return filas
+
 
 def parse_markdown_response(response_text):
     """
     Parsea una respuesta en formato markdown que incluye una tabla y nota de validación.
-    También maneja respuestas en formato de texto plano.
+    También maneja respuestas en formato de texto plano, y las respuestas JSON con
+    el esquema de tiquete se delegan a ``parse_structured_response``.
     """
     parsed_data = {
         'table_data': [],
@@ -22,94 +91,43 @@ def parse_markdown_response(response_text):
         'cargo': '',
         'descripcion': ''
     }
-    
+
     if not response_text or not isinstance(response_text, str):
-        logger.error(f"Respuesta inválida: {response_text}")
+        logger.error(f"Respuesta inválida: {response_text!r:.200}")
         return parsed_data
-    
-    try:
-        # Registrar la respuesta completa para debugging
-        logger.debug(f"Parseando respuesta: {response_text[:200]}...")
-        
-        # Verificar si la respuesta contiene una tabla (formato markdown)
-        if '|' in response_text and ('Campo' in response_text or 'Información Original' in response_text):
-            # Es una respuesta con formato de tabla
-            
-            # Extraer valores para Se Acarreó y Se Cargó
-            acarreo_match = re.search(r"Se Acarreó:\s*([^\n|]*)", response_text, re.IGNORECASE)
-            if acarreo_match:
-                parsed_data['acarreo'] = acarreo_match.group(1).strip()
-            
-            cargo_match = re.search(r"Se Cargó:\s*([^\n|]*)", response_text, re.IGNORECASE)
-            if cargo_match:
-                parsed_data['cargo'] = cargo_match.group(1).strip()
-            
-            # Separar la tabla de la nota - busca tanto "Nota de Validación:" como "Nota:"
-            parts = None
-            if "Nota de Validación:" in response_text:
-                parts = response_text.split("Nota de Validación:")
-            elif "**Nota de Validación:**" in response_text:
-                parts = response_text.split("**Nota de Validación:**")
-            elif "Nota:" in response_text:
-                parts = response_text.split("Nota:")
-            else:
-                parts = [response_text, ""]
-                logger.warning("No se encontró sección de nota en la respuesta")
-            
-            table_text = parts[0].strip()
-            
-            # Procesar tabla
-            rows = table_text.split('\n')
-            header_found = False
-            
-            for row in rows:
-                row = row.strip()
-                if not row or '---' in row:
-                    continue
-                    
-                if '|' not in row:
-                    continue
-                    
-                # Procesar fila de la tabla
-                columns = [col.strip() for col in row.split('|') if col.strip()]
-                
-                if not header_found:
-                    if 'Campo' in columns[0]:
-                        header_found = True
-                    continue
-                
-                if len(columns) >= 3:
-                    # Asegurarnos de que los datos se guarden correctamente
-                    entry = {
-                        'campo': columns[0].strip(),
-                        'original': columns[1].strip(),
-                        'sugerido': columns[2].strip()
-                    }
-                    logger.debug(f"Agregando entrada a table_data: {entry}")
-                    parsed_data['table_data'].append(entry)
-            
-            # Extraer nota de validación
-            if len(parts) > 1:
-                # Limpiar la nota de cualquier formato markdown adicional
-                nota = parts[1].strip()
-                # Eliminar "Status: 200" o líneas similares al final si existen
-                if "Status:" in nota:
-                    nota = nota.split("Status:")[0].strip()
-                parsed_data['nota'] = nota
-            
-            # Verificar si se encontraron datos en la tabla
-            if not parsed_data['table_data']:
-                logger.warning("No se encontraron datos en la tabla de la respuesta")
-        else:
-            # Es una respuesta en formato de texto plano (descripción)
-            logger.info("Respuesta en formato de texto plano (descripción)")
-            parsed_data['descripcion'] = response_text.strip()
-            parsed_data['nota'] = "La imagen no contiene un tiquete válido. Se muestra una descripción general."
-        
-        logger.debug(f"Datos parseados completos: {parsed_data}")
-        
-    except Exception as e:
-        logger.error(f"Error parseando respuesta: {str(e)}")
-        logger.error(f"Texto recibido: {response_text}")
-        
-    return parsed_data
\ No newline at end of file
+
+    if response_text.lstrip().startswith('{'):
+        try:
+            return parse_structured_response(response_text)
+        except ocr_esquemas.ErrorEsquema as e:
+            logger.warning(f"Respuesta JSON fuera del esquema de tiquete ({e}); se parsea como texto")
+
+    # Sin tabla: es una descripción de una imagen que no es un tiquete
+    if '|' not in response_text or ('Campo' not in response_text and 'Información Original' not in response_text):
+        logger.info("Respuesta en formato de texto plano (descripción)")
+        parsed_data['descripcion'] = response_text.strip()
+        parsed_data['nota'] = NOTA_NO_TIQUETE
+        return parsed_data
+
+    for clave, etiqueta in _ETIQUETAS.items():
+        valor = etiqueta.search(response_text)
+        if valor:
+            parsed_data[clave] = valor.group(1).strip()
+
+    seccion = _seccion_nota(response_text)
+    if seccion:
+        fin_tabla, inicio_nota, fin_nota = seccion
+        nota = response_text[inicio_nota:fin_nota]
+        # Quitar "Status: 200" o líneas similares al final si existen
+        status = nota.find('Status:')
+        parsed_data['nota'] = (nota[:status] if status != -1 else nota).strip()
+    else:
+        fin_tabla = len(response_text)
+        logger.warning("No se encontró sección de nota en la respuesta")
+
+    parsed_data['table_data'] = _filas(response_text[:fin_tabla])
+    if not parsed_data['table_data']:
+        logger.warning("No se encontraron datos en la tabla de la respuesta")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Tiquete parseado: {len(parsed_data['table_data'])} filas, nota de {len(parsed_data['nota'])} caracteres")
+    return parsed_data
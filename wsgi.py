@@ -28,14 +28,30 @@ except ImportError:
 # Configurar entorno
 os.environ['FLASK_ENV'] = 'production'
 
+# Perfilado de arranque opcional (PROFILE_STARTUP=true): un reporte por worker
+from startup_profiler import startup_profiler, is_enabled_from_env
+if is_enabled_from_env():
+    startup_profiler.start(entrypoint='wsgi.py')
+
 # Importar y crear aplicación
 try:
     from app import create_app
     from config.config import ProductionConfig
     
-    application = create_app(ProductionConfig)
+    with startup_profiler.fase('create_app'):
+        application = create_app(ProductionConfig)
     print("✅ Aplicación Flask creada exitosamente")
     
+    if startup_profiler.active:
+        startup_profiler.stop()
+        try:
+            report_path = startup_profiler.write_report(
+                os.environ.get('PROFILE_STARTUP_OUTPUT'), ProductionConfig.__name__
+            )
+            print(f"📝 Reporte de arranque: {report_path}")
+        except OSError as report_error:
+            print(f"⚠️ No se pudo escribir el reporte de arranque: {report_error}")
+    
 except Exception as e:
     print(f"❌ Error: {e}")
     from flask import Flask